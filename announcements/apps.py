@@ -8,4 +8,5 @@ class AnnouncementsConfig(AppConfig):
     verbose_name = _('Announcements')
 
     def ready(self):
+        import announcements.checks  # noqa
         import announcements.signals  # noqa
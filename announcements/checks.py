@@ -0,0 +1,20 @@
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Буфер просмотров, кэш подбора потерянных и найденных, присутствие и состав чатов,
+    поколение дерева категорий делят состояние между веб-процессами, ASGI-процессами
+    и воркером задач: кэш процесса для них не подходит.
+    """
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return [checks.Error(
+            'The default cache is local to the process.',
+            hint='Configure a shared cache backend such as Redis in CACHES.',
+            id='announcements.E001',
+        )]
+    return []
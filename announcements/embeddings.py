@@ -0,0 +1,207 @@
+"""
+Эмбеддинги изображений объявлений.
+
+Признаки каждого AnnouncementImage считаются один раз: после загрузки задачей
+в очереди, для уже загруженных — командой compute_image_embeddings. Хранятся
+float32-блобом с единичной нормой, поэтому косинусная близость — это скалярное
+произведение, а поиск похожих — одно умножение матрицы всех векторов на запрос.
+Модель признаков задается настройкой IMAGE_EMBEDDING_EXTRACTOR.
+"""
+import logging
+import threading
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Max
+from django.utils.module_loading import import_string
+from .models import ImageEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+class ColorHistogramExtractor:
+    """Цветовая гистограмма 8x8x8: быстрая модель на CPU без внешних зависимостей"""
+    name = 'color-histogram-8'
+    bins = 8
+
+    def extract(self, images):
+        rows = []
+        for image in images:
+            pixels = np.asarray(image.convert('RGB').resize((64, 64)), dtype=np.int64).reshape(-1, 3)
+            pixels //= 256 // self.bins
+            cells = (pixels[:, 0] * self.bins + pixels[:, 1]) * self.bins + pixels[:, 2]
+            rows.append(np.bincount(cells, minlength=self.bins ** 3))
+        return np.asarray(rows, dtype=np.float32)
+
+
+class ResNetExtractor:
+    """ResNet50 без классификатора (2048 признаков); нужны torch и torchvision"""
+    name = 'resnet50'
+
+    def __init__(self):
+        try:
+            import torch
+            from torchvision import models, transforms
+        except ImportError as e:
+            raise ImproperlyConfigured('ResNetExtractor requires torch and torchvision') from e
+
+        self.torch = torch
+        self.model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
+        self.model.fc = torch.nn.Identity()
+        self.model.eval()
+        self.transforms = transforms.Compose([
+            transforms.Resize(256),
+            transforms.CenterCrop(224),
+            transforms.ToTensor(),
+            transforms.Normalize(
+                mean=[0.485, 0.456, 0.406],
+                std=[0.229, 0.224, 0.225]
+            )
+        ])
+
+    def extract(self, images):
+        batch = self.torch.stack([self.transforms(image.convert('RGB')) for image in images])
+        with self.torch.no_grad():
+            return self.model(batch).numpy().astype(np.float32)
+
+
+_extractors = {}
+
+
+def get_extractor():
+    path = settings.IMAGE_EMBEDDING_EXTRACTOR
+    if path not in _extractors:
+        _extractors[path] = import_string(path)()
+    return _extractors[path]
+
+
+def normalize(vectors):
+    """Нормирует строки матрицы; нулевые строки остаются нулевыми"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def compute_embeddings(images, batch_size=None):
+    """Считает и сохраняет эмбеддинги для AnnouncementImage пачками; возвращает число сохраненных"""
+    extractor = get_extractor()
+    batch_size = batch_size or settings.IMAGE_EMBEDDING_BATCH_SIZE
+    images = list(images)
+    saved = 0
+
+    for start in range(0, len(images), batch_size):
+        loaded, pictures = [], []
+        for image in images[start:start + batch_size]:
+            try:
+                with image.image.open('rb') as f:
+                    picture = Image.open(f)
+                    picture.load()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cannot read image {image.pk}: {e}")
+                continue
+            loaded.append(image)
+            pictures.append(picture)
+
+        if not loaded:
+            continue
+
+        vectors = normalize(extractor.extract(pictures))
+        ImageEmbedding.objects.bulk_create(
+            [
+                ImageEmbedding(
+                    image_id=image.pk,
+                    announcement_id=image.announcement_id,
+                    extractor=extractor.name,
+                    vector=vector.tobytes(),
+                )
+                for image, vector in zip(loaded, vectors)
+            ],
+            update_conflicts=True,
+            unique_fields=['image'],
+            update_fields=['announcement', 'extractor', 'vector', 'updated_at'],
+        )
+        saved += len(loaded)
+
+    return saved
+
+
+class EmbeddingIndex:
+    """Матрица всех эмбеддингов текущей модели признаков"""
+
+    def __init__(self, image_ids, announcement_ids, matrix):
+        self.image_ids = image_ids
+        self.announcement_ids = announcement_ids
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls, extractor_name):
+        rows = list(ImageEmbedding.objects.filter(extractor=extractor_name).values_list(
+            'image_id', 'announcement_id', 'vector'
+        ))
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+        image_ids, announcement_ids, vectors = zip(*rows)
+        matrix = np.frombuffer(b''.join(bytes(vector) for vector in vectors), dtype=np.float32)
+        return cls(
+            np.asarray(image_ids),
+            np.asarray(announcement_ids),
+            matrix.reshape(len(rows), -1)
+        )
+
+    def __len__(self):
+        return len(self.image_ids)
+
+    def vectors_for(self, announcement_id):
+        return self.matrix[self.announcement_ids == announcement_id]
+
+    def announcement_scores(self, query, exclude=None, candidates=None):
+        """
+        Лучшая косинусная близость каждого объявления к любому из векторов query.
+        Возвращает (id объявлений, оценки), отсортированные по убыванию.
+        """
+        query = np.atleast_2d(query)
+        if not len(self) or not len(query):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = (self.matrix @ query.T).max(axis=1)
+        mask = np.ones(len(scores), dtype=bool)
+        if exclude is not None:
+            mask &= self.announcement_ids != exclude
+        if candidates is not None:
+            mask &= np.isin(self.announcement_ids, list(candidates))
+        scores, announcement_ids = scores[mask], self.announcement_ids[mask]
+
+        # Для объявления с несколькими фото берем лучшее совпадение
+        order = np.argsort(-scores, kind='stable')
+        _, first = np.unique(announcement_ids[order], return_index=True)
+        best = order[np.sort(first)]
+        return announcement_ids[best], scores[best]
+
+    def similar(self, announcement_id, k=10, candidates=None):
+        """k объявлений с самыми похожими фотографиями: список (id, близость)"""
+        ids, scores = self.announcement_scores(
+            self.vectors_for(announcement_id), exclude=announcement_id, candidates=candidates
+        )
+        return list(zip(ids[:k].tolist(), scores[:k].tolist()))
+
+
+_index = {'key': None, 'index': None}
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Индекс в памяти процесса; перестраивается, когда эмбеддинги изменились"""
+    extractor_name = get_extractor().name
+    # Версия берется из таблицы: эмбеддинги пишет воркер, и веб-процессы должны
+    # заметить новые, измененные (updated_at) и удаленные (число строк) векторы
+    version = ImageEmbedding.objects.filter(extractor=extractor_name).aggregate(
+        updated=Max('updated_at'), total=Count('pk')
+    )
+    key = (extractor_name, version['updated'], version['total'])
+    with _index_lock:
+        if _index['key'] != key:
+            _index['index'] = EmbeddingIndex.build(extractor_name)
+            _index['key'] = key
+        return _index['index']
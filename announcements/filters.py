@@ -1,23 +1,16 @@
 import django_filters
 from django.db.models import Q
-from .models import Announcement
-from math import radians, sin, cos, sqrt, atan2
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # радиус Земли в километрах
-
-    lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-    
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    distance = R * c
-    
-    return distance
+from .models import Announcement, AnnouncementCategory
+from search import search_queryset
+from tree import get_tree
+from . import geo
 
 class AnnouncementFilter(django_filters.FilterSet):
+    # Категория вместе со всеми подкатегориями
+    category = django_filters.ModelChoiceFilter(
+        queryset=AnnouncementCategory.objects.all(), method='filter_category'
+    )
+
     # Фильтры по цене
     price__gte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price__lte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
@@ -41,11 +34,14 @@ class AnnouncementFilter(django_filters.FilterSet):
     
     # Фильтр по местоположению
     location = django_filters.CharFilter(method='filter_location')
+    distance = django_filters.NumberFilter(method='filter_distance', min_value=0)
+    # Координаты центра для distance; некорректные значения не проходят валидацию формы
+    latitude = django_filters.NumberFilter(method='filter_latitude', min_value=-90, max_value=90)
+    longitude = django_filters.NumberFilter(method='filter_longitude', min_value=-180, max_value=180)
     
     class Meta:
         model = Announcement
         fields = {
-            'category': ['exact'],
             'type': ['exact'],
             'status': ['exact'],
             'is_premium': ['exact'],
@@ -53,16 +49,17 @@ class AnnouncementFilter(django_filters.FilterSet):
             'is_active': ['exact'],
         }
     
+    def filter_category(self, queryset, name, value):
+        if not value:
+            return queryset
+
+        return queryset.filter(category_id__in=get_tree(AnnouncementCategory).subtree_ids(value.pk))
+
     def filter_search(self, queryset, name, value):
         if not value:
             return queryset
             
-        return queryset.filter(
-            Q(title__icontains=value) |
-            Q(description__icontains=value) |
-            Q(animal_details__breed__icontains=value) |
-            Q(service_details__service_type__icontains=value)
-        )
+        return search_queryset(queryset, value)
     
     def filter_location(self, queryset, name, value):
         if not value:
@@ -84,28 +81,17 @@ class AnnouncementFilter(django_filters.FilterSet):
         return queryset 
 
     def filter_distance(self, queryset, name, value):
-        lat = self.data.get('latitude')
-        lon = self.data.get('longitude')
-        
-        if not (lat and lon and value):
+        lat = self.form.cleaned_data.get('latitude')
+        lon = self.form.cleaned_data.get('longitude')
+
+        if lat is None or lon is None or not value:
             return queryset
-            
-        filtered_announcements = []
-        for announcement in queryset:
-            if announcement.latitude and announcement.longitude:
-                distance = calculate_distance(
-                    float(lat), float(lon),
-                    float(announcement.latitude), float(announcement.longitude)
-                )
-                if distance <= float(value):
-                    filtered_announcements.append(announcement.id)
-        
-        return queryset.filter(id__in=filtered_announcements)
+
+        return geo.filter_within_radius(queryset, float(lat), float(lon), float(value))
 
     def filter_latitude(self, queryset, name, value):
-        # Implementation of filter_latitude method
-        pass
+        # Сама по себе координата не фильтрует, ее читает filter_distance
+        return queryset
 
     def filter_longitude(self, queryset, name, value):
-        # Implementation of filter_longitude method
-        pass 
\ No newline at end of file
+        return queryset 
\ No newline at end of file
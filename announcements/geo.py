@@ -0,0 +1,235 @@
+"""Геопоиск: геохеш-ячейки, bounding box и векторный haversine"""
+from math import radians, degrees, sin, cos, sqrt, atan2, floor
+import numpy as np
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371
+
+# Длина геохеша, хранимого в базе (ячейка ~5x5 м)
+GEOHASH_PRECISION = 9
+
+# Максимальное число ячеек в префильтре; при большем радиусе берем ячейки крупнее
+MAX_COVERING_CELLS = 16
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Вычисляет расстояние между двумя точками в километрах"""
+    if any(value is None for value in (lat1, lon1, lat2, lon2)):
+        return float('inf')
+
+    lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_many(latitude, longitude, lats, lons):
+    """
+    Расстояния в км от одной точки до массивов координат за один векторный вызов.
+    Для одной пары точек calculate_distance быстрее.
+    """
+    lat0 = radians(float(latitude))
+    lon0 = radians(float(longitude))
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+
+    a = np.sin((lats - lat0) / 2) ** 2 + cos(lat0) * np.cos(lats) * np.sin((lons - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def coordinates(queryset, lat_field='latitude', lon_field='longitude'):
+    """
+    Достает (pk, широты, долготы) массивами через values_list, без создания моделей.
+    Записи без координат пропускаются.
+    """
+    rows = list(queryset.filter(**{
+        f'{lat_field}__isnull': False,
+        f'{lon_field}__isnull': False,
+    }).values_list('pk', lat_field, lon_field))
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+
+    pks, lats, lons = zip(*rows)
+    return np.asarray(pks), np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+
+
+def nearest(pks, distances, limit=None):
+    """Пары (pk, расстояние), отсортированные по расстоянию; limit берет top-k без полной сортировки"""
+    if limit is not None and limit < len(distances):
+        order = np.argpartition(distances, limit)[:limit]
+        order = order[np.argsort(distances[order], kind='stable')]
+    else:
+        order = np.argsort(distances, kind='stable')
+    return list(zip(pks[order].tolist(), distances[order].tolist()))
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Кодирует координаты в геохеш заданной длины"""
+    if latitude is None or longitude is None:
+        return ''
+
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """Размер ячейки геохеша в градусах: (широта, долгота)"""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def bounding_boxes(latitude, longitude, radius_km):
+    """
+    Прямоугольники (min_lat, max_lat, min_lon, max_lon), описанные вокруг круга поиска.
+    Круг, пересекающий антимеридиан, дает два прямоугольника по обе стороны от него.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    dlat = degrees(radius_km / EARTH_RADIUS_KM)
+
+    min_lat = max(latitude - dlat, -90.0)
+    max_lat = min(latitude + dlat, 90.0)
+
+    # У полюсов круг накрывает все долготы
+    if max_lat >= 90.0 or min_lat <= -90.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    dlon = dlat / cos(radians(latitude))
+    if dlon >= 180.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if min_lon < -180.0:
+        return [(min_lat, max_lat, min_lon + 360.0, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360.0)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Возвращает набор префиксов геохеша, полностью покрывающих круг поиска.
+    Пустой набор означает, что радиус слишком велик для префильтра по ячейкам.
+    """
+    boxes = bounding_boxes(latitude, longitude, radius_km)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        grids = [
+            (
+                range(floor((min_lat + 90) / lat_step), floor((max_lat + 90) / lat_step) + 1),
+                range(floor((min_lon + 180) / lon_step), floor((max_lon + 180) / lon_step) + 1),
+            )
+            for min_lat, max_lat, min_lon, max_lon in boxes
+        ]
+        if sum(len(rows) * len(cols) for rows, cols in grids) > MAX_COVERING_CELLS:
+            continue
+
+        cells = set()
+        for rows, cols in grids:
+            for row in rows:
+                for col in cols:
+                    cells.add(encode_geohash(
+                        min((row + 0.5) * lat_step - 90, 90.0),
+                        min((col + 0.5) * lon_step - 180, 180.0),
+                        precision
+                    ))
+        return cells
+
+    return set()
+
+
+def prefilter(queryset, latitude, longitude, radius_km,
+              lat_field='latitude', lon_field='longitude', geohash_field='geohash'):
+    """
+    Отсекает в SQL записи вне bounding box и вне покрывающих ячеек геохеша.
+    Префиксы проверяются диапазоном строк, чтобы работал обычный индекс.
+    """
+    box_filter = Q()
+    for min_lat, max_lat, min_lon, max_lon in bounding_boxes(latitude, longitude, radius_km):
+        box_filter |= Q(**{
+            f'{lat_field}__range': (min_lat, max_lat),
+            f'{lon_field}__range': (min_lon, max_lon),
+        })
+    queryset = queryset.filter(box_filter)
+
+    cells = covering_cells(latitude, longitude, radius_km)
+    if geohash_field and cells:
+        cell_filter = Q()
+        for cell in sorted(cells):
+            # '{' идет сразу за 'z', последним символом алфавита геохеша
+            cell_filter |= Q(**{f'{geohash_field}__gte': cell, f'{geohash_field}__lt': cell + '{'})
+        queryset = queryset.filter(cell_filter)
+
+    return queryset
+
+
+def within_radius(queryset, latitude, longitude, radius_km, limit=None,
+                  lat_field='latitude', lon_field='longitude', geohash_field='geohash'):
+    """
+    Возвращает список (pk, расстояние в км) для записей в радиусе, ближайшие первыми.
+    Точный haversine считается одним векторным вызовом только по кандидатам из prefilter.
+    """
+    radius_km = float(radius_km)
+    pks, lats, lons = coordinates(
+        prefilter(
+            queryset, latitude, longitude, radius_km,
+            lat_field=lat_field, lon_field=lon_field, geohash_field=geohash_field
+        ),
+        lat_field, lon_field
+    )
+    distances = haversine_many(latitude, longitude, lats, lons)
+    mask = distances <= radius_km
+    return nearest(pks[mask], distances[mask], limit)
+
+
+def top_k(queryset, latitude, longitude, k, lat_field='latitude', lon_field='longitude'):
+    """k ближайших записей queryset без ограничения по радиусу: список (pk, расстояние в км)"""
+    pks, lats, lons = coordinates(queryset, lat_field, lon_field)
+    return nearest(pks, haversine_many(latitude, longitude, lats, lons), k)
+
+
+def filter_within_radius(queryset, latitude, longitude, radius_km, **fields):
+    """Сужает queryset до записей в радиусе, сохраняя его порядок сортировки"""
+    ids = [pk for pk, _ in within_radius(queryset, latitude, longitude, radius_km, **fields)]
+    return queryset.filter(pk__in=ids)
@@ -0,0 +1,100 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from announcements.models import Announcement, AnnouncementCategory
+from announcements import geo
+
+User = get_user_model()
+
+# Москва и область
+MIN_LAT, MAX_LAT = 55.0, 56.5
+MIN_LON, MAX_LON = 36.5, 38.5
+
+
+def legacy_search(queryset, lat, lon, radius):
+    """Старый поиск: перебор всех объявлений в Python"""
+    nearby = []
+    for announcement in queryset:
+        if announcement.latitude and announcement.longitude:
+            distance = geo.calculate_distance(
+                lat, lon, announcement.latitude, announcement.longitude
+            )
+            if distance <= radius:
+                nearby.append(announcement.id)
+    return nearby
+
+
+class Command(BaseCommand):
+    help = 'Compares geo-search over the geohash index with the per-row haversine loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Numbers of synthetic announcements to benchmark')
+        parser.add_argument('--radius', type=float, default=5, help='Search radius in km')
+        parser.add_argument('--queries', type=int, default=5, help='Queries per size')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        for size in options['sizes']:
+            self._run(size, options)
+
+    def _run(self, size, options):
+        radius = options['radius']
+        with transaction.atomic():
+            author = User.objects.create_user(phone='+70000000001')
+            category = AnnouncementCategory.objects.create(name='Benchmark', slug='benchmark-geo')
+            self._populate(size, author, category, options['batch_size'])
+
+            points = [
+                (random.uniform(MIN_LAT, MAX_LAT), random.uniform(MIN_LON, MAX_LON))
+                for _ in range(options['queries'])
+            ]
+            queryset = Announcement.objects.filter(is_active=True)
+
+            legacy_time, legacy_ids = self._time(
+                lambda lat, lon: legacy_search(queryset, lat, lon, radius), points
+            )
+            indexed_time, indexed_ids = self._time(
+                lambda lat, lon: [pk for pk, _ in geo.within_radius(queryset, lat, lon, radius)],
+                points
+            )
+
+            if sorted(legacy_ids) != sorted(indexed_ids):
+                self.stdout.write(self.style.ERROR(f'{size}: results differ'))
+
+            self.stdout.write(
+                f'{size:>9} rows | loop {legacy_time * 1000:10.1f} ms/query | '
+                f'index {indexed_time * 1000:8.1f} ms/query | '
+                f'x{legacy_time / max(indexed_time, 1e-9):.0f}'
+            )
+            transaction.set_rollback(True)
+
+    def _populate(self, size, author, category, batch_size):
+        for start in range(0, size, batch_size):
+            batch = []
+            for _ in range(min(batch_size, size - start)):
+                lat = round(random.uniform(MIN_LAT, MAX_LAT), 6)
+                lon = round(random.uniform(MIN_LON, MAX_LON), 6)
+                batch.append(Announcement(
+                    title='Benchmark',
+                    description='',
+                    category=category,
+                    type=Announcement.TYPE_ANIMAL,
+                    status=Announcement.STATUS_ACTIVE,
+                    author=author,
+                    latitude=lat,
+                    longitude=lon,
+                    # bulk_create обходит save(), геохеш заполняем сами
+                    geohash=geo.encode_geohash(lat, lon),
+                ))
+            Announcement.objects.bulk_create(batch)
+
+    def _time(self, search, points):
+        found = []
+        started = time.perf_counter()
+        for lat, lon in points:
+            found.extend(search(lat, lon))
+        return (time.perf_counter() - started) / len(points), found
@@ -0,0 +1,39 @@
+import random
+import timeit
+from django.core.management.base import BaseCommand
+from announcements import geo
+
+
+class Command(BaseCommand):
+    help = 'Measures per-call cost of the scalar haversine loop and the vectorized kernel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 100000],
+                            help='Numbers of points per call')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        origin = (55.75, 37.62)
+
+        self.stdout.write(f'{"points":>8} | {"loop, us/call":>14} | {"kernel, us/call":>15} | {"ns/point":>8}')
+        for size in options['sizes']:
+            lats = [random.uniform(55.0, 56.5) for _ in range(size)]
+            lons = [random.uniform(36.5, 38.5) for _ in range(size)]
+            number = max(1, 100000 // size)
+
+            loop = self._measure(
+                lambda: [geo.calculate_distance(*origin, lat, lon) for lat, lon in zip(lats, lons)],
+                number, options['repeat']
+            )
+            kernel = self._measure(
+                lambda: geo.haversine_many(*origin, lats, lons),
+                number, options['repeat']
+            )
+
+            self.stdout.write(
+                f'{size:>8} | {loop * 1e6:>14.1f} | {kernel * 1e6:>15.1f} | {kernel * 1e9 / size:>8.1f}'
+            )
+
+    def _measure(self, func, number, repeat):
+        return min(timeit.repeat(func, number=number, repeat=repeat)) / number
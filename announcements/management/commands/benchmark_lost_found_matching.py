@@ -0,0 +1,117 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from announcements import geo
+from announcements.models import Announcement, AnnouncementCategory, LostFoundAnnouncement
+from announcements.services import LostPetMatchingService
+
+User = get_user_model()
+
+# Москва и область
+MIN_LAT, MAX_LAT = 55.0, 56.5
+MIN_LON, MAX_LON = 36.5, 38.5
+
+ANIMAL_TYPES = ['dog', 'cat', 'bird', 'rodent']
+BREEDS = ['Лабрадор', 'Хаски', 'Дворняга', 'Шпиц', 'Мейн-кун', 'Сиамская']
+COLORS = ['черный', 'белый', 'рыжий', 'серый']
+SIZES = ['small', 'medium', 'large']
+
+
+def legacy_find_matches(service, announcement):
+    """Прежний поиск: все объявления противоположного типа за ±30 дней, оценка и причины для каждого"""
+    candidates = LostFoundAnnouncement.objects.exclude(id=announcement.id).select_related('announcement').filter(
+        type='found' if announcement.type == 'lost' else 'lost',
+        date_lost_found__range=(
+            announcement.date_lost_found - timedelta(days=30),
+            announcement.date_lost_found + timedelta(days=30)
+        )
+    )
+    matches = []
+    for match in candidates:
+        score = service._calculate_match_score(announcement, match)
+        if score > 0.3:
+            matches.append({
+                'match': match,
+                'score': score,
+                'reasons': service._get_match_reasons(announcement, match)
+            })
+    return sorted(matches, key=lambda x: x['score'], reverse=True)
+
+
+class Command(BaseCommand):
+    help = 'Compares candidate-pruned lost/found matching with the full per-row loop on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                            help='Numbers of synthetic lost/found announcements to benchmark')
+        parser.add_argument('--queries', type=int, default=5, help='Queries per size')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        for size in options['sizes']:
+            self._run(size, options)
+
+    def _run(self, size, options):
+        with transaction.atomic():
+            author = User.objects.create_user(phone='+70000000001')
+            category = AnnouncementCategory.objects.create(name='Benchmark', slug='benchmark-lost-found')
+            self._populate(size, author, category, options['batch_size'])
+
+            queries = list(LostFoundAnnouncement.objects.filter(type='lost').order_by('?')[:options['queries']])
+            service = LostPetMatchingService()
+
+            legacy_time = self._time(lambda query: legacy_find_matches(service, query), queries)
+            cache.clear()
+            cold_time = self._time(service.find_matches, queries)
+            warm_time = self._time(service.find_matches, queries)
+
+            self.stdout.write(
+                f'{size:>8} rows | loop {legacy_time * 1000:9.1f} ms/query | '
+                f'pruned {cold_time * 1000:7.1f} ms/query | cached {warm_time * 1000:6.1f} ms/query | '
+                f'x{legacy_time / max(cold_time, 1e-9):.0f}'
+            )
+            transaction.set_rollback(True)
+        cache.clear()
+
+    def _populate(self, size, author, category, batch_size):
+        now = timezone.now()
+        for start in range(0, size, batch_size):
+            count = min(batch_size, size - start)
+            announcements = Announcement.objects.bulk_create([
+                Announcement(
+                    title='Benchmark', description='', category=category,
+                    type=Announcement.TYPE_LOST_FOUND, status=Announcement.STATUS_ACTIVE, author=author,
+                )
+                for _ in range(count)
+            ])
+            batch = []
+            for announcement in announcements:
+                lat = round(random.uniform(MIN_LAT, MAX_LAT), 6)
+                lon = round(random.uniform(MIN_LON, MAX_LON), 6)
+                batch.append(LostFoundAnnouncement(
+                    announcement=announcement,
+                    type=random.choice(['lost', 'found']),
+                    animal_type=random.choice(ANIMAL_TYPES),
+                    breed=random.choice(BREEDS),
+                    color=random.choice(COLORS),
+                    size=random.choice(SIZES),
+                    distinctive_features='',
+                    date_lost_found=now - timedelta(days=random.uniform(0, 180)),
+                    latitude=lat,
+                    longitude=lon,
+                    # bulk_create обходит save(), геохеш заполняем сами
+                    geohash=geo.encode_geohash(lat, lon),
+                ))
+            LostFoundAnnouncement.objects.bulk_create(batch)
+
+    def _time(self, find_matches, queries):
+        started = time.perf_counter()
+        for query in queries:
+            find_matches(query)
+        return (time.perf_counter() - started) / len(queries)
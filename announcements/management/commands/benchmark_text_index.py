@@ -0,0 +1,90 @@
+import math
+import random
+import time
+from collections import Counter
+import numpy as np
+from django.core.management.base import BaseCommand
+from announcements.text_index import TextIndex, tokenize
+
+COLORS = ['рыжий', 'черный', 'белый', 'серый', 'трехцветный', 'палевый', 'тигровый', 'коричневый']
+BREEDS = ['лабрадор', 'овчарка', 'хаски', 'дворняга', 'шпиц', 'мейн-кун', 'британская', 'сиамская', 'такса']
+FEATURES = [
+    'белое пятно на груди', 'рваное ухо', 'красный ошейник', 'синий ошейник с адресником',
+    'купированный хвост', 'хромает на заднюю лапу', 'откликается на кличку', 'боится людей',
+    'чипирован', 'шрам на морде', 'разные глаза', 'длинная шерсть', 'короткая шерсть',
+    'очень ласковый', 'пугливая', 'в шлейке', 'белые носочки на лапах', 'пушистый хвост',
+]
+
+
+def synthetic_text():
+    features = ', '.join(random.sample(FEATURES, random.randint(1, 4)))
+    return f'{features}. {random.choice(BREEDS)} {random.choice(COLORS)}'
+
+
+def pairwise_similarity(text1, text2):
+    """Прежний подход: словарь и IDF заново строятся по паре текстов для каждого сравнения"""
+    documents = [Counter(tokenize(text1)), Counter(tokenize(text2))]
+    vocabulary = sorted(set(documents[0]) | set(documents[1]))
+    idf = [math.log(3 / (1 + sum(term in document for document in documents))) + 1 for term in vocabulary]
+    vectors = np.array([
+        [(1 + math.log(document[term])) * weight if term in document else 0.0
+         for term, weight in zip(vocabulary, idf)]
+        for document in documents
+    ])
+    norms = np.linalg.norm(vectors, axis=1)
+    return float(vectors[0] @ vectors[1] / (norms[0] * norms[1])) if norms.all() else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Compares top-k description search over the TF-IDF index with per-pair vectorization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of synthetic descriptions to benchmark')
+        parser.add_argument('--queries', type=int, default=5, help='Queries per size')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--pairwise-limit', type=int, default=10000,
+                            help='Skip the per-pair baseline above this size')
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        for size in options['sizes']:
+            self._run(size, options)
+
+    def _run(self, size, options):
+        texts = [synthetic_text() for _ in range(size)]
+        queries = [synthetic_text() for _ in range(options['queries'])]
+
+        started = time.perf_counter()
+        index = TextIndex()
+        for pk, text in enumerate(texts):
+            index.add(pk, text)
+        index.similar(queries[0], k=1)  # веса считаются при первом запросе
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for query in queries:
+            index.similar(query, k=options['k'])
+        indexed_time = (time.perf_counter() - started) / len(queries)
+
+        started = time.perf_counter()
+        for pk, query in enumerate(queries, size):
+            index.add(pk, query)
+            index.similar(query, k=options['k'])
+        update_time = (time.perf_counter() - started) / len(queries)
+
+        line = (
+            f'{size:>8} docs | build {build_time:7.2f} s | '
+            f'index {indexed_time * 1000:8.1f} ms/query | add+query {update_time * 1000:8.1f} ms'
+        )
+        if size <= options['pairwise_limit']:
+            started = time.perf_counter()
+            for query in queries:
+                scores = [pairwise_similarity(query, text) for text in texts]
+                sorted(range(size), key=scores.__getitem__, reverse=True)[:options['k']]
+            pairwise_time = (time.perf_counter() - started) / len(queries)
+            line += (
+                f' | per-pair {pairwise_time * 1000:9.1f} ms/query | '
+                f'x{pairwise_time / max(indexed_time, 1e-9):.0f}'
+            )
+        self.stdout.write(line)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from announcements.embeddings import compute_embeddings, get_extractor
+from announcements.models import AnnouncementImage
+
+
+class Command(BaseCommand):
+    help = 'Computes image embeddings for photos that do not have one for the current extractor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute embeddings for all images')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        extractor = get_extractor()
+        images = AnnouncementImage.objects.order_by('pk')
+        if not options['all']:
+            images = images.exclude(embedding__extractor=extractor.name)
+
+        pks = list(images.values_list('pk', flat=True))
+        chunk = 1000
+        saved = 0
+        for start in range(0, len(pks), chunk):
+            saved += compute_embeddings(
+                AnnouncementImage.objects.filter(pk__in=pks[start:start + chunk]).order_by('pk'),
+                batch_size=options['batch_size']
+            )
+        self.stdout.write(f'{extractor.name}: {saved} of {len(pks)} images embedded')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from announcements import view_counts
+
+
+class Command(BaseCommand):
+    help = 'Flushes buffered view counts to the database'
+
+    def handle(self, *args, **options):
+        for prefix, updated in view_counts.flush_all().items():
+            self.stdout.write(f'{prefix}: {updated} rows updated')
@@ -1,61 +1,37 @@
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from PIL import Image
-import torch
-from torchvision import transforms, models
-from django.core.files.storage import default_storage
-from django.conf import settings
-import io
+from .embeddings import get_index
+from .geo import calculate_distance, haversine_many
+from .text_index import document_text, get_text_index
+
+
+def _announcement_id(announcement):
+    """id базового Announcement: фотографии привязаны к нему, а не к деталям объявления"""
+    return getattr(announcement, 'announcement_id', None) or announcement.pk
+
 
 class PetMatchingSystem:
     """Система сопоставления объявлений о пропаже/находке животных"""
     
-    def __init__(self):
-        # Инициализация модели для анализа изображений
-        self.image_model = models.resnet50(pretrained=True)
-        self.image_model.eval()
-        
-        # Подготовка трансформации изображений
-        self.image_transforms = transforms.Compose([
-            transforms.Resize(256),
-            transforms.CenterCrop(224),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            )
-        ])
-        
-        # Векторизатор для текстовых описаний
-        self.text_vectorizer = TfidfVectorizer(
-            max_features=1000,
-            stop_words='russian'
+    def image_similarities(self, announcement, candidates) -> dict:
+        """Схожесть фотографий с каждым кандидатом одним умножением матриц (по готовым эмбеддингам)"""
+        index = get_index()
+        query = index.vectors_for(_announcement_id(announcement))
+        ids, scores = index.announcement_scores(
+            query, candidates={_announcement_id(candidate) for candidate in candidates}
         )
+        return dict(zip(ids.tolist(), scores.tolist()))
     
-    def get_image_features(self, image_path: str) -> np.ndarray:
-        """Извлечение признаков из изображения"""
-        # Загрузка изображения
-        with default_storage.open(image_path, 'rb') as f:
-            img = Image.open(io.BytesIO(f.read())).convert('RGB')
-        
-        # Подготовка изображения
-        img_tensor = self.image_transforms(img)
-        img_tensor = img_tensor.unsqueeze(0)
-        
-        # Получение признаков
-        with torch.no_grad():
-            features = self.image_model.features(img_tensor)
-            features = torch.flatten(features, 1)
-        
-        return features.numpy()
-    
-    def get_text_features(self, text: str) -> np.ndarray:
-        """Извлечение признаков из текста"""
-        return self.text_vectorizer.fit_transform([text]).toarray()
+    def text_similarities(self, announcement, candidates) -> dict:
+        """Схожесть описаний с каждым кандидатом одним проходом по TF-IDF индексу"""
+        return get_text_index().scores(
+            document_text(announcement), [candidate.pk for candidate in candidates]
+        )
     
-    def calculate_similarity(self, announcement1, announcement2) -> float:
-        """Расчет схожести двух объявлений"""
+    def calculate_similarity(self, announcement1, announcement2, distance: float = None,
+                             image_similarity: float = None, text_similarity: float = None) -> float:
+        """
+        Расчет схожести двух объявлений; distance в метрах, схожесть фотографий
+        и описаний можно передать заранее посчитанными
+        """
         # Веса для разных компонентов сравнения
         weights = {
             'location': 0.3,
@@ -67,33 +43,27 @@ class PetMatchingSystem:
         total_score = 0.0
         
         # Сравнение по геолокации
-        distance = self.calculate_distance(
-            announcement1.latitude, announcement1.longitude,
-            announcement2.latitude, announcement2.longitude
-        )
+        if distance is None:
+            distance = self.calculate_distance(
+                announcement1.latitude, announcement1.longitude,
+                announcement2.latitude, announcement2.longitude
+            )
         location_score = 1.0 / (1.0 + distance/1000)  # km to score
         total_score += weights['location'] * location_score
         
         # Сравнение текстовых описаний
-        text1 = f"{announcement1.distinctive_features} {announcement1.breed} {announcement1.color}"
-        text2 = f"{announcement2.distinctive_features} {announcement2.breed} {announcement2.color}"
-        
-        text_vectors = self.get_text_features(text1 + " " + text2)
-        text_similarity = cosine_similarity(
-            text_vectors[0:1],
-            text_vectors[1:2]
-        )[0][0]
+        if text_similarity is None:
+            text_similarity = get_text_index().similarity(
+                document_text(announcement1), document_text(announcement2)
+            )
         total_score += weights['description'] * text_similarity
         
         # Сравнение изображений
-        if announcement1.images.exists() and announcement2.images.exists():
-            img_features1 = self.get_image_features(announcement1.images.first().image.path)
-            img_features2 = self.get_image_features(announcement2.images.first().image.path)
-            
-            image_similarity = cosine_similarity(
-                img_features1,
-                img_features2
-            )[0][0]
+        if image_similarity is None:
+            image_similarity = self.image_similarities(announcement1, [announcement2]).get(
+                _announcement_id(announcement2)
+            )
+        if image_similarity is not None:
             total_score += weights['image'] * image_similarity
         
         # Сравнение атрибутов
@@ -122,20 +92,7 @@ class PetMatchingSystem:
     
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Расчет расстояния между двумя точками в метрах"""
-        from math import sin, cos, sqrt, atan2, radians
-        
-        R = 6371.0  # радиус Земли в километрах
-        
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance = R * c
-        
-        return distance * 1000  # конвертируем в метры
+        return calculate_distance(lat1, lon1, lat2, lon2) * 1000  # конвертируем в метры
     
     def find_matches(self, announcement, threshold: float = 0.7) -> list:
         """Поиск похожих объявлений"""
@@ -150,9 +107,24 @@ class PetMatchingSystem:
             id=announcement.id
         )
         
+        # Расстояния до всех кандидатов одним векторным вызовом
+        potential_matches = list(potential_matches)
+        distances = haversine_many(
+            announcement.latitude, announcement.longitude,
+            [match.latitude for match in potential_matches],
+            [match.longitude for match in potential_matches]
+        ) * 1000
+        
+        image_similarities = self.image_similarities(announcement, potential_matches)
+        text_similarities = self.text_similarities(announcement, potential_matches)
+        
         matches = []
-        for potential_match in potential_matches:
-            similarity = self.calculate_similarity(announcement, potential_match)
+        for potential_match, distance in zip(potential_matches, distances.tolist()):
+            similarity = self.calculate_similarity(
+                announcement, potential_match, distance,
+                image_similarities.get(_announcement_id(potential_match)),
+                text_similarities.get(potential_match.pk)
+            )
             if similarity >= threshold:
                 matches.append({
                     'announcement': potential_match,
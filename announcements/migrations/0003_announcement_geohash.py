@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_geohash(apps, schema_editor):
+    from announcements.geo import encode_geohash
+
+    Announcement = apps.get_model('announcements', 'Announcement')
+    batch = []
+    for announcement in Announcement.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude').iterator():
+        announcement.geohash = encode_geohash(announcement.latitude, announcement.longitude)
+        batch.append(announcement)
+        if len(batch) >= 1000:
+            Announcement.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Announcement.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='геохеш'),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['geohash'], name='announcemen_geohash_1d3ad8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['latitude', 'longitude'], name='announcemen_latitud_d40f34_idx'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
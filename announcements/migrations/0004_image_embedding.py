@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0003_announcement_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageEmbedding',
+            fields=[
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='announcements.announcementimage', verbose_name='Изображение')),
+                ('extractor', models.CharField(max_length=100, verbose_name='Модель признаков')),
+                ('vector', models.BinaryField(verbose_name='Вектор')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_embeddings', to='announcements.announcement', verbose_name='Объявление')),
+            ],
+            options={
+                'verbose_name': 'Эмбеддинг изображения',
+                'verbose_name_plural': 'Эмбеддинги изображений',
+                'indexes': [models.Index(fields=['extractor'], name='announcemen_extract_651357_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+def fill_geohash(apps, schema_editor):
+    from announcements.geo import encode_geohash
+
+    LostFoundAnnouncement = apps.get_model('announcements', 'LostFoundAnnouncement')
+    batch = []
+    for announcement in LostFoundAnnouncement.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude').iterator():
+        announcement.geohash = encode_geohash(announcement.latitude, announcement.longitude)
+        batch.append(announcement)
+        if len(batch) >= 1000:
+            LostFoundAnnouncement.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        LostFoundAnnouncement.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0004_image_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lostfoundannouncement',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='геохеш'),
+        ),
+        migrations.AddIndex(
+            model_name='lostfoundannouncement',
+            index=models.Index(fields=['type', 'animal_type', 'date_lost_found'], name='announcemen_type_18b0b7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostfoundannouncement',
+            index=models.Index(fields=['geohash'], name='announcemen_geohash_53ac1a_idx'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0006_announcement_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcementimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Копии'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0008_announcementcategory_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextIndexChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lost_found_id', models.IntegerField(verbose_name='Объявление о потере/находке')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Изменение индекса описаний',
+                'verbose_name_plural': 'Изменения индекса описаний',
+            },
+        ),
+    ]
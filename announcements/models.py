@@ -7,14 +7,19 @@ from unidecode import unidecode
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 import json
+from renditions import RenditionsMixin
+from tree import MaterializedPathMixin
+from .geo import encode_geohash
 
-class AnnouncementCategory(models.Model):
+class AnnouncementCategory(MaterializedPathMixin, models.Model):
     name = models.CharField(_('Название'), max_length=100)
     slug = models.SlugField(_('Слаг'), unique=True)
     description = models.TextField(_('Описание'), blank=True)
     parent = models.ForeignKey('self', verbose_name=_('Родительская категория'),
                              on_delete=models.CASCADE, null=True, blank=True,
                              related_name='children')
+    # id предков и самой категории, см. tree
+    path = models.CharField(_('Путь'), max_length=255, db_index=True, editable=False, default='')
     
     class Meta:
         verbose_name = _('Категория объявления')
@@ -71,6 +76,7 @@ class Announcement(models.Model):
     address = models.CharField(_('адрес'), max_length=255, null=True, blank=True)
     latitude = models.DecimalField(_('широта'), max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(_('долгота'), max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(_('геохеш'), max_length=12, blank=True, default='', editable=False)
     
     # Изображения
     images = models.TextField(_('Изображения'), default='[]')  # JSON строка для хранения списка URL изображений
@@ -81,15 +87,26 @@ class Announcement(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['created_at']),
+            models.Index(fields=['-created_at', '-id']),
             models.Index(fields=['category']),
             models.Index(fields=['author']),
             models.Index(fields=['is_premium']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['geohash']),
+            models.Index(fields=['latitude', 'longitude']),
         ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Геохеш пересчитывается при каждом сохранении, чтобы не расходиться с координатами
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
     def get_images(self):
         return json.loads(self.images)
 
@@ -304,6 +321,7 @@ class LostFoundAnnouncement(models.Model):
     location = models.CharField(_('Место пропажи/находки'), max_length=255, null=True, blank=True, default='')
     latitude = models.DecimalField(_('Широта'), max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(_('Долгота'), max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(_('геохеш'), max_length=12, blank=True, default='', editable=False)
     
     # Contact information
     contact_phone = models.CharField(
@@ -339,26 +357,65 @@ class LostFoundAnnouncement(models.Model):
             models.Index(fields=['type']),
             models.Index(fields=['animal_type']),
             models.Index(fields=['date_lost_found']),
+            models.Index(fields=['type', 'animal_type', 'date_lost_found']),
+            models.Index(fields=['geohash']),
         ]
     
+    def save(self, *args, **kwargs):
+        # Геохеш нужен префильтру поиска совпадений, пересчитываем вместе с координатами
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+    
     def get_contacted_users(self):
         return json.loads(self.contacted_users)
     
     def set_contacted_users(self, users_list):
         self.contacted_users = json.dumps(users_list)
 
-class AnnouncementImage(models.Model):
+class AnnouncementImage(RenditionsMixin, models.Model):
     announcement = models.ForeignKey(Announcement, verbose_name=_('Объявление'),
                                    on_delete=models.CASCADE, related_name='announcement_images')
     image = models.ImageField(_('Изображение'), upload_to='announcements/')
     is_main = models.BooleanField(_('Главное изображение'), default=False)
     created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    # Ширины собранных копий, см. renditions
+    renditions = models.JSONField(_('Копии'), default=list, blank=True, editable=False)
     
     class Meta:
         verbose_name = _('Изображение объявления')
         verbose_name_plural = _('Изображения объявлений')
         ordering = ['-is_main', '-created_at']
 
+class ImageEmbedding(models.Model):
+    """Вектор признаков изображения (float32, нормирован), см. announcements.embeddings"""
+    image = models.OneToOneField(AnnouncementImage, verbose_name=_('Изображение'),
+                                 on_delete=models.CASCADE, primary_key=True, related_name='embedding')
+    announcement = models.ForeignKey(Announcement, verbose_name=_('Объявление'),
+                                     on_delete=models.CASCADE, related_name='image_embeddings')
+    extractor = models.CharField(_('Модель признаков'), max_length=100)
+    vector = models.BinaryField(_('Вектор'))
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Эмбеддинг изображения')
+        verbose_name_plural = _('Эмбеддинги изображений')
+        indexes = [
+            models.Index(fields=['extractor']),
+        ]
+
+class TextIndexChange(models.Model):
+    """Журнал изменений объявлений о потере/находке для индекса описаний, см. announcements.text_index"""
+    # Не внешний ключ: запись об удалении должна пережить само объявление
+    lost_found_id = models.IntegerField(_('Объявление о потере/находке'))
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('Изменение индекса описаний')
+        verbose_name_plural = _('Изменения индекса описаний')
+
 class LostPet(models.Model):
     STATUS_LOST = 'lost'
     STATUS_FOUND = 'found'
@@ -0,0 +1,17 @@
+import search
+from .models import Announcement
+
+
+@search.register
+class AnnouncementIndex(search.SearchIndex):
+    model = Announcement
+    fields = {
+        'title': 3,
+        'animal_details__breed': 2,
+        'service_details__service_type': 2,
+        'description': 1,
+    }
+    depends_on = {
+        'announcements.AnimalAnnouncement': 'announcement_id',
+        'announcements.ServiceAnnouncement': 'announcement_id',
+    }
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import (
     Announcement,
@@ -13,15 +14,27 @@ class AnnouncementCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'parent']
 
 class AnnouncementImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = AnnouncementImage
-        fields = ['id', 'announcement', 'image', 'is_main', 'created_at']
+        fields = ['id', 'announcement', 'image', 'srcset', 'is_main', 'created_at']
         read_only_fields = ['created_at']
 
+    def get_srcset(self, obj):
+        """WebP и JPEG-копии для <picture>; пустые строки, пока копии не собраны"""
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request else None
+        return {
+            'webp': obj.get_srcset('webp', build_url),
+            'jpeg': obj.get_srcset('jpeg', build_url),
+        }
+
 class AnnouncementSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_name = serializers.CharField(source='author.get_full_name', read_only=True)
-    images = AnnouncementImageSerializer(many=True, read_only=True)
+    location = serializers.CharField(source='address', required=False, allow_null=True, allow_blank=True)
+    images = AnnouncementImageSerializer(source='announcement_images', many=True, read_only=True)
     main_image = serializers.SerializerMethodField()
 
     class Meta:
@@ -35,11 +48,22 @@ class AnnouncementSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'author', 'created_at', 'updated_at', 'views_count', 'is_premium'
         ]
+        # Подсказки для queryplan: главное изображение читается методом
+        prefetch_related = [
+            Prefetch(
+                'announcement_images',
+                queryset=AnnouncementImage.objects.filter(is_main=True),
+                to_attr='main_images'
+            ),
+        ]
 
     def get_main_image(self, obj):
-        main_image = obj.images.filter(is_main=True).first()
+        main_images = getattr(obj, 'main_images', None)
+        if main_images is None:
+            main_images = obj.announcement_images.filter(is_main=True)[:1]
+        main_image = next(iter(main_images), None)
         if main_image:
-            return AnnouncementImageSerializer(main_image).data
+            return AnnouncementImageSerializer(main_image, context=self.context).data
         return None
 
     def validate_price(self, value):
@@ -1,137 +1,182 @@
-from math import sin, cos, sqrt, atan2, radians
+import hashlib
+import uuid
+import numpy as np
+from django.core.cache import cache
 from django.db.models import Q, F
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, timezone as dt_timezone
 from .models import LostFoundAnnouncement, Announcement
+from . import geo
+from .geo import calculate_distance
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.db import transaction
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from notifications.models import Notification
+from notifications.fanout import RadiusFanout
 from user_profile.models import UserProfile
 import logging
 
 logger = logging.getLogger(__name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Вычисляет расстояние между двумя точками в километрах"""
-    if not all([lat1, lon1, lat2, lon2]):
-        return float('inf')
-        
-    R = 6371  # Радиус Земли в километрах
-    
-    lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-    
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    distance = R * c
-    
-    return distance
-
 class AreaNotificationService:
     """Сервис для отправки уведомлений в радиусе"""
     
     def notify_users_in_radius(self, announcement):
-        """Отправляет уведомления пользователям в заданном радиусе"""
+        """Ставит в очередь рассылку уведомлений пользователям в заданном радиусе"""
         if not announcement.latitude or not announcement.longitude:
-            return []
-            
-        radius_km = announcement.search_radius or 5
-        
-        # Находим пользователей в радиусе
-        nearby_users = []
-        for profile in UserProfile.objects.select_related('user').filter(
-            last_latitude__isnull=False, 
-            last_longitude__isnull=False
-        ):
-            distance = calculate_distance(
-                announcement.latitude, announcement.longitude,
-                profile.last_latitude, profile.last_longitude
-            )
-            if distance <= radius_km:
-                profile.user.distance = distance
-                nearby_users.append(profile.user)
-        
-        # Сортируем по расстоянию
-        nearby_users.sort(key=lambda u: u.distance)
-        
-        # Отправляем уведомления
-        for user in nearby_users:
-            self._send_notification(user, announcement)
-            
-        return nearby_users
-        
-    def _send_notification(self, user, announcement):
-        """Отправляет уведомление конкретному пользователю"""
-        notification_data = {
-            'title': _('Потерянный питомец рядом') if announcement.type == 'lost' 
-                    else _('Найденный питомец рядом'),
-            'body': f"{announcement.announcement.title} в районе {announcement.last_seen_location}",
-            'data': {
-                'announcement_id': announcement.id,
-                'type': announcement.type
-            }
-        }
-        
-        # Отправляем через выбранный сервис уведомлений
-        try:
-            if hasattr(settings, 'PUSH_NOTIFICATIONS_SETTINGS'):
-                # Используем push-уведомления если настроены
-                device = user.fcm_device
-                if device:
-                    device.send_message(**notification_data)
-            else:
-                # Иначе создаем уведомление в базе
-                Notification.objects.create(
-                    user=user,
-                    title=notification_data['title'],
-                    message=notification_data['body'],
-                    data=notification_data['data']
-                )
-        except Exception as e:
-            logger.error(f"Failed to send notification: {e}")
+            return
+
+        RadiusFanout().schedule(
+            announcement.latitude, announcement.longitude,
+            getattr(announcement, 'search_radius', None) or 5,
+            title=_('Потерянный питомец рядом') if announcement.type == 'lost'
+                  else _('Найденный питомец рядом'),
+            message=f"{announcement.announcement.title} в районе {announcement.location}",
+            content_object=announcement,
+            exclude_user_id=announcement.announcement.author_id,
+            data={'announcement_id': announcement.id, 'announcement_type': announcement.type},
+        )
+
+
+def _utc(value):
+    """Наивное время в UTC для массивов datetime64"""
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None) if timezone.is_aware(value) else value
 
 
 class LostPetMatchingService:
-    """Сервис для поиска совпадений объявлений о потерянных/найденных животных"""
+    """
+    Сервис для поиска совпадений объявлений о потерянных/найденных животных.
+
+    Кандидаты отбираются в SQL (противоположный тип, тот же вид животного, окно
+    по дате и ячейки геохеша в радиусе), оцениваются все сразу по столбцам значений,
+    а модели и причины совпадения собираются только для возвращаемых top-k.
+    Оценки кэшируются, пока не появится объявление противоположного типа о том же виде;
+    поколения кэша меняют все процессы, поэтому нужен общий кэш (Redis).
+    """
+    
+    # Поля кандидата, по которым считается оценка
+    SCORE_FIELDS = ('pk', 'animal_type', 'breed', 'color', 'size', 'latitude', 'longitude', 'date_lost_found')
+    
+    def __init__(self, radius_km=None, window_days=None, limit=None):
+        self.radius_km = radius_km or settings.LOST_FOUND_MATCH_RADIUS_KM
+        self.window_days = window_days or settings.LOST_FOUND_MATCH_WINDOW_DAYS
+        self.limit = limit or settings.LOST_FOUND_MATCH_LIMIT
     
-    def find_matches(self, announcement):
-        """Находит потенциальные совпадения для объявления"""
-        # Базовый queryset исключает текущее объявление
-        base_queryset = LostFoundAnnouncement.objects.exclude(
-            id=announcement.id
-        ).select_related('announcement')
-        
-        # Ищем объявления противоположного типа
-        opposite_type = 'found' if announcement.type == 'lost' else 'lost'
-        matches = base_queryset.filter(
-            type=opposite_type,
-            # В пределах 30 дней от даты пропажи/находки
+    def find_matches(self, announcement, limit=None):
+        """Находит потенциальные совпадения для объявления, лучшие первыми"""
+        scored = self.scored_candidates(announcement)[:limit or self.limit]
+        matches = LostFoundAnnouncement.objects.select_related('announcement').in_bulk(
+            [pk for pk, _, _ in scored]
+        )
+        return [
+            {
+                'match': matches[pk],
+                'score': score,
+                'reasons': self._get_match_reasons(announcement, matches[pk], distance)
+            }
+            for pk, score, distance in scored
+            if pk in matches
+        ]
+    
+    def scored_candidates(self, announcement):
+        """Список (pk, оценка, расстояние в км) кандидатов выше порога; кэшируется"""
+        key = self._cache_key(announcement)
+        scored = cache.get(key)
+        if scored is None:
+            scored = self._score_candidates(announcement, self._candidates(announcement))
+            cache.set(key, scored, settings.LOST_FOUND_MATCH_CACHE_TTL)
+        return scored
+    
+    def _candidates(self, announcement):
+        """SQL-префильтр кандидатов"""
+        window = timedelta(days=self.window_days)
+        candidates = LostFoundAnnouncement.objects.exclude(id=announcement.id).filter(
+            type=self._opposite_type(announcement.type),
+            animal_type=announcement.animal_type,
             date_lost_found__range=(
-                announcement.date_lost_found - timedelta(days=30),
-                announcement.date_lost_found + timedelta(days=30)
+                announcement.date_lost_found - window,
+                announcement.date_lost_found + window
+            )
+        )
+        if announcement.latitude is not None and announcement.longitude is not None:
+            # Кандидаты без координат остаются: их оценивают без учета расстояния
+            nearby = geo.prefilter(
+                candidates, announcement.latitude, announcement.longitude, self.radius_km
+            )
+            candidates = candidates.filter(
+                Q(pk__in=nearby.values('pk')) | Q(latitude__isnull=True) | Q(longitude__isnull=True)
             )
+        return candidates
+    
+    def _score_candidates(self, announcement, candidates):
+        """Оценки всех кандидатов одним проходом по массивам; те же правила, что и _calculate_match_score"""
+        rows = list(candidates.values_list(*self.SCORE_FIELDS))
+        if not rows:
+            return []
+        pks, animal_types, breeds, colors, sizes, lats, lons, dates = (
+            np.array(column, dtype=object) for column in zip(*rows)
         )
         
-        # Считаем релевантность для каждого совпадения
-        scored_matches = []
-        for match in matches:
-            score = self._calculate_match_score(announcement, match)
-            if score > 0.3:  # Минимальный порог релевантности
-                scored_matches.append({
-                    'match': match,
-                    'score': score,
-                    'reasons': self._get_match_reasons(announcement, match)
-                })
+        score = np.zeros(len(rows))
+        # Базовые характеристики (50% веса)
+        score += np.where(animal_types == announcement.animal_type, 0.2, 0.0)
+        score += np.where(breeds == announcement.breed, 0.1, 0.0)
+        score += np.where(colors == announcement.color, 0.1, 0.0)
+        score += np.where(sizes == announcement.size, 0.1, 0.0)
+        
+        # Геолокация (30% веса)
+        distances = np.full(len(rows), np.inf)
+        if announcement.latitude is not None and announcement.longitude is not None:
+            located = np.array([lat is not None and lon is not None for lat, lon in zip(lats, lons)])
+            if located.any():
+                distances[located] = geo.haversine_many(
+                    announcement.latitude, announcement.longitude,
+                    lats[located].astype(float), lons[located].astype(float)
+                )
+        score += np.select([distances <= 1, distances <= 5, distances <= 10], [0.3, 0.2, 0.1], 0.0)
         
-        # Сортируем по релевантности
-        return sorted(scored_matches, key=lambda x: x['score'], reverse=True)
+        # Временной промежуток (20% веса)
+        stamps = np.array([_utc(date) for date in dates], dtype='datetime64[us]')
+        days = np.abs(stamps - np.datetime64(_utc(announcement.date_lost_found), 'us')) // np.timedelta64(1, 'D')
+        score += np.select([days <= 1, days <= 3, days <= 7], [0.2, 0.15, 0.1], 0.0)
+        
+        # Минимальный порог релевантности; при равной оценке раньше идет старое объявление
+        passed = np.flatnonzero(score > 0.3)
+        passed = passed[np.lexsort((pks[passed].astype(np.int64), -score[passed]))]
+        return [
+            (int(pks[i]), float(score[i]), float(distances[i]))
+            for i in passed
+        ]
+    
+    @staticmethod
+    def _opposite_type(announcement_type):
+        return 'found' if announcement_type == 'lost' else 'lost'
+    
+    @classmethod
+    def _generation_key(cls, announcement_type, animal_type):
+        return f'lost_found_matches:gen:{announcement_type}:{animal_type}'
+    
+    def _cache_key(self, announcement):
+        generation = cache.get_or_set(
+            self._generation_key(self._opposite_type(announcement.type), announcement.animal_type),
+            lambda: uuid.uuid4().hex, None
+        )
+        # Изменение самого объявления меняет ключ, отдельный сброс не нужен
+        fingerprint = hashlib.md5(repr((
+            announcement.type, announcement.animal_type, announcement.breed, announcement.color,
+            announcement.size, announcement.latitude, announcement.longitude,
+            announcement.date_lost_found, self.radius_km, self.window_days
+        )).encode()).hexdigest()
+        return f'lost_found_matches:{announcement.pk}:{generation}:{fingerprint}'
     
-    def _calculate_match_score(self, announcement1, announcement2):
+    @classmethod
+    def invalidate(cls, announcement_type, animal_type):
+        """Сбрасывает кэш объявлений, для которых такое объявление может быть совпадением"""
+        cache.set(cls._generation_key(announcement_type, animal_type), uuid.uuid4().hex, None)
+    
+    def _calculate_match_score(self, announcement1, announcement2, distance=None):
         """Вычисляет оценку совпадения двух объявлений"""
         score = 0.0
         
@@ -146,12 +191,12 @@ class LostPetMatchingService:
             score += 0.1
             
         # Геолокация (30% веса)
-        if announcement1.latitude and announcement1.longitude and \
-           announcement2.latitude and announcement2.longitude:
+        if distance is None:
             distance = calculate_distance(
                 announcement1.latitude, announcement1.longitude,
                 announcement2.latitude, announcement2.longitude
             )
+        if distance != float('inf'):
             if distance <= 1:  # До 1 км
                 score += 0.3
             elif distance <= 5:  # До 5 км
@@ -170,7 +215,7 @@ class LostPetMatchingService:
             
         return score
         
-    def _get_match_reasons(self, announcement1, announcement2):
+    def _get_match_reasons(self, announcement1, announcement2, distance=None):
         """Возвращает причины, почему объявления могут совпадать"""
         reasons = []
         
@@ -184,12 +229,12 @@ class LostPetMatchingService:
             reasons.append(_('Совпадает размер'))
             
         # Проверяем расстояние
-        if announcement1.latitude and announcement1.longitude and \
-           announcement2.latitude and announcement2.longitude:
+        if distance is None:
             distance = calculate_distance(
                 announcement1.latitude, announcement1.longitude,
                 announcement2.latitude, announcement2.longitude
             )
+        if distance != float('inf'):
             reasons.append(_(f'Расстояние между точками: {distance:.1f} км'))
             
         # Проверяем временной промежуток
@@ -281,25 +326,19 @@ class LostPetSuggestionService:
         if not announcement.latitude or not announcement.longitude:
             return []
             
-        # Находим приюты
-        shelters = []
-        for profile in UserProfile.objects.select_related('user').filter(
-            user__is_shelter=True,
-            user__is_active=True,
-            last_latitude__isnull=False,
-            last_longitude__isnull=False
-        ):
-            distance = calculate_distance(
-                announcement.latitude, announcement.longitude,
-                profile.last_latitude, profile.last_longitude
-            )
-            if distance <= 5:  # В радиусе 5 км
-                profile.distance = distance
-                shelters.append(profile)
+        # Находим 5 ближайших приютов в радиусе 5 км
+        nearby = geo.within_radius(
+            UserProfile.objects.filter(user__is_shelter=True, user__is_active=True),
+            announcement.latitude, announcement.longitude, 5, limit=5,
+            lat_field='last_latitude', lon_field='last_longitude', geohash_field=None
+        )
+        profiles = UserProfile.objects.select_related('user').in_bulk([pk for pk, _ in nearby])
         
-        # Сортируем по расстоянию
-        shelters.sort(key=lambda p: p.distance)
-        shelters = shelters[:5]  # Берем только первые 5
+        shelters = []
+        for pk, distance in nearby:
+            profile = profiles[pk]
+            profile.distance = distance
+            shelters.append(profile)
         
         facilities = []
             
@@ -1,8 +1,13 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from .models import Announcement
+from .models import Announcement, AnnouncementImage, LostFoundAnnouncement
+from .tasks import compute_image_embeddings
+from . import text_index
+from .services import LostPetMatchingService
+from common import loaded_values, remember_on_init
 from notifications.models import Notification
 
 @receiver(pre_save, sender=Announcement)
@@ -52,4 +57,38 @@ def handle_new_announcement(sender, instance, created, **kwargs):
             title=_('Announcement Created'),
             message=_('Your announcement "{}" has been created and is pending review.').format(instance.title),
             notification_type='announcement_status'
-        ) 
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=AnnouncementImage)
+def handle_new_image(sender, instance, created, **kwargs):
+    """Эмбеддинг новой фотографии считается в фоне"""
+    if created or 'image' in (kwargs.get('update_fields') or ()):
+        compute_image_embeddings.delay([instance.pk])
+
+
+remember_on_init(LostFoundAnnouncement, '_match_group', lambda instance: loaded_values(instance, 'type', 'animal_type'))
+
+
+@receiver(post_save, sender=LostFoundAnnouncement)
+@receiver(post_delete, sender=LostFoundAnnouncement)
+def handle_lost_found_change(sender, instance, **kwargs):
+    """Индекс описаний и кэш совпадений обновляются при изменении объявления"""
+    text_index.record_change(instance.pk)
+    # Сбрасываем и прежнюю группу, если вид или тип объявления поменялись
+    groups = {instance._match_group, (instance.type, instance.animal_type)}
+    instance._match_group = (instance.type, instance.animal_type)
+
+    def invalidate():
+        for announcement_type, animal_type in groups:
+            LostPetMatchingService.invalidate(announcement_type, animal_type)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Announcement)
+def handle_lost_found_status(sender, instance, created, **kwargs):
+    """Закрытое объявление о потере/находке уходит из индекса описаний"""
+    if created or instance.type != Announcement.TYPE_LOST_FOUND:
+        return
+    for pk in LostFoundAnnouncement.objects.filter(announcement_id=instance.pk).values_list('pk', flat=True):
+        text_index.record_change(pk)
@@ -0,0 +1,16 @@
+from taskqueue import task
+from . import view_counts
+from .embeddings import compute_embeddings
+from .models import AnnouncementImage
+
+
+@task
+def flush_view_counts():
+    """Сброс накопленных просмотров в базу"""
+    view_counts.flush_all()
+
+
+@task
+def compute_image_embeddings(image_ids):
+    """Эмбеддинги новых фотографий объявлений"""
+    compute_embeddings(AnnouncementImage.objects.filter(pk__in=image_ids))
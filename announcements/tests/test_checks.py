@@ -0,0 +1,18 @@
+from django.core.checks import Error
+from django.test import SimpleTestCase, override_settings
+from announcements.checks import check_shared_cache
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_rejected(self):
+        errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['announcements.E001'])
+        self.assertIsInstance(errors[0], Error)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_dummy_cache_is_rejected(self):
+        self.assertEqual(len(check_shared_cache(None)), 1)
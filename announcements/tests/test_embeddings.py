@@ -0,0 +1,130 @@
+import io
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from taskqueue.base import get_backend
+from taskqueue.worker import Worker
+from announcements import embeddings
+from announcements.models import Announcement, AnnouncementCategory, AnnouncementImage, ImageEmbedding
+
+User = get_user_model()
+
+
+class MeanColorExtractor:
+    """Средний цвет картинки: предсказуемые векторы для тестов"""
+    name = 'mean-color'
+
+    def extract(self, images):
+        return np.asarray([
+            np.asarray(image.convert('RGB'), dtype=np.float32).reshape(-1, 3).mean(axis=0)
+            for image in images
+        ])
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, format='PNG')
+    return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(
+    IMAGE_EMBEDDING_EXTRACTOR='announcements.tests.test_embeddings.MeanColorExtractor',
+    TASKS_BACKEND='taskqueue.backends.InMemoryBackend',
+)
+class ImageEmbeddingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        get_backend().jobs.clear()
+
+        self.user = User.objects.create_user(phone='+79990000081', password='testpass123')
+        self.category = AnnouncementCategory.objects.create(name='Собаки', slug='dogs')
+
+    def _announcement(self, *colors):
+        announcement = Announcement.objects.create(
+            title='Объявление', description='Описание', category=self.category,
+            type=Announcement.TYPE_ANIMAL, author=self.user,
+        )
+        for color in colors:
+            AnnouncementImage.objects.create(announcement=announcement, image=_png(color))
+        return announcement
+
+    def test_upload_enqueues_embedding(self):
+        """Эмбеддинг новой фотографии считается задачей в очереди, один раз"""
+        with self.captureOnCommitCallbacks(execute=True):
+            announcement = self._announcement((255, 0, 0))
+        Worker().drain()
+
+        embedding = ImageEmbedding.objects.get(announcement=announcement)
+        self.assertEqual(embedding.extractor, 'mean-color')
+        vector = np.frombuffer(bytes(embedding.vector), dtype=np.float32)
+        np.testing.assert_allclose(vector, [1, 0, 0], atol=1e-6)
+
+    def test_similar_announcements(self):
+        """Похожие объявления находятся по лучшему совпадению среди всех фото"""
+        with self.captureOnCommitCallbacks(execute=True):
+            query = self._announcement((250, 10, 10))
+            red = self._announcement((0, 0, 255), (240, 20, 20))
+            orange = self._announcement((240, 120, 0))
+            blue = self._announcement((0, 0, 250))
+        Worker().drain()
+
+        index = embeddings.get_index()
+        self.assertEqual(len(index), 5)
+        ranked = index.similar(query.pk, k=3)
+        self.assertEqual([pk for pk, _ in ranked], [red.pk, orange.pk, blue.pk])
+        self.assertAlmostEqual(ranked[0][1], 1.0, places=2)
+
+        self.assertEqual(
+            [pk for pk, _ in index.similar(query.pk, candidates=[orange.pk, blue.pk])],
+            [orange.pk, blue.pk]
+        )
+
+    def test_index_reloads_after_new_embeddings(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._announcement((255, 0, 0))
+        Worker().drain()
+        self.assertEqual(embeddings.get_index().similar(first.pk), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self._announcement((255, 0, 0))
+        Worker().drain()
+        self.assertEqual([pk for pk, _ in embeddings.get_index().similar(first.pk)], [second.pk])
+
+    def test_index_reloads_after_changes_in_other_process(self):
+        """Изменения в таблице без compute_embeddings (воркер, удаление фото) тоже видны"""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._announcement((255, 0, 0))
+            second = self._announcement((250, 0, 0))
+        Worker().drain()
+        self.assertEqual(len(embeddings.get_index()), 2)
+
+        ImageEmbedding.objects.filter(announcement=second).delete()
+        self.assertEqual(len(embeddings.get_index()), 1)
+        self.assertEqual(embeddings.get_index().similar(first.pk), [])
+
+    def test_command_fills_missing(self):
+        """Команда досчитывает только фото без эмбеддинга текущей модели"""
+        self._announcement((255, 0, 0), (0, 255, 0))
+        ImageEmbedding.objects.all().delete()
+        embeddings.compute_embeddings(AnnouncementImage.objects.all()[:1])
+
+        out = io.StringIO()
+        call_command('compute_image_embeddings', stdout=out)
+        self.assertIn('1 of 1', out.getvalue())
+        self.assertEqual(ImageEmbedding.objects.count(), 2)
+
+        out = io.StringIO()
+        call_command('compute_image_embeddings', '--all', stdout=out)
+        self.assertIn('2 of 2', out.getvalue())
@@ -0,0 +1,138 @@
+import numpy as np
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from announcements.models import Announcement, AnnouncementCategory
+from announcements.filters import AnnouncementFilter
+from announcements import geo
+
+User = get_user_model()
+
+# Красная площадь
+MOSCOW = (55.753930, 37.620795)
+
+
+class GeohashTest(TestCase):
+    def test_encode_known_point(self):
+        """Геохеш совпадает с эталонным значением"""
+        self.assertEqual(geo.encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_encode_empty_coordinates(self):
+        self.assertEqual(geo.encode_geohash(None, 37.6), '')
+
+    def test_covering_cells_contain_nearby_points(self):
+        """Покрывающие ячейки содержат все точки внутри радиуса"""
+        cells = geo.covering_cells(*MOSCOW, 5)
+        self.assertTrue(cells)
+        for dlat, dlon in [(0.04, 0), (-0.04, 0), (0, 0.07), (0, -0.07), (0.03, 0.05)]:
+            point_hash = geo.encode_geohash(MOSCOW[0] + dlat, MOSCOW[1] + dlon)
+            self.assertTrue(any(point_hash.startswith(cell) for cell in cells))
+
+    def test_huge_radius_disables_cell_filter(self):
+        self.assertEqual(geo.covering_cells(*MOSCOW, 20000), set())
+
+    def test_boxes_split_at_antimeridian(self):
+        """Круг через антимеридиан дает два прямоугольника, а не обрезанный по 180°"""
+        self.assertEqual(len(geo.bounding_boxes(*MOSCOW, 20)), 1)
+        east, west = geo.bounding_boxes(65.0, 179.9, 20)
+        self.assertEqual((east[3], west[2]), (180.0, -180.0))
+        self.assertLess(east[2], 179.9)
+        self.assertGreater(west[3], -179.9)
+
+        cells = geo.covering_cells(65.0, 179.9, 20)
+        for longitude in (179.95, -179.9):
+            point_hash = geo.encode_geohash(65.0, longitude)
+            self.assertTrue(any(point_hash.startswith(cell) for cell in cells))
+
+
+class HaversineKernelTest(TestCase):
+    def test_kernel_matches_scalar(self):
+        lats = [55.0, 55.75, 59.93, -33.87, 0.0]
+        lons = [37.0, 37.62, 30.31, 151.21, 0.0]
+        distances = geo.haversine_many(*MOSCOW, lats, lons)
+        for lat, lon, distance in zip(lats, lons, distances):
+            self.assertAlmostEqual(distance, geo.calculate_distance(*MOSCOW, lat, lon), places=6)
+
+    def test_nearest_limit(self):
+        pks = np.array([10, 11, 12, 13])
+        distances = np.array([3.0, 1.0, 4.0, 2.0])
+        self.assertEqual(geo.nearest(pks, distances, 2), [(11, 1.0), (13, 2.0)])
+        self.assertEqual([pk for pk, _ in geo.nearest(pks, distances)], [11, 13, 10, 12])
+
+
+class GeoSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone='+79990000001', password='testpass123')
+        self.category = AnnouncementCategory.objects.create(name='Собаки', slug='dogs')
+        self.center = self._create(*MOSCOW)
+        self.near = self._create(MOSCOW[0] + 0.02, MOSCOW[1] + 0.02)   # ~2.6 км
+        self.far = self._create(MOSCOW[0] + 0.5, MOSCOW[1])            # ~55 км
+        self.no_coords = self._create(None, None)
+
+    def _create(self, lat, lon):
+        return Announcement.objects.create(
+            title='Объявление',
+            description='Описание',
+            category=self.category,
+            type=Announcement.TYPE_ANIMAL,
+            author=self.user,
+            latitude=lat,
+            longitude=lon,
+        )
+
+    def test_geohash_maintained_on_save(self):
+        self.assertEqual(self.center.geohash, geo.encode_geohash(*MOSCOW))
+        self.assertEqual(self.no_coords.geohash, '')
+
+        self.center.latitude = MOSCOW[0] + 1
+        self.center.save(update_fields=['latitude'])
+        self.center.refresh_from_db()
+        self.assertEqual(self.center.geohash, geo.encode_geohash(MOSCOW[0] + 1, MOSCOW[1]))
+
+    def test_within_radius_across_antimeridian(self):
+        # Чукотка: точки по разные стороны от 180° в ~9 км друг от друга
+        east = self._create(65.0, 179.9)
+        west = self._create(65.0, -179.9)
+        self.assertEqual({pk for pk, _ in geo.within_radius(Announcement.objects.all(), 65.0, 179.9, 20)},
+                         {east.pk, west.pk})
+        self.assertEqual({pk for pk, _ in geo.within_radius(Announcement.objects.all(), 65.0, -179.9, 20)},
+                         {east.pk, west.pk})
+
+    def test_within_radius_sorted_by_distance(self):
+        results = geo.within_radius(Announcement.objects.all(), *MOSCOW, 5)
+        self.assertEqual([pk for pk, _ in results], [self.center.pk, self.near.pk])
+        self.assertAlmostEqual(results[0][1], 0, places=3)
+
+    def test_within_radius_matches_full_scan(self):
+        """Результат совпадает с перебором всех записей"""
+        for radius in [0.5, 3, 10, 60, 500]:
+            expected = {
+                a.pk for a in Announcement.objects.all()
+                if geo.calculate_distance(*MOSCOW, a.latitude, a.longitude) <= radius
+            }
+            found = {pk for pk, _ in geo.within_radius(Announcement.objects.all(), *MOSCOW, radius)}
+            self.assertEqual(found, expected)
+
+    def test_top_k(self):
+        results = geo.top_k(Announcement.objects.all(), *MOSCOW, 2)
+        self.assertEqual([pk for pk, _ in results], [self.center.pk, self.near.pk])
+
+    def test_coordinates_skip_missing(self):
+        pks, lats, lons = geo.coordinates(Announcement.objects.all())
+        self.assertEqual(set(pks.tolist()), {self.center.pk, self.near.pk, self.far.pk})
+        self.assertEqual(len(lats), len(lons))
+
+    def test_filter_distance(self):
+        announcement_filter = AnnouncementFilter(
+            {'latitude': MOSCOW[0], 'longitude': MOSCOW[1], 'distance': 10},
+            queryset=Announcement.objects.all()
+        )
+        self.assertEqual(set(announcement_filter.qs), {self.center, self.near})
+
+    def test_filter_distance_invalid_coordinates(self):
+        announcement_filter = AnnouncementFilter(
+            {'latitude': 'abc', 'longitude': 1, 'distance': 5}, queryset=Announcement.objects.all()
+        )
+        self.assertFalse(announcement_filter.is_valid())
+        self.assertIn('latitude', announcement_filter.errors)
+        # Без валидных координат радиус не применяется
+        self.assertEqual(announcement_filter.qs.count(), Announcement.objects.count())
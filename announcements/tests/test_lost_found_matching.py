@@ -0,0 +1,125 @@
+import random
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from announcements.geo import calculate_distance
+from announcements.models import Announcement, AnnouncementCategory, LostFoundAnnouncement
+from announcements.services import LostPetMatchingService
+from announcements.text_index import SyncedTextIndex
+
+User = get_user_model()
+
+MOSCOW = (55.7558, 37.6173)
+
+
+class LostPetMatchingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch('announcements.text_index._synced', SyncedTextIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(phone='+79990000101', password='testpass123')
+        self.category = AnnouncementCategory.objects.create(name='Потеряшки', slug='lost')
+        self.now = timezone.now()
+        self.lost = self._create('lost', breed='Лабрадор', color='черный')
+        self.service = LostPetMatchingService()
+
+    def _create(self, type, animal_type='dog', breed='', color='', size='medium',
+                lat=MOSCOW[0], lon=MOSCOW[1], days=0):
+        announcement = Announcement.objects.create(
+            title='Объявление', description='Описание', category=self.category,
+            type=Announcement.TYPE_LOST_FOUND, author=self.user,
+        )
+        return LostFoundAnnouncement.objects.create(
+            announcement=announcement, type=type, animal_type=animal_type, breed=breed, color=color,
+            size=size, latitude=lat, longitude=lon, date_lost_found=self.now + timedelta(days=days),
+            distinctive_features='Пятно на груди',
+        )
+
+    def test_batched_scores_match_pairwise(self):
+        """Векторная оценка совпадает с попарной _calculate_match_score"""
+        random.seed(1)
+        for _ in range(40):
+            self._create(
+                'found',
+                breed=random.choice(['Лабрадор', 'Хаски', '']),
+                color=random.choice(['черный', 'белый', None]),
+                size=random.choice(['small', 'medium']),
+                lat=MOSCOW[0] + random.uniform(-0.08, 0.08),
+                lon=MOSCOW[1] + random.uniform(-0.08, 0.08),
+                days=random.uniform(-12, 12),
+            )
+
+        scored = self.service.scored_candidates(self.lost)
+        self.assertTrue(scored)
+        self.assertEqual([score for _, score, _ in scored], sorted((score for _, score, _ in scored), reverse=True))
+        for pk, score, distance in scored:
+            match = LostFoundAnnouncement.objects.get(pk=pk)
+            self.assertAlmostEqual(distance, calculate_distance(
+                self.lost.latitude, self.lost.longitude, match.latitude, match.longitude
+            ), places=6)
+            self.assertAlmostEqual(score, self.service._calculate_match_score(self.lost, match, distance))
+            self.assertGreater(score, 0.3)
+
+    def test_prefilter(self):
+        """Кандидаты отбираются по типу, виду животного, окну дат и радиусу"""
+        match = self._create('found', breed='Лабрадор', days=2)
+        self._create('lost', breed='Лабрадор')
+        self._create('found', animal_type='cat', breed='Лабрадор')
+        self._create('found', breed='Лабрадор', days=45)
+        self._create('found', breed='Лабрадор', lat=MOSCOW[0] + 0.5)  # ~55 км
+
+        self.assertEqual(list(self.service._candidates(self.lost)), [match])
+
+    def test_candidates_without_coordinates(self):
+        """Объявление без координат остается кандидатом и оценивается без расстояния"""
+        unlocated = self._create('found', breed='Лабрадор', color='черный', lat=None, lon=None)
+        self.assertEqual(list(self.service._candidates(self.lost)), [unlocated])
+        [(pk, score, distance)] = self.service.scored_candidates(self.lost)
+        self.assertEqual(pk, unlocated.pk)
+        self.assertEqual(distance, float('inf'))
+        self.assertAlmostEqual(score, self.service._calculate_match_score(self.lost, unlocated))
+
+    def test_reasons_only_for_top_k(self):
+        for days in range(5):
+            self._create('found', breed='Лабрадор', days=days)
+
+        with mock.patch.object(
+            LostPetMatchingService, '_get_match_reasons', autospec=True, return_value=['причина']
+        ) as reasons:
+            with self.assertNumQueries(2):
+                matches = self.service.find_matches(self.lost, limit=2)
+        self.assertEqual(reasons.call_count, 2)
+        self.assertEqual([m['match'].date_lost_found for m in matches], [self.now, self.now + timedelta(days=1)])
+        self.assertEqual(matches[0]['reasons'], ['причина'])
+        self.assertEqual(matches[0]['match'].announcement.title, 'Объявление')
+
+    def test_cache_until_relevant_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._create('found', breed='Лабрадор')
+        self.assertEqual([m['match'] for m in self.service.find_matches(self.lost)], [first])
+
+        # Кэш: остается только загрузка моделей top-k
+        with self.assertNumQueries(1):
+            self.service.find_matches(self.lost)
+
+        # Объявления о других видах и того же типа кэш не сбрасывают
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create('found', animal_type='cat')
+            self._create('lost', breed='Лабрадор')
+        with self.assertNumQueries(1):
+            self.service.find_matches(self.lost)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self._create('found', breed='Лабрадор', days=3)
+        self.assertEqual([m['match'] for m in self.service.find_matches(self.lost)], [first, second])
+
+        # Кандидат сменил вид животного: сбрасывается и прежняя группа
+        with self.captureOnCommitCallbacks(execute=True):
+            second.animal_type = 'cat'
+            second.save()
+        self.assertEqual([m['match'] for m in self.service.find_matches(self.lost)], [first])
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from announcements.models import Announcement, AnnouncementCategory, LostFoundAnnouncement, TextIndexChange
+from announcements.text_index import SyncedTextIndex, TextIndex, get_text_index, tokenize
+
+User = get_user_model()
+
+
+class TextIndexTest(SimpleTestCase):
+    def test_tokenize_russian(self):
+        """Словоформы сводятся к одной основе, стоп-слова отбрасываются"""
+        self.assertEqual(tokenize('Рыжая собака'), tokenize('рыжую собаку'))
+        self.assertEqual(tokenize('Пёс и ёж'), ['пес', 'еж'])
+        self.assertEqual(tokenize('на груди'), tokenize('грудь'))
+
+    def test_similar_ranks_by_description(self):
+        index = TextIndex()
+        index.add(1, 'рыжая собака, белое пятно на груди')
+        index.add(2, 'черная кошка с белыми лапами')
+        index.add(3, 'рыжий кот, ошейник красный')
+
+        ranked = index.similar('рыжую собаку', k=2)
+        self.assertEqual([pk for pk, _ in ranked], [1, 3])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+        self.assertEqual(index.similar('попугай'), [])
+        self.assertEqual([pk for pk, _ in index.similar('рыжий', candidates=[3, 2])], [3])
+
+    def test_incremental_updates_match_full_build(self):
+        """Добавление, замена и удаление дают те же оценки, что и построение с нуля"""
+        texts = {pk: f'собака {"рыжая" if pk % 2 else "черная"} пятно {pk}' for pk in range(10)}
+        index = TextIndex()
+        for pk, text in texts.items():
+            index.add(pk, text)
+        index.add(3, 'кошка трехцветная')
+        for pk in range(5, 10):
+            index.remove(pk)  # половина удалений сжимает матрицу
+
+        fresh = TextIndex()
+        for pk in range(5):
+            fresh.add(pk, 'кошка трехцветная' if pk == 3 else texts[pk])
+
+        self.assertEqual(len(index), 5)
+        for query in ['рыжая собака', 'кошка', 'пятно 4']:
+            self.assertEqual(
+                [(pk, round(score, 6)) for pk, score in index.similar(query)],
+                [(pk, round(score, 6)) for pk, score in fresh.similar(query)]
+            )
+
+
+class SyncedTextIndexTest(TestCase):
+    def setUp(self):
+        patcher = mock.patch('announcements.text_index._synced', SyncedTextIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(phone='+79990000091', password='testpass123')
+        self.category = AnnouncementCategory.objects.create(name='Потеряшки', slug='lost')
+
+    def _lost_found(self, features, breed=''):
+        announcement = Announcement.objects.create(
+            title='Потерялась собака', description='Описание', category=self.category,
+            type=Announcement.TYPE_LOST_FOUND, author=self.user, status=Announcement.STATUS_ACTIVE,
+        )
+        return LostFoundAnnouncement.objects.create(
+            announcement=announcement, type='lost', animal_type='dog', breed=breed,
+            distinctive_features=features, date_lost_found=timezone.now(),
+        )
+
+    def test_index_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            spotted = self._lost_found('белое пятно на груди', 'лабрадор')
+        self.assertIn(spotted.pk, get_text_index())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self._lost_found('рваное ухо', 'хаски')
+        index = get_text_index()
+        self.assertEqual([pk for pk, _ in index.similar('хаски с рваным ухом')], [other.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            spotted.announcement.status = Announcement.STATUS_CLOSED
+            spotted.announcement.save()
+        self.assertNotIn(spotted.pk, get_text_index())
+
+        # Другой процесс строит индекс сам и догоняет изменения по журналу в базе
+        other_process = SyncedTextIndex()
+        self.assertEqual(len(other_process.get()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.distinctive_features = 'черное пятно на спине'
+            other.save()
+        with self.assertNumQueries(3):
+            index = other_process.get()
+        self.assertEqual([pk for pk, _ in index.similar('черное пятно')], [other.pk])
+        self.assertEqual([pk for pk, _ in get_text_index().similar('черное пятно')], [other.pk])
+
+    def test_stale_process_rebuilds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            spotted = self._lost_found('белое пятно на груди')
+        self.assertIn(spotted.pk, get_text_index())
+
+        # Процесс не синхронизировался дольше срока хранения журнала
+        TextIndexChange.objects.all().delete()
+        LostFoundAnnouncement.objects.filter(pk=spotted.pk).update(distinctive_features='рваное ухо')
+        with mock.patch('announcements.text_index.timezone.now',
+                        return_value=timezone.now() + timedelta(seconds=settings.TEXT_INDEX_JOURNAL_TTL + 1)):
+            index = get_text_index()
+        self.assertEqual([pk for pk, _ in index.similar('рваное ухо')], [spotted.pk])
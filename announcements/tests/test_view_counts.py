@@ -0,0 +1,143 @@
+import threading
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from catalog.models import Category, Product
+from announcements.view_counts import product_views
+
+User = get_user_model()
+
+
+@override_settings(VIEW_COUNTS_SESSION_TTL=600, TASKS_BACKEND='taskqueue.backends.InMemoryBackend')
+class ViewCounterTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        seller = User.objects.create_user(phone='+79990000041', password='testpass123')
+        category = Category.objects.create(name='Корма')
+        self.products = [
+            Product.objects.create(
+                seller=seller, category=category, title=f'Товар {i}', description='Описание',
+                price=100, condition='new', status='active'
+            )
+            for i in range(3)
+        ]
+        self.product = self.products[0]
+
+    def _request(self, session_key=None):
+        request = RequestFactory().get('/')
+        request.session = type('Session', (), {'session_key': session_key})()
+        return request
+
+    def test_hits_do_not_touch_database(self):
+        """Просмотр не делает UPDATE строки"""
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                product_views.hit(self.product.pk)
+        self.assertEqual(product_views.pending(self.product.pk), 50)
+
+    def test_flush_batches_updates(self):
+        """Сброс делает один UPDATE на каждое различное приращение"""
+        for product, views in zip(self.products, [5, 5, 2]):
+            for _ in range(views):
+                product_views.hit(product.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(product_views.flush(), 3)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('views', flat=True)), [5, 5, 2]
+        )
+        self.assertEqual(product_views.pending(self.product.pk), 0)
+        self.assertEqual(product_views.flush(), 0)
+
+    def test_flush_does_not_touch_updated(self):
+        updated = self.product.updated
+        product_views.hit(self.product.pk)
+        product_views.flush()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.updated, updated)
+
+    def test_concurrent_hits_are_not_lost(self):
+        """Параллельные просмотры и сбросы не теряют ни одного инкремента"""
+        def worker():
+            for _ in range(200):
+                product_views.hit(self.product.pk)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            product_views.flush()
+        for thread in threads:
+            thread.join()
+        product_views.flush()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 800)
+
+    def test_failed_flush_keeps_buffer(self):
+        """Откат UPDATE не сдвигает журнал: следующий сброс запишет те же просмотры"""
+        for _ in range(3):
+            product_views.hit(self.product.pk)
+
+        with patch.object(QuerySet, 'update', side_effect=DatabaseError('database is locked')):
+            with self.assertRaises(DatabaseError):
+                product_views.flush()
+        self.assertEqual(product_views.pending(self.product.pk), 3)
+
+        self.assertEqual(product_views.flush(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 3)
+
+    def _interrupted_hit(self, pk):
+        """Просмотр, получивший номер в журнале, но еще не записавший туда pk"""
+        prefix = product_views.prefix
+        cache.set(f'{prefix}:n:{pk}', 1, None)
+        cache.add(f'{prefix}:d:{pk}', 1)
+        cache.add(f'{prefix}:seq', 0, None)
+        return cache.incr(f'{prefix}:seq')
+
+    def test_flush_stops_before_unwritten_entry(self):
+        """Сброс между номером и записью журнала не теряет объект"""
+        product_views.hit(self.products[1].pk)
+        index = self._interrupted_hit(self.product.pk)
+        product_views.hit(self.products[2].pk)
+        self.assertEqual(product_views.flush(), 1)
+
+        # Запись появилась после сброса: следующий сброс ее прочитает
+        cache.set(f'{product_views.prefix}:s:{index}', self.product.pk, None)
+        self.assertEqual(product_views.flush(), 2)
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('views', flat=True)), [1, 1, 1]
+        )
+
+    def test_flush_skips_abandoned_entry(self):
+        """Запись упавшего процесса не останавливает журнал навсегда"""
+        self._interrupted_hit(self.products[1].pk)
+        product_views.hit(self.product.pk)
+        self.assertEqual(product_views.flush(), 0)
+        self.assertEqual(product_views.flush(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 1)
+
+    def test_hit_after_flush_is_registered_again(self):
+        product_views.hit(self.product.pk)
+        product_views.flush()
+        product_views.hit(self.product.pk)
+        product_views.flush()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.views, 2)
+
+    def test_session_deduplication(self):
+        self.assertTrue(product_views.hit(self.product.pk, self._request('abc')))
+        self.assertFalse(product_views.hit(self.product.pk, self._request('abc')))
+        self.assertTrue(product_views.hit(self.product.pk, self._request('def')))
+        # Без сессии дедупликации нет
+        self.assertTrue(product_views.hit(self.product.pk, self._request()))
+        self.assertEqual(product_views.pending(self.product.pk), 3)
@@ -0,0 +1,264 @@
+"""
+TF-IDF индекс описаний объявлений о потере/находке.
+
+Словарь и разреженная матрица документ-термин (координатный формат: строка,
+термин, 1 + log tf) строятся один раз и дополняются по мере добавления и закрытия
+объявлений. IDF и нормы строк пересчитываются векторно только после изменений,
+поэтому «top-k похожих описаний» — это одно произведение разреженной матрицы
+на вектор запроса (np.bincount по ненулевым элементам).
+
+Процессы узнают об изменениях из журнала в базе (TextIndexChange): каждый
+процесс помнит id последней прочитанной записи и дочитывает новые. Записи старше
+TEXT_INDEX_JOURNAL_TTL удаляются; процесс, который не синхронизировался дольше,
+перестраивает индекс из базы целиком.
+"""
+import math
+import threading
+from collections import Counter
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from search.analysis import tokenize
+from .models import Announcement, LostFoundAnnouncement, TextIndexChange
+
+# Старые записи журнала удаляются при каждой PRUNE_EVERY-й записи
+PRUNE_EVERY = 100
+
+
+def document_text(announcement):
+    """Текст объявления, по которому сравниваются описания"""
+    return _join(announcement.distinctive_features, announcement.breed, announcement.color)
+
+
+def _join(*parts):
+    return ' '.join(filter(None, parts))
+
+
+class TextIndex:
+    """TF-IDF матрица описаний с добавлением и удалением документов без перестройки"""
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.df = np.zeros(1024, dtype=np.int64)
+        self.doc_ids = []
+        self.rows = {}  # id документа -> строка матрицы
+        self.spans = []  # строка -> (начало, конец) ее элементов
+        self._alive = np.zeros(1024, dtype=bool)
+        # Ненулевые элементы: строка, термин, 1 + log tf; буферы растут удвоением
+        self._row = np.zeros(4096, dtype=np.int64)
+        self._col = np.zeros(4096, dtype=np.int64)
+        self._tf = np.zeros(4096, dtype=np.float32)
+        self._nnz = 0
+        self._weights = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.rows
+
+    @property
+    def alive(self):
+        return self._alive[:len(self.doc_ids)]
+
+    def add(self, doc_id, text):
+        """Добавляет или заменяет документ"""
+        self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        columns = [self._column(term) for term in counts]
+
+        row = len(self.doc_ids)
+        start, end = self._nnz, self._nnz + len(columns)
+        if end > len(self._col):
+            size = max(end, 2 * len(self._col))
+            self._row, self._col, self._tf = (
+                np.resize(self._row, size), np.resize(self._col, size), np.resize(self._tf, size)
+            )
+        self._row[start:end] = row
+        self._col[start:end] = columns
+        self._tf[start:end] = [1 + math.log(count) for count in counts.values()]
+        self._nnz = end
+        self.df[columns] += 1
+
+        if row >= len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(len(self._alive), dtype=bool)])
+        self._alive[row] = True
+        self.doc_ids.append(doc_id)
+        self.spans.append((start, end))
+        self.rows[doc_id] = row
+        self._weights = None
+
+    def remove(self, doc_id):
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return
+        start, end = self.spans[row]
+        self.df[self._col[start:end]] -= 1
+        self._alive[row] = False
+        self._weights = None
+        # Удаленные строки занимают место в матрице, пока их не станет больше половины
+        if len(self.rows) < len(self.doc_ids) / 2:
+            self._compact()
+
+    def similar(self, text, k=10, candidates=None, exclude=None):
+        """k самых похожих документов: список (id, косинусная близость) по убыванию"""
+        scores = self._scores(text)
+        mask = self.alive & (scores > 0)
+        if exclude is not None and exclude in self.rows:
+            mask[self.rows[exclude]] = False
+        if candidates is not None:
+            candidate_mask = np.zeros_like(mask)
+            candidate_mask[[self.rows[pk] for pk in candidates if pk in self.rows]] = True
+            mask &= candidate_mask
+
+        rows = np.flatnonzero(mask)
+        if k is not None and len(rows) > k:
+            rows = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return [(self.doc_ids[row], float(scores[row])) for row in rows]
+
+    def scores(self, text, candidates):
+        """{id: близость} для кандидатов из индекса, одним проходом по матрице"""
+        scores = self._scores(text)
+        return {pk: float(scores[self.rows[pk]]) for pk in candidates if pk in self.rows}
+
+    def similarity(self, text1, text2):
+        """Близость двух произвольных текстов с весами IDF индекса"""
+        return float(self._query(text1) @ self._query(text2))
+
+    def _scores(self, text):
+        row, col, weights, norms, _ = self._matrix()
+        query = self._query(text)
+        products = np.bincount(row, weights=weights * query[col], minlength=len(self.doc_ids))
+        return products / norms
+
+    def _query(self, text):
+        """Нормированный вектор запроса; незнакомые индексу слова не учитываются"""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for term, count in Counter(tokenize(text)).items():
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] = 1 + math.log(count)
+        vector *= self._matrix()[4]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _idf(self):
+        # Сглаженный IDF, как в sklearn: у термина без документов вес конечный
+        return np.log((1 + len(self.rows)) / (1 + self.df[:len(self.vocabulary)])) + 1
+
+    def _matrix(self):
+        """Элементы матрицы с весами TF-IDF, нормы строк и IDF; пересчитываются после изменений"""
+        if self._weights is None:
+            row, col = self._row[:self._nnz], self._col[:self._nnz]
+            idf = self._idf()
+            weights = self._tf[:self._nnz] * idf[col]
+            norms = np.sqrt(np.bincount(row, weights=weights ** 2, minlength=len(self.doc_ids)))
+            self._weights = (row, col, weights, np.where(norms > 0, norms, 1), idf)
+        return self._weights
+
+    def _column(self, term):
+        column = self.vocabulary.get(term)
+        if column is None:
+            column = self.vocabulary[term] = len(self.vocabulary)
+            if column >= len(self.df):
+                self.df = np.concatenate([self.df, np.zeros(len(self.df), dtype=np.int64)])
+        return column
+
+    def _compact(self):
+        """Выбрасывает удаленные строки; словарь сохраняется"""
+        alive = self.alive
+        row = self._row[:self._nnz]
+        keep = alive[row]
+        new_rows = np.cumsum(alive) - 1
+
+        self._row = new_rows[row[keep]]
+        self._col = self._col[:self._nnz][keep]
+        self._tf = self._tf[:self._nnz][keep]
+        self._nnz = len(self._row)
+
+        self.doc_ids = [doc_id for doc_id, is_alive in zip(self.doc_ids, alive) if is_alive]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(self._row, minlength=len(self.doc_ids)))]).tolist()
+        self.spans = list(zip(offsets[:-1], offsets[1:]))
+        self._alive = np.ones(max(len(self.doc_ids), 1), dtype=bool)
+        self._weights = None
+
+
+def indexed_queryset():
+    """Объявления, которые участвуют в поиске похожих описаний"""
+    return LostFoundAnnouncement.objects.filter(
+        announcement__status=Announcement.STATUS_ACTIVE,
+        announcement__is_active=True
+    )
+
+
+class SyncedTextIndex:
+    """Индекс процесса, который догоняет изменения по журналу в базе"""
+
+    def __init__(self):
+        self.index = None
+        self.last_id = 0
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            now = timezone.now()
+            last_id = TextIndexChange.objects.aggregate(last=Max('id'))['last'] or 0
+            # Номер последней записи меньше прочитанного: журнал очищен вместе с базой
+            if self.index is None or now - self.synced_at > _journal_ttl() or last_id < self.last_id:
+                self._rebuild(last_id)
+            elif last_id > self.last_id:
+                self._catch_up(last_id)
+            self.synced_at = now
+            return self.index
+
+    def _rebuild(self, last_id):
+        # Номер записи прочитан до загрузки: изменения во время загрузки применятся повторно
+        index = TextIndex()
+        for pk, features, breed, color in indexed_queryset().values_list(
+            'pk', 'distinctive_features', 'breed', 'color'
+        ).iterator():
+            index.add(pk, _join(features, breed, color))
+        self.index, self.last_id = index, last_id
+
+    def _catch_up(self, last_id):
+        pks = set(TextIndexChange.objects.filter(
+            id__gt=self.last_id, id__lte=last_id
+        ).values_list('lost_found_id', flat=True))
+        current = {
+            pk: _join(features, breed, color)
+            for pk, features, breed, color in indexed_queryset().filter(pk__in=pks).values_list(
+                'pk', 'distinctive_features', 'breed', 'color'
+            )
+        }
+        for pk in pks:
+            if pk in current:
+                self.index.add(pk, current[pk])
+            else:
+                self.index.remove(pk)
+        self.last_id = last_id
+
+
+def _journal_ttl():
+    return timedelta(seconds=settings.TEXT_INDEX_JOURNAL_TTL)
+
+
+_synced = SyncedTextIndex()
+
+
+def get_text_index():
+    return _synced.get()
+
+
+def record_change(pk):
+    """Записывает изменение объявления в журнал после коммита"""
+    def write():
+        change = TextIndexChange.objects.create(lost_found_id=pk)
+        if change.id % PRUNE_EVERY == 0:
+            TextIndexChange.objects.filter(created_at__lt=timezone.now() - _journal_ttl()).delete()
+    transaction.on_commit(write)
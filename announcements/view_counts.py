@@ -0,0 +1,167 @@
+"""
+Буферизованные счетчики просмотров.
+
+Просмотр увеличивает счетчик в кэше, а не делает UPDATE всей строки. Накопленные
+значения периодически сбрасываются в базу пачками UPDATE ... SET views = views + N.
+Задача сброса ставится в очередь сама (раз в VIEW_COUNTS_FLUSH_INTERVAL), вручную:
+python manage.py flush_view_counts.
+
+Ключи в кэше для счетчика <prefix>:
+    <prefix>:n:<pk>    накопленные просмотры объекта
+    <prefix>:d:<pk>    флаг «объект уже в журнале»
+    <prefix>:seq       номер последней записи журнала
+    <prefix>:s:<i>     запись журнала: pk объекта
+    <prefix>:flushed   номер последней сброшенной записи
+    <prefix>:gap       номер записи, которой не было при прошлом сбросе
+
+Номер записи и сама запись пишутся двумя командами, поэтому сброс может застать
+номер без записи. Такой сброс останавливается перед пропуском и дочитает журнал
+в следующий раз; пропуск, который не заполнился и к следующему сбросу (процесс
+упал между командами), пропускается.
+
+Буфер пишут веб-процессы, а сбрасывает воркер задач, поэтому кэш должен быть
+общим (Redis): в локальном кэше процесса воркер видит пустой буфер.
+"""
+from collections import defaultdict
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+# Сколько записей журнала читать из кэша за раз
+FLUSH_CHUNK_SIZE = 1000
+
+
+class ViewCounter:
+    """Счетчик просмотров поля модели"""
+
+    def __init__(self, model_label, field):
+        self.model_label = model_label
+        self.field = field
+        self.prefix = f'views:{model_label.lower()}:{field}'
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def hit(self, pk, request=None):
+        """Учитывает просмотр; повторный просмотр в той же сессии не считается"""
+        if request is not None and not self._first_in_session(pk, request):
+            return False
+
+        key = f'{self.prefix}:n:{pk}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, None):
+                cache.incr(key)
+
+        # Флаг ставится после incr: иначе сброс между ними мог бы потерять просмотр
+        if cache.add(f'{self.prefix}:d:{pk}', 1, settings.VIEW_COUNTS_DIRTY_TTL):
+            cache.add(f'{self.prefix}:seq', 0, None)
+            cache.set(f'{self.prefix}:s:{cache.incr(f"{self.prefix}:seq")}', pk, None)
+
+        self._schedule_flush()
+        return True
+
+    def pending(self, pk):
+        """Просмотры, еще не сброшенные в базу"""
+        return cache.get(f'{self.prefix}:n:{pk}') or 0
+
+    def flush(self):
+        """Сбрасывает накопленные просмотры в базу; возвращает число обновленных строк"""
+        lock = f'{self.prefix}:lock'
+        if not cache.add(lock, 1, 300):
+            return 0
+        try:
+            return self._flush()
+        finally:
+            cache.delete(lock)
+
+    def _flush(self):
+        last = cache.get(f'{self.prefix}:seq') or 0
+        start = cache.get(f'{self.prefix}:flushed') or 0
+        if last <= start:
+            return 0
+
+        journal = []
+        pks = []
+        gap = cache.get(f'{self.prefix}:gap')
+        for chunk_start in range(start + 1, last + 1, FLUSH_CHUNK_SIZE):
+            keys = [f'{self.prefix}:s:{i}' for i in range(chunk_start, min(chunk_start + FLUSH_CHUNK_SIZE, last + 1))]
+            entries = cache.get_many(keys)
+            for index, key in enumerate(keys, chunk_start):
+                if key in entries:
+                    pks.append(entries[key])
+                elif index != gap:
+                    # Запись еще пишется: сбрасываем журнал до нее
+                    cache.set(f'{self.prefix}:gap', index, None)
+                    last = index - 1
+                    break
+                journal.append(key)
+            else:
+                continue
+            break
+        if last <= start:
+            return 0
+        # Объект мог попасть в журнал дважды, если флаг истек до сброса
+        pks = list(dict.fromkeys(pks))
+
+        # Сначала снимаем флаг: просмотр после этого снова попадет в журнал
+        cache.delete_many([f'{self.prefix}:d:{pk}' for pk in pks])
+        counts = cache.get_many([f'{self.prefix}:n:{pk}' for pk in pks])
+
+        by_increment = defaultdict(list)
+        for pk in pks:
+            count = counts.get(f'{self.prefix}:n:{pk}')
+            if count:
+                by_increment[count].append(pk)
+
+        updated = 0
+        with transaction.atomic():
+            # Одинаковые приращения обновляются одним UPDATE
+            for increment, ids in by_increment.items():
+                updated += self.model.objects.filter(pk__in=ids).update(
+                    **{self.field: F(self.field) + increment}
+                )
+            # Буфер и журнал сдвигаются только после коммита: при откате те же записи
+            # журнала прочитает следующий сброс
+            transaction.on_commit(lambda: self._advance(by_increment, journal, last))
+        return updated
+
+    def _advance(self, by_increment, journal, last):
+        # Вычитаем ровно сброшенное: просмотры, пришедшие во время сброса, останутся в кэше
+        for increment, ids in by_increment.items():
+            for pk in ids:
+                try:
+                    cache.decr(f'{self.prefix}:n:{pk}', increment)
+                except ValueError:
+                    pass  # ключ истек
+        cache.delete_many(journal)
+        cache.set(f'{self.prefix}:flushed', last, None)
+
+    def _first_in_session(self, pk, request):
+        ttl = settings.VIEW_COUNTS_SESSION_TTL
+        session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+        if not ttl or not session_key:
+            return True
+        return cache.add(f'{self.prefix}:seen:{session_key}:{pk}', 1, ttl)
+
+    def _schedule_flush(self):
+        # Первый просмотр за интервал планирует сброс на конец интервала
+        interval = settings.VIEW_COUNTS_FLUSH_INTERVAL
+        if cache.add(f'{self.prefix}:scheduled', 1, interval):
+            from .tasks import flush_view_counts
+            flush_view_counts.delay_in(interval)
+
+
+product_views = ViewCounter('catalog.Product', 'views')
+lost_pet_views = ViewCounter('announcements.LostPet', 'views_count')
+
+counters = [product_views, lost_pet_views]
+
+
+def flush_all():
+    """Сбрасывает все счетчики; возвращает {метка модели: обновлено строк}"""
+    return {counter.prefix: counter.flush() for counter in counters}
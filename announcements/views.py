@@ -5,7 +5,6 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db import transaction
 from django.db.models import Q, Count, Avg
-from django.core.paginator import Paginator
 from .models import (
     Announcement,
     AnnouncementCategory,
@@ -28,21 +27,9 @@ from .forms import (
 )
 from .filters import AnnouncementFilter
 from django.conf import settings
-from math import radians, sin, cos, sqrt, atan2
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # радиус Земли в километрах
-
-    lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-    
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    distance = R * c
-    
-    return distance
+from . import geo
+from .view_counts import lost_pet_views
+from pagination import paginate
 
 def announcement_list(request):
     announcements = Announcement.objects.filter(is_active=True)
@@ -52,9 +39,7 @@ def announcement_list(request):
     announcements = filter.qs
     
     # Пагинация
-    paginator = Paginator(announcements, 12)
-    page = request.GET.get('page')
-    announcements = paginator.get_page(page)
+    announcements = paginate(request, announcements, 12)
     
     context = {
         'announcements': announcements,
@@ -144,17 +129,15 @@ def search_nearby(request):
         messages.error(request, 'Необходимо указать координаты для поиска!')
         return redirect('announcements:announcement_list')
     
-    announcements = Announcement.objects.filter(is_active=True)
-    nearby_announcements = []
+    try:
+        lat, lon, radius = float(lat), float(lon), float(radius)
+    except (TypeError, ValueError):
+        messages.error(request, 'Некорректные координаты для поиска!')
+        return redirect('announcements:announcement_list')
     
-    for announcement in announcements:
-        if announcement.latitude and announcement.longitude:
-            distance = calculate_distance(
-                float(lat), float(lon),
-                float(announcement.latitude), float(announcement.longitude)
-            )
-            if distance <= float(radius):
-                nearby_announcements.append(announcement)
+    nearby_announcements = geo.filter_within_radius(
+        Announcement.objects.filter(is_active=True), lat, lon, radius
+    )
     
     context = {
         'announcements': nearby_announcements,
@@ -172,9 +155,7 @@ def my_announcements(request):
     if status:
         announcements = announcements.filter(status=status)
     
-    paginator = Paginator(announcements, 12)
-    page = request.GET.get('page')
-    announcements = paginator.get_page(page)
+    announcements = paginate(request, announcements, 12)
     
     return render(request, 'announcements/my_announcements.html', {
         'announcements': announcements,
@@ -225,8 +206,8 @@ def lost_pet_create(request):
 
 def lost_pet_detail(request, pk):
     lost_pet = get_object_or_404(LostPet, pk=pk)
-    lost_pet.views_count += 1
-    lost_pet.save()
+    lost_pet_views.hit(lost_pet.pk, request)
+    lost_pet.views_count += lost_pet_views.pending(lost_pet.pk)
     
     # Получаем похожие случаи
     similar_cases = lost_pet.get_similar_cases()
@@ -261,45 +242,17 @@ def lost_pets_map(request):
 
 def notify_users_in_radius(lost_pet):
     """Отправка уведомлений пользователям в радиусе"""
-    from notifications.models import Notification
-    from django.contrib.auth import get_user_model
-    from django.contrib.gis.measure import D
-    
-    User = get_user_model()
-    
-    # Находим пользователей в радиусе
-    users_in_radius = User.objects.filter(
-        profile__location__distance_lte=(
-            lost_pet.last_seen_location,
-            D(km=lost_pet.search_radius)
-        )
-    ).exclude(id=lost_pet.announcement.author.id)
-    
-    # Создаем уведомления
-    notifications = []
-    for user in users_in_radius:
-        notifications.append(
-            Notification(
-                recipient=user,
-                verb='new_lost_pet',
-                action_object=lost_pet,
-                description=f"Новое объявление о {'потерянном' if lost_pet.status == 'lost' else 'найденном'} животном в вашем районе"
-            )
-        )
-    
-    if notifications:
-        Notification.objects.bulk_create(notifications)
-        
-    # Отправляем push-уведомления
-    from notifications.services import send_push_notification
-    for user in users_in_radius:
-        if user.profile.push_enabled:
-            send_push_notification(
-                user,
-                title="Новое объявление поблизости",
-                body=f"{'Потерялось' if lost_pet.status == 'lost' else 'Найдено'} животное в вашем районе",
-                data={'lost_pet_id': lost_pet.id}
-            )
+    from notifications.fanout import RadiusFanout
+
+    is_lost = lost_pet.status == LostPet.STATUS_LOST
+    RadiusFanout().schedule(
+        lost_pet.last_seen_latitude, lost_pet.last_seen_longitude, lost_pet.search_radius,
+        title="Новое объявление поблизости",
+        message=f"{'Потерялось' if is_lost else 'Найдено'} животное в вашем районе",
+        content_object=lost_pet,
+        exclude_user_id=lost_pet.announcement.author_id,
+        data={'announcement_id': lost_pet.announcement_id, 'lost_pet_id': lost_pet.id},
+    )
 
 @login_required
 def mating_create(request):
@@ -387,9 +340,7 @@ def mating_list(request):
         announcements = announcements.order_by('-announcement__created_at')
     
     # Pagination
-    paginator = Paginator(announcements, 12)
-    page = request.GET.get('page')
-    announcements = paginator.get_page(page)
+    announcements = paginate(request, announcements, 12)
     
     return render(request, 'announcements/mating_list.html', {
         'announcements': announcements,
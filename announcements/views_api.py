@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
+from queryplan import QueryPlanMixin
 from .models import (
     Announcement,
     AnnouncementCategory,
@@ -30,7 +31,7 @@ class AnnouncementCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint для объявлений.
     Поддерживает все CRUD операции.
@@ -73,7 +74,7 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-class AnimalAnnouncementViewSet(viewsets.ModelViewSet):
+class AnimalAnnouncementViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint для объявлений о животных.
     Поддерживает все CRUD операции.
@@ -88,7 +89,7 @@ class AnimalAnnouncementViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, type=Announcement.TYPE_ANIMAL)
 
-class ServiceAnnouncementViewSet(viewsets.ModelViewSet):
+class ServiceAnnouncementViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint для объявлений об услугах.
     Поддерживает все CRUD операции.
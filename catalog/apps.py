@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
-    verbose_name = 'Каталог' 
\ No newline at end of file
+    verbose_name = 'Каталог'
+
+    def ready(self):
+        import catalog.signals  # noqa
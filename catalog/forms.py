@@ -1,5 +1,6 @@
 from django import forms
 from django.utils.translation import gettext_lazy as _
+from renditions.tasks import build_renditions
 from .models import Product, Category, ProductImage
 
 
@@ -56,35 +57,41 @@ class ProductForm(forms.ModelForm):
             product.save()
         
         # Обработка загруженных изображений
+        image_objects = []
         for i in range(1, 4):
             image = self.cleaned_data.get(f'image_{i}')
             if image:
-                # Создаем изображение, но не сохраняем если commit=False
-                image_obj = ProductImage(
+                image_objects.append(ProductImage(
                     product=product,
                     image=image,
                     is_main=(i == 1)  # Первое изображение будет главным
-                )
-                if commit:
-                    image_obj.save()
-                else:
-                    # Сохраняем для последующего создания
-                    if not hasattr(self, '_image_objects'):
-                        self._image_objects = []
-                    self._image_objects.append(image_obj)
+                ))
         
-        if not commit:
+        if commit:
+            self._save_images(image_objects)
+        else:
             old_save_m2m = self.save_m2m
             def save_m2m():
                 old_save_m2m()
                 # Сохраняем отложенные изображения
-                if hasattr(self, '_image_objects'):
-                    for image_obj in self._image_objects:
-                        image_obj.save()
+                self._save_images(image_objects)
             self.save_m2m = save_m2m
             
         return product
 
+    def _save_images(self, image_objects):
+        """Фотографии одной вставкой вместо save() с UPDATE и EXISTS на каждую"""
+        if not image_objects:
+            return
+        product = image_objects[0].product
+        if any(image.is_main for image in image_objects):
+            ProductImage.objects.filter(product=product, is_main=True).update(is_main=False)
+        elif not ProductImage.objects.filter(product=product).exists():
+            image_objects[0].is_main = True
+        created = ProductImage.objects.bulk_create(image_objects)
+        # bulk_create не шлет post_save, копии ставятся в очередь здесь
+        build_renditions.delay(ProductImage._meta.label, [image.pk for image in created])
+
 class ProductFilterForm(forms.Form):
     category = forms.ModelChoiceField(
         queryset=Category.objects.filter(is_active=True),
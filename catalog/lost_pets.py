@@ -0,0 +1,106 @@
+"""
+Поиск потерянных питомцев для catalog.views.lost_pets_search.
+
+Выдача ограничена: страница не длиннее LOST_PETS_SEARCH_MAX_PAGE_SIZE, следующая
+открывается курсором (keyset по -created, -id; при текстовом запросе - смещение в
+порядке релевантности). Главные фото всей страницы подгружаются одним prefetch.
+
+Картам нужны все объявления сразу: format=ndjson отдает их потоком, по объекту JSON
+на строку, не больше LOST_PETS_SEARCH_STREAM_LIMIT. Из базы строки читаются
+пачками через iterator(chunk_size) с prefetch фото на каждую пачку, поэтому память
+не растет с размером выдачи.
+
+Страницы кэшируются на LOST_PETS_SEARCH_CACHE_TTL секунд по нормализованным
+запросу и месту. Любое изменение объявлений или их фото меняет поколение в ключе.
+
+Ключи в кэше:
+    lost_pets_search:gen                      поколение
+    lost_pets_search:<поколение>:<md5>        готовый JSON страницы
+"""
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from pagination import CursorPaginator
+from search import search_queryset
+from .models import Product, ProductImage
+
+CATEGORY_SLUG = 'lostfound'
+GENERATION_KEY = 'lost_pets_search:gen'
+
+
+def normalize(text):
+    return ' '.join((text or '').split())
+
+
+def lost_pets(query='', location=''):
+    """Активные объявления о потерянных питомцах с подгрузкой главного фото"""
+    products = Product.objects.filter(
+        category__slug=CATEGORY_SLUG,
+        status='active'
+    ).only('id', 'title', 'description', 'location', 'created').order_by('-created', '-id')
+
+    if query:
+        products = search_queryset(products, query)
+    if location:
+        products = products.filter(location__icontains=location)
+
+    return products.prefetch_related(Prefetch(
+        'images',
+        queryset=ProductImage.objects.filter(is_main=True).only('id', 'product', 'image', 'renditions'),
+        to_attr='main_images'
+    ))
+
+
+def result(product):
+    main_image = product.main_images[0] if product.main_images else None
+    return {
+        'id': product.id,
+        'title': product.title,
+        'description': product.description,
+        'location': product.location,
+        'image': main_image.display_url if main_image else None,
+        'srcset': {'webp': main_image.webp_srcset, 'jpeg': main_image.srcset} if main_image else None,
+    }
+
+
+def page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return settings.LOST_PETS_SEARCH_PAGE_SIZE
+    return min(max(size, 1), settings.LOST_PETS_SEARCH_MAX_PAGE_SIZE)
+
+
+def search_page(query='', location='', cursor=None, limit=None):
+    """JSON страницы выдачи: {"results": [...], "next": курсор или null}; из кэша, если есть"""
+    query, location, limit = normalize(query), normalize(location), page_size(limit)
+    generation = cache.get_or_set(GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+    # Поиск и фильтр по месту не различают регистр, ключ тоже
+    digest = hashlib.md5(
+        json.dumps([query.casefold(), location.casefold(), cursor or '', limit]).encode()
+    ).hexdigest()
+    key = f'lost_pets_search:{generation}:{digest}'
+
+    content = cache.get(key)
+    if content is None:
+        page = CursorPaginator(lost_pets(query, location), limit).page(cursor)
+        content = json.dumps({
+            'results': [result(product) for product in page],
+            'next': page.next_cursor,
+        }, ensure_ascii=False)
+        cache.set(key, content, settings.LOST_PETS_SEARCH_CACHE_TTL)
+    return content
+
+
+def stream(query='', location=''):
+    """Строки NDJSON со всеми найденными объявлениями (до LOST_PETS_SEARCH_STREAM_LIMIT)"""
+    products = lost_pets(normalize(query), normalize(location))[:settings.LOST_PETS_SEARCH_STREAM_LIMIT]
+    for product in products.iterator(chunk_size=settings.LOST_PETS_SEARCH_STREAM_CHUNK_SIZE):
+        yield json.dumps(result(product), ensure_ascii=False) + '\n'
+
+
+def invalidate():
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
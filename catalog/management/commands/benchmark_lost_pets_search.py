@@ -0,0 +1,149 @@
+import json
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import JsonResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from catalog import lost_pets
+from catalog.models import Category, Product, ProductImage
+from catalog.views import lost_pets_search
+
+User = get_user_model()
+
+
+def legacy_lost_pets_search(request):
+    """Прежняя выдача: все строки одним ответом и два запроса к фото на каждую"""
+    products = Product.objects.filter(category__slug='lostfound', status='active')
+    location = request.GET.get('location', '')
+    if location:
+        products = products.filter(location__icontains=location)
+    return JsonResponse({
+        'results': [
+            {
+                'id': p.id,
+                'title': p.title,
+                'description': p.description,
+                'location': p.location,
+                'image': p.images.filter(is_main=True).first().image.url if p.images.exists() else None
+            }
+            for p in products
+        ]
+    })
+
+
+class Command(BaseCommand):
+    help = 'Load-tests lost_pets_search (pages, cache, NDJSON stream) on synthetic lost/found listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50000, help='Number of synthetic listings')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per page scenario')
+        parser.add_argument('--streams', type=int, default=5, help='Full NDJSON downloads to time')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also time the old unbounded endpoint once (about 2 queries per listing)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(options['size'], options['batch_size'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.factory = RequestFactory()
+
+            first = self._get({})
+            deep_cursor = self._cursor_at_page(50)
+            scenarios = [
+                ('first page, cold', {}, True),
+                ('first page, cached', {}, False),
+                ('page 50 by cursor, cold', {'cursor': deep_cursor}, True),
+                ('location filter, cold', {'location': 'Район 7'}, True),
+                ('location filter, cached', {'location': '  район 7 '}, False),
+                ('limit=100, cold', {'limit': 100}, True),
+            ]
+            self.stdout.write(f'{options["size"]} listings, first page: {len(first["results"])} results')
+            for name, params, cold in scenarios:
+                self._measure(name, params, cold, options['requests'])
+
+            self._measure_stream(options['streams'])
+            if options['legacy']:
+                self._measure_legacy()
+            transaction.set_rollback(True)
+
+    def _populate(self, size, batch_size):
+        seller = User.objects.create_user(phone='+70000000022')
+        category, _ = Category.objects.get_or_create(slug='lostfound', defaults={'name': 'Потеряшки'})
+        for start in range(0, size, batch_size):
+            products = Product.objects.bulk_create(
+                Product(
+                    seller=seller, category=category, slug=f'benchmark-lost-{number}',
+                    title=f'Пропал питомец {number}', description='Рыжий кот, откликается на Барсик',
+                    location=f'Москва, Район {number % 50}', condition='used', status='active',
+                )
+                for number in range(start, min(start + batch_size, size))
+            )
+            ProductImage.objects.bulk_create(
+                ProductImage(
+                    product=product, image=f'products/benchmark-{product.pk}.jpg',
+                    is_main=True, renditions=[320, 640, 1280],
+                )
+                for product in products
+            )
+        # bulk_create не шлет сигналов, сбрасывающих кэш выдачи
+        lost_pets.invalidate()
+
+    def _get(self, params):
+        request = self.factory.get('/catalog/lost-pets/search/', params)
+        return json.loads(lost_pets_search(request).content)
+
+    def _cursor_at_page(self, page):
+        cursor = None
+        for _ in range(page - 1):
+            cursor = self._get({'cursor': cursor} if cursor else {})['next']
+        return cursor
+
+    def _measure(self, name, params, cold, requests):
+        timings = []
+        queries = 0
+        for _ in range(requests):
+            if cold:
+                lost_pets.invalidate()
+            request = self.factory.get('/catalog/lost-pets/search/', params)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                lost_pets_search(request)
+                timings.append(time.perf_counter() - started)
+            queries = len(captured)
+        timings.sort()
+        self.stdout.write(
+            f'{name:<26} | p50 {statistics.median(timings) * 1000:7.2f} ms | '
+            f'p99 {timings[int(len(timings) * 0.99) - 1] * 1000:7.2f} ms | '
+            f'{len(timings) / sum(timings):7.0f} req/s | {queries} queries'
+        )
+
+    def _measure_stream(self, streams):
+        for _ in range(streams):
+            request = self.factory.get('/catalog/lost-pets/search/', {'format': 'ndjson'})
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                rows = size = 0
+                for line in lost_pets_search(request).streaming_content:
+                    rows += 1
+                    size += len(line)
+                seconds = time.perf_counter() - started
+            self.stdout.write(
+                f'ndjson stream             | {rows} rows, {size / 1024 / 1024:.1f} MB in {seconds:.2f}s | '
+                f'{rows / seconds:8.0f} rows/s | {len(captured)} queries'
+            )
+
+    def _measure_legacy(self):
+        request = self.factory.get('/catalog/lost-pets/search/')
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = legacy_lost_pets_search(request)
+            seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'legacy endpoint           | {seconds:.2f}s | {len(response.content) / 1024 / 1024:.1f} MB | '
+            f'{len(captured)} queries'
+        )
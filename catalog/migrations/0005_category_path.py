@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (path(parent_id) if parent_id else '') + f'{pk}/'
+        return paths[pk]
+
+    categories = [Category(id=pk, path=path(pk)) for pk in parents]
+    Category.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_productimage_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='path'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,20 @@
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
-from django.utils.text import slugify
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
-from unidecode import unidecode
+from renditions import RenditionsMixin
+from tree import MaterializedPathMixin
+from .slugs import unique_slugs
 
-class Category(models.Model):
+class Category(MaterializedPathMixin, models.Model):
     name = models.CharField(_('name'), max_length=200)
     slug = models.SlugField(_('slug'), max_length=200, unique=True)
     parent = models.ForeignKey('self', verbose_name=_('parent category'),
                              on_delete=models.CASCADE, null=True, blank=True,
                              related_name='children')
+    # id предков и самой категории, см. tree
+    path = models.CharField(_('path'), max_length=255, db_index=True, editable=False, default='')
     description = models.TextField(_('description'), blank=True)
     image = models.ImageField(_('image'), upload_to='categories/', blank=True)
     order = models.IntegerField(_('order'), default=0)
@@ -29,14 +32,8 @@ class Category(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            # Convert Russian text to Latin characters
-            base_slug = slugify(unidecode(self.name))
-            slug = base_slug
-            n = 1
-            while Category.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{n}"
-                n += 1
-            self.slug = slug
+            # Convert Russian text to Latin characters, one query for all taken variants
+            self.slug = unique_slugs(Category, [self.name])[0]
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -94,6 +91,7 @@ class Product(models.Model):
         ordering = ['-created']
         indexes = [
             models.Index(fields=['-created']),
+            models.Index(fields=['-created', '-id']),
             models.Index(fields=['status']),
             models.Index(fields=['is_featured']),
         ]
@@ -103,26 +101,21 @@ class Product(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            # Convert Russian text to Latin characters and create base slug
-            base_slug = slugify(unidecode(self.title))
-            slug = base_slug
-            n = 1
-            # Keep trying until we find a unique slug
-            while Product.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{n}"
-                n += 1
-            self.slug = slug
+            # Convert Russian text to Latin characters, one query for all taken variants
+            self.slug = unique_slugs(Product, [self.title])[0]
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
         return reverse('catalog:product_detail', kwargs={'slug': self.slug})
 
-class ProductImage(models.Model):
+class ProductImage(RenditionsMixin, models.Model):
     product = models.ForeignKey(Product, verbose_name=_('product'),
                                on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(_('image'), upload_to='products/')
     is_main = models.BooleanField(_('main image'), default=False)
     order = models.IntegerField(_('order'), default=0)
+    # Ширины собранных копий, см. renditions
+    renditions = models.JSONField(_('renditions'), default=list, blank=True, editable=False)
     
     class Meta:
         verbose_name = _('product image')
@@ -131,9 +124,11 @@ class ProductImage(models.Model):
     
     def save(self, *args, **kwargs):
         if self.is_main:
-            # Убираем отметку основного изображения у других изображений продукта
-            ProductImage.objects.filter(product=self.product).update(is_main=False)
-        elif not ProductImage.objects.filter(product=self.product).exists():
+            # Убираем отметку у прежнего основного изображения продукта
+            ProductImage.objects.filter(
+                product_id=self.product_id, is_main=True
+            ).exclude(pk=self.pk).update(is_main=False)
+        elif self._state.adding and not ProductImage.objects.filter(product_id=self.product_id).exists():
             # Если это первое изображение продукта, делаем его основным
             self.is_main = True
         super().save(*args, **kwargs)
@@ -153,6 +148,9 @@ class Favorite(models.Model):
             models.UniqueConstraint(fields=['user', 'product'],
                                   name='unique_user_product_favorite')
         ]
+        indexes = [
+            models.Index(fields=['user', '-created', '-id']),
+        ]
     
     def __str__(self):
         return f'{self.user} - {self.product}'
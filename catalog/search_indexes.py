@@ -0,0 +1,16 @@
+import search
+from .models import Product
+
+
+@search.register
+class ProductIndex(search.SearchIndex):
+    model = Product
+    fields = {
+        'title': 3,
+        'breed': 2,
+        'category__name': 2,
+        'description': 1,
+    }
+    depends_on = {
+        'catalog.Category': 'category',
+    }
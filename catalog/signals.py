@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from common import reset_now_and_on_commit
+from . import lost_pets
+from .models import Product, ProductImage
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_lost_pets_search(sender, instance, **kwargs):
+    """Кэш поиска потерянных питомцев сбрасывается при любом изменении объявлений"""
+    reset_now_and_on_commit(lost_pets.invalidate)
@@ -0,0 +1,50 @@
+"""
+Уникальные слаги для пачки объектов одним запросом.
+
+Раньше каждый объект перебирал slug, slug-1, slug-2... отдельным запросом на
+вариант, и популярные заголовки («Щенок лабрадора») стоили десятков запросов.
+Здесь все занятые слаги с нужными основами читаются одним запросом (по индексу
+слага, префиксный поиск), а свободные номера подбираются в памяти.
+"""
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from django.utils.text import slugify
+from unidecode import unidecode
+
+# Место под суффикс -<n>, чтобы слаг с номером влез в поле
+SUFFIX_RESERVE = 10
+
+
+def base_slug(text, max_length):
+    # Кириллица переводится в латиницу
+    return slugify(unidecode(text))[:max_length - SUFFIX_RESERVE].strip('-')
+
+
+def unique_slugs(model, texts, field='slug'):
+    """
+    Слаги для texts в том же порядке: base, base-1, base-2... - первый свободный,
+    не занятый ни в базе, ни предыдущими текстами пачки. Один запрос на пачку;
+    пачку держите в сотнях объектов, условие содержит по префиксу на основу.
+    """
+    max_length = model._meta.get_field(field).max_length
+    default = model._meta.model_name
+    bases = [base_slug(text, max_length) or default for text in texts]
+    if not bases:
+        return []
+
+    condition = reduce(or_, (Q(**{f'{field}__startswith': base}) for base in set(bases)))
+    taken = set(model._default_manager.filter(condition).values_list(field, flat=True))
+
+    slugs = []
+    # Следующий номер для основы: одинаковые заголовки не перебирают номера заново
+    next_number = {}
+    for base in bases:
+        slug, n = base, next_number.get(base, 1)
+        while slug in taken:
+            slug = f'{base}-{n}'
+            n += 1
+        next_number[base] = n
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
@@ -0,0 +1,114 @@
+import json
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from login_auth.models import User
+from catalog.models import Category, Product, ProductImage
+
+
+class LostPetsSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone='+79990000221', password='testpass123')
+        cls.category = Category.objects.create(name='Потеряшки', slug='lostfound')
+        cls.other = Category.objects.create(name='Собаки', slug='dogs')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.url = reverse('catalog:lost_pets_search')
+
+    def _listings(self, count, location='Москва', category=None, with_image=True):
+        category = category or self.category
+        products = Product.objects.bulk_create(
+            Product(
+                seller=self.user, category=category, slug=f'{category.slug}-{location}-{number}',
+                title=f'Пропал питомец {number}', description='Описание', location=location,
+                condition='used', status='active',
+            )
+            for number in range(count)
+        )
+        if with_image:
+            ProductImage.objects.bulk_create(
+                ProductImage(product=product, image=f'products/{product.pk}.jpg', is_main=True)
+                for product in products
+            )
+        return products
+
+    def _newest_first(self):
+        return list(
+            Product.objects.filter(category=self.category).order_by('-created', '-id').values_list('pk', flat=True)
+        )
+
+    def _get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_page_queries_do_not_grow(self):
+        """Страница - один запрос объявлений и один prefetch главных фото"""
+        self._listings(5)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self._get()['results']), 5)
+
+        self._listings(40, location='Тверь')
+        cache.clear()
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self._get()['results']), 20)
+
+    def test_cursor_pages(self):
+        self._listings(25)
+        self._listings(3, category=self.other)
+
+        seen = []
+        cursor = None
+        while True:
+            data = self._get(limit=10, **({'cursor': cursor} if cursor else {}))
+            seen.extend(row['id'] for row in data['results'])
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(seen, self._newest_first())
+
+    def test_limit_is_capped(self):
+        self._listings(3)
+        with override_settings(LOST_PETS_SEARCH_MAX_PAGE_SIZE=2):
+            data = self._get(limit=1000)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
+
+    def test_main_image(self):
+        with_image = self._listings(1)[0]
+        without_image = self._listings(1, location='Тверь', with_image=False)[0]
+        ProductImage.objects.bulk_create([ProductImage(product=without_image, image='products/extra.jpg')])
+
+        results = {row['id']: row for row in self._get()['results']}
+        self.assertEqual(results[with_image.pk]['image'], f'/media/products/{with_image.pk}.jpg')
+        self.assertIsNone(results[without_image.pk]['image'])
+
+    def test_cache_by_normalized_location(self):
+        self._listings(2, location='Москва, Сокол')
+        first = self._get(location='Сокол')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get(location='  Сокол ')['results'], first['results'])
+
+        # Новое объявление сбрасывает кэш
+        Product.objects.create(
+            seller=self.user, category=self.category, title='Найден кот', description='Описание',
+            location='Москва, Сокол', condition='used', status='active'
+        )
+        self.assertEqual(len(self._get(location='Сокол')['results']), 3)
+
+    def test_ndjson_stream(self):
+        self._listings(7)
+        with override_settings(LOST_PETS_SEARCH_STREAM_CHUNK_SIZE=3):
+            response = self.client.get(self.url, {'format': 'ndjson'})
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            # Запрос объявлений читается пачками по три, фото подгружаются на каждую
+            with self.assertNumQueries(4):
+                lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], self._newest_first())
+
+        with override_settings(LOST_PETS_SEARCH_STREAM_LIMIT=4):
+            response = self.client.get(self.url, {'format': 'ndjson'})
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
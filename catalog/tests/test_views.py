@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from catalog.models import Category, Product, ProductImage, Favorite
+from announcements.view_counts import product_views
 
 User = get_user_model()
 
@@ -80,6 +81,7 @@ class CatalogViewsTest(TestCase):
         self.assertEqual(response.context['product'], self.product)
         
         # Test view counter
+        product_views.flush()
         self.product.refresh_from_db()
         self.assertEqual(self.product.views, 1)
 
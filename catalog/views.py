@@ -1,26 +1,29 @@
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.translation import gettext as _
 from .models import Category, Product, Favorite, ProductImage, MatingRequest
 from .forms import ProductForm, ProductFilterForm
+from . import lost_pets
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.db import transaction
 from chat.models import Dialog
 from notifications.models import Notification
+from announcements.view_counts import product_views
 from login_auth.models import User
+from search import search_queryset
+from pagination import paginate
+from tree import get_tree
 
 def search_products(request):
     query = request.GET.get('q', '')
     products_list = Product.objects.filter(
-        Q(title__icontains=query) |
-        Q(description__icontains=query) |
-        Q(category__name__icontains=query),
         status='active'
-    ).select_related('seller', 'category').prefetch_related('images').distinct()
+    ).select_related('seller', 'category').prefetch_related('images')
+    if query:
+        # Полнотекстовый индекс: по умолчанию сортировка по релевантности
+        products_list = search_queryset(products_list, query, prefix=True)
     
     # Фильтрация по состоянию
     conditions = request.GET.getlist('condition')
@@ -36,13 +39,13 @@ def search_products(request):
     if price_max and price_max.isdigit():
         products_list = products_list.filter(price__lte=price_max)
     
-    # Фильтрация по категории
+    # Фильтрация по категории вместе со всеми подкатегориями
+    tree = get_tree(Category)
     category_id = request.GET.get('category')
     if category_id and category_id.isdigit():
-        category = get_object_or_404(Category, id=category_id)
-        products_list = products_list.filter(
-            Q(category=category) | Q(category__parent=category)
-        )
+        if tree.get(int(category_id)) is None:
+            raise Http404
+        products_list = products_list.filter(category_id__in=tree.subtree_ids(int(category_id)))
     
     # Фильтрация по местоположению
     location = request.GET.get('location')
@@ -50,23 +53,16 @@ def search_products(request):
         products_list = products_list.filter(location__icontains=location)
     
     # Сортировка
-    sort = request.GET.get('sort', '-created')
+    sort = request.GET.get('sort', '' if query else '-created')
     valid_sort_fields = ['price', '-price', 'created', '-created', 'views', '-views']
     if sort in valid_sort_fields:
         products_list = products_list.order_by(sort)
     
     # Пагинация
-    paginator = Paginator(products_list, 24)  # 24 товара на странице
-    page = request.GET.get('page')
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    products = paginate(request, products_list, 24)  # 24 товара на странице
     
-    # Получаем все категории для фильтра
-    categories = Category.objects.filter(parent=None).prefetch_related('children')
+    # Все категории для фильтра - из дерева в памяти, без запросов
+    categories = tree.roots
     
     context = {
         'query': query,
@@ -90,10 +86,7 @@ def catalog_home(request):
         is_featured=True
     ).select_related('seller').prefetch_related('images')[:8]
     
-    categories = Category.objects.filter(
-        is_active=True,
-        parent__isnull=True
-    ).prefetch_related('children')
+    categories = [category for category in get_tree(Category).roots if category.is_active]
     
     latest_products = Product.objects.filter(
         status='active'
@@ -107,13 +100,16 @@ def catalog_home(request):
 
 def category_detail(request, slug):
     """Страница категории с фильтрацией товаров"""
-    category = get_object_or_404(Category, slug=slug, is_active=True)
+    tree = get_tree(Category)
+    category = tree.by_slug(slug)
+    if category is None or not category.is_active:
+        raise Http404
     form = ProductFilterForm(request.GET)
     
-    # Базовый queryset
+    # Базовый queryset: товары категории и всех ее подкатегорий
     products = Product.objects.filter(
         status='active',
-        category=category
+        category_id__in=tree.subtree_ids(category.pk)
     ).select_related('seller').prefetch_related('images')
     
     if form.is_valid():
@@ -128,11 +124,7 @@ def category_detail(request, slug):
             products = products.filter(price__lte=form.cleaned_data['max_price'])
         
         if form.cleaned_data['search']:
-            query = form.cleaned_data['search']
-            products = products.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query)
-            )
+            products = search_queryset(products, form.cleaned_data['search'], order=False)
         
         # Сортировка
         sort = form.cleaned_data['sort']
@@ -148,9 +140,7 @@ def category_detail(request, slug):
             products = products.order_by('-created')
     
     # Пагинация
-    paginator = Paginator(products, 12)
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    products = paginate(request, products, 12)
     
     return render(request, 'catalog/category_detail.html', {
         'category': category,
@@ -162,9 +152,9 @@ def product_detail(request, slug):
     """Страница товара"""
     product = get_object_or_404(Product, slug=slug, status='active')
     
-    # Увеличиваем счетчик просмотров
-    product.views += 1
-    product.save()
+    # Просмотр копится в буфере и попадает в базу при сбросе
+    product_views.hit(product.pk, request)
+    product.views += product_views.pending(product.pk)
     
     # Получаем похожие товары
     similar_products = Product.objects.filter(
@@ -190,9 +180,7 @@ def my_products(request):
         products = products.filter(status=status)
     
     # Пагинация
-    paginator = Paginator(products, 10)
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    products = paginate(request, products, 10)
     
     return render(request, 'catalog/my_products.html', {
         'products': products,
@@ -270,9 +258,7 @@ def favorites(request):
     ).select_related('product', 'product__seller').prefetch_related('product__images')
     
     # Пагинация
-    paginator = Paginator(favorites, 12)
-    page = request.GET.get('page')
-    favorites = paginator.get_page(page)
+    favorites = paginate(request, favorites, 12)
     
     return render(request, 'catalog/favorites.html', {
         'favorites': favorites
@@ -355,37 +341,18 @@ def create_lost_pet(request):
     return render(request, 'catalog/lost_pet_form.html', {'form': form})
 
 def lost_pets_search(request):
-    """Search for lost pets"""
+    """
+    Search for lost pets: a cursor-paged page of results, or with format=ndjson
+    all results streamed one JSON object per line (for maps)
+    """
     query = request.GET.get('q', '')
     location = request.GET.get('location', '')
     
-    products = Product.objects.filter(
-        category__slug='lostfound',
-        status='active'
-    )
-    
-    if query:
-        products = products.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(breed__icontains=query)
-        )
+    if request.GET.get('format') == 'ndjson':
+        return StreamingHttpResponse(lost_pets.stream(query, location), content_type='application/x-ndjson')
     
-    if location:
-        products = products.filter(location__icontains=location)
-    
-    return JsonResponse({
-        'results': [
-            {
-                'id': p.id,
-                'title': p.title,
-                'description': p.description,
-                'location': p.location,
-                'image': p.images.filter(is_main=True).first().image.url if p.images.exists() else None
-            }
-            for p in products
-        ]
-    })
+    content = lost_pets.search_page(query, location, request.GET.get('cursor'), request.GET.get('limit'))
+    return HttpResponse(content, content_type='application/json')
 
 @login_required
 @require_POST
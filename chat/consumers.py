@@ -1,12 +1,15 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
-from .models import Dialog, Message, User, GroupChat
+from . import inbox
+from .membership import members
+from .models import Chat, Dialog, Message
+from .presence import presence, presence_group
+from .store import history, message_payload, writer
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.dialog_id = self.scope['url_route']['kwargs']['dialog_id']
+        self.dialog_id = int(self.scope['url_route']['kwargs']['dialog_id'])
         self.room_group_name = f'chat_{self.dialog_id}'
         self.user = self.scope['user']
         
@@ -15,45 +18,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
-        # Присоединение к группе чата
+        await self.join_room()
+
+    async def join_room(self):
+        """Подписка на комнату и на статусы собеседников, регистрация подключения"""
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         
         await self.accept()
+        self.joined = True
         
-        # Обновление статуса пользователя
-        await self.update_user_status(True)
+        self.peer_ids = [user_id for user_id in self.participant_ids if user_id != self.user.id]
+        for peer_id in self.peer_ids:
+            await self.channel_layer.group_add(presence_group(peer_id), self.channel_name)
         
-        # Отправка уведомления другим участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_status',
-                'user': {
-                    'id': self.user.id,
-                    'is_online': True
-                }
-            }
-        )
+        await presence.connect(self.user.id, self.channel_layer)
+        
+        # Текущие статусы собеседников; дальше придут только изменения
+        online = presence.online(self.peer_ids)
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'users': [{'id': peer_id, 'is_online': peer_id in online} for peer_id in self.peer_ids]
+        }))
     
     async def disconnect(self, close_code):
-        if hasattr(self, 'room_group_name'):
-            # Обновление статуса пользователя
-            await self.update_user_status(False)
+        if getattr(self, 'joined', False):
+            await presence.disconnect(self.user.id, self.channel_layer)
             
-            # Отправка уведомления другим участникам
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_status',
-                    'user': {
-                        'id': self.user.id,
-                        'is_online': False
-                    }
-                }
-            )
+            for peer_id in self.peer_ids:
+                await self.channel_layer.group_discard(presence_group(peer_id), self.channel_name)
             
             # Отключение от группы чата
             await self.channel_layer.group_discard(
@@ -61,11 +56,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
     
+    def message_target(self):
+        """Поле сообщения, связывающее его с комнатой"""
+        return {'dialog_id': self.dialog_id}
+
     async def receive(self, text_data):
         data = json.loads(text_data)
         message_type = data.get('type')
         
-        if message_type == 'typing':
+        if message_type == 'send':
+            await self.send_message(data)
+        elif message_type == 'history':
+            await self.send_history(data)
+        elif message_type == 'heartbeat':
+            # Счетчик истек (долго не было heartbeat) - подключение регистрируется заново
+            if not presence.heartbeat(self.user.id):
+                await presence.connect(self.user.id, self.channel_layer)
+        elif message_type == 'typing':
             # Обработка статуса печати
             await self.channel_layer.group_send(
                 self.room_group_name,
@@ -92,6 +99,47 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }
             )
     
+    async def send_message(self, data):
+        """Сохранение сообщения (пачкой с другими) и рассылка участникам"""
+        text = (data.get('text') or '').strip()
+        if not text:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'client_id': data.get('client_id'),
+                'error': 'Текст сообщения не может быть пустым'
+            }))
+            return
+
+        message = await writer.write(self.user.id, text, **self.message_target())
+        payload = message_payload(message, self.user)
+
+        # Подтверждение отправителю: по client_id клиент находит свое сообщение
+        await self.send(text_data=json.dumps({
+            'type': 'sent',
+            'client_id': data.get('client_id'),
+            'message': payload
+        }))
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'new_message',
+                'message': payload
+            }
+        )
+
+    async def send_history(self, data):
+        """Страница истории: сообщения старше before_id"""
+        try:
+            before_id = int(data['before_id']) if data.get('before_id') else None
+        except (TypeError, ValueError):
+            before_id = None
+        messages, has_more = await self.load_history(before_id, data.get('limit'))
+        await self.send(text_data=json.dumps({
+            'type': 'history',
+            'messages': messages,
+            'has_more': has_more
+        }))
+
     async def new_message(self, event):
         """Отправка нового сообщения клиенту"""
         message = event['message']
@@ -125,37 +173,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def has_dialog_access(self):
         """Проверка доступа пользователя к диалогу"""
-        try:
-            dialog = Dialog.objects.get(id=self.dialog_id)
-            return self.user in dialog.participants.all()
-        except Dialog.DoesNotExist:
-            return False
+        self.participant_ids = members(Dialog, self.dialog_id)
+        return self.user.id in self.participant_ids
     
     @database_sync_to_async
-    def update_user_status(self, is_online):
-        """Обновление статуса пользователя"""
-        User.objects.filter(id=self.user.id).update(
-            is_online=is_online,
-            last_activity=timezone.now()
-        )
-    
+    def load_history(self, before_id, limit):
+        messages, has_more = history(before_id, limit, **self.message_target())
+        return [message_payload(message) for message in messages], has_more
+
     @database_sync_to_async
     def mark_messages_read(self, message_ids):
         """Отметка сообщений как прочитанных"""
-        Message.objects.filter(
-            id__in=message_ids,
-            dialog_id=self.dialog_id
-        ).exclude(
-            sender=self.user
-        ).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        inbox.mark_read(self.user.id, self.dialog_id, message_ids)
 
 
 class GroupChatConsumer(ChatConsumer):
     async def connect(self):
-        self.chat_id = self.scope['url_route']['kwargs']['chat_id']
+        self.chat_id = int(self.scope['url_route']['kwargs']['chat_id'])
         self.room_group_name = f'group_chat_{self.chat_id}'
         self.user = self.scope['user']
         
@@ -164,67 +198,46 @@ class GroupChatConsumer(ChatConsumer):
             await self.close()
             return
         
-        # Присоединение к группе чата
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
-        
-        await self.accept()
-        
-        # Обновление статуса пользователя
-        await self.update_user_status(True)
-        
-        # Отправка уведомления другим участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_status',
-                'user': {
-                    'id': self.user.id,
-                    'is_online': True
-                }
-            }
-        )
+        await self.join_room()
     
+    def message_target(self):
+        return {'chat_id': self.chat_id}
+
     @database_sync_to_async
     def has_group_chat_access(self):
         """Проверка доступа пользователя к групповому чату"""
-        try:
-            group_chat = GroupChat.objects.get(id=self.chat_id)
-            return self.user in group_chat.participants.all()
-        except GroupChat.DoesNotExist:
-            return False
-
-    async def handle_new_message(self, data):
-        """Обработка нового сообщения в групповом чате"""
-        content = data.get('content')
-        if not content:
+        self.participant_ids = members(Chat, self.chat_id)
+        return self.user.id in self.participant_ids
+
+    @database_sync_to_async
+    def mark_messages_read(self, message_ids):
+        """Отметка сообщений как прочитанных; у групповых чатов нет входящих"""
+        Message.objects.filter(
+            id__in=message_ids,
+            chat_id=self.chat_id
+        ).exclude(
+            sender=self.user
+        ).update(is_read=True)
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Уведомления пользователя: рассылка в радиусе и счетчик непрочитанных
+    приходят в группу notifications_<user_id>
+    """
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
             return
-            
-        # Создаем новое сообщение
-        message = Message.objects.create(
-            dialog_id=self.chat_id,  # GroupChat наследуется от Dialog
-            sender=self.user,
-            content=content
-        )
-        
-        # Обновляем последнее сообщение
-        chat = GroupChat.objects.get(id=self.chat_id)
-        chat.last_message = message
-        chat.save()
-        
-        # Отправляем сообщение всем участникам
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': {
-                    'id': message.id,
-                    'content': message.content,
-                    'sender_id': message.sender.id,
-                    'sender_name': message.sender.get_full_name() or message.sender.username,
-                    'created_at': message.created_at.isoformat()
-                }
-            }
-        ) 
\ No newline at end of file
+
+        self.group_name = f'notifications_{self.user.id}'
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_message(self, event):
+        await self.send(text_data=json.dumps(event['message'], ensure_ascii=False))
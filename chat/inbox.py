@@ -0,0 +1,155 @@
+"""
+Входящие: по строке InboxEntry на пару (пользователь, диалог).
+
+Список диалогов читается одним запросом по индексу (user, -last_message_at), без
+агрегатов по таблице сообщений. Строки меняются в той же транзакции, что и
+сообщения: record_messages() при создании (в том числе пачкой bulk_create),
+mark_read() при прочтении. Последнее сообщение заменяется только более новым, так
+что пачки, закоммиченные не по порядку, его не откатывают.
+
+Расхождения исправляет reconcile() (команда rebuild_chat_inbox), она же заполняет
+входящие для уже существующих диалогов.
+"""
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.db.models.functions import Greatest
+from .membership import members
+from .models import Dialog, InboxEntry, Message
+
+PREVIEW_LENGTH = 100
+
+
+def preview(text):
+    text = ' '.join(text.split())
+    if len(text) <= PREVIEW_LENGTH:
+        return text
+    return text[:PREVIEW_LENGTH - 1] + '…'
+
+
+def ensure_entries(dialog_id, user_ids):
+    """Создает недостающие строки входящих участников диалога"""
+    InboxEntry.objects.bulk_create(
+        [InboxEntry(user_id=user_id, dialog_id=dialog_id) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+
+
+def _if_newer(message_id, field, value):
+    newer = Q(last_message__isnull=True) | Q(last_message_id__lt=message_id)
+    return Case(
+        When(newer, then=Value(value)), default=F(field),
+        output_field=InboxEntry._meta.get_field(field)
+    )
+
+
+def record_messages(messages):
+    """Учитывает новые сообщения диалогов; вызывается в транзакции, где они созданы"""
+    by_dialog = defaultdict(list)
+    for message in messages:
+        if message.dialog_id:
+            by_dialog[int(message.dialog_id)].append(message)
+
+    with transaction.atomic():
+        for dialog_id, batch in by_dialog.items():
+            participants = members(Dialog, dialog_id)
+            ensure_entries(dialog_id, participants)
+
+            last = max(batch, key=lambda message: message.id)
+            changes = {
+                'last_message': _if_newer(last.id, 'last_message', last.id),
+                'last_sender': _if_newer(last.id, 'last_sender', last.sender_id),
+                'last_message_at': _if_newer(last.id, 'last_message_at', last.created_at),
+                'preview': _if_newer(last.id, 'preview', preview(last.text)),
+            }
+            # Свои сообщения непрочитанными не считаются
+            sent = Counter(message.sender_id for message in batch)
+            by_increment = defaultdict(list)
+            for user_id in participants:
+                by_increment[len(batch) - sent[user_id]].append(user_id)
+            for increment, user_ids in by_increment.items():
+                InboxEntry.objects.filter(dialog_id=dialog_id, user_id__in=user_ids).update(
+                    unread_count=F('unread_count') + increment, **changes
+                )
+
+
+def mark_read(user_id, dialog_id, message_ids=None):
+    """
+    Отмечает прочитанными сообщения собеседников в диалоге (все или только message_ids)
+    и уменьшает счетчик входящих. Возвращает число отмеченных сообщений.
+    """
+    with transaction.atomic():
+        unread = Message.objects.filter(dialog_id=dialog_id, is_read=False).exclude(sender_id=user_id)
+        if message_ids is not None:
+            unread = unread.filter(id__in=message_ids)
+        updated = unread.update(is_read=True)
+
+        entries = InboxEntry.objects.filter(user_id=user_id, dialog_id=dialog_id)
+        if message_ids is None:
+            entries.update(unread_count=0)
+        elif updated:
+            entries.update(unread_count=Greatest(F('unread_count') - updated, Value(0)))
+    return updated
+
+
+def inbox(user):
+    """Входящие пользователя, новые диалоги сверху"""
+    return (
+        InboxEntry.objects.filter(user=user)
+        .select_related('dialog__announcement', 'last_sender')
+        .order_by(F('last_message_at').desc(nulls_last=True), '-id')
+    )
+
+
+def reconcile(dialog_ids=None):
+    """
+    Пересчитывает входящие по таблице сообщений и возвращает число исправленных строк.
+    Без dialog_ids проверяются все диалоги.
+    """
+    dialogs = Dialog.objects.all()
+    if dialog_ids is not None:
+        dialogs = dialogs.filter(id__in=dialog_ids)
+
+    fixed = 0
+    for dialog in dialogs.prefetch_related('participants').iterator(chunk_size=500):
+        fixed += _reconcile_dialog(dialog)
+    return fixed
+
+
+def _reconcile_dialog(dialog):
+    participant_ids = [user.id for user in dialog.participants.all()]
+    last_id = Message.objects.filter(dialog=dialog).aggregate(last=Max('id'))['last']
+    last = Message.objects.get(id=last_id) if last_id else None
+    unread = dict(
+        Message.objects.filter(dialog=dialog, is_read=False)
+        .values('sender_id').annotate(total=Count('id')).values_list('sender_id', 'total')
+    )
+    total_unread = sum(unread.values())
+
+    expected = {
+        user_id: {
+            'last_message_id': last.id if last else None,
+            'last_sender_id': last.sender_id if last else None,
+            'last_message_at': last.created_at if last else None,
+            'preview': preview(last.text) if last else '',
+            'unread_count': total_unread - unread.get(user_id, 0),
+        }
+        for user_id in participant_ids
+    }
+    fields = list(next(iter(expected.values()), {}))
+
+    fixed = 0
+    with transaction.atomic():
+        ensure_entries(dialog.id, participant_ids)
+        stored = {
+            row['user_id']: row
+            for row in InboxEntry.objects.filter(dialog=dialog).values('user_id', *fields)
+        }
+        for user_id, values in expected.items():
+            row = stored.get(user_id, {})
+            if any(row.get(field) != value for field, value in values.items()):
+                InboxEntry.objects.filter(dialog=dialog, user_id=user_id).update(**values)
+                fixed += 1
+        # Бывшие участники
+        fixed += InboxEntry.objects.filter(dialog=dialog).exclude(user_id__in=participant_ids).delete()[0]
+    return fixed
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from chat.models import Dialog
+from chat.routing import websocket_urlpatterns
+from chat.store import writer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Sends messages through in-process chat sockets and reports messages per second '
+            'and p99 send latency, with per-message inserts and with batched writes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dialogs', type=int, default=50, help='Dialogs with two connected participants each')
+        parser.add_argument('--messages', type=int, default=20, help='Messages sent by every participant')
+
+    def handle(self, *args, **options):
+        users, dialogs = self._populate(options['dialogs'])
+        batch_size, delay = writer.batch_size, writer.delay
+        try:
+            for label, size, wait in [('per message', 1, 0), ('batched', None, None)]:
+                writer.batch_size, writer.delay = size, wait
+                rate, p50, p99 = async_to_sync(self._run)(dialogs, options['messages'])
+                self.stdout.write(
+                    f'{label:>11} | {rate:8.0f} msg/s | p50 {p50 * 1000:7.2f} ms | p99 {p99 * 1000:7.2f} ms'
+                )
+        finally:
+            writer.batch_size, writer.delay = batch_size, delay
+            Dialog.objects.filter(id__in=[dialog.id for dialog, _ in dialogs]).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def _populate(self, count):
+        users, dialogs = [], []
+        for number in range(count):
+            pair = [
+                User.objects.create_user(phone=f'+7000{number:06d}{side}')
+                for side in range(2)
+            ]
+            dialog = Dialog.objects.create()
+            dialog.participants.add(*pair)
+            users.extend(pair)
+            dialogs.append((dialog, pair))
+        return users, dialogs
+
+    async def _run(self, dialogs, messages):
+        application = URLRouter(websocket_urlpatterns)
+        communicators = []
+        for dialog, pair in dialogs:
+            for user in pair:
+                communicator = WebsocketCommunicator(application, f'/ws/chat/{dialog.id}/')
+                communicator.scope['user'] = user
+                connected, _ = await communicator.connect()
+                if not connected:
+                    raise RuntimeError(f'Connection to dialog {dialog.id} was refused')
+                communicators.append(communicator)
+
+        latencies = []
+        started = time.perf_counter()
+        await asyncio.gather(*(self._send(communicator, messages, latencies) for communicator in communicators))
+        elapsed = time.perf_counter() - started
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        latencies.sort()
+        return (
+            len(latencies) / elapsed,
+            latencies[len(latencies) // 2],
+            latencies[int(0.99 * (len(latencies) - 1))],
+        )
+
+    @staticmethod
+    async def _send(communicator, messages, latencies):
+        for number in range(messages):
+            sent = time.perf_counter()
+            await communicator.send_json_to({'type': 'send', 'text': f'Сообщение {number}', 'client_id': number})
+            while True:
+                frame = await communicator.receive_json_from(timeout=10)
+                if frame['type'] == 'sent' and frame['client_id'] == number:
+                    break
+            latencies.append(time.perf_counter() - sent)
@@ -0,0 +1,63 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from django.test import RequestFactory
+from chat.models import Dialog, Message
+from chat.views import get_new_messages
+
+User = get_user_model()
+
+
+def legacy_access_check(request, dialog_id):
+    """Старая проверка: диалог и все его участники читаются на каждый опрос"""
+    dialog = get_object_or_404(Dialog, id=dialog_id)
+    if request.user not in dialog.participants.all():
+        return HttpResponseForbidden()
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Compares polls per second of get_new_messages with the old and the cached participant check'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, nargs='+', default=[2, 50, 500],
+                            help='Participants per dialog')
+        parser.add_argument('--polls', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        for participants in options['participants']:
+            with transaction.atomic():
+                self._run(participants, options['polls'])
+                transaction.set_rollback(True)
+
+    def _run(self, participants, polls):
+        users = User.objects.bulk_create([
+            User(phone=f'+7000{number:07d}') for number in range(participants)
+        ])
+        dialog = Dialog.objects.create()
+        dialog.participants.add(*users)
+        message = Message.objects.create(dialog=dialog, sender=users[0], text='Привет')
+
+        request = RequestFactory().get('/', {'last_id': message.id})
+        request.user = users[-1]
+        view = get_new_messages.__wrapped__
+
+        # Старая проверка поверх текущего представления (его проверка - одно чтение из кэша)
+        view(request, dialog.id)
+        started = time.perf_counter()
+        for _ in range(polls):
+            legacy_access_check(request, dialog.id)
+            view(request, dialog.id)
+        legacy = polls / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(polls):
+            view(request, dialog.id)
+        cached = polls / (time.perf_counter() - started)
+
+        self.stdout.write(
+            f'{participants:>5} participants | old check {legacy:8.0f} polls/s | cached {cached:8.0f} polls/s'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from chat import inbox
+
+
+class Command(BaseCommand):
+    help = 'Fills in and repairs chat inbox rows from the messages table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dialog', type=int, nargs='+', dest='dialog_ids',
+                            help='Only rebuild these dialog ids')
+
+    def handle(self, *args, **options):
+        fixed = inbox.reconcile(options['dialog_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Repaired {fixed} inbox rows'))
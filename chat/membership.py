@@ -0,0 +1,48 @@
+"""
+Кэш участников диалогов и групповых чатов.
+
+Проверка доступа выполняется на каждый опрос и каждое WebSocket-подключение, поэтому
+состав комнаты хранится в кэше как frozenset id участников и не читается из базы
+заново. Кэш сбрасывается сигналом m2m_changed при изменении participants и при
+удалении комнаты, сразу и после коммита.
+
+Сброс должны увидеть все веб-процессы и воркеры, поэтому нужен общий кэш
+(Redis, проверяется при запуске: announcements.checks). Короткий
+CHAT_MEMBERSHIP_CACHE_TTL страхует от изменений в обход сигналов (запросы
+без ORM, bulk-операции по through-модели).
+
+Ключи в кэше:
+    chat:members:<model>:<id>    frozenset id участников
+"""
+from django.conf import settings
+from django.core.cache import cache
+from common import reset_now_and_on_commit
+
+
+def _cache_key(model, room_id):
+    return f'chat:members:{model._meta.model_name}:{room_id}'
+
+
+def members(model, room_id):
+    """frozenset id участников комнаты (Dialog или Chat); пустой, если комнаты нет"""
+    key = _cache_key(model, room_id)
+    ids = cache.get(key)
+    if ids is None:
+        field = model.participants.field
+        ids = frozenset(
+            field.remote_field.through.objects.filter(**{f'{field.m2m_field_name()}_id': room_id})
+            .values_list(f'{field.m2m_reverse_field_name()}_id', flat=True)
+        )
+        cache.set(key, ids, settings.CHAT_MEMBERSHIP_CACHE_TTL)
+    return ids
+
+
+def is_member(model, room_id, user):
+    return user.is_authenticated and user.id in members(model, room_id)
+
+
+def invalidate(model, room_ids):
+    keys = [_cache_key(model, room_id) for room_id in room_ids]
+    if not keys:
+        return
+    reset_now_and_on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='dialog',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.dialog', verbose_name='Диалог'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='chat',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.chat', verbose_name='Чат'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['dialog', 'id'], name='chat_messag_dialog__499f08_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', 'id'], name='chat_messag_chat_id_08e8ad_idx'),
+        ),
+    ]
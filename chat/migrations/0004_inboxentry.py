@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_dialog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее сообщение отправлено')),
+                ('preview', models.CharField(blank=True, max_length=100, verbose_name='Начало последнего сообщения')),
+                ('unread_count', models.PositiveIntegerField(default=0, verbose_name='Непрочитанные')),
+                ('dialog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='chat.dialog', verbose_name='Диалог')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message', verbose_name='Последнее сообщение')),
+                ('last_sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор последнего сообщения')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Строка входящих',
+                'verbose_name_plural': 'Входящие',
+                'indexes': [models.Index(fields=['user', '-last_message_at', '-id'], name='chat_inboxe_user_id_fa608c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'dialog'), name='chat_inbox_user_dialog_unique')],
+            },
+        ),
+    ]
@@ -77,11 +77,22 @@ class Chat(models.Model):
         return f'Чат {self.id}'
 
 class Message(models.Model):
+    # Сообщение принадлежит либо диалогу, либо групповому чату
+    dialog = models.ForeignKey(
+        Dialog,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        verbose_name='Диалог',
+        null=True,
+        blank=True
+    )
     chat = models.ForeignKey(
         Chat,
         on_delete=models.CASCADE,
         related_name='messages',
-        verbose_name='Чат'
+        verbose_name='Чат',
+        null=True,
+        blank=True
     )
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -103,6 +114,62 @@ class Message(models.Model):
         verbose_name = 'Сообщение'
         verbose_name_plural = 'Сообщения'
         ordering = ['created_at']
+        indexes = [
+            # История страницами: WHERE dialog_id = ... AND id < ... ORDER BY id DESC
+            models.Index(fields=['dialog', 'id']),
+            models.Index(fields=['chat', 'id']),
+        ]
+
+    def __str__(self):
+        return f'Сообщение от {self.sender} в чате {self.dialog_id or self.chat_id}' 
+
+class InboxEntry(models.Model):
+    """
+    Строка входящих пользователя: последнее сообщение диалога и число непрочитанных.
+    Обновляется в одной транзакции с сообщениями (chat.inbox), восстанавливается
+    командой rebuild_chat_inbox.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='inbox_entries',
+        verbose_name='Пользователь'
+    )
+    dialog = models.ForeignKey(
+        Dialog,
+        on_delete=models.CASCADE,
+        related_name='inbox_entries',
+        verbose_name='Диалог'
+    )
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Последнее сообщение',
+        null=True,
+        blank=True
+    )
+    last_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Автор последнего сообщения',
+        null=True,
+        blank=True
+    )
+    last_message_at = models.DateTimeField('Последнее сообщение отправлено', null=True, blank=True)
+    preview = models.CharField('Начало последнего сообщения', max_length=100, blank=True)
+    unread_count = models.PositiveIntegerField('Непрочитанные', default=0)
+
+    class Meta:
+        verbose_name = 'Строка входящих'
+        verbose_name_plural = 'Входящие'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dialog'], name='chat_inbox_user_dialog_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', '-id']),
+        ]
 
     def __str__(self):
-        return f'Сообщение от {self.sender} в чате {self.chat.id}' 
\ No newline at end of file
+        return f'Входящие {self.user} - диалог {self.dialog_id}'
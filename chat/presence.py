@@ -0,0 +1,166 @@
+"""
+Присутствие пользователей в чате без записи в таблицу пользователей.
+
+Каждое WebSocket-подключение увеличивает счетчик пользователя в кэше, отключение -
+уменьшает. Пользователь в сети, пока счетчик больше нуля. Ключ живет PRESENCE_TTL
+секунд и продлевается heartbeat-кадрами клиента: если процесс упал и не уменьшил
+счетчик, пользователь уйдет из сети, когда перестанут приходить heartbeat.
+
+Смена статуса рассылается не сразу, а через PRESENCE_DEBOUNCE секунд, и только если
+статус отличается от последнего разосланного. Переподключения (закрыли вкладку и
+открыли другую, обрыв сети) поэтому не порождают пары «вышел/вошел».
+
+Рассылка идет в группу presence_<user_id>; на нее подписываются подключения
+собеседников пользователя.
+
+User.last_activity обновляется не на каждое событие: время последней активности
+копится в памяти процесса и пишется одним bulk_update раз в PRESENCE_FLUSH_INTERVAL.
+
+Ключи в кэше:
+    presence:n:<user_id>    число открытых подключений
+    presence:b:<user_id>    последний разосланный статус
+
+Кэш должен быть общим для всех ASGI-процессов (Redis, см. CACHES): в локальном
+кэше процесса счетчики не видны соседям и вытесняются при переполнении.
+"""
+import asyncio
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def presence_group(user_id):
+    return f'presence_{user_id}'
+
+
+def _write_activity(activity):
+    User = get_user_model()
+    User.objects.bulk_update(
+        [User(id=user_id, last_activity=moment) for user_id, moment in activity.items()],
+        ['last_activity']
+    )
+
+
+class Presence:
+    """Счетчики подключений, отложенная рассылка статуса и сброс last_activity"""
+
+    def __init__(self, prefix='presence'):
+        self.prefix = prefix
+        self._broadcasts = {}
+        self._activity = {}
+        self._flush_timer = None
+        self._tasks = set()
+        self._loop = None
+
+    def _current_loop(self):
+        # Таймеры остановленного цикла событий (тесты, перезапуск) уже не сработают
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._broadcasts.clear()
+            self._flush_timer = None
+            self._tasks = set()
+        return loop
+
+    def _count_key(self, user_id):
+        return f'{self.prefix}:n:{user_id}'
+
+    def _state_key(self, user_id):
+        return f'{self.prefix}:b:{user_id}'
+
+    async def connect(self, user_id, channel_layer):
+        key = self._count_key(user_id)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            count = 1 if cache.add(key, 1, settings.PRESENCE_TTL) else cache.incr(key)
+        cache.touch(key, settings.PRESENCE_TTL)
+        self.touch(user_id)
+        if count == 1:
+            self._schedule_broadcast(user_id, channel_layer)
+
+    async def disconnect(self, user_id, channel_layer):
+        key = self._count_key(user_id)
+        try:
+            count = cache.decr(key)
+        except ValueError:
+            count = 0
+        if count <= 0:
+            cache.delete(key)
+            self._schedule_broadcast(user_id, channel_layer)
+        self.touch(user_id)
+
+    def heartbeat(self, user_id):
+        """Продлевает жизнь счетчика; False, если он уже истек"""
+        self.touch(user_id)
+        return cache.touch(self._count_key(user_id), settings.PRESENCE_TTL)
+
+    def is_online(self, user_id):
+        return (cache.get(self._count_key(user_id)) or 0) > 0
+
+    def online(self, user_ids):
+        """Множество пользователей из user_ids, которые сейчас в сети"""
+        keys = {self._count_key(user_id): user_id for user_id in user_ids}
+        return {keys[key] for key, count in cache.get_many(list(keys)).items() if count and count > 0}
+
+    def _spawn(self, func, *args):
+        task = asyncio.ensure_future(func(*args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule_broadcast(self, user_id, channel_layer):
+        loop = self._current_loop()
+        # Уже запланированная рассылка прочитает итоговый статус сама
+        if user_id in self._broadcasts:
+            return
+        handle = loop.call_later(settings.PRESENCE_DEBOUNCE, self._spawn, self._broadcast, user_id, channel_layer)
+        self._broadcasts[user_id] = (handle, channel_layer)
+
+    async def _broadcast(self, user_id, channel_layer):
+        self._broadcasts.pop(user_id, None)
+        is_online = self.is_online(user_id)
+        # Без записи считается, что пользователя не объявляли в сети
+        if cache.get(self._state_key(user_id), False) == is_online:
+            return
+        cache.set(self._state_key(user_id), is_online, settings.PRESENCE_TTL)
+        await channel_layer.group_send(
+            presence_group(user_id),
+            {
+                'type': 'user_status',
+                'user': {
+                    'id': user_id,
+                    'is_online': is_online
+                }
+            }
+        )
+
+    def touch(self, user_id):
+        """Отмечает активность; в базу она попадет при следующем сбросе"""
+        self._activity[user_id] = timezone.now()
+        loop = self._current_loop()
+        if self._flush_timer is None:
+            self._flush_timer = loop.call_later(settings.PRESENCE_FLUSH_INTERVAL, self._spawn, self.flush)
+
+    async def flush(self):
+        """Пишет накопленные last_activity; возвращает число пользователей"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        activity, self._activity = self._activity, {}
+        if activity:
+            await database_sync_to_async(_write_activity)(activity)
+        return len(activity)
+
+    async def drain(self):
+        """Выполняет отложенные рассылки и сброс сразу (при остановке и в тестах)"""
+        for user_id, (handle, channel_layer) in list(self._broadcasts.items()):
+            handle.cancel()
+            await self._broadcast(user_id, channel_layer)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+
+presence = Presence()
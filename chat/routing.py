@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<dialog_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
     re_path(r'ws/group-chat/(?P<chat_id>\d+)/$', consumers.GroupChatConsumer.as_asgi()),
+    re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
 ] 
\ No newline at end of file
@@ -0,0 +1,62 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from . import inbox, membership
+from .models import Chat, Dialog, InboxEntry, Message
+
+
+def _participants_changed(model, instance, action, reverse, pk_set):
+    if action == 'pre_clear' and reverse:
+        # После очистки со стороны пользователя его комнаты уже не найти
+        rooms = getattr(instance, model.participants.field.remote_field.related_name)
+        instance._chat_cleared_rooms = list(rooms.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        room_ids = [instance.pk]
+    elif action == 'post_clear':
+        room_ids = getattr(instance, '_chat_cleared_rooms', [])
+    else:
+        room_ids = pk_set or []
+    membership.invalidate(model, room_ids)
+
+
+@receiver(m2m_changed, sender=Dialog.participants.through)
+def dialog_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _participants_changed(Dialog, instance, action, reverse, pk_set)
+    _update_inbox(instance, action, reverse, pk_set)
+
+
+def _update_inbox(instance, action, reverse, pk_set):
+    """Строки входящих появляются и исчезают вместе с участниками диалога"""
+    if action == 'post_add':
+        if reverse:
+            for dialog_id in pk_set:
+                inbox.ensure_entries(dialog_id, [instance.pk])
+        else:
+            inbox.ensure_entries(instance.pk, pk_set)
+    elif action == 'post_remove':
+        key = 'dialog_id__in' if reverse else 'user_id__in'
+        owner = 'user_id' if reverse else 'dialog_id'
+        InboxEntry.objects.filter(**{owner: instance.pk, key: pk_set}).delete()
+    elif action == 'post_clear':
+        owner = 'user_id' if reverse else 'dialog_id'
+        InboxEntry.objects.filter(**{owner: instance.pk}).delete()
+
+
+@receiver(m2m_changed, sender=Chat.participants.through)
+def chat_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _participants_changed(Chat, instance, action, reverse, pk_set)
+
+
+@receiver(post_delete, sender=Dialog)
+@receiver(post_delete, sender=Chat)
+def room_deleted(sender, instance, **kwargs):
+    membership.invalidate(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, **kwargs):
+    # Пачки из chat.store пишутся bulk_create и учитываются там же
+    if created and instance.dialog_id:
+        inbox.record_messages([instance])
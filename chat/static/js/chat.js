@@ -130,7 +130,15 @@ class ChatHandler {
         );
         
         this.socket.onmessage = this.handleWebSocketMessage.bind(this);
+        this.socket.onopen = () => {
+            this.loadHistory();
+            // Без heartbeat сервер через PRESENCE_TTL считает пользователя не в сети
+            this.heartbeat = setInterval(() => {
+                this.socket.send(JSON.stringify({type: 'heartbeat'}));
+            }, 30000);
+        };
         this.socket.onclose = () => {
+            clearInterval(this.heartbeat);
             console.log('WebSocket соединение закрыто');
             // Можно добавить логику переподключения
         };
@@ -141,6 +149,11 @@ class ChatHandler {
         // Отправка сообщения
         this.messageForm.addEventListener('submit', this.handleMessageSubmit.bind(this));
         
+        // Подгрузка истории при прокрутке к началу
+        this.messagesContainer.addEventListener('scroll', () => {
+            if (this.messagesContainer.scrollTop === 0) this.loadHistory();
+        });
+        
         // Отправка файлов
         document.getElementById('attach-file').addEventListener('click', () => {
             const input = document.createElement('input');
@@ -186,45 +199,75 @@ class ChatHandler {
             case 'new_message':
                 this.addMessage(data.message);
                 break;
+            case 'history':
+                this.prependHistory(data.messages, data.has_more);
+                break;
+            case 'error':
+                alert(data.error);
+                break;
             case 'typing':
                 this.updateTypingStatus(data.user);
                 break;
             case 'user_status':
                 this.updateUserStatus(data.user);
                 break;
+            case 'presence':
+                data.users.forEach(user => this.updateUserStatus(user));
+                break;
             case 'message_read':
                 this.updateMessageStatus(data.message_id);
                 break;
         }
     }
     
-    // Отправка сообщения
-    async handleMessageSubmit(event) {
+    // Отправка сообщения через сокет; сервер сохраняет его и рассылает участникам
+    handleMessageSubmit(event) {
         event.preventDefault();
         
-        const content = this.messageInput.value.trim();
-        if (!content) return;
-        
-        const formData = new FormData();
-        formData.append('content', content);
+        const text = this.messageInput.value.trim();
+        if (!text) return;
         
-        try {
-            const response = await fetch(`/chat/${this.dialogId}/send/`, {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
-                }
-            });
-            
-            if (!response.ok) throw new Error('Ошибка отправки сообщения');
-            
-            this.messageInput.value = '';
-            this.messageInput.focus();
-            
-        } catch (error) {
-            console.error('Ошибка:', error);
+        if (this.socket.readyState !== WebSocket.OPEN) {
             alert('Не удалось отправить сообщение');
+            return;
+        }
+        
+        this.socket.send(JSON.stringify({
+            type: 'send',
+            text: text,
+            client_id: `${Date.now()}-${Math.random().toString(36).slice(2)}`
+        }));
+        
+        this.messageInput.value = '';
+        this.messageInput.focus();
+    }
+    
+    // Запрос страницы истории старше самого раннего показанного сообщения
+    loadHistory() {
+        if (this.historyLoading || this.historyExhausted) return;
+        this.historyLoading = true;
+        
+        const first = this.messagesContainer.querySelector('[data-message-id]');
+        this.socket.send(JSON.stringify({
+            type: 'history',
+            before_id: first ? first.dataset.messageId : null
+        }));
+    }
+    
+    prependHistory(messages, hasMore) {
+        this.historyLoading = false;
+        this.historyExhausted = !hasMore;
+        
+        const initial = !this.messagesContainer.querySelector('[data-message-id]');
+        const previousHeight = this.messagesContainer.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        messages.forEach(message => fragment.appendChild(this.renderMessage(message)));
+        this.messagesContainer.prepend(fragment);
+        
+        if (initial) {
+            this.scrollToBottom();
+        } else {
+            this.messagesContainer.scrollTop += this.messagesContainer.scrollHeight - previousHeight;
         }
     }
     
@@ -318,22 +361,27 @@ class ChatHandler {
     
     // Добавление сообщения в чат
     addMessage(message) {
+        if (this.messagesContainer.querySelector(`[data-message-id="${message.id}"]`)) return;
+        this.messagesContainer.appendChild(this.renderMessage(message));
+        this.scrollToBottom();
+    }
+    
+    renderMessage(message) {
         const messageElement = document.createElement('div');
         messageElement.className = `message ${message.sender_id === currentUser ? 'outgoing' : 'incoming'}`;
         messageElement.dataset.messageId = message.id;
         
         messageElement.innerHTML = `
             <div class="message-content">
-                <p>${message.content}</p>
+                <p></p>
             </div>
             <div class="message-meta">
                 <span class="time">${new Date(message.created_at).toLocaleTimeString([], {hour: '2-digit', minute:'2-digit'})}</span>
                 ${message.sender_id === currentUser ? '<span class="status"><i class="fas fa-check"></i></span>' : ''}
             </div>
         `;
-        
-        this.messagesContainer.appendChild(messageElement);
-        this.scrollToBottom();
+        messageElement.querySelector('.message-content p').textContent = message.text;
+        return messageElement;
     }
     
     // Обновление статуса печати
@@ -0,0 +1,127 @@
+"""
+Запись и чтение сообщений чата для WebSocket-потребителей.
+
+Сообщения, пришедшие через сокет, не сохраняются по одному: MessageWriter
+копит их и пишет пачкой bulk_create - когда набралось CHAT_WRITE_BATCH_SIZE
+сообщений или прошло CHAT_WRITE_DELAY секунд с первого из них. Отправитель
+ждет свою пачку и получает сообщение с id, после чего рассылает его в группу.
+
+История читается страницами по id (keyset): WHERE id < before_id ORDER BY id
+DESC LIMIT n по индексу (dialog, id), поэтому глубина страницы не важна.
+"""
+import asyncio
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import inbox
+from .models import Chat, Dialog, Message
+
+HISTORY_MAX_LIMIT = 100
+
+
+def message_payload(message, sender=None):
+    """Сообщение в том виде, в каком его получает клиент"""
+    sender = sender or message.sender
+    return {
+        'id': message.id,
+        'text': message.text,
+        'sender_id': message.sender_id,
+        'sender_name': sender.get_full_name() or str(sender),
+        'created_at': message.created_at.isoformat(),
+        'is_read': message.is_read,
+    }
+
+
+def _save_batch(messages):
+    now = timezone.now()
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        # bulk_create не шлет post_save, входящие обновляются здесь
+        inbox.record_messages(messages)
+        dialog_ids = {m.dialog_id for m in messages if m.dialog_id}
+        chat_ids = {m.chat_id for m in messages if m.chat_id}
+        if dialog_ids:
+            Dialog.objects.filter(id__in=dialog_ids).update(updated=now)
+        if chat_ids:
+            Chat.objects.filter(id__in=chat_ids).update(updated_at=now)
+    return messages
+
+
+class MessageWriter:
+    """Пакетная запись сообщений из всех потребителей процесса"""
+
+    def __init__(self, batch_size=None, delay=None):
+        self.batch_size = batch_size
+        self.delay = delay
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+
+    def _settings(self):
+        batch_size = self.batch_size or settings.CHAT_WRITE_BATCH_SIZE
+        delay = self.delay if self.delay is not None else settings.CHAT_WRITE_DELAY
+        return batch_size, delay
+
+    async def write(self, sender_id, text, **target):
+        """
+        Ставит сообщение в пачку и ждет ее записи. target - dialog_id или chat_id.
+        Возвращает сохраненное сообщение.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((Message(sender_id=sender_id, text=text, **target), future))
+
+        batch_size, delay = self._settings()
+        if len(self._pending) >= batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        try:
+            saved = await database_sync_to_async(_save_batch)([message for message, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for message, (_, future) in zip(saved, batch):
+            if not future.done():
+                future.set_result(message)
+
+    async def drain(self):
+        """Дописывает все, что накоплено (при остановке и в тестах)"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+writer = MessageWriter()
+
+
+def history(before_id=None, limit=None, **target):
+    """
+    Страница истории от новых к старым: сообщения с id < before_id.
+    Возвращает (сообщения по возрастанию id, есть ли еще более старые).
+    """
+    try:
+        limit = min(max(int(limit), 1), HISTORY_MAX_LIMIT)
+    except (TypeError, ValueError):
+        limit = settings.CHAT_HISTORY_PAGE_SIZE
+    queryset = Message.objects.filter(**target).select_related('sender').order_by('-id')
+    if before_id:
+        queryset = queryset.filter(id__lt=before_id)
+    rows = list(queryset[:limit + 1])
+    return rows[:limit][::-1], len(rows) > limit
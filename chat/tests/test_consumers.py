@@ -0,0 +1,138 @@
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from login_auth.models import User
+from chat.models import Dialog, Message
+from chat.routing import websocket_urlpatterns
+from chat.store import history
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CHAT_WRITE_BATCH_SIZE=10,
+    CHAT_WRITE_DELAY=0.01,
+)
+class ChatConsumerTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.buyer = User.objects.create_user(phone='+79990000171', password='testpass123')
+        self.seller = User.objects.create_user(phone='+79990000172', password='testpass123')
+        self.stranger = User.objects.create_user(phone='+79990000173', password='testpass123')
+        self.dialog = Dialog.objects.create()
+        self.dialog.participants.add(self.buyer, self.seller)
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.dialog.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def _receive(self, communicator, frame_type):
+        while True:
+            frame = await communicator.receive_json_from(timeout=5)
+            if frame['type'] == frame_type:
+                return frame
+
+    def test_send_persists_and_fans_out(self):
+        async def scenario():
+            buyer, _ = await self._connect(self.buyer)
+            seller, _ = await self._connect(self.seller)
+
+            await buyer.send_json_to({'type': 'send', 'text': 'Привет', 'client_id': 'a1'})
+            ack = await self._receive(buyer, 'sent')
+            received = await self._receive(seller, 'new_message')
+
+            await buyer.disconnect()
+            await seller.disconnect()
+            return ack, received
+
+        ack, received = async_to_sync(scenario)()
+        self.assertEqual(ack['client_id'], 'a1')
+        self.assertEqual(received['message'], ack['message'])
+        message = Message.objects.get(id=ack['message']['id'])
+        self.assertEqual((message.dialog_id, message.sender_id, message.text), (self.dialog.id, self.buyer.id, 'Привет'))
+
+    def test_concurrent_sends_from_both_sides_are_persisted(self):
+        async def scenario():
+            buyer, _ = await self._connect(self.buyer)
+            seller, _ = await self._connect(self.seller)
+            for number in range(5):
+                await buyer.send_json_to({'type': 'send', 'text': f'Покупатель {number}', 'client_id': number})
+                await seller.send_json_to({'type': 'send', 'text': f'Продавец {number}', 'client_id': number})
+            acks = []
+            for communicator in (buyer, seller):
+                for _ in range(5):
+                    acks.append(await self._receive(communicator, 'sent'))
+            await buyer.disconnect()
+            await seller.disconnect()
+            return acks
+
+        acks = async_to_sync(scenario)()
+        ids = {ack['message']['id'] for ack in acks}
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(Message.objects.filter(dialog=self.dialog).count(), 10)
+
+    def test_empty_message_is_rejected(self):
+        async def scenario():
+            buyer, _ = await self._connect(self.buyer)
+            await buyer.send_json_to({'type': 'send', 'text': '   ', 'client_id': 'x'})
+            frame = await self._receive(buyer, 'error')
+            await buyer.disconnect()
+            return frame
+
+        self.assertEqual(async_to_sync(scenario)()['client_id'], 'x')
+        self.assertFalse(Message.objects.exists())
+
+    def test_history_pages(self):
+        Message.objects.bulk_create([
+            Message(dialog=self.dialog, sender=self.seller, text=f'Сообщение {number}') for number in range(7)
+        ])
+        ids = list(Message.objects.order_by('id').values_list('id', flat=True))
+
+        async def scenario():
+            buyer, _ = await self._connect(self.buyer)
+            await buyer.send_json_to({'type': 'history', 'limit': 3})
+            first = await self._receive(buyer, 'history')
+            await buyer.send_json_to({'type': 'history', 'limit': 5, 'before_id': first['messages'][0]['id']})
+            second = await self._receive(buyer, 'history')
+            await buyer.disconnect()
+            return first, second
+
+        first, second = async_to_sync(scenario)()
+        self.assertEqual([m['id'] for m in first['messages']], ids[4:])
+        self.assertTrue(first['has_more'])
+        self.assertEqual([m['id'] for m in second['messages']], ids[:4])
+        self.assertFalse(second['has_more'])
+
+    def test_presence_snapshot_on_connect(self):
+        async def scenario():
+            buyer, _ = await self._connect(self.buyer)
+            await self._receive(buyer, 'presence')
+            seller, _ = await self._connect(self.seller)
+            snapshot = await self._receive(seller, 'presence')
+            await buyer.disconnect()
+            await seller.disconnect()
+            return snapshot
+
+        self.assertEqual(async_to_sync(scenario)()['users'], [{'id': self.buyer.id, 'is_online': True}])
+
+    def test_stranger_is_refused(self):
+        async def scenario():
+            communicator, connected = await self._connect(self.stranger)
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(scenario)())
+
+
+class HistoryTest(TransactionTestCase):
+    def test_limit_is_clamped(self):
+        user = User.objects.create_user(phone='+79990000174', password='testpass123')
+        dialog = Dialog.objects.create()
+        Message.objects.bulk_create([Message(dialog=dialog, sender=user, text=str(n)) for n in range(3)])
+        messages, has_more = history(limit=0, dialog_id=dialog.id)
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(has_more)
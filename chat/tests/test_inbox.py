@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import TestCase
+from login_auth.models import User
+from chat import inbox
+from chat.models import Dialog, InboxEntry, Message
+from chat.store import _save_batch
+
+
+class InboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.buyer = User.objects.create_user(phone='+79990000201', password='testpass123')
+        self.seller = User.objects.create_user(phone='+79990000202', password='testpass123')
+        self.dialog = Dialog.objects.create()
+        self.dialog.participants.add(self.buyer, self.seller)
+
+    def _entry(self, user, dialog=None):
+        return InboxEntry.objects.get(user=user, dialog=dialog or self.dialog)
+
+    def _snapshot(self):
+        return sorted(InboxEntry.objects.values_list(
+            'user_id', 'dialog_id', 'last_message_id', 'last_sender_id', 'last_message_at', 'preview', 'unread_count'
+        ))
+
+    def test_entries_follow_participants(self):
+        self.assertEqual(InboxEntry.objects.filter(dialog=self.dialog).count(), 2)
+        self.dialog.participants.remove(self.seller)
+        self.assertFalse(InboxEntry.objects.filter(user=self.seller).exists())
+
+    def test_created_message_updates_both_sides(self):
+        message = Message.objects.create(dialog=self.dialog, sender=self.buyer, text='Здравствуйте, котенок еще продается?')
+
+        buyer, seller = self._entry(self.buyer), self._entry(self.seller)
+        self.assertEqual((buyer.last_message_id, buyer.unread_count), (message.id, 0))
+        self.assertEqual((seller.last_message_id, seller.unread_count), (message.id, 1))
+        self.assertEqual(seller.preview, message.text)
+        self.assertEqual(seller.last_message_at, message.created_at)
+
+    def test_batch_counts_unread_per_participant(self):
+        _save_batch([
+            Message(dialog_id=self.dialog.id, sender=self.buyer, text='1'),
+            Message(dialog_id=self.dialog.id, sender=self.seller, text='2'),
+            Message(dialog_id=self.dialog.id, sender=self.buyer, text='3'),
+        ])
+        self.assertEqual(self._entry(self.seller).unread_count, 2)
+        self.assertEqual(self._entry(self.buyer).unread_count, 1)
+        self.assertEqual(self._entry(self.buyer).preview, '3')
+
+    def test_older_message_does_not_replace_last(self):
+        older = Message(dialog_id=self.dialog.id, sender=self.buyer, text='раньше')
+        newer = Message(dialog_id=self.dialog.id, sender=self.buyer, text='позже')
+        Message.objects.bulk_create([older, newer])
+        inbox.record_messages([newer])
+        inbox.record_messages([older])
+        entry = self._entry(self.seller)
+        self.assertEqual((entry.last_message_id, entry.preview, entry.unread_count), (newer.id, 'позже', 2))
+
+    def test_mark_read(self):
+        messages = [Message.objects.create(dialog=self.dialog, sender=self.seller, text=str(n)) for n in range(4)]
+        self.assertEqual(inbox.mark_read(self.buyer.id, self.dialog.id, [messages[0].id, messages[1].id]), 2)
+        self.assertEqual(self._entry(self.buyer).unread_count, 2)
+        # Свои сообщения прочитанными не отмечаются
+        self.assertEqual(inbox.mark_read(self.seller.id, self.dialog.id), 0)
+        self.assertEqual(self._entry(self.buyer).unread_count, 2)
+        inbox.mark_read(self.buyer.id, self.dialog.id)
+        self.assertEqual(self._entry(self.buyer).unread_count, 0)
+        self.assertFalse(Message.objects.filter(is_read=False).exists())
+
+    def test_incremental_state_matches_rebuild(self):
+        other = Dialog.objects.create()
+        other.participants.add(self.buyer, self.seller)
+        for number in range(5):
+            Message.objects.create(dialog=self.dialog, sender=[self.buyer, self.seller][number % 2], text=f'Сообщение {number}')
+        _save_batch([Message(dialog_id=other.id, sender=self.seller, text='Новый диалог')])
+        inbox.mark_read(self.buyer.id, self.dialog.id, list(Message.objects.filter(dialog=self.dialog).values_list('id', flat=True)[:2]))
+
+        incremental = self._snapshot()
+        self.assertEqual(inbox.reconcile(), 0)
+
+        InboxEntry.objects.update(unread_count=7, preview='', last_message=None)
+        InboxEntry.objects.filter(user=self.seller, dialog=other).delete()
+        self.assertEqual(inbox.reconcile(), 4)
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_list_is_one_query(self):
+        other = Dialog.objects.create()
+        other.participants.add(self.buyer, self.seller)
+        Message.objects.create(dialog=self.dialog, sender=self.seller, text='старое')
+        Message.objects.create(dialog=other, sender=self.seller, text='новое')
+        empty = Dialog.objects.create()
+        empty.participants.add(self.buyer)
+
+        with self.assertNumQueries(1):
+            entries = list(inbox.inbox(self.buyer))
+            titles = [(entry.dialog_id, entry.last_sender and entry.last_sender.phone) for entry in entries]
+        self.assertEqual([dialog_id for dialog_id, _ in titles], [other.id, self.dialog.id, empty.id])
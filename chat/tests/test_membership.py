@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase
+from login_auth.models import User
+from chat.membership import is_member, members
+from chat.models import Chat, Dialog
+
+
+class MembershipCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.buyer = User.objects.create_user(phone='+79990000191', password='testpass123')
+        self.seller = User.objects.create_user(phone='+79990000192', password='testpass123')
+        self.other = User.objects.create_user(phone='+79990000193', password='testpass123')
+        self.dialog = Dialog.objects.create()
+        self.dialog.participants.add(self.buyer, self.seller)
+
+    def test_members_are_cached(self):
+        self.assertEqual(members(Dialog, self.dialog.id), frozenset({self.buyer.id, self.seller.id}))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_member(Dialog, self.dialog.id, self.buyer))
+            self.assertFalse(is_member(Dialog, self.dialog.id, self.other))
+
+    def test_add_and_remove_invalidate(self):
+        members(Dialog, self.dialog.id)
+        self.dialog.participants.add(self.other)
+        self.assertTrue(is_member(Dialog, self.dialog.id, self.other))
+        self.dialog.participants.remove(self.buyer)
+        self.assertFalse(is_member(Dialog, self.dialog.id, self.buyer))
+
+    def test_reverse_changes_invalidate(self):
+        members(Dialog, self.dialog.id)
+        self.other.dialogs.add(self.dialog)
+        self.assertTrue(is_member(Dialog, self.dialog.id, self.other))
+        self.buyer.dialogs.clear()
+        self.assertFalse(is_member(Dialog, self.dialog.id, self.buyer))
+
+    def test_clear_and_delete_invalidate(self):
+        members(Dialog, self.dialog.id)
+        self.dialog.participants.clear()
+        self.assertEqual(members(Dialog, self.dialog.id), frozenset())
+
+        self.dialog.participants.add(self.buyer)
+        dialog_id = self.dialog.id
+        members(Dialog, dialog_id)
+        self.dialog.delete()
+        self.assertFalse(is_member(Dialog, dialog_id, self.buyer))
+
+    def test_group_chats_are_separate(self):
+        chat = Chat.objects.create()
+        chat.participants.add(self.other)
+        self.assertTrue(is_member(Chat, chat.id, self.other))
+        self.assertFalse(is_member(Dialog, chat.id, self.other))
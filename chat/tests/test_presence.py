@@ -0,0 +1,121 @@
+import asyncio
+import random
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from login_auth.models import User
+from chat.presence import Presence, presence_group
+
+
+class RecordingLayer:
+    """Канальный слой, который только запоминает рассылки"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+@override_settings(
+    PRESENCE_TTL=60,
+    PRESENCE_DEBOUNCE=0.05,
+    PRESENCE_FLUSH_INTERVAL=3600,
+)
+class PresenceTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.presence = Presence()
+        self.layer = RecordingLayer()
+
+    def _statuses(self, user_id):
+        return [message['user']['is_online'] for group, message in self.layer.sent if group == presence_group(user_id)]
+
+    def test_reconnect_within_debounce_is_not_broadcast(self):
+        async def scenario():
+            await self.presence.connect(1, self.layer)
+            await asyncio.sleep(0.1)
+            await self.presence.disconnect(1, self.layer)
+            await self.presence.connect(1, self.layer)
+            await asyncio.sleep(0.1)
+
+        async_to_sync(scenario)()
+        self.assertEqual(self._statuses(1), [True])
+        self.assertTrue(self.presence.is_online(1))
+
+    def test_offline_after_last_tab_closes(self):
+        async def scenario():
+            for _ in range(3):
+                await self.presence.connect(1, self.layer)
+            for _ in range(2):
+                await self.presence.disconnect(1, self.layer)
+            await asyncio.sleep(0.1)
+            online = self.presence.is_online(1)
+            await self.presence.disconnect(1, self.layer)
+            await asyncio.sleep(0.1)
+            return online
+
+        self.assertTrue(async_to_sync(scenario)())
+        self.assertEqual(self._statuses(1), [True, False])
+        self.assertFalse(self.presence.is_online(1))
+
+    def test_heartbeat_reports_expired_counter(self):
+        async def scenario():
+            await self.presence.connect(1, self.layer)
+            alive = self.presence.heartbeat(1)
+            # Истечение TTL
+            cache.delete(self.presence._count_key(1))
+            return alive, self.presence.heartbeat(1)
+
+        self.assertEqual(async_to_sync(scenario)(), (True, False))
+
+    def test_connect_storm(self):
+        """Тысячи подключений и отключений без запросов к базе и не больше одной рассылки на пользователя"""
+        users = 300
+        rng = random.Random(7)
+        events = []
+        for user_id in range(1, users + 1):
+            tabs = rng.randint(1, 4)
+            events += [(user_id, 'connect')] * tabs
+            if user_id % 3 == 0:
+                # Закрыл все вкладки
+                events += [(user_id, 'disconnect')] * tabs
+            else:
+                # Оставил одну вкладку, которая несколько раз переподключалась
+                events += [(user_id, 'disconnect')] * (tabs - 1)
+                events += [(user_id, 'disconnect'), (user_id, 'connect')] * rng.randint(0, 3)
+
+        async def scenario():
+            for user_id, event in events:
+                await getattr(self.presence, event)(user_id, self.layer)
+            await asyncio.sleep(0.2)
+
+        self.assertGreater(len(events), 1000)
+        # Запросы к базе выполняются в этом потоке (database_sync_to_async)
+        with CaptureQueriesContext(connection) as queries:
+            async_to_sync(scenario)()
+        self.assertEqual(len(queries), 0)
+
+        expected = {user_id for user_id in range(1, users + 1) if user_id % 3}
+        self.assertEqual(self.presence.online(range(1, users + 1)), expected)
+        for user_id in range(1, users + 1):
+            self.assertEqual(self._statuses(user_id), [True] if user_id in expected else [])
+
+    def test_last_activity_is_flushed_in_one_pass(self):
+        users = [User.objects.create_user(phone=f'+7999000018{n}', password='testpass123') for n in range(3)]
+
+        async def scenario():
+            for _ in range(5):
+                for user in users:
+                    await self.presence.connect(user.id, self.layer)
+                    await self.presence.disconnect(user.id, self.layer)
+            return await self.presence.flush()
+
+        with CaptureQueriesContext(connection) as queries:
+            written = async_to_sync(scenario)()
+        self.assertEqual(written, 3)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertFalse(User.objects.filter(last_activity__isnull=True).exists())
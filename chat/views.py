@@ -1,21 +1,19 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponseForbidden
-from django.db.models import Q, Max, Prefetch
+from django.db.models import Q, Prefetch
 from django.utils import timezone
+from .inbox import inbox, mark_read
+from .membership import is_member
 from .models import Dialog, Message, Chat
+from .store import history
 from catalog.models import Product
 
 @login_required
 def dialogs_list(request):
-    """Список диалогов пользователя"""
-    dialogs = Dialog.objects.filter(participants=request.user)\
-        .select_related('product')\
-        .prefetch_related('participants')\
-        .annotate(last_message_time=Max('messages__created'))\
-        .order_by('-last_message_time')
-    
-    return render(request, 'chat/dialogs_list.html', {'dialogs': dialogs})
+    """Список диалогов пользователя: один запрос к входящим, без агрегатов по сообщениям"""
+    return render(request, 'chat/dialogs_list.html', {'entries': inbox(request.user)})
 
 @login_required
 def dialog_detail(request, dialog_id):
@@ -23,20 +21,19 @@ def dialog_detail(request, dialog_id):
     dialog = get_object_or_404(Dialog, id=dialog_id)
     
     # Проверяем права доступа
-    if request.user not in dialog.participants.all():
+    if not is_member(Dialog, dialog.id, request.user):
         return HttpResponseForbidden('У вас нет доступа к этому диалогу')
     
     # Отмечаем сообщения как прочитанные
-    Message.objects.filter(dialog=dialog)\
-        .exclude(sender=request.user)\
-        .filter(is_read=False)\
-        .update(is_read=True)
+    mark_read(request.user.id, dialog.id)
     
-    messages = dialog.messages.select_related('sender').all()
+    # Последняя страница; более старые сообщения клиент запрашивает через сокет
+    messages, has_more = history(dialog_id=dialog.id)
     
     return render(request, 'chat/dialog_detail.html', {
         'dialog': dialog,
-        'messages': messages
+        'messages': messages,
+        'has_more': has_more
     })
 
 @login_required
@@ -45,10 +42,9 @@ def send_message(request, dialog_id):
     if request.method != 'POST':
         return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
     
-    dialog = get_object_or_404(Dialog, id=dialog_id)
-    
-    # Проверяем права доступа
-    if request.user not in dialog.participants.all():
+    # Проверяем права доступа; участник есть только у существующего диалога
+    if not is_member(Dialog, dialog_id, request.user):
+        get_object_or_404(Dialog, id=dialog_id)
         return HttpResponseForbidden('У вас нет доступа к этому диалогу')
     
     text = request.POST.get('text', '').strip()
@@ -57,49 +53,51 @@ def send_message(request, dialog_id):
         return JsonResponse({'error': 'Текст сообщения не может быть пустым'}, status=400)
     
     message = Message.objects.create(
-        dialog=dialog,
+        dialog_id=dialog_id,
         sender=request.user,
         text=text
     )
     
     # Обновляем время последнего сообщения в диалоге
-    dialog.updated = timezone.now()
-    dialog.save()
+    Dialog.objects.filter(id=dialog_id).update(updated=timezone.now())
     
     return JsonResponse({
         'id': message.id,
         'text': message.text,
-        'created': message.created.strftime('%Y-%m-%d %H:%M:%S'),
+        'created': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
         'sender_name': message.sender.get_full_name(),
         'is_own': True
     })
 
 @login_required
 def get_new_messages(request, dialog_id):
-    """API для получения новых сообщений"""
-    dialog = get_object_or_404(Dialog, id=dialog_id)
-    
-    # Проверяем права доступа
-    if request.user not in dialog.participants.all():
+    """
+    API для получения новых сообщений (опрос для клиентов без WebSocket).
+    Без last_id отдает только последнюю страницу, а не всю историю.
+    """
+    # Проверяем права доступа без запросов к базе: состав диалога в кэше
+    if not is_member(Dialog, dialog_id, request.user):
+        get_object_or_404(Dialog, id=dialog_id)
         return HttpResponseForbidden('У вас нет доступа к этому диалогу')
     
     last_message_id = request.GET.get('last_id')
     
-    messages_query = dialog.messages.select_related('sender')
-    
     if last_message_id:
-        messages_query = messages_query.filter(id__gt=last_message_id)
-    
-    messages = messages_query.all()
+        messages = list(
+            Message.objects.filter(dialog_id=dialog_id, id__gt=last_message_id)
+            .select_related('sender').order_by('id')[:settings.CHAT_HISTORY_PAGE_SIZE]
+        )
+    else:
+        messages, _ = history(dialog_id=dialog_id)
     
     # Отмечаем полученные сообщения как прочитанные
-    messages.exclude(sender=request.user).filter(is_read=False).update(is_read=True)
+    mark_read(request.user.id, dialog_id, [msg.id for msg in messages])
     
     return JsonResponse({
         'messages': [{
             'id': msg.id,
             'text': msg.text,
-            'created': msg.created.strftime('%Y-%m-%d %H:%M:%S'),
+            'created': msg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'sender_name': msg.sender.get_full_name(),
             'is_own': msg.sender == request.user
         } for msg in messages]
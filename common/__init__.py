@@ -0,0 +1,3 @@
+from .tracking import loaded_values, remember_on_init, reset_now_and_on_commit
+
+__all__ = ['loaded_values', 'remember_on_init', 'reset_now_and_on_commit']
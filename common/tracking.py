@@ -0,0 +1,31 @@
+"""
+Помощники обработчиков сигналов моделей.
+
+remember_on_init запоминает состояние объекта, прочитанное из базы: обработчик
+post_save сравнивает с ним новое и обновляет счетчики или кэш только на разницу.
+reset_now_and_on_commit сбрасывает кэш дважды, сразу и после коммита.
+"""
+from django.db import transaction
+from django.db.models.signals import post_init
+
+
+def loaded_values(instance, *names):
+    """Значения полей из __dict__: отложенные поля не подгружаются и дают None"""
+    return tuple(instance.__dict__.get(name) for name in names)
+
+
+def remember_on_init(model, attr, state):
+    """Кладет state(instance) в instance.<attr> при создании каждого объекта model"""
+    def remember(sender, instance, **kwargs):
+        setattr(instance, attr, state(instance))
+
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=f'remember:{model._meta.label}:{attr}')
+
+
+def reset_now_and_on_commit(reset):
+    """
+    Вызывает reset сейчас и еще раз после коммита: иначе параллельный запрос
+    успеет положить в кэш данные, прочитанные до коммита.
+    """
+    reset()
+    transaction.on_commit(reset)
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django_otp.plugins.otp_totp',
     'django_otp.plugins.otp_static',
     'rest_framework',
+    'channels',
     
     # Local apps
     'login_auth.apps.LoginAuthConfig',
@@ -46,6 +47,13 @@ INSTALLED_APPS = [
     'notifications.apps.NotificationsConfig',
     'user_profile.apps.UserProfileConfig',
     'announcements.apps.AnnouncementsConfig',
+    'taskqueue.apps.TaskQueueConfig',
+    'search.apps.SearchConfig',
+    'pagination.apps.PaginationConfig',
+    'queryplan.apps.QueryPlanConfig',
+    'renditions.apps.RenditionsConfig',
+    'tree.apps.TreeConfig',
+    'imports.apps.ImportsConfig',
 ]
 
 MIDDLEWARE = [
@@ -85,6 +93,24 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Channels: в продакшене нужен общий слой (channels_redis), иначе воркер не увидит сообщения
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Общий кэш: счетчики присутствия, буферы и поколения кэшей должны видеть все
+# веб-процессы и воркер задач, поэтому локальный кэш процесса не подходит
+REDIS_URL = os.getenv('REDIS_URL', f"redis://{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')}/0")
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+}
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -101,6 +127,10 @@ DATABASES = {
 
 # Настройки для полнотекстового поиска
 POSTGRES_SEARCH_CONFIG = 'russian'
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'search.backends.DatabaseBackend')
+SEARCH_MAX_RESULTS = 1000  # matches ranked per query; deeper pages are not reachable
+# Connection from HAYSTACK_CONNECTIONS used by search.backends.HaystackBackend (e.g. Whoosh)
+SEARCH_HAYSTACK_CONNECTION = 'default'
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -180,6 +210,99 @@ SMS_API_ID = os.getenv('SMS_API_ID', '80746AAB-3314-EE3B-B48A-61C607DE7446')  #
 SMS_ENABLED = os.getenv('SMS_ENABLED', 'True') == 'True'  # Enable/disable actual SMS sending
 SMS_TEST_MODE = os.getenv('SMS_TEST_MODE', 'True') == 'True'  # Enable/disable test mode for SMS
 
+# Deferred tasks (workers: python manage.py run_tasks)
+TASKS_BACKEND = os.getenv('TASKS_BACKEND', 'taskqueue.backends.DatabaseBackend')
+TASKS_MAX_RETRIES = 3
+TASKS_RETRY_BACKOFF = 10  # seconds before the first retry, doubled on every next one
+TASKS_RETRY_BACKOFF_MAX = 3600
+TASKS_BATCH_SIZE = 20  # tasks claimed by a worker per poll
+TASKS_LOCK_TIMEOUT = 600  # running tasks of a dead worker are picked up again after this many seconds
+TASKS_HEARTBEAT_INTERVAL = 60  # a live worker extends the lock of its running tasks this often
+
+# Swipe decks (pets.deck)
+SWIPE_DECK_BATCH_SIZE = 200  # cards precomputed per deck refill
+SWIPE_DECK_TTL = 600  # seconds; new announcements show up in decks after this
+
+# Buffered view counters (announcements.view_counts)
+VIEW_COUNTS_FLUSH_INTERVAL = 60  # seconds between flushes to the database
+VIEW_COUNTS_SESSION_TTL = 30 * 60  # repeated views from one session within this window count once; 0 disables
+VIEW_COUNTS_DIRTY_TTL = 24 * 60 * 60
+
+# Unread notification badge (notifications.counters)
+NOTIFICATIONS_UNREAD_CACHE_TTL = 3600
+
+# Radius notification fan-out
+NOTIFICATIONS_PUSH_SENDER = 'notifications.fanout.FCMSender'
+NOTIFICATIONS_FANOUT_CHUNK_SIZE = 500  # notifications per bulk_create / delivery batch
+# True runs the pipeline in the task queue; False sends it to `runworker notifications-fanout`, which needs a shared channel layer
+NOTIFICATIONS_FANOUT_VIA_TASKQUEUE = os.getenv('NOTIFICATIONS_FANOUT_VIA_TASKQUEUE', 'True') == 'True'
+
+# Image embeddings for photo similarity (announcements.embeddings)
+# 'announcements.embeddings.ResNetExtractor' needs torch and torchvision; recompute with
+# `python manage.py compute_image_embeddings --all` after switching
+IMAGE_EMBEDDING_EXTRACTOR = os.getenv('IMAGE_EMBEDDING_EXTRACTOR', 'announcements.embeddings.ColorHistogramExtractor')
+IMAGE_EMBEDDING_BATCH_SIZE = 32  # images per extractor call
+
+# Resized WebP/JPEG copies of uploaded photos (renditions); rebuild with
+# `python manage.py build_renditions --all` after changing widths or quality
+IMAGE_RENDITION_WIDTHS = [320, 640, 1280]
+IMAGE_RENDITION_DEFAULT_WIDTH = 640  # src of <img> when the browser ignores srcset
+IMAGE_RENDITION_SIZES = '(max-width: 576px) 100vw, 320px'  # default sizes attribute of {% picture %}
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_PROCESSES = int(os.getenv('IMAGE_RENDITION_PROCESSES', '2'))  # encoder pool per task worker; 1 encodes in the worker itself
+
+# Lost/found matching (announcements.services.LostPetMatchingService)
+LOST_FOUND_MATCH_RADIUS_KM = 10  # candidates farther than this get no location score and are not considered
+LOST_FOUND_MATCH_WINDOW_DAYS = 30
+LOST_FOUND_MATCH_LIMIT = 20
+LOST_FOUND_MATCH_CACHE_TTL = 3600
+TEXT_INDEX_JOURNAL_TTL = 24 * 60 * 60  # seconds; a process idle for longer rebuilds its description index
+
+# Collaborative recommendations (matcher.collaborative)
+MATCHER_INTERACTION_WEIGHTS = {'like': 1.0, 'dislike': -1.0, 'view': 0.1, 'favorite': 1.0, 'contact': 0.5}
+MATCHER_CF_NEIGHBOURS = 20  # similar animals kept per animal
+MATCHER_CF_UPDATE_INTERVAL = 300  # new interactions are folded in at most this often, seconds
+MATCHER_CF_CACHE_TTL = 3600
+
+# Preference matching (matcher.services.MatchingService)
+MATCHER_CANDIDATE_LIMIT = 1000  # newest unscored animals scored per request
+
+# WebSocket chat (chat.store)
+CHAT_WRITE_BATCH_SIZE = 100  # messages per bulk_create
+CHAT_WRITE_DELAY = 0.02  # seconds a message waits for its batch to fill up
+CHAT_HISTORY_PAGE_SIZE = 50  # history frames without an explicit limit
+CHAT_MEMBERSHIP_CACHE_TTL = 5 * 60  # participant sets are also dropped on every change
+
+# Chat presence (chat.presence)
+PRESENCE_TTL = 90  # seconds without a heartbeat before a user drops offline; clients send one every 30
+PRESENCE_DEBOUNCE = 2  # seconds a status change waits, so reconnects do not flap
+PRESENCE_FLUSH_INTERVAL = 60  # seconds between last_activity writes
+
+# Lost pets search API (catalog.lost_pets)
+LOST_PETS_SEARCH_PAGE_SIZE = 20
+LOST_PETS_SEARCH_MAX_PAGE_SIZE = 100  # larger ?limit= values are clamped
+LOST_PETS_SEARCH_STREAM_LIMIT = 10000  # rows in a format=ndjson response
+LOST_PETS_SEARCH_STREAM_CHUNK_SIZE = 1000  # rows fetched (and images prefetched) per query while streaming
+LOST_PETS_SEARCH_CACHE_TTL = 30  # seconds; any listing change also drops cached pages
+
+# Keyset pagination (pagination.CursorPaginator)
+PAGINATION_COUNT_CAP = 1000  # non-PostgreSQL counts stop here and are shown as "1000+"
+
+# Bulk listing import (imports); `python manage.py import_listings` or POST /api/imports/
+IMPORT_BATCH_SIZE = 500  # rows validated and inserted per transaction and per slug query
+IMPORT_MAX_ERRORS = 1000  # row errors stored on an import job; further ones are only counted
+IMPORT_MAX_FILE_SIZE = 50 * 1024 * 1024
+IMPORT_MAX_IMAGES_PER_ROW = 10
+IMPORT_IMAGE_THREADS = 8  # concurrent photo downloads per task
+IMPORT_IMAGE_TIMEOUT = 10  # seconds per photo download
+IMPORT_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+IMPORT_IMAGE_MAX_REDIRECTS = 3  # every hop is checked against private and reserved addresses
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'pagination.rest.KeysetPagination',
+    'PAGE_SIZE': 20,
+}
+
 # Logging Configuration
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
@@ -13,6 +13,7 @@ urlpatterns = [
     path('announcements/', include('announcements.urls')),
     path('chat/', include('chat.urls')),
     path('pets/', include('pets.urls')),
+    path('api/', include('imports.urls')),
 
 ]
 
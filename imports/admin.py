@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import ImportJob
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'kind', 'status', 'processed_rows', 'created_rows', 'failed_rows', 'created_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('owner__phone', 'error')
+    raw_id_fields = ('owner',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -0,0 +1,119 @@
+"""
+Проверка строк импорта.
+
+Формы модельные, чтобы строка проверялась теми же правилами полей, что и при
+создании объявления вручную, но без полей-связей: категория ищется в дереве
+категорий в памяти (tree), так что проверка строки не делает запросов.
+Логические колонки в CSV - true/false, пустая ячейка считается false.
+"""
+from urllib.parse import urlsplit
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.utils.translation import gettext_lazy as _
+from announcements.models import AnimalAnnouncement, Announcement, AnnouncementCategory, ServiceAnnouncement
+from catalog.models import Category, Product
+from tree import get_tree
+from .images import is_public_address
+
+
+class CategoryField(forms.Field):
+    """Категория по id или слагу"""
+
+    def __init__(self, category_model, **kwargs):
+        self.category_model = category_model
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            return None
+        tree = get_tree(self.category_model)
+        category = tree.get(int(value)) if value.isdigit() else tree.by_slug(value)
+        if category is None:
+            raise ValidationError(_('Категория «%(value)s» не найдена'), code='invalid_choice',
+                                  params={'value': value})
+        return category
+
+
+class ImageURLsField(forms.Field):
+    """Ссылки на фотографии: список в JSONL или строка через пробел в CSV"""
+
+    def to_python(self, value):
+        if not value:
+            return []
+        urls = value.split() if isinstance(value, str) else value
+        if not isinstance(urls, list):
+            raise ValidationError(_('Ожидается список ссылок'), code='invalid')
+        if len(urls) > settings.IMPORT_MAX_IMAGES_PER_ROW:
+            raise ValidationError(_('Не больше %(limit)s фотографий'), code='max_images',
+                                  params={'limit': settings.IMPORT_MAX_IMAGES_PER_ROW})
+        return [str(url) for url in urls]
+
+    def validate(self, value):
+        super().validate(value)
+        validate_url = URLValidator(schemes=['http', 'https'])
+        for url in value:
+            validate_url(url)
+            # Имена хостов разрешаются при скачивании (imports.images.check_url), здесь
+            # без сетевых запросов отсекаются только явные внутренние адреса
+            host = urlsplit(url).hostname or ''
+            if host == 'localhost' or host.endswith('.localhost') or not _public_literal(host):
+                raise ValidationError(_('Ссылка %(url)s ведет во внутреннюю сеть'), code='private_url',
+                                      params={'url': url})
+
+
+def _public_literal(host):
+    """False для IP-адреса не из интернета; имена хостов здесь не проверяются"""
+    try:
+        return is_public_address(host)
+    except ValueError:
+        return True
+
+
+class ProductRowForm(forms.ModelForm):
+    category = CategoryField(Category)
+    images = ImageURLsField(required=False)
+
+    class Meta:
+        model = Product
+        fields = ['title', 'description', 'price', 'condition', 'location', 'breed', 'age', 'size', 'gender']
+
+
+class AnnouncementRowForm(forms.ModelForm):
+    category = CategoryField(AnnouncementCategory)
+    images = ImageURLsField(required=False)
+
+    # Типы, для которых есть форма подробностей
+    TYPES = (Announcement.TYPE_ANIMAL, Announcement.TYPE_SERVICE)
+
+    class Meta:
+        model = Announcement
+        fields = ['title', 'description', 'price', 'type', 'address', 'latitude', 'longitude']
+
+    def clean_type(self):
+        value = self.cleaned_data['type']
+        if value not in self.TYPES:
+            raise ValidationError(_('Импорт поддерживает только объявления о животных и услугах'),
+                                  code='unsupported_type')
+        return value
+
+
+class AnimalRowForm(forms.ModelForm):
+    class Meta:
+        model = AnimalAnnouncement
+        fields = ['species', 'breed', 'age', 'gender', 'size', 'color',
+                  'pedigree', 'vaccinated', 'passport', 'microchipped']
+
+
+class ServiceRowForm(forms.ModelForm):
+    class Meta:
+        model = ServiceAnnouncement
+        fields = ['service_type', 'experience', 'certificates', 'schedule']
+
+
+DETAIL_FORMS = {
+    Announcement.TYPE_ANIMAL: AnimalRowForm,
+    Announcement.TYPE_SERVICE: ServiceRowForm,
+}
@@ -0,0 +1,130 @@
+"""
+Фотографии импортированных объявлений.
+
+Ссылки скачиваются пулом потоков (IMPORT_IMAGE_THREADS): задача ждет сеть, а не
+процессор. Каждый файл проверяется Pillow и сразу пишется в хранилище, затем
+записи фотографий создаются одной пачкой, а копии разных ширин строит пул
+процессов renditions. Недоступные и битые ссылки пропускаются с предупреждением
+в логе: повтор задачи скачал бы заново и удачные.
+
+Ссылки приходят из файла пользователя, поэтому перед каждым запросом, в том числе
+после каждого перенаправления, имя хоста разрешается, и адреса локальной сети,
+loopback, link-local и зарезервированные диапазоны отклоняются: иначе импорт
+позволял бы обращаться к внутренним сервисам от имени сервера.
+"""
+import io
+import ipaddress
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+import requests
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+# формат Pillow -> расширение файла
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'GIF': 'gif',
+}
+
+
+class ImageDownloadError(Exception):
+    pass
+
+
+def is_public_address(address):
+    """Адрес из интернета, а не из локальной сети, loopback или служебных диапазонов"""
+    address = ipaddress.ip_address(address)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not (address.is_multicast or address.is_reserved or address.is_link_local)
+
+
+def check_url(url):
+    """Проверяет схему и все адреса хоста ссылки; ImageDownloadError, если обращаться туда нельзя"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ImageDownloadError(f'unsupported url {url}')
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ImageDownloadError(f'cannot resolve {parts.hostname}: {e}') from e
+    for *_, sockaddr in addresses:
+        if not is_public_address(sockaddr[0].split('%')[0]):
+            raise ImageDownloadError(f'{parts.hostname} resolves to a non-public address {sockaddr[0]}')
+
+
+def fetch(url):
+    """Содержимое и расширение фотографии по ссылке"""
+    limit = settings.IMPORT_IMAGE_MAX_BYTES
+    # Перенаправления обрабатываются вручную, чтобы проверить адрес каждого шага
+    for _ in range(settings.IMPORT_IMAGE_MAX_REDIRECTS + 1):
+        check_url(url)
+        response = requests.get(url, timeout=settings.IMPORT_IMAGE_TIMEOUT, stream=True, allow_redirects=False)
+        if not response.is_redirect:
+            break
+        url = urljoin(url, response.headers['location'])
+        response.close()
+    else:
+        raise ImageDownloadError(f'more than {settings.IMPORT_IMAGE_MAX_REDIRECTS} redirects')
+
+    with response:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > limit:
+                raise ImageDownloadError(f'larger than {limit} bytes')
+    with Image.open(io.BytesIO(data)) as image:
+        image.verify()
+        extension = EXTENSIONS.get(image.format)
+    if extension is None:
+        raise ImageDownloadError(f'unsupported format {image.format}')
+    return bytes(data), extension
+
+
+def _download(field, pk, position, url):
+    """Имя сохраненного файла или None"""
+    try:
+        data, extension = fetch(url)
+    except (requests.RequestException, OSError, ImageDownloadError, Image.DecompressionBombError) as e:
+        logger.warning('Cannot import image %s for %s: %s', url, pk, e)
+        return None
+    name = field.generate_filename(None, f'import-{pk}-{position}.{extension}')
+    return field.storage.save(name, ContentFile(data))
+
+
+def attach_images(importer, items):
+    """
+    Скачивает и сохраняет фотографии; items - [id объекта, [ссылки]], первая
+    скачанная фотография объекта становится главной. Возвращает созданные записи.
+    """
+    model = importer.model
+    image_model = importer.image_model
+    field = image_model._meta.get_field('image')
+    # Объект могли удалить, пока задача ждала в очереди
+    existing = set(model._default_manager.filter(pk__in=[pk for pk, _ in items]).values_list('pk', flat=True))
+    jobs = [(pk, position, url) for pk, urls in items if pk in existing for position, url in enumerate(urls)]
+
+    with ThreadPoolExecutor(settings.IMPORT_IMAGE_THREADS) as pool:
+        names = list(pool.map(lambda job: _download(field, *job), jobs))
+
+    images = []
+    with_main = set()
+    for (pk, position, _), name in zip(jobs, names):
+        if name is None:
+            continue
+        images.append(importer.make_image(pk, name, pk not in with_main, position))
+        with_main.add(pk)
+    if not images:
+        return []
+
+    image_model._default_manager.bulk_create(images)
+    importer.images_created(images)
+    return images
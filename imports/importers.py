@@ -0,0 +1,145 @@
+"""
+Что создается из строк импорта.
+
+Импортер проверяет строку формой (clean), создает объекты пачкой (create) и
+знает, куда складывать скачанные фотографии (make_image). bulk_create не шлет
+сигналов, поэтому то, что для одиночных объектов делают обработчики сигналов -
+поисковый индекс, сброс кэша поиска потерянных питомцев, копии и эмбеддинги
+фотографий, - импортер делает сам, один раз на пачку.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from announcements.geo import encode_geohash
+from announcements.models import Announcement, AnnouncementImage
+from announcements.tasks import compute_image_embeddings
+from catalog import lost_pets
+from catalog.models import Product, ProductImage
+from catalog.slugs import unique_slugs
+from renditions import build
+from search import get_backend
+from search.base import get_index
+from .forms import AnnouncementRowForm, DETAIL_FORMS, ProductRowForm
+from .models import ImportJob
+
+
+class Row:
+    """Проверенная строка: несохраненный объект, его подробности и ссылки на фото"""
+    __slots__ = ('obj', 'details', 'images')
+
+    def __init__(self, obj, images, details=None):
+        self.obj = obj
+        self.images = images
+        self.details = details
+
+
+class Importer:
+    kind = None
+    model = None
+    form_class = None
+    image_model = None
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def clean(self, data):
+        """Row из словаря колонок; ValidationError с ошибками по полям"""
+        form = self.form_class(data)
+        if not form.is_valid():
+            raise ValidationError(form.errors.as_data())
+        obj = form.instance
+        obj.category = form.cleaned_data['category']
+        return Row(obj, form.cleaned_data['images'])
+
+    def create(self, rows):
+        """Сохраняет объекты строк пачкой; вызывается внутри транзакции"""
+        raise NotImplementedError
+
+    def make_image(self, pk, name, is_main, position):
+        """Несохраненная фотография объекта pk с файлом name в хранилище"""
+        raise NotImplementedError
+
+    def images_created(self, images):
+        build(images)
+
+    def _index(self, objs):
+        index = get_index(self.model)
+        get_backend().update(index, index.get_queryset().filter(pk__in=[obj.pk for obj in objs]))
+
+
+class ProductImporter(Importer):
+    kind = ImportJob.KIND_PRODUCTS
+    model = Product
+    form_class = ProductRowForm
+    image_model = ProductImage
+
+    def clean(self, data):
+        row = super().clean(data)
+        row.obj.seller = self.owner
+        return row
+
+    def create(self, rows):
+        products = [row.obj for row in rows]
+        for product, slug in zip(products, unique_slugs(Product, [product.title for product in products])):
+            product.slug = slug
+        Product.objects.bulk_create(products)
+        self._index(products)
+        lost_pets.invalidate()
+        transaction.on_commit(lost_pets.invalidate)
+        return products
+
+    def make_image(self, pk, name, is_main, position):
+        return ProductImage(product_id=pk, image=name, is_main=is_main, order=position)
+
+    def images_created(self, images):
+        super().images_created(images)
+        lost_pets.invalidate()
+
+
+class AnnouncementImporter(Importer):
+    kind = ImportJob.KIND_ANNOUNCEMENTS
+    model = Announcement
+    form_class = AnnouncementRowForm
+    image_model = AnnouncementImage
+
+    def clean(self, data):
+        # Ошибки основной формы и формы подробностей возвращаются вместе
+        form = self.form_class(data)
+        errors = {} if form.is_valid() else form.errors.as_data()
+        details = None
+        if form.cleaned_data.get('type') in DETAIL_FORMS:
+            details = DETAIL_FORMS[form.cleaned_data['type']](data)
+            if not details.is_valid():
+                errors = {**errors, **details.errors.as_data()}
+        if errors:
+            raise ValidationError(errors)
+
+        announcement = form.instance
+        announcement.category = form.cleaned_data['category']
+        announcement.author = self.owner
+        return Row(announcement, form.cleaned_data['images'], details.instance)
+
+    def create(self, rows):
+        announcements = [row.obj for row in rows]
+        for announcement in announcements:
+            # Announcement.save не вызывается
+            announcement.geohash = encode_geohash(announcement.latitude, announcement.longitude)
+        Announcement.objects.bulk_create(announcements)
+
+        details_by_model = {}
+        for row in rows:
+            row.details.announcement = row.obj
+            details_by_model.setdefault(type(row.details), []).append(row.details)
+        for model, details in details_by_model.items():
+            model.objects.bulk_create(details)
+        self._index(announcements)
+        return announcements
+
+    def make_image(self, pk, name, is_main, position):
+        return AnnouncementImage(announcement_id=pk, image=name, is_main=is_main)
+
+    def images_created(self, images):
+        super().images_created(images)
+        compute_image_embeddings.delay([image.pk for image in images])
+
+
+IMPORTERS = {importer.kind: importer for importer in (ProductImporter, AnnouncementImporter)}
@@ -0,0 +1,59 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from imports.importers import IMPORTERS
+from imports.pipeline import import_rows
+from imports.readers import FORMATS, count_rows, detect_format, read_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Bulk-imports catalog products or announcements of one owner from a CSV/JSONL file; '
+            'photos by URL are downloaded by the task worker')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (header row) or JSON Lines file')
+        parser.add_argument('--kind', choices=sorted(IMPORTERS), required=True)
+        parser.add_argument('--owner', required=True, help='Phone of the seller/author of all rows')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction, IMPORT_BATCH_SIZE by default')
+        parser.add_argument('--show-errors', type=int, default=20, help='Invalid rows to print')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot detect the format from the extension, pass --format')
+        try:
+            owner = User.objects.get(**{User.USERNAME_FIELD: options['owner']})
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["owner"]} does not exist')
+        importer = IMPORTERS[options['kind']](owner)
+
+        try:
+            f = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(e)
+        with f:
+            total = count_rows(f, fmt)
+            f.seek(0)
+            self.stdout.write(f'{total} rows')
+
+            started = time.perf_counter()
+
+            def progress(stats):
+                self.stdout.write(
+                    f'{stats.processed}/{total} rows | {stats.created} created | {stats.failed} invalid | '
+                    f'{stats.processed / (time.perf_counter() - started):.0f} rows/s'
+                )
+
+            stats = import_rows(importer, read_rows(f, fmt), options['batch_size'], progress)
+
+        seconds = time.perf_counter() - started
+        for error in stats.errors[:options['show_errors']]:
+            messages = '; '.join(f'{field}: {" ".join(texts)}' for field, texts in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f'line {error["line"]}: {messages}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {stats.created} of {stats.processed} rows in {seconds:.2f}s, '
+            f'{stats.failed} invalid, {stats.images} photos queued for download'
+        ))
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ImportJob(models.Model):
+    """Загрузка файла с объявлениями и ее прогресс"""
+    KIND_PRODUCTS = 'products'
+    KIND_ANNOUNCEMENTS = 'announcements'
+
+    KIND_CHOICES = [
+        (KIND_PRODUCTS, _('Товары и животные каталога')),
+        (KIND_ANNOUNCEMENTS, _('Объявления')),
+    ]
+
+    FORMAT_CSV = 'csv'
+    FORMAT_JSONL = 'jsonl'
+
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, 'CSV'),
+        (FORMAT_JSONL, 'JSON Lines'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('В очереди')),
+        (STATUS_RUNNING, _('Выполняется')),
+        (STATUS_DONE, _('Завершен')),
+        (STATUS_FAILED, _('Ошибка')),
+    ]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name=_('Владелец'),
+                              on_delete=models.CASCADE, related_name='import_jobs')
+    kind = models.CharField(_('Что загружается'), max_length=20, choices=KIND_CHOICES)
+    format = models.CharField(_('Формат'), max_length=10, choices=FORMAT_CHOICES)
+    file = models.FileField(_('Файл'), upload_to='imports/')
+    status = models.CharField(_('Статус'), max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    # Прогресс обновляется после каждой пачки строк
+    total_rows = models.PositiveIntegerField(_('Строк в файле'), null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(_('Обработано строк'), default=0)
+    created_rows = models.PositiveIntegerField(_('Создано объявлений'), default=0)
+    failed_rows = models.PositiveIntegerField(_('Строк с ошибками'), default=0)
+    # [{'line': номер строки, 'errors': {поле: [сообщения]}}], не больше IMPORT_MAX_ERRORS
+    errors = models.JSONField(_('Ошибки в строках'), default=list, blank=True)
+    error = models.TextField(_('Ошибка загрузки'), blank=True)
+
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    started_at = models.DateTimeField(_('Начат'), null=True, blank=True)
+    finished_at = models.DateTimeField(_('Завершен'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Импорт объявлений')
+        verbose_name_plural = _('Импорт объявлений')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.owner} - {self.get_kind_display()} ({self.get_status_display()})'
+
+    @property
+    def progress(self):
+        """Процент обработанных строк"""
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, self.processed_rows * 100 // self.total_rows)
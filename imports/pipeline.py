@@ -0,0 +1,117 @@
+"""
+Массовая загрузка объявлений питомников и приютов.
+
+Строки файла идут пачками по IMPORT_BATCH_SIZE: каждая строка проверяется формой
+без запросов, слаги всей пачки подбираются одним запросом, объекты и их
+подробности создаются bulk_create в одной транзакции на пачку. Ошибочные строки
+пропускаются и попадают в отчет с номером строки файла. Фотографии по ссылкам
+скачиваются потом отдельной задачей (imports.images), чтобы медленные сайты не
+держали транзакции.
+"""
+import logging
+from dataclasses import dataclass, field
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from notifications.models import Notification
+from .importers import IMPORTERS
+from .models import ImportJob
+from .readers import count_rows, read_rows
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportStats:
+    processed: int = 0
+    created: int = 0
+    failed: int = 0
+    images: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, messages, max_errors):
+        self.failed += 1
+        if len(self.errors) < max_errors:
+            self.errors.append({'line': line, 'errors': messages})
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def import_rows(importer, rows, batch_size=None, progress=None):
+    """
+    Создает объекты из rows - пар (номер строки, словарь колонок), см. readers.
+    progress(stats) вызывается после каждой пачки. Возвращает ImportStats.
+    """
+    # tasks импортирует этот модуль
+    from .tasks import download_images
+
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    stats = ImportStats()
+    for batch in _batches(rows, batch_size):
+        cleaned = []
+        for line, data in batch:
+            if data is None:
+                stats.add_error(line, {'__all__': [_('Строка не является JSON-объектом')]},
+                                settings.IMPORT_MAX_ERRORS)
+                continue
+            try:
+                cleaned.append(importer.clean(data))
+            except ValidationError as e:
+                stats.add_error(line, e.message_dict, settings.IMPORT_MAX_ERRORS)
+
+        if cleaned:
+            with transaction.atomic():
+                objs = importer.create(cleaned)
+                images = [[obj.pk, row.images] for obj, row in zip(objs, cleaned) if row.images]
+                if images:
+                    download_images.delay(importer.kind, images)
+            stats.created += len(objs)
+            stats.images += sum(len(row.images) for row in cleaned)
+        stats.processed += len(batch)
+        if progress:
+            progress(stats)
+    return stats
+
+
+def run_job(job):
+    """Выполняет ImportJob, сохраняя прогресс после каждой пачки"""
+    jobs = ImportJob.objects.filter(pk=job.pk)
+    importer = IMPORTERS[job.kind](job.owner)
+
+    def progress(stats):
+        jobs.update(
+            processed_rows=stats.processed, created_rows=stats.created,
+            failed_rows=stats.failed, errors=stats.errors,
+        )
+
+    job.status = ImportJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    try:
+        with job.file.open('rb') as f:
+            job.total_rows = count_rows(f, job.format)
+            jobs.update(status=job.status, started_at=job.started_at, total_rows=job.total_rows)
+            f.seek(0)
+            stats = import_rows(importer, read_rows(f, job.format), progress=progress)
+    except Exception as e:
+        # Уже созданные пачки остаются; повтор задачи создал бы их второй раз
+        logger.exception('Import %s failed', job.pk)
+        jobs.update(status=ImportJob.STATUS_FAILED, error=str(e) or type(e).__name__, finished_at=timezone.now())
+        raise
+
+    jobs.update(status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+    Notification.objects.create(
+        user=job.owner,
+        notification_type='system',
+        title=_('Импорт завершен'),
+        message=_('Создано объявлений: {created}, строк с ошибками: {failed}.').format(
+            created=stats.created, failed=stats.failed
+        ),
+    )
+    return stats
@@ -0,0 +1,53 @@
+"""
+Чтение строк файла импорта.
+
+CSV - первая строка с названиями колонок; JSON Lines - по объекту на строку.
+Значения приходят как есть: в CSV это строки, в JSONL - любые JSON-типы;
+проверяют их формы строк (imports.forms).
+"""
+import csv
+import io
+import json
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(name):
+    """Формат по расширению файла; None, если не распознан"""
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    return None
+
+
+def read_rows(file, fmt):
+    """
+    (номер строки файла, словарь колонок) для каждой строки данных; file открыт в
+    бинарном режиме. Вместо словаря None, если строку JSONL не удалось разобрать.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                # Лишние ячейки без заголовка DictReader складывает под ключ None
+                row.pop(None, None)
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(text, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield number, row if isinstance(row, dict) else None
+    finally:
+        # Файл закрывает вызывающий код
+        text.detach()
+
+
+def count_rows(file, fmt):
+    return sum(1 for _ in read_rows(file, fmt))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from .models import ImportJob
+from .readers import detect_format
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    format = serializers.ChoiceField(choices=ImportJob.FORMAT_CHOICES, required=False)
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'format', 'file', 'status', 'progress',
+            'total_rows', 'processed_rows', 'created_rows', 'failed_rows', 'errors', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'total_rows', 'processed_rows', 'created_rows', 'failed_rows', 'errors', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        extra_kwargs = {'file': {'write_only': True}}
+
+    def validate_file(self, value):
+        if value.size > settings.IMPORT_MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                _('Файл больше %(limit)s') % {'limit': filesizeformat(settings.IMPORT_MAX_FILE_SIZE)}
+            )
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('format'):
+            attrs['format'] = detect_format(attrs['file'].name)
+            if attrs['format'] is None:
+                raise serializers.ValidationError({'format': _('Укажите формат: csv или jsonl')})
+        return attrs
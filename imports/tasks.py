@@ -0,0 +1,18 @@
+from taskqueue import task
+from .images import attach_images
+from .importers import IMPORTERS
+from .models import ImportJob
+from .pipeline import run_job
+
+
+# Повтор создал бы уже загруженные пачки второй раз
+@task(max_retries=0)
+def run_import(job_id):
+    """Загрузка файла ImportJob"""
+    run_job(ImportJob.objects.select_related('owner').get(pk=job_id))
+
+
+@task(max_retries=0)
+def download_images(kind, items):
+    """Фотографии импортированных объявлений; items - [id объекта, [ссылки]]"""
+    attach_images(IMPORTERS[kind](owner=None), items)
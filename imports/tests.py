@@ -0,0 +1,265 @@
+import io
+import json
+import shutil
+import tempfile
+import socket
+from unittest.mock import MagicMock, patch
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from taskqueue.base import get_backend
+from taskqueue.worker import Worker
+from announcements.models import AnimalAnnouncement, Announcement, AnnouncementCategory, ServiceAnnouncement
+from catalog.models import Category, Product, ProductImage
+from catalog.slugs import unique_slugs
+from imports.forms import ImageURLsField
+from imports.images import ImageDownloadError, fetch
+from imports.importers import AnnouncementImporter, ProductImporter
+from imports.models import ImportJob
+from imports.pipeline import import_rows
+from imports.readers import read_rows
+from search import search_queryset
+
+User = get_user_model()
+
+PRODUCT_COLUMNS = ['title', 'description', 'price', 'condition', 'category', 'location', 'breed', 'images']
+
+
+def _csv(rows, columns=PRODUCT_COLUMNS):
+    lines = [','.join(columns)] + [','.join(str(row.get(column, '')) for column in columns) for row in rows]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _jsonl(rows):
+    return ''.join((row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)) + '\n' for row in rows).encode()
+
+
+def _product(number, **kwargs):
+    return {
+        'title': 'Щенок лабрадора', 'description': f'Щенок номер {number}', 'price': 15000,
+        'condition': 'new', 'category': 'dogs', 'location': 'Москва', 'breed': 'Лабрадор', **kwargs,
+    }
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), (10, 120, 200)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(TASKS_BACKEND='taskqueue.backends.InMemoryBackend')
+class ImportTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        get_backend().jobs.clear()
+        self.user = User.objects.create_user(phone='+79990000241', password='testpass123')
+        self.category = Category.objects.create(name='Собаки', slug='dogs')
+
+    def _temp_media(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _import(self, importer_class, data, fmt, batch_size=None):
+        return import_rows(importer_class(self.user), read_rows(io.BytesIO(data), fmt), batch_size)
+
+
+class UniqueSlugsTest(ImportTestCase):
+    def test_one_query_for_batch(self):
+        Product.objects.create(seller=self.user, category=self.category, title='Щенок лабрадора',
+                               description='Описание', condition='new')
+        with self.assertNumQueries(1):
+            slugs = unique_slugs(Product, ['Щенок лабрадора'] * 3 + ['Котенок', ''])
+        self.assertEqual(slugs, [
+            'shchenok-labradora-1', 'shchenok-labradora-2', 'shchenok-labradora-3', 'kotenok', 'product',
+        ])
+
+    def test_single_save_uses_it(self):
+        slugs = [
+            Product.objects.create(seller=self.user, category=self.category, title='Щенок',
+                                   description='Описание', condition='new').slug
+            for _ in range(3)
+        ]
+        self.assertEqual(slugs, ['shchenok', 'shchenok-1', 'shchenok-2'])
+
+
+class ImportRowsTest(ImportTestCase):
+    def test_products_from_csv(self):
+        data = _csv([_product(number) for number in range(40)])
+        with CaptureQueriesContext(connection) as captured:
+            stats = self._import(ProductImporter, data, 'csv')
+        self.assertEqual((stats.processed, stats.created, stats.failed), (40, 40, 0))
+        # Запросы на пачку, а не на строку
+        self.assertLess(len(captured), 15)
+
+        products = Product.objects.filter(seller=self.user)
+        self.assertEqual(products.count(), 40)
+        self.assertEqual(len(set(products.values_list('slug', flat=True))), 40)
+        self.assertTrue(products.filter(slug='shchenok-labradora-39').exists())
+        self.assertEqual(search_queryset(Product.objects.all(), 'лабрадора').count(), 40)
+
+    def test_invalid_rows_are_reported(self):
+        rows = [_product(0), _product(1, category='birds'), _product(2, condition='broken'), _product(3)]
+        stats = self._import(ProductImporter, _csv(rows), 'csv', batch_size=2)
+        self.assertEqual((stats.processed, stats.created, stats.failed), (4, 2, 2))
+        self.assertEqual([error['line'] for error in stats.errors], [3, 4])
+        self.assertIn('category', stats.errors[0]['errors'])
+        self.assertIn('condition', stats.errors[1]['errors'])
+
+    def test_announcements_with_details_from_jsonl(self):
+        category = AnnouncementCategory.objects.create(name='Собаки', slug='dogs')
+        animal = {
+            'title': 'Щенок из приюта', 'description': 'Ищет дом', 'type': 'animal', 'category': category.pk,
+            'species': 'Собака', 'gender': 'male', 'size': 'medium', 'color': 'рыжий', 'vaccinated': True,
+            'latitude': '55.751244', 'longitude': '37.618423',
+        }
+        service = {
+            'title': 'Передержка', 'description': 'Частный дом', 'type': 'service', 'category': 'dogs',
+            'service_type': 'boarding', 'experience': 5, 'schedule': 'Ежедневно',
+        }
+        stats = self._import(AnnouncementImporter, _jsonl([
+            animal, service, 'not json', {**animal, 'type': 'mating'}, {**animal, 'gender': ''},
+        ]), 'jsonl')
+        self.assertEqual((stats.created, stats.failed), (2, 3))
+        self.assertEqual([error['line'] for error in stats.errors], [3, 4, 5])
+        self.assertIn('gender', stats.errors[2]['errors'])
+
+        animal_details = AnimalAnnouncement.objects.get(announcement__title='Щенок из приюта')
+        self.assertTrue(animal_details.vaccinated)
+        self.assertTrue(animal_details.announcement.geohash)
+        self.assertEqual(animal_details.announcement.author, self.user)
+        self.assertEqual(ServiceAnnouncement.objects.get().experience, 5)
+        self.assertEqual(Announcement.objects.get(title='Передержка').status, Announcement.STATUS_MODERATION)
+
+
+@override_settings(IMAGE_RENDITION_WIDTHS=[320], IMAGE_RENDITION_PROCESSES=1)
+class ImportImagesTest(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self._temp_media()
+
+    def test_photos_are_downloaded_by_task(self):
+        rows = [_product(0, images='https://example.com/1.jpg https://example.com/broken.jpg https://example.com/2.jpg')]
+
+        def fetch(url):
+            if 'broken' in url:
+                raise OSError('timed out')
+            return _png(), 'png'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = self._import(ProductImporter, _csv(rows), 'csv')
+        self.assertEqual(stats.images, 3)
+        self.assertFalse(ProductImage.objects.exists())
+
+        with patch('imports.images.fetch', side_effect=fetch):
+            Worker().drain()
+        images = list(ProductImage.objects.order_by('order'))
+        self.assertEqual([(image.order, image.is_main) for image in images], [(0, True), (2, False)])
+        self.assertEqual(images[0].renditions, [320])
+
+
+def _resolve(addresses):
+    """Подмена socket.getaddrinfo: имя хоста -> адрес"""
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET6 if ':' in addresses[host] else socket.AF_INET, socket.SOCK_STREAM,
+                 socket.IPPROTO_TCP, '', (addresses[host], 0))]
+    return patch('imports.images.socket.getaddrinfo', side_effect=getaddrinfo)
+
+
+def _response(status=200, location=None, content=b''):
+    response = MagicMock(status_code=status, is_redirect=location is not None, headers={'location': location})
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [content]
+    return response
+
+
+class FetchTest(SimpleTestCase):
+    ADDRESSES = {
+        'cdn.example.com': '93.184.216.34',
+        'intranet.example.com': '10.0.0.5',
+        'metadata.example.com': '169.254.169.254',
+        'mapped.example.com': '::ffff:127.0.0.1',
+    }
+
+    def test_public_host_with_redirect(self):
+        responses = [_response(302, '/photos/1.png'), _response(content=_png())]
+        with _resolve(self.ADDRESSES), patch('imports.images.requests.get', side_effect=responses) as get:
+            data, extension = fetch('https://cdn.example.com/1')
+        self.assertEqual(extension, 'png')
+        self.assertEqual(get.call_args.args[0], 'https://cdn.example.com/photos/1.png')
+        self.assertFalse(get.call_args.kwargs['allow_redirects'])
+
+    def test_private_addresses_are_rejected(self):
+        with _resolve(self.ADDRESSES), patch('imports.images.requests.get') as get:
+            for host in ('intranet.example.com', 'metadata.example.com', 'mapped.example.com'):
+                with self.assertRaises(ImageDownloadError):
+                    fetch(f'http://{host}/1.png')
+        get.assert_not_called()
+
+    def test_redirect_to_private_address_is_rejected(self):
+        responses = [_response(301, 'http://metadata.example.com/latest/meta-data/')]
+        with _resolve(self.ADDRESSES), patch('imports.images.requests.get', side_effect=responses) as get:
+            with self.assertRaises(ImageDownloadError):
+                fetch('https://cdn.example.com/1.png')
+        self.assertEqual(get.call_count, 1)
+
+    @override_settings(IMPORT_IMAGE_MAX_REDIRECTS=2)
+    def test_redirect_limit(self):
+        responses = [_response(302, f'/{hop}') for hop in range(3)]
+        with _resolve(self.ADDRESSES), patch('imports.images.requests.get', side_effect=responses):
+            with self.assertRaises(ImageDownloadError):
+                fetch('https://cdn.example.com/0')
+
+    def test_form_rejects_internal_literals(self):
+        field = ImageURLsField()
+        self.assertEqual(field.clean('https://cdn.example.com/1.png'), ['https://cdn.example.com/1.png'])
+        for url in ('http://127.0.0.1/1.png', 'http://[::1]/1.png', 'http://169.254.169.254/latest',
+                    'http://192.168.0.10/1.png', 'http://localhost:8000/1.png'):
+            with self.assertRaises(ValidationError):
+                field.clean(url)
+
+
+class ImportApiTest(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self._temp_media()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_upload_and_progress(self):
+        upload = SimpleUploadedFile('shelter.csv', _csv([_product(0), _product(1, category='birds')]))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('imports:import-list'), {'kind': 'products', 'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['format'], 'csv')
+        self.assertEqual(response.data['status'], ImportJob.STATUS_PENDING)
+
+        Worker().drain()
+        response = self.client.get(reverse('imports:import-detail', args=[response.data['id']]))
+        self.assertEqual(response.data['status'], ImportJob.STATUS_DONE)
+        self.assertEqual(response.data['progress'], 100)
+        self.assertEqual(
+            (response.data['total_rows'], response.data['created_rows'], response.data['failed_rows']), (2, 1, 1)
+        )
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertTrue(self.user.notifications.filter(notification_type='system').exists())
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(phone='+79990000242', password='testpass123'))
+        self.assertEqual(other.get(reverse('imports:import-detail', args=[response.data['id']])).status_code, 404)
+
+    def test_unknown_format(self):
+        upload = SimpleUploadedFile('shelter.xlsx', b'data')
+        response = self.client.post(reverse('imports:import-list'), {'kind': 'products', 'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.data)
@@ -0,0 +1,12 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from .views import ImportJobViewSet
+
+app_name = 'imports'
+
+router = DefaultRouter()
+router.register(r'imports', ImportJobViewSet, basename='import')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
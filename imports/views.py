@@ -0,0 +1,22 @@
+from rest_framework import mixins, viewsets
+from rest_framework.permissions import IsAuthenticated
+from .models import ImportJob
+from .serializers import ImportJobSerializer
+from .tasks import run_import
+
+
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                       mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    API массовой загрузки объявлений.
+    POST - файл CSV или JSONL, загрузка идет в фоне; GET по id - ее прогресс и ошибки в строках.
+    """
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(owner=self.request.user).order_by('-created_at', '-id')
+
+    def perform_create(self, serializer):
+        job = serializer.save(owner=self.request.user)
+        run_import.delay(job.pk)
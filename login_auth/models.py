@@ -59,6 +59,8 @@ class User(AbstractUser):
     
     # Дополнительные поля
     rating = models.DecimalField(_('рейтинг'), max_digits=3, decimal_places=2, default=0)
+    # Пишется пачками из chat.presence, а не на каждое подключение
+    last_activity = models.DateTimeField(_('последняя активность'), null=True, blank=True)
     
     # Настройки Django
     username = None
@@ -0,0 +1,13 @@
+from taskqueue import task
+from .services import SMSService
+
+
+class SMSDeliveryError(Exception):
+    pass
+
+
+@task(max_retries=5)
+def send_sms(phone, message):
+    """Отправка SMS с повторами при ошибке провайдера"""
+    if not SMSService().send_sms(phone, message):
+        raise SMSDeliveryError(f'SMS to {phone} was not accepted by the provider')
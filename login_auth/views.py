@@ -13,6 +13,7 @@ from django.utils import timezone
 from datetime import timedelta
 import random
 from .services import SMSService
+from .tasks import send_sms
 import logging
 from django.core.exceptions import ValidationError
 from django.http import JsonResponse
@@ -160,8 +161,7 @@ def signup(request):
             request.session['phone'] = phone
             
             # Отправляем код подтверждения
-            sms_service = SMSService()
-            sms_service.send_sms(phone, f'Ваш код подтверждения: {verification.code}')
+            send_sms.delay(phone, f'Ваш код подтверждения: {verification.code}')
             
             messages.success(request, 'Код подтверждения отправлен на ваш телефон')
             return redirect('login_auth:sms_validation')
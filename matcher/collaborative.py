@@ -0,0 +1,295 @@
+"""
+Коллаборативная фильтрация item-item для RecommendationService.
+
+Взаимодействия UserInteraction сводятся в разреженную матрицу пользователь x животное
+(веса типов — настройка MATCHER_INTERACTION_WEIGHTS: лайк +1, дизлайк -1, просмотр
+немного). Косинусная близость животных считается произведением разреженных столбцов
+на строки матрицы, блоками, без цикла по парам; для каждого животного сохраняются
+MATCHER_CF_NEIGHBOURS лучших соседей в ItemNeighbour.
+
+Полная пересборка — rebuild() (команда train_recommendations). Новые взаимодействия
+после последнего пересчета учитывает update(): пересчитываются только животные, с
+которыми взаимодействовали их авторы. Задача обновления ставится в очередь сама, не
+чаще раза в MATCHER_CF_UPDATE_INTERVAL. Рекомендации пользователю — сумма соседей его
+животных с весами его оценок, кешируются на MATCHER_CF_CACHE_TTL.
+
+Состояние пересчета общее для всех процессов и хранится в базе, в строке
+RecomputationLock: она не дает пересчетам пересекаться и хранит водяной знак и версию
+соседей, по которой сбрасывается кеш рекомендаций. Оба поля меняются в одной
+транзакции с соседями.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from .models import ItemNeighbour, RecomputationLock, UserInteraction
+
+LOCK_NAME = 'matcher:cf'
+# Блокировка упавшего пересчета снимается по истечении этого времени
+LOCK_TIMEOUT = timedelta(hours=1)
+SCHEDULED_KEY = 'matcher:cf:scheduled'
+
+# Ограничение плотного блока близостей: строк блока x число животных
+BLOCK_CELLS = 4_000_000
+# Сколько рекомендаций хранить в кеше пользователя
+CACHED_RECOMMENDATIONS = 100
+
+
+def _ranges(starts, lengths):
+    """Склеенные диапазоны [start, start + length) для каждой пары"""
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+
+
+def _lookup(ids, values):
+    """Позиции значений в отсортированном массиве ids; отсутствующие пропускаются"""
+    values = np.asarray(sorted(values), dtype=np.int64)
+    positions = np.searchsorted(ids, values)
+    found = positions < len(ids)
+    positions, values = positions[found], values[found]
+    return positions[ids[positions] == values]
+
+
+def _ratings(kinds):
+    weights = settings.MATCHER_INTERACTION_WEIGHTS
+    return np.fromiter((weights.get(kind, 0.0) for kind in kinds), dtype=np.float64, count=len(kinds))
+
+
+class InteractionMatrix:
+    """Разреженная матрица оценок: строки по пользователям (CSR) и по животным (CSC)"""
+
+    def __init__(self, user_ids, item_ids, users, items, values):
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+
+        order = np.lexsort((items, users))
+        self.user_indptr = np.searchsorted(users[order], np.arange(len(user_ids) + 1))
+        self.user_items = items[order]
+        self.user_values = values[order]
+
+        order = np.lexsort((users, items))
+        self.item_indptr = np.searchsorted(items[order], np.arange(len(item_ids) + 1))
+        self.item_users = users[order]
+        self.item_values = values[order]
+
+        self.norms = np.sqrt(np.bincount(items, weights=values ** 2, minlength=len(item_ids)))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Матрица из троек (user_id, animal_id, тип взаимодействия)"""
+        if not rows:
+            empty = np.array([], dtype=np.int64)
+            return cls(empty, empty, empty, empty, np.array([], dtype=np.float64))
+
+        user_column, item_column, kinds = zip(*rows)
+        user_ids, users = np.unique(np.asarray(user_column, dtype=np.int64), return_inverse=True)
+        item_ids, items = np.unique(np.asarray(item_column, dtype=np.int64), return_inverse=True)
+
+        # Повторные взаимодействия с одним животным складываются, оценка ограничена [-1, 1]
+        cells, cell_index = np.unique(users * len(item_ids) + items, return_inverse=True)
+        values = np.clip(np.bincount(cell_index, weights=_ratings(kinds)), -1, 1)
+        nonzero = values != 0
+        cells, values = cells[nonzero], values[nonzero]
+        return cls(user_ids, item_ids, cells // len(item_ids), cells % len(item_ids), values)
+
+    @classmethod
+    def load(cls, last_id=None):
+        queryset = UserInteraction.objects.all()
+        if last_id is not None:
+            queryset = queryset.filter(pk__lte=last_id)
+        return cls.from_rows(list(queryset.values_list('user_id', 'animal_id', 'interaction_type').iterator()))
+
+    def item_indices(self, animal_ids):
+        """Индексы столбцов животных, которые есть в матрице"""
+        return _lookup(self.item_ids, animal_ids)
+
+    def user_items_of(self, user_ids):
+        """id животных, которые оценили пользователи"""
+        positions = _lookup(self.user_ids, user_ids)
+        starts = self.user_indptr[positions]
+        return self.item_ids[self.user_items[_ranges(starts, self.user_indptr[positions + 1] - starts)]]
+
+    def similarities(self, targets):
+        """Косинусные близости животных targets со всеми животными: плотный блок"""
+        n_items = len(self.item_ids)
+        # Оценки целевых животных: (строка блока, пользователь, оценка)
+        starts = self.item_indptr[targets]
+        lengths = self.item_indptr[targets + 1] - starts
+        positions = _ranges(starts, lengths)
+        block_rows = np.repeat(np.arange(len(targets)), lengths)
+        users = self.item_users[positions]
+        ratings = self.item_values[positions]
+
+        # Каждая оценка умножается на всю строку ее пользователя
+        user_starts = self.user_indptr[users]
+        user_lengths = self.user_indptr[users + 1] - user_starts
+        user_positions = _ranges(user_starts, user_lengths)
+        cells = np.repeat(block_rows, user_lengths) * n_items + self.user_items[user_positions]
+        products = np.repeat(ratings, user_lengths) * self.user_values[user_positions]
+        dots = np.bincount(cells, weights=products, minlength=len(targets) * n_items).reshape(len(targets), n_items)
+
+        denominator = np.outer(self.norms[targets], self.norms)
+        similarity = np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+        similarity[np.arange(len(targets)), targets] = 0
+        return similarity
+
+    def neighbours(self, targets, k):
+        """Для каждого целевого животного: (id, [(id соседа, близость), ...]) по убыванию"""
+        n_items = len(self.item_ids)
+        block_size = max(1, BLOCK_CELLS // max(n_items, 1))
+        for start in range(0, len(targets), block_size):
+            block = targets[start:start + block_size]
+            similarity = self.similarities(block)
+            if n_items > k:
+                top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(n_items), (len(block), n_items))
+            for row, item in enumerate(block):
+                scores = similarity[row, top[row]]
+                order = np.argsort(-scores, kind='stable')
+                yield int(self.item_ids[item]), [
+                    (int(self.item_ids[top[row][i]]), float(scores[i])) for i in order if scores[i] > 0
+                ]
+
+
+def _save_neighbours(matrix, targets, stale_ids=()):
+    """Заменяет соседей целевых животных; у stale_ids соседи просто удаляются"""
+    k = settings.MATCHER_CF_NEIGHBOURS
+    with transaction.atomic():
+        ItemNeighbour.objects.filter(
+            animal_id__in=[int(i) for i in matrix.item_ids[targets]] + list(stale_ids)
+        ).delete()
+        batch = []
+        for animal_id, neighbours in matrix.neighbours(targets, k):
+            batch.extend(
+                ItemNeighbour(animal_id=animal_id, neighbour_id=neighbour_id, score=score)
+                for neighbour_id, score in neighbours
+            )
+            if len(batch) >= 5000:
+                ItemNeighbour.objects.bulk_create(batch)
+                batch = []
+        ItemNeighbour.objects.bulk_create(batch)
+
+
+def _acquire_lock():
+    """Занимает строку блокировки условным UPDATE; False, если пересчет уже идет"""
+    RecomputationLock.objects.get_or_create(name=LOCK_NAME)
+    now = timezone.now()
+    return RecomputationLock.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now), name=LOCK_NAME
+    ).update(locked_until=now + LOCK_TIMEOUT) == 1
+
+
+def _release_lock():
+    RecomputationLock.objects.filter(name=LOCK_NAME).update(locked_until=None)
+
+
+def _locked(func):
+    def wrapper(*args, **kwargs):
+        if not _acquire_lock():
+            return None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _release_lock()
+    return wrapper
+
+
+def _state():
+    return RecomputationLock.objects.filter(name=LOCK_NAME)
+
+
+def _advance(last_id):
+    """Сдвигает водяной знак и версию; вызывается в транзакции записи соседей"""
+    _state().update(watermark=last_id, version=F('version') + 1)
+
+
+def watermark():
+    """id последнего учтенного взаимодействия; None, если соседи еще не считались"""
+    return _state().values_list('watermark', flat=True).first()
+
+
+def _version():
+    """Версия соседей: меняется после каждого пересчета"""
+    return _state().values_list('version', flat=True).first()
+
+
+@_locked
+def rebuild():
+    """Пересчитывает соседей всех животных; возвращает число животных в матрице"""
+    last_id = UserInteraction.objects.aggregate(last=Max('pk'))['last'] or 0
+    matrix = InteractionMatrix.load(last_id)
+    with transaction.atomic():
+        ItemNeighbour.objects.all().delete()
+        _save_neighbours(matrix, np.arange(len(matrix.item_ids)))
+        _advance(last_id)
+    return len(matrix.item_ids)
+
+
+def update():
+    """Учитывает взаимодействия после последнего пересчета; возвращает число пересчитанных животных"""
+    if watermark() is None:
+        # Неизвестно, что уже учтено: только полная пересборка
+        return rebuild()
+    return _update()
+
+
+@_locked
+def _update():
+    # Водяной знак читается под блокировкой: параллельный пересчет мог его сдвинуть
+    new = list(UserInteraction.objects.filter(pk__gt=watermark() or 0).values_list('pk', 'user_id', 'animal_id'))
+    if not new:
+        return 0
+    last_id = max(pk for pk, _, _ in new)
+    matrix = InteractionMatrix.load(last_id)
+
+    # Скалярные произведения меняются у пар, где хотя бы одно животное оценил автор
+    # нового взаимодействия; нормы остальных пар уточнит следующая полная пересборка
+    changed = {animal_id for _, _, animal_id in new}
+    affected = changed | set(matrix.user_items_of({user_id for _, user_id, _ in new}).tolist())
+    targets = matrix.item_indices(affected)
+    with transaction.atomic():
+        # Животные, у которых оценки взаимно погасились, выпадают из матрицы
+        _save_neighbours(matrix, targets, stale_ids=changed - set(matrix.item_ids[targets].tolist()))
+        _advance(last_id)
+    return len(targets)
+
+
+def record_interaction(user_id):
+    """Вызывается после нового взаимодействия: сбрасывает кеш пользователя и планирует обновление"""
+    cache.delete(f'matcher:cf:user:{user_id}')
+    interval = settings.MATCHER_CF_UPDATE_INTERVAL
+    if cache.add(SCHEDULED_KEY, 1, interval):
+        from .tasks import update_item_neighbours
+        update_item_neighbours.delay_in(interval)
+
+
+def recommend(user):
+    """Список (id животного, оценка) для пользователя по убыванию оценки"""
+    version = _version()
+    key = f'matcher:cf:user:{user.pk}'
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    ratings = defaultdict(float)
+    weights = settings.MATCHER_INTERACTION_WEIGHTS
+    for animal_id, kind in UserInteraction.objects.filter(user=user).values_list('animal_id', 'interaction_type'):
+        ratings[animal_id] += weights.get(kind, 0.0)
+
+    scores = defaultdict(float)
+    for animal_id, neighbour_id, score in ItemNeighbour.objects.filter(
+        animal_id__in=list(ratings)
+    ).values_list('animal_id', 'neighbour_id', 'score'):
+        scores[neighbour_id] += max(-1.0, min(1.0, ratings[animal_id])) * score
+
+    recommendations = sorted(
+        ((animal_id, score) for animal_id, score in scores.items() if score > 0 and animal_id not in ratings),
+        key=lambda item: (-item[1], -item[0])
+    )[:CACHED_RECOMMENDATIONS]
+    cache.set(key, (version, recommendations), settings.MATCHER_CF_CACHE_TTL)
+    return recommendations
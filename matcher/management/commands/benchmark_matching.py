@@ -0,0 +1,96 @@
+import random
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from announcements import geo
+from announcements.models import AnimalAnnouncement, Announcement, AnnouncementCategory
+from matcher.models import UserInteraction, UserPreferences
+from matcher.services import MatchingService
+from user_profile.models import UserProfile
+
+User = get_user_model()
+
+SPECIES = ['Собака', 'Кошка', 'Попугай', 'Хомяк']
+BREEDS = ['Лабрадор', 'Хаски', 'Дворняга', 'Шпиц', 'Мейн-кун', 'Сиамская']
+COLORS = ['черный', 'белый', 'рыжий', 'серый']
+SIZES = ['small', 'medium', 'large']
+
+
+def legacy_get_matches(service, limit=20):
+    """Прежний подбор: 100 животных, оценка каждого отдельно, по два COUNT на животное"""
+    animals = AnimalAnnouncement.objects.filter(
+        announcement__status='active'
+    ).exclude(matching_scores__user=service.user)
+    location = service.user_location()
+    matches = []
+    for animal in animals[:100]:
+        score, criteria = service.calculate_base_score(animal)
+        if score > 0:
+            announcement = animal.announcement
+            if location and announcement.latitude and announcement.longitude:
+                distance = geo.calculate_distance(*location, announcement.latitude, announcement.longitude)
+                if distance <= service.preferences.max_distance:
+                    score *= 1 + (1 - distance / service.preferences.max_distance) * 0.2
+            interactions = UserInteraction.objects.filter(user=service.user, animal__species=animal.species)
+            score *= 1 + interactions.filter(interaction_type='like').count() / max(interactions.count(), 1) * 0.1
+            matches.append({'animal': animal, 'score': score, 'criteria': criteria})
+    matches.sort(key=lambda x: x['score'], reverse=True)
+    return matches[:limit]
+
+
+class Command(BaseCommand):
+    help = 'Compares batched MatchingService scoring with the per-animal loop: queries and time per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--animals', type=int, default=5000)
+        parser.add_argument('--interactions', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        with transaction.atomic():
+            user = self._populate(options['animals'], options['interactions'])
+            for name, find in [
+                ('per-animal loop', lambda: legacy_get_matches(MatchingService(user))),
+                ('batched', lambda: MatchingService(user).get_matches()),
+            ]:
+                with CaptureQueriesContext(connection) as queries:
+                    find()
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    find()
+                elapsed = (time.perf_counter() - started) / options['repeat']
+                self.stdout.write(f'{name:<16} | {len(queries):4} queries | {elapsed * 1000:8.1f} ms/request')
+            transaction.set_rollback(True)
+
+    def _populate(self, size, interactions):
+        user = User.objects.create_user(phone='+70000000003')
+        UserProfile.objects.update_or_create(user=user, defaults={'last_latitude': 55.75, 'last_longitude': 37.62})
+        UserPreferences.objects.create(
+            user=user, preferred_species=str(SPECIES[:2]), size_preference=str(SIZES[:2]),
+            preferred_age_min=1, preferred_age_max=8, max_distance=50
+        )
+        category = AnnouncementCategory.objects.create(name='Benchmark', slug='benchmark-matching')
+        announcements = Announcement.objects.bulk_create([
+            Announcement(
+                title='Benchmark', description='', category=category, type=Announcement.TYPE_ANIMAL,
+                status=Announcement.STATUS_ACTIVE, author=user,
+                latitude=round(random.uniform(55.0, 56.5), 6), longitude=round(random.uniform(36.5, 38.5), 6),
+            )
+            for _ in range(size)
+        ])
+        animals = AnimalAnnouncement.objects.bulk_create([
+            AnimalAnnouncement(
+                announcement=announcement, species=random.choice(SPECIES), breed=random.choice(BREEDS),
+                age=random.randint(0, 15), gender=random.choice(['male', 'female']), size=random.choice(SIZES),
+                color=random.choice(COLORS), vaccinated=random.random() < 0.5, passport=random.random() < 0.5,
+            )
+            for announcement in announcements
+        ])
+        UserInteraction.objects.bulk_create([
+            UserInteraction(user=user, animal=random.choice(animals), interaction_type=random.choice(['like', 'dislike', 'view']))
+            for _ in range(interactions)
+        ])
+        return user
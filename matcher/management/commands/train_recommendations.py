@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from matcher import collaborative
+
+
+class Command(BaseCommand):
+    help = 'Recomputes item-item collaborative filtering neighbours from user interactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only fold in interactions recorded since the last run')
+
+    def handle(self, *args, **options):
+        updated = collaborative.update() if options['incremental'] else collaborative.rebuild()
+        if updated is None:
+            self.stdout.write('Another recomputation is in progress')
+        else:
+            self.stdout.write(f'{updated} animals recomputed')
@@ -0,0 +1,121 @@
+import json
+from bisect import bisect_right
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from matcher.services import active_user_ids, delete_stale_scores, update_matching_scores
+
+
+def _score_chunk(user_ids):
+    started = time.perf_counter()
+    # Скоры считаются вне транзакции: запись занимает базу только на время вставки
+    saved = update_matching_scores(user_ids)
+    return user_ids[0], user_ids[-1], len(user_ids), saved, time.perf_counter() - started
+
+
+class Checkpoint:
+    """
+    Прогресс запуска в JSON-файле: начало окна активности и готовые диапазоны id.
+    Файл переписывается атомарно после каждой пачки, поэтому упавший запуск
+    продолжается с неготовых пользователей.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.since = None
+        self.done = []
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.since = parse_datetime(state['since'])
+        self.done = [tuple(bounds) for bounds in state['done']]
+        return True
+
+    def save(self):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'since': self.since.isoformat(), 'done': self.done}, f)
+        os.replace(temporary, self.path)
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def pending(self, user_ids):
+        """id, не попавшие ни в один готовый диапазон"""
+        done = sorted(self.done)
+        lows = [low for low, _ in done]
+        pending = []
+        for user_id in user_ids:
+            position = bisect_right(lows, user_id) - 1
+            if position < 0 or user_id > done[position][1]:
+                pending.append(user_id)
+        return pending
+
+
+class Command(BaseCommand):
+    help = 'Recomputes matching scores of recently active users in parallel chunks; resumes after a crash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Users per chunk and per upsert')
+        parser.add_argument('--days', type=int, default=7,
+                            help='Users active in this many days are rescored; older scores are deleted')
+        parser.add_argument('--checkpoint', default=os.path.join(tempfile.gettempdir(), 'update_matching_scores.json'),
+                            help='Progress file of the current run')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options['checkpoint'])
+        if options['restart'] or not checkpoint.load():
+            checkpoint.since = timezone.now() - timedelta(days=options['days'])
+            checkpoint.done = []
+            deleted = delete_stale_scores(checkpoint.since)
+            checkpoint.save()
+            self.stdout.write(f'Deleted {deleted} stale scores')
+        else:
+            self.stdout.write(f'Resuming: {len(checkpoint.done)} chunks already done')
+
+        user_ids = checkpoint.pending(active_user_ids(checkpoint.since))
+        chunk_size = options['chunk_size']
+        chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+        self.stdout.write(f'{len(user_ids)} users in {len(chunks)} chunks, {options["processes"]} processes')
+
+        started = time.perf_counter()
+        users = saved = 0
+        for first, last, chunk_users, chunk_saved, seconds in self._run(chunks, options['processes']):
+            checkpoint.done.append((first, last))
+            checkpoint.save()
+            users += chunk_users
+            saved += chunk_saved
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'users {first}-{last}: {chunk_saved} scores in {seconds:.1f}s | '
+                f'total {users}/{len(user_ids)} users, {users / max(elapsed, 1e-9):.0f} users/s'
+            )
+
+        checkpoint.delete()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {users} users ({saved} scores) in {elapsed:.1f}s, {users / max(elapsed, 1e-9):.0f} users/s'
+        ))
+
+    def _run(self, chunks, processes):
+        if processes == 1 or len(chunks) <= 1:
+            yield from map(_score_chunk, chunks)
+            return
+
+        # Дочерние процессы не должны делить соединения с базой родителя
+        connections.close_all()
+        with multiprocessing.Pool(processes) as pool:
+            yield from pool.imap_unordered(_score_chunk, chunks)
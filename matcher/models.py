@@ -102,6 +102,40 @@ class UserInteraction(models.Model):
             models.Index(fields=['animal', 'interaction_type']),
         ]
 
+class ItemNeighbour(models.Model):
+    """Похожее животное по поведению пользователей (matcher.collaborative)"""
+    animal = models.ForeignKey(AnimalAnnouncement,
+                             on_delete=models.CASCADE,
+                             related_name='cf_neighbours')
+    neighbour = models.ForeignKey(AnimalAnnouncement,
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    score = models.FloatField(_('Близость'))
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Похожее животное')
+        verbose_name_plural = _('Похожие животные')
+        unique_together = ('animal', 'neighbour')
+        indexes = [
+            models.Index(fields=['animal', '-score']),
+        ]
+
+class RecomputationLock(models.Model):
+    """
+    Блокировка и состояние пересчета соседей (matcher.collaborative).
+    Блокировка истекает сама, если процесс упал.
+    """
+    name = models.CharField(_('Название'), max_length=50, unique=True)
+    locked_until = models.DateTimeField(_('Занята до'), null=True, blank=True)
+    # Последнее учтенное UserInteraction; None, пока не было полной пересборки
+    watermark = models.PositiveBigIntegerField(_('Учтено взаимодействий до'), null=True, blank=True)
+    version = models.PositiveIntegerField(_('Версия соседей'), default=0)
+
+    class Meta:
+        verbose_name = _('Блокировка пересчета')
+        verbose_name_plural = _('Блокировки пересчета')
+
 class RecommendationHistory(models.Model):
     """Модель для хранения истории рекомендаций"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
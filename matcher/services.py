@@ -1,139 +1,247 @@
-from django.db.models import Q, F, Value, FloatField
-from django.db.models.functions import Cast
-from django.contrib.gis.measure import D
+import ast
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
 from .models import UserPreferences, MatchingScore, UserInteraction, RecommendationHistory, Match
 from announcements.models import AnimalAnnouncement, Announcement
-from math import radians, sin, cos, sqrt, atan2
+from announcements import geo
+from . import collaborative
+
+
+# Поля животного, по которым считается скор
+CANDIDATE_FIELDS = [
+    'pk', 'species', 'breed', 'gender', 'age', 'size', 'color',
+    'pedigree', 'vaccinated', 'passport', 'announcement__latitude', 'announcement__longitude',
+]
+
+
+def preference_values(value):
+    """Значения множественного предпочтения: форма сохраняет список строкой"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            value = value.split(',')
+    if isinstance(value, (str, int, float)):
+        value = [value]
+    return [str(item).strip() for item in value if str(item).strip()]
 
 class MatchingService:
     """Сервис для умного подбора животных"""
     
+    # Баллы за совпадение критерия
+    CRITERIA_POINTS = {
+        'species_match': 20,
+        'breed_match': 15,
+        'gender_match': 10,
+        'age_match': 10,
+        'size_match': 5,
+        'color_match': 5,
+        'pedigree_match': 5,
+        'vaccinated_match': 5,
+        'passport_match': 5,
+    }
+    
     def __init__(self, user):
         self.user = user
-        self.preferences = UserPreferences.objects.get_or_create(user=user)[0]
+        self.preferences = self._load_preferences(user)
+        self.species = preference_values(self.preferences.preferred_species)
+        self.breeds = preference_values(self.preferences.preferred_breeds)
+        self.sizes = preference_values(self.preferences.size_preference)
+        self.colors = preference_values(self.preferences.color_preference)
+        self._like_ratios = None
+    
+    @staticmethod
+    def _load_preferences(user):
+        # Профиль с координатами пользователя приходит тем же запросом
+        preferences = UserPreferences.objects.select_related('user__userprofile').filter(user=user).first()
+        if preferences is None:
+            preferences = UserPreferences.objects.get_or_create(user_id=getattr(user, 'pk', user))[0]
+        return preferences
+    
+    def user_location(self):
+        """Последние известные координаты пользователя или None"""
+        try:
+            profile = self.preferences.user.userprofile
+        except ObjectDoesNotExist:
+            return None
+        if profile.last_latitude is None or profile.last_longitude is None:
+            return None
+        return float(profile.last_latitude), float(profile.last_longitude)
+    
+    def like_ratios(self):
+        """Доля лайков среди взаимодействий пользователя по видам животных"""
+        if self._like_ratios is None:
+            rows = UserInteraction.objects.filter(user=self.user).values('animal__species').annotate(
+                likes=Count('pk', filter=Q(interaction_type='like')),
+                total=Count('pk')
+            )
+            self._like_ratios = {row['animal__species']: row['likes'] / row['total'] for row in rows}
+        return self._like_ratios
     
     def calculate_base_score(self, animal):
         """Расчет базового скора на основе предпочтений"""
-        score = 0
-        matched_criteria = []
-        
-        # Проверяем основные характеристики
-        if self.preferences.preferred_species and animal.species in self.preferences.preferred_species:
-            score += 20
-            matched_criteria.append('species_match')
+        scores, criteria = self.score_criteria(self.animal_columns([animal]))
+        return int(scores[0]), [name for name, mask in criteria if mask[0]]
+    
+    def apply_location_boost(self, score, animal):
+        """Применяем бустинг на основе расстояния"""
+        return score * self.location_factors(self.animal_columns([animal]))[0]
+    
+    def apply_interaction_boost(self, score, animal):
+        """Применяем бустинг на основе взаимодействий"""
+        return score * self.interaction_factors(self.animal_columns([animal]))[0]
+    
+    @staticmethod
+    def animal_columns(animals):
+        """Колонки CANDIDATE_FIELDS из загруженных животных"""
+        return {
+            field: [
+                getattr(animal.announcement, field.split('__')[1]) if '__' in field else getattr(animal, field)
+                for animal in animals
+            ]
+            for field in CANDIDATE_FIELDS
+        }
+    
+    def score_criteria(self, columns):
+        """Базовые скоры животных и маски совпавших критериев, без цикла по животным"""
+        preferences = self.preferences
         
-        if self.preferences.preferred_breeds and animal.breed in self.preferences.preferred_breeds:
-            score += 15
-            matched_criteria.append('breed_match')
+        def column(field):
+            return np.array(columns[field], dtype=object)
         
-        if self.preferences.preferred_gender and animal.gender == self.preferences.preferred_gender:
-            score += 10
-            matched_criteria.append('gender_match')
+        def flag(field):
+            return np.array(columns[field], dtype=bool)
         
-        # Проверяем возраст
-        if animal.age:
-            if (not self.preferences.preferred_age_min or animal.age >= self.preferences.preferred_age_min) and \
-               (not self.preferences.preferred_age_max or animal.age <= self.preferences.preferred_age_max):
-                score += 10
-                matched_criteria.append('age_match')
+        criteria = []
+        if self.species:
+            criteria.append(('species_match', np.isin(column('species'), self.species)))
+        if self.breeds:
+            criteria.append(('breed_match', np.isin(column('breed'), self.breeds)))
+        if preferences.preferred_gender:
+            criteria.append(('gender_match', column('gender') == preferences.preferred_gender))
         
-        # Проверяем размер
-        if self.preferences.size_preference and animal.size in self.preferences.size_preference:
-            score += 5
-            matched_criteria.append('size_match')
+        ages = np.array([age or 0 for age in columns['age']], dtype=np.int64)
+        age_match = ages > 0
+        if preferences.preferred_age_min:
+            age_match &= ages >= preferences.preferred_age_min
+        if preferences.preferred_age_max:
+            age_match &= ages <= preferences.preferred_age_max
+        criteria.append(('age_match', age_match))
         
-        # Проверяем окрас
-        if self.preferences.color_preference and animal.color in self.preferences.color_preference:
-            score += 5
-            matched_criteria.append('color_match')
+        if self.sizes:
+            criteria.append(('size_match', np.isin(column('size'), self.sizes)))
+        if self.colors:
+            criteria.append(('color_match', np.isin(column('color'), self.colors)))
+        if preferences.requires_pedigree:
+            criteria.append(('pedigree_match', flag('pedigree')))
+        if preferences.requires_vaccinated:
+            criteria.append(('vaccinated_match', flag('vaccinated')))
+        if preferences.requires_passport:
+            criteria.append(('passport_match', flag('passport')))
         
-        # Проверяем специальные требования
-        if self.preferences.requires_pedigree and animal.pedigree:
-            score += 5
-            matched_criteria.append('pedigree_match')
-        if self.preferences.requires_vaccinated and animal.vaccinated:
-            score += 5
-            matched_criteria.append('vaccinated_match')
-        if self.preferences.requires_passport and animal.passport:
-            score += 5
-            matched_criteria.append('passport_match')
+        scores = np.zeros(len(columns['pk']))
+        for name, mask in criteria:
+            scores += self.CRITERIA_POINTS[name] * mask
+        return scores, criteria
+    
+    def location_factors(self, columns):
+        """Множители за близость: до +20% в пределах max_distance"""
+        factors = np.ones(len(columns['pk']))
+        location = self.user_location()
+        max_distance = self.preferences.max_distance
+        if location is None or not max_distance:
+            return factors
         
-        return score, matched_criteria
+        # У объявлений без координат расстояние NaN, и бустинга нет
+        distances = geo.haversine_many(
+            location[0], location[1],
+            np.array(columns['announcement__latitude'], dtype=np.float64),
+            np.array(columns['announcement__longitude'], dtype=np.float64)
+        )
+        near = distances <= max_distance
+        factors[near] += (1 - distances[near] / max_distance) * 0.2
+        return factors
     
-    def apply_location_boost(self, score, animal):
-        """Применяем бустинг на основе расстояния"""
-        if animal.announcement.latitude and animal.announcement.longitude:
-            distance = self.user.profile.location.distance(
-                animal.announcement.location
-            ).km if self.user.profile.location else float('inf')
-            
-            if distance <= self.preferences.max_distance:
-                distance_factor = 1 - (distance / self.preferences.max_distance)
-                return score * (1 + distance_factor * 0.2)
-        return score
+    def interaction_factors(self, columns):
+        """Множители за долю лайков пользователя у того же вида: до +10%"""
+        ratios = self.like_ratios()
+        return 1 + np.array([ratios.get(species, 0.0) for species in columns['species']]) * 0.1
     
-    def apply_interaction_boost(self, score, animal):
-        """Применяем бустинг на основе взаимодействий"""
-        user_interactions = UserInteraction.objects.filter(
-            user=self.user,
-            animal__species=animal.species
-        )
+    def candidate_pool(self):
+        """Активные животные с фильтрами предпочтений в SQL, новые первыми"""
+        animals = AnimalAnnouncement.objects.filter(announcement__status='active')
+        
+        if self.species:
+            animals = animals.filter(species__in=self.species)
         
-        like_ratio = user_interactions.filter(interaction_type='like').count() / \
-                    max(user_interactions.count(), 1)
+        if self.breeds:
+            animals = animals.filter(breed__in=self.breeds)
         
-        return score * (1 + like_ratio * 0.1)
+        return animals.order_by('-announcement__created_at')
     
-    def get_matches(self, limit=20):
-        """Получение списка подходящих животных"""
-        # Получаем базовый queryset
-        animals = AnimalAnnouncement.objects.filter(
-            announcement__status='active'
-        ).exclude(
+    def get_candidates(self):
+        """Кандидаты, еще не оцененные для пользователя"""
+        return self.candidate_pool().exclude(
             matching_scores__user=self.user
-        )
-        
-        # Применяем фильтры предпочтений
-        if self.preferences.preferred_species:
-            animals = animals.filter(species__in=self.preferences.preferred_species)
+        )[:settings.MATCHER_CANDIDATE_LIMIT]
+    
+    def rank(self, columns, limit):
+        """Индексы лучших кандидатов, их скоры и маски критериев"""
+        base_scores, criteria = self.score_criteria(columns)
+        scores = base_scores * self.location_factors(columns) * self.interaction_factors(columns)
         
-        if self.preferences.preferred_breeds:
-            animals = animals.filter(breed__in=self.preferences.preferred_breeds)
+        candidates = np.flatnonzero(base_scores > 0)
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')][:limit]
+        return candidates, scores, criteria
+    
+    def get_matches(self, limit=20):
+        """Получение списка подходящих животных"""
+        animals = list(self.get_candidates().select_related('announcement'))
+        if not animals:
+            return []
         
-        matches = []
-        for animal in animals[:100]:  # Ограничиваем для производительности
-            base_score, criteria = self.calculate_base_score(animal)
-            if base_score > 0:
-                final_score = self.apply_location_boost(base_score, animal)
-                final_score = self.apply_interaction_boost(final_score, animal)
-                
-                matches.append({
-                    'animal': animal,
-                    'score': final_score,
-                    'criteria': criteria
-                })
+        candidates, scores, criteria = self.rank(self.animal_columns(animals), limit)
+        return [
+            {
+                'animal': animals[i],
+                'score': float(scores[i]),
+                'criteria': [name for name, mask in criteria if mask[i]]
+            }
+            for i in candidates
+        ]
+    
+    def get_match_scores(self, limit=20):
+        """
+        То же, что get_matches, но без загрузки моделей: (id животного, скор, критерии).
+        Уже оцененные пары тоже попадают в выборку, чтобы пересчет обновлял их скоры.
+        """
+        rows = list(self.candidate_pool().values_list(*CANDIDATE_FIELDS)[:settings.MATCHER_CANDIDATE_LIMIT])
+        if not rows:
+            return []
         
-        # Сортируем и ограничиваем результаты
-        matches.sort(key=lambda x: x['score'], reverse=True)
-        return matches[:limit]
+        columns = dict(zip(CANDIDATE_FIELDS, zip(*rows)))
+        candidates, scores, criteria = self.rank(columns, limit)
+        return [
+            (columns['pk'][i], float(scores[i]), [name for name, mask in criteria if mask[i]])
+            for i in candidates
+        ]
     
     def save_matches(self, matches):
-        """Сохранение результатов матчинга"""
-        bulk_scores = []
-        for match in matches:
-            bulk_scores.append(
-                MatchingScore(
-                    user=self.user,
-                    animal=match['animal'],
-                    score=match['score'],
-                    matched_criteria=match['criteria']
-                )
+        """Сохранение результатов матчинга; существующие оценки пар обновляются"""
+        save_scores([
+            MatchingScore(
+                user_id=self.preferences.user_id,
+                animal=match['animal'],
+                score=match['score'],
+                matched_criteria=match['criteria']
             )
-        MatchingScore.objects.bulk_create(bulk_scores)
+            for match in matches
+        ])
 
 class RecommendationService:
     """Сервис рекомендаций животных"""
@@ -144,23 +252,14 @@ class RecommendationService:
     
     def get_collaborative_recommendations(self, limit=5):
         """Получение рекомендаций на основе поведения похожих пользователей"""
-        # Находим пользователей с похожими взаимодействиями
-        user_interactions = UserInteraction.objects.filter(user=self.user)
-        similar_users = UserInteraction.objects.filter(
-            animal__in=user_interactions.values('animal')
-        ).exclude(
-            user=self.user
-        ).values('user').distinct()
-        
-        # Получаем животных, с которыми взаимодействовали похожие пользователи
-        recommended_animals = AnimalAnnouncement.objects.filter(
-            user_interactions__user__in=similar_users,
-            user_interactions__interaction_type='like'
-        ).exclude(
-            user_interactions__user=self.user
-        ).distinct()
+        # Соседи животных посчитаны заранее (matcher.collaborative), здесь только выборка из кеша
+        ids = [animal_id for animal_id, _ in collaborative.recommend(self.user)]
+        animals = AnimalAnnouncement.objects.filter(
+            pk__in=ids,
+            announcement__status='active'
+        ).select_related('announcement').in_bulk()
         
-        return recommended_animals[:limit]
+        return [animals[animal_id] for animal_id in ids if animal_id in animals][:limit]
     
     def get_content_based_recommendations(self, limit=5):
         """Получение рекомендаций на основе характеристик животных"""
@@ -244,36 +343,40 @@ class RecommendationService:
             )
         RecommendationHistory.objects.bulk_create(bulk_history)
 
-def update_matching_scores():
-    """Периодическое обновление скоров матчинга"""
-    # Удаляем старые скоры
-    MatchingScore.objects.filter(
-        created_at__lt=timezone.now() - timedelta(days=7)
-    ).delete()
-    
-    # Обновляем скоры для активных пользователей
-    active_users = UserInteraction.objects.filter(
-        created_at__gte=timezone.now() - timedelta(days=7)
-    ).values('user').distinct()
-    
-    for user_dict in active_users:
-        matching_service = MatchingService(user_dict['user'])
-        matches = matching_service.get_matches()
-        matching_service.save_matches(matches)
+def active_user_ids(since):
+    """id пользователей со взаимодействиями после since, по возрастанию"""
+    return list(UserInteraction.objects.filter(
+        created_at__gte=since
+    ).order_by('user_id').values_list('user_id', flat=True).distinct())
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # радиус Земли в километрах
+def delete_stale_scores(before):
+    """Удаляет оценки, посчитанные раньше before"""
+    return MatchingScore.objects.filter(created_at__lt=before).delete()[0]
 
-    lat1, lon1, lat2, lon2 = map(radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-    
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    distance = R * c
-    
-    return distance
+def save_scores(scores):
+    """Вставка оценок; оценки уже посчитанных пар обновляются"""
+    MatchingScore.objects.bulk_create(
+        scores,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'animal'],
+        update_fields=['score', 'matched_criteria', 'created_at']
+    )
+
+def update_matching_scores(user_ids):
+    """Пересчет скоров матчинга пользователей одной вставкой; возвращает число сохраненных оценок"""
+    started = timezone.now()
+    scores = []
+    for user_id in user_ids:
+        matching_service = MatchingService(user_id)
+        scores.extend(
+            MatchingScore(user_id=user_id, animal_id=animal_id, score=score, matched_criteria=criteria)
+            for animal_id, score, criteria in matching_service.get_match_scores()
+        )
+    save_scores(scores)
+    # Пары, которые больше не подходят под предпочтения, не были перезаписаны
+    MatchingScore.objects.filter(user_id__in=user_ids, created_at__lt=started).delete()
+    return len(scores)
 
 def find_matches(user, preferences):
     """
@@ -313,17 +416,7 @@ def find_matches(user, preferences):
         radius = preferences.get('radius', 10)  # радиус поиска в километрах
         
         if lat and lon:
-            filtered_announcements = []
-            for announcement in announcements:
-                if announcement.latitude and announcement.longitude:
-                    distance = calculate_distance(
-                        float(lat), float(lon),
-                        float(announcement.latitude), float(announcement.longitude)
-                    )
-                    if distance <= float(radius):
-                        filtered_announcements.append(announcement.id)
-            
-            announcements = announcements.filter(id__in=filtered_announcements)
+            announcements = geo.filter_within_radius(announcements, lat, lon, radius)
     
     # Создаем или обновляем запись о совпадениях
     match, created = Match.objects.get_or_create(user=user)
@@ -0,0 +1,8 @@
+from taskqueue import task
+from . import collaborative
+
+
+@task
+def update_item_neighbours():
+    """Учет новых взаимодействий в соседях животных"""
+    collaborative.update()
@@ -0,0 +1,391 @@
+import io
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, modify_settings
+from django.utils import timezone
+from announcements.geo import calculate_distance
+from announcements.models import AnimalAnnouncement, Announcement, AnnouncementCategory
+from user_profile.models import UserProfile
+
+User = get_user_model()
+
+# Приложение matcher не входит в INSTALLED_APPS и не имеет миграций: тесты подключают его
+# на время класса, а таблицы создает MatcherTestCase; модели импортируются внутри тестов
+with_matcher = modify_settings(INSTALLED_APPS={'append': 'matcher'})
+
+
+@with_matcher
+class MatcherTestCase(TransactionTestCase):
+    """Создает таблицы моделей matcher на время класса"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connection.schema_editor() as editor:
+            for model in apps.get_app_config('matcher').get_models():
+                editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            for model in apps.get_app_config('matcher').get_models():
+                editor.delete_model(model)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.category = AnnouncementCategory.objects.create(name='Собаки', slug='dogs')
+        self.author = User.objects.create_user(phone='+79990000300', password='testpass123')
+
+    def _user(self, number):
+        return User.objects.create_user(phone=f'+7999000{number:04d}', password='testpass123')
+
+    def _animal(self, breed='Лабрадор', latitude=None, longitude=None, **kwargs):
+        announcement = Announcement.objects.create(
+            title=f'Щенок {breed}', description='Описание', category=self.category,
+            type=Announcement.TYPE_ANIMAL, author=self.author, status=Announcement.STATUS_ACTIVE,
+            latitude=latitude, longitude=longitude,
+        )
+        kwargs = {'species': 'Собака', 'gender': 'male', 'size': 'medium', 'color': 'черный', **kwargs}
+        return AnimalAnnouncement.objects.create(announcement=announcement, breed=breed, **kwargs)
+
+
+def _dense_similarities(rows):
+    """Эталон: плотная матрица оценок и косинусы всех пар столбцов"""
+    users = sorted({user for user, _, _ in rows})
+    items = sorted({item for _, item, _ in rows})
+    ratings = np.zeros((len(users), len(items)))
+    for user, item, kind in rows:
+        ratings[users.index(user), items.index(item)] += settings.MATCHER_INTERACTION_WEIGHTS[kind]
+    ratings = np.clip(ratings, -1, 1)
+    norms = np.linalg.norm(ratings, axis=0)
+    similarity = ratings.T @ ratings / np.maximum(np.outer(norms, norms), 1e-300)
+    similarity[np.outer(norms, norms) == 0] = 0
+    np.fill_diagonal(similarity, 0)
+    return np.array(items), similarity
+
+
+@with_matcher
+class InteractionMatrixTest(SimpleTestCase):
+    def _rows(self, seed, users=30, items=25, count=300):
+        rng = np.random.default_rng(seed)
+        kinds = list(settings.MATCHER_INTERACTION_WEIGHTS)
+        return [
+            (int(rng.integers(users)) + 1, int(rng.integers(items)) + 100, kinds[rng.integers(len(kinds))])
+            for _ in range(count)
+        ]
+
+    def test_similarities_match_dense_reference(self):
+        from matcher.collaborative import InteractionMatrix
+        for seed in range(5):
+            rows = self._rows(seed)
+            matrix = InteractionMatrix.from_rows(rows)
+            item_ids, reference = _dense_similarities(rows)
+            # Столбцы, где оценки взаимно погасились, в разреженную матрицу не попадают
+            kept = np.isin(item_ids, matrix.item_ids)
+            reference = reference[np.ix_(kept, kept)]
+            np.testing.assert_array_equal(matrix.item_ids, item_ids[kept])
+
+            np.testing.assert_allclose(matrix.similarities(np.arange(len(matrix.item_ids))), reference, atol=1e-12)
+            targets = np.array([3, 0, 7])
+            np.testing.assert_allclose(matrix.similarities(targets), reference[targets], atol=1e-12)
+
+    def test_neighbours_are_top_k_of_reference(self):
+        from matcher import collaborative
+        rows = self._rows(7)
+        matrix = collaborative.InteractionMatrix.from_rows(rows)
+        _, reference = _dense_similarities([row for row in rows if row[1] in set(matrix.item_ids.tolist())])
+
+        # Маленький блок: близости считаются несколькими блоками
+        with mock.patch.object(collaborative, 'BLOCK_CELLS', 3 * len(matrix.item_ids)):
+            neighbours = dict(matrix.neighbours(np.arange(len(matrix.item_ids)), 5))
+        for row, animal_id in enumerate(matrix.item_ids.tolist()):
+            expected = sorted((score for score in reference[row] if score > 0), reverse=True)[:5]
+            self.assertEqual(len(neighbours[animal_id]), len(expected))
+            np.testing.assert_allclose([score for _, score in neighbours[animal_id]], expected, atol=1e-12)
+
+    def test_empty_matrix(self):
+        from matcher.collaborative import InteractionMatrix
+        matrix = InteractionMatrix.from_rows([])
+        self.assertEqual(list(matrix.neighbours(np.array([], dtype=np.int64), 5)), [])
+
+
+class CollaborativeStateTest(MatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        from matcher.models import UserInteraction
+        self.animals = [self._animal(breed) for breed in ('Лабрадор', 'Хаски', 'Корги', 'Такса')]
+        self.users = [self._user(number) for number in range(1, 4)]
+        self.interactions = UserInteraction.objects
+        for user in self.users:
+            self._like(user, self.animals[0])
+            self._like(user, self.animals[1])
+
+    def _like(self, user, animal):
+        return self.interactions.create(user=user, animal=animal, interaction_type='like')
+
+    def test_watermark_is_stored_with_neighbours(self):
+        from matcher import collaborative
+        from matcher.models import ItemNeighbour
+        self.assertIsNone(collaborative.watermark())
+        collaborative.rebuild()
+        last_id = self.interactions.latest('pk').pk
+        self.assertEqual(collaborative.watermark(), last_id)
+
+        # Кеш другого процесса ничего не знает: обновление все равно инкрементальное
+        cache.clear()
+        new = self._like(self.users[0], self.animals[2])
+        with mock.patch.object(collaborative, 'rebuild') as rebuild:
+            self.assertEqual(collaborative.update(), 3)
+        rebuild.assert_not_called()
+        self.assertEqual(collaborative.watermark(), new.pk)
+        self.assertTrue(ItemNeighbour.objects.filter(animal=self.animals[2], neighbour=self.animals[0]).exists())
+
+        # Новых взаимодействий нет
+        self.assertEqual(collaborative.update(), 0)
+
+    def test_lock_is_held_in_database(self):
+        from matcher import collaborative
+        from matcher.models import RecomputationLock
+        self.assertTrue(collaborative._acquire_lock())
+        self.assertFalse(collaborative._acquire_lock())
+        self.assertIsNone(collaborative.rebuild())
+
+        # Блокировку упавшего процесса можно занять после истечения срока
+        RecomputationLock.objects.update(locked_until=RecomputationLock.objects.get().locked_until
+                                         - collaborative.LOCK_TIMEOUT * 2)
+        self.assertEqual(collaborative.rebuild(), 2)
+        self.assertIsNone(RecomputationLock.objects.get().locked_until)
+
+    def test_empty_rebuild_sets_watermark(self):
+        from matcher import collaborative
+        from matcher.models import ItemNeighbour
+        self.interactions.all().delete()
+        collaborative.rebuild()
+        self.assertFalse(ItemNeighbour.objects.exists())
+        self.assertEqual(collaborative.watermark(), 0)
+
+        # Дальше только инкрементальные обновления
+        self._like(self.users[0], self.animals[0])
+        with mock.patch.object(collaborative, 'rebuild') as rebuild:
+            collaborative.update()
+        rebuild.assert_not_called()
+
+    def test_recommend_reads_one_state_row(self):
+        from matcher import collaborative
+        collaborative.rebuild()
+        reader = self._user(9)
+        self._like(reader, self.animals[0])
+        collaborative.recommend(reader)
+        # Кеш актуален: версия берется из строки состояния, соседи не читаются
+        with self.assertNumQueries(1):
+            self.assertEqual([pk for pk, _ in collaborative.recommend(reader)], [self.animals[1].pk])
+
+    def test_recommendations_follow_recomputation(self):
+        from matcher import collaborative
+        collaborative.rebuild()
+        reader = self._user(9)
+        self._like(reader, self.animals[0])
+        self.assertEqual([pk for pk, _ in collaborative.recommend(reader)], [self.animals[1].pk])
+
+        for user in self.users:
+            self._like(user, self.animals[3])
+        collaborative.update()
+        self.assertEqual(
+            {pk for pk, _ in collaborative.recommend(reader)}, {self.animals[1].pk, self.animals[3].pk}
+        )
+
+
+class MatchingServiceTest(MatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        from matcher.models import UserInteraction, UserPreferences
+        self.user = self._user(10)
+        UserProfile.objects.filter(user=self.user).update(last_latitude='55.755800', last_longitude='37.617300')
+        UserPreferences.objects.create(
+            user=self.user, preferred_species="['Собака', 'Кошка']", preferred_gender='female',
+            preferred_age_min=1, preferred_age_max=5, size_preference="['small', 'medium']",
+            color_preference="['рыжий']", requires_pedigree=True, requires_vaccinated=True,
+            requires_passport=False, max_distance=30,
+        )
+
+        rng = np.random.default_rng(3)
+        breeds = ['Лабрадор', 'Хаски', 'Сиамская', 'Корги']
+        for _ in range(40):
+            located = rng.random() < 0.7
+            self._animal(
+                breed=breeds[rng.integers(len(breeds))],
+                species=['Собака', 'Кошка', 'Попугай'][rng.integers(3)],
+                gender=['male', 'female'][rng.integers(2)],
+                age=[None, 0, 2, 4, 8][rng.integers(5)],
+                size=['small', 'medium', 'large'][rng.integers(3)],
+                color=['рыжий', 'черный'][rng.integers(2)],
+                pedigree=bool(rng.integers(2)), vaccinated=bool(rng.integers(2)),
+                latitude=round(55.7558 + rng.uniform(-0.4, 0.4), 6) if located else None,
+                longitude=round(37.6173 + rng.uniform(-0.4, 0.4), 6) if located else None,
+            )
+        animals = list(AnimalAnnouncement.objects.all())
+        for animal in animals[:12]:
+            UserInteraction.objects.create(
+                user=self.user, animal=animal, interaction_type=['like', 'view', 'dislike'][animal.pk % 3]
+            )
+
+    def _reference_score(self, animal):
+        """Прежний расчет по одному животному: критерии, бустинг расстояния и доли лайков"""
+        from matcher.models import UserInteraction
+        preferences = self.user.matching_preferences
+        checks = [
+            ('species_match', 20, animal.species in ('Собака', 'Кошка')),
+            ('gender_match', 10, animal.gender == preferences.preferred_gender),
+            ('age_match', 10, bool(animal.age) and 1 <= animal.age <= 5),
+            ('size_match', 5, animal.size in ('small', 'medium')),
+            ('color_match', 5, animal.color == 'рыжий'),
+            ('pedigree_match', 5, animal.pedigree),
+            ('vaccinated_match', 5, animal.vaccinated),
+        ]
+        score = sum(points for _, points, matched in checks if matched)
+        criteria = [name for name, _, matched in checks if matched]
+
+        distance = calculate_distance(55.7558, 37.6173, animal.announcement.latitude, animal.announcement.longitude)
+        if distance <= preferences.max_distance:
+            score *= 1 + (1 - distance / preferences.max_distance) * 0.2
+
+        interactions = UserInteraction.objects.filter(user=self.user, animal__species=animal.species)
+        like_ratio = interactions.filter(interaction_type='like').count() / max(interactions.count(), 1)
+        return score * (1 + like_ratio * 0.1), criteria
+
+    def test_batched_matches_equal_per_animal_scores(self):
+        from matcher.services import MatchingService
+        with self.assertNumQueries(3):
+            matches = MatchingService(self.user).get_matches(limit=100)
+
+        expected = {
+            animal.pk: self._reference_score(animal)
+            for animal in AnimalAnnouncement.objects.filter(species__in=['Собака', 'Кошка'])
+        }
+        expected = {pk: value for pk, value in expected.items() if value[0] > 0}
+        self.assertGreater(len(expected), 10)
+        self.assertEqual({match['animal'].pk for match in matches}, set(expected))
+        self.assertEqual([match['score'] for match in matches],
+                         sorted((match['score'] for match in matches), reverse=True))
+        for match in matches:
+            score, criteria = expected[match['animal'].pk]
+            self.assertAlmostEqual(match['score'], score, places=6)
+            self.assertEqual(match['criteria'], criteria)
+
+        # Скоры без загрузки моделей совпадают со скорами get_matches
+        scores = {pk: score for pk, score, _ in MatchingService(self.user).get_match_scores(limit=100)}
+        self.assertEqual(scores, {match['animal'].pk: match['score'] for match in matches})
+
+    def test_per_animal_helpers_match_batch(self):
+        from matcher.services import MatchingService
+        service = MatchingService(self.user)
+        for match in service.get_matches(limit=100):
+            animal = match['animal']
+            base, criteria = service.calculate_base_score(animal)
+            score = service.apply_interaction_boost(service.apply_location_boost(base, animal), animal)
+            self.assertAlmostEqual(score, match['score'], places=6)
+            self.assertEqual(criteria, match['criteria'])
+
+
+class UpdateMatchingScoresTest(MatcherTestCase):
+    def setUp(self):
+        super().setUp()
+        from matcher.models import UserInteraction, UserPreferences
+        self.animal = self._animal(age=2)
+        self.users = [self._user(number) for number in range(20, 25)]
+        for user in self.users:
+            UserPreferences.objects.create(user=user, preferred_species="['Собака']")
+            UserInteraction.objects.create(user=user, animal=self.animal, interaction_type='view')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+
+    def test_checkpoint_pending(self):
+        from matcher.management.commands.update_matching_scores import Checkpoint
+        checkpoint = Checkpoint(self.checkpoint)
+        self.assertFalse(checkpoint.load())
+        checkpoint.since = timezone.now()
+        checkpoint.done = [(10, 12), (3, 5)]
+        checkpoint.save()
+
+        restored = Checkpoint(self.checkpoint)
+        self.assertTrue(restored.load())
+        self.assertEqual(restored.since, checkpoint.since)
+        self.assertEqual(restored.pending([1, 3, 4, 5, 6, 11, 12, 13]), [1, 6, 13])
+        restored.delete()
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_after_crash(self):
+        from matcher.management.commands import update_matching_scores as command
+        from matcher.models import MatchingScore
+        scored = []
+
+        def crash_on_third(user_ids):
+            if len(scored) == 2:
+                raise RuntimeError('worker died')
+            scored.extend(user_ids)
+            return real(user_ids)
+
+        real = command.update_matching_scores
+        options = {'chunk_size': 1, 'checkpoint': self.checkpoint, 'stdout': io.StringIO()}
+        with mock.patch.object(command, 'update_matching_scores', side_effect=crash_on_third):
+            with self.assertRaises(RuntimeError):
+                call_command('update_matching_scores', **options)
+        self.assertTrue(os.path.exists(self.checkpoint))
+        self.assertEqual(MatchingScore.objects.count(), 2)
+
+        # Повторный запуск досчитывает только оставшихся пользователей
+        with mock.patch.object(command, 'update_matching_scores', side_effect=real) as resumed:
+            call_command('update_matching_scores', **options)
+        self.assertEqual(sorted(call.args[0][0] for call in resumed.call_args_list),
+                         sorted(user.pk for user in self.users[2:]))
+        self.assertIn('Resuming: 2 chunks already done', options['stdout'].getvalue())
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertEqual(set(MatchingScore.objects.values_list('user_id', flat=True)),
+                         {user.pk for user in self.users})
+
+    def test_rerun_updates_stored_scores(self):
+        from matcher.models import MatchingScore, UserPreferences
+        cat = self._animal(breed='Сиамская', species='Кошка', age=2)
+        user = self.users[0]
+        options = {'checkpoint': self.checkpoint, 'restart': True, 'stdout': io.StringIO()}
+        call_command('update_matching_scores', **options)
+        score = MatchingScore.objects.get(user=user)
+        self.assertEqual((score.animal_id, score.score), (self.animal.pk, 30))
+
+        # Новые предпочтения: пара с собакой пересчитана, кошка добавлена
+        UserPreferences.objects.filter(user=user).update(
+            preferred_species="['Собака', 'Кошка']", preferred_gender='female'
+        )
+        AnimalAnnouncement.objects.filter(pk=self.animal.pk).update(gender='female')
+        call_command('update_matching_scores', **options)
+        self.assertEqual(dict(MatchingScore.objects.filter(user=user).values_list('animal_id', 'score')),
+                         {self.animal.pk: 40, cat.pk: 30})
+
+        # Собака больше не подходит: ее оценка удалена
+        UserPreferences.objects.filter(user=user).update(preferred_species="['Кошка']")
+        call_command('update_matching_scores', **options)
+        self.assertEqual(list(MatchingScore.objects.filter(user=user).values_list('animal_id', flat=True)),
+                         [cat.pk])
+
+    def test_save_scores_upserts(self):
+        from matcher.models import MatchingScore
+        from matcher.services import save_scores
+        user = self.users[0]
+        save_scores([MatchingScore(user=user, animal=self.animal, score=10, matched_criteria=['age_match'])])
+        save_scores([MatchingScore(user=user, animal=self.animal, score=35, matched_criteria=['species_match'])])
+
+        score = MatchingScore.objects.get()
+        self.assertEqual((score.user_id, score.animal_id), (user.pk, self.animal.pk))
+        self.assertEqual(score.score, 35)
+        self.assertEqual(score.matched_criteria, ['species_match'])
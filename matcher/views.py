@@ -4,10 +4,11 @@ from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
 from .models import UserPreferences, UserInteraction
 from .services import MatchingService, RecommendationService
+from . import collaborative
 from .forms import UserPreferencesForm
+from pagination import paginate
 
 @login_required
 def preferences_update(request):
@@ -34,9 +35,7 @@ def matches_list(request):
     matches = matching_service.get_matches(limit=50)
     
     # Пагинация
-    paginator = Paginator(matches, 12)
-    page = request.GET.get('page')
-    matches = paginator.get_page(page)
+    matches = paginate(request, matches, 12)
     
     return render(request, 'matcher/matches_list.html', {
         'matches': matches
@@ -49,9 +48,7 @@ def recommendations_list(request):
     recommendations = recommendation_service.get_recommendations(limit=24)
     
     # Пагинация
-    paginator = Paginator(recommendations, 12)
-    page = request.GET.get('page')
-    recommendations = paginator.get_page(page)
+    recommendations = paginate(request, recommendations, 12)
     
     return render(request, 'matcher/recommendations_list.html', {
         'recommendations': recommendations
@@ -76,6 +73,7 @@ def record_interaction(request):
             animal_id=animal_id,
             interaction_type=interaction_type
         )
+        collaborative.record_interaction(request.user.id)
         return JsonResponse({
             'status': 'success',
             'interaction_id': interaction.id
@@ -94,9 +92,7 @@ def interaction_history(request):
     ).order_by('-created_at')
     
     # Пагинация
-    paginator = Paginator(interactions, 20)
-    page = request.GET.get('page')
-    interactions = paginator.get_page(page)
+    interactions = paginate(request, interactions, 20)
     
     return render(request, 'matcher/interaction_history.html', {
         'interactions': interactions
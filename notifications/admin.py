@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import counters
 from .models import Notification
 
 @admin.register(Notification)
@@ -12,11 +13,13 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def mark_as_read(self, request, queryset):
         queryset.update(is_read=True)
+        counters.reconcile(set(queryset.values_list('user_id', flat=True)))
         self.message_user(request, f'Отмечено прочитанными: {queryset.count()}')
     mark_as_read.short_description = 'Отметить как прочитанные'
     
     def mark_as_unread(self, request, queryset):
         queryset.update(is_read=False)
+        counters.reconcile(set(queryset.values_list('user_id', flat=True)))
         self.message_user(request, f'Отмечено непрочитанными: {queryset.count()}')
     mark_as_unread.short_description = 'Отметить как непрочитанные'
     
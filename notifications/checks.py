@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core import checks
+
+IN_MEMORY_LAYER = 'channels.layers.InMemoryChannelLayer'
+
+
+@checks.register()
+def check_fanout_channel_layer(app_configs, **kwargs):
+    """
+    Без очереди задач рассылка уходит воркеру notifications-fanout через слой каналов.
+    Слой в памяти процесса воркеру ничего не доставит.
+    """
+    if settings.NOTIFICATIONS_FANOUT_VIA_TASKQUEUE:
+        return []
+    backend = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND')
+    if backend in (None, IN_MEMORY_LAYER):
+        return [checks.Error(
+            'NOTIFICATIONS_FANOUT_VIA_TASKQUEUE is False, but the default channel layer is not shared '
+            'between processes.',
+            hint='Configure a shared channel layer such as channels_redis in CHANNEL_LAYERS, '
+                 'or run the fan-out in the task queue.',
+            id='notifications.E001',
+        )]
+    return []
@@ -0,0 +1,12 @@
+from channels.consumer import SyncConsumer
+from .fanout import RadiusFanout
+
+
+class FanoutConsumer(SyncConsumer):
+    """Воркер рассылки: python manage.py runworker notifications-fanout"""
+
+    def fanout_area(self, message):
+        RadiusFanout(channel_layer=self.channel_layer).run(message)
+
+    def fanout_deliver(self, message):
+        RadiusFanout(channel_layer=self.channel_layer).deliver(message)
@@ -0,0 +1,123 @@
+"""
+Счетчики непрочитанных уведомлений.
+
+Источник правды — таблица UnreadCounter, которая меняется атомарным UPDATE с F().
+Перед ней стоит кэш, поэтому бейдж рисуется без запросов. Строка счетчика
+появляется при первом чтении, значение берется из COUNT(*). Пока строки нет,
+изменения пропускаются: первое чтение все равно посчитает правильное значение.
+
+Уведомления создают и веб-процессы, и воркер задач, поэтому кэш общий (Redis).
+После коммита изменение применяется к нему атомарным incr, чтобы параллельные
+изменения не затирали друг друга, а новое значение отправляется в WebSocket-группу
+пользователя (chat.consumers.NotificationConsumer). Расхождения исправляет
+команда reconcile_unread_counters.
+"""
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from .models import Notification, UnreadCounter
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def unread_count(user_id):
+    """Количество непрочитанных уведомлений; обычно без запросов к базе"""
+    count = cache.get(_cache_key(user_id))
+    if count is None:
+        count = UnreadCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+        if count is None:
+            count = reconcile([user_id])[user_id]
+        # В кэше значение как в таблице, чтобы incr из publish не расходился с ней
+        cache.set(_cache_key(user_id), count, settings.NOTIFICATIONS_UNREAD_CACHE_TTL)
+    return max(count, 0)
+
+
+def adjust(user_ids, delta):
+    """Атомарно меняет счетчики пользователей на delta и публикует их после коммита"""
+    user_ids = list(set(user_ids))
+    if not user_ids or not delta:
+        return
+    UnreadCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + delta)
+    transaction.on_commit(lambda: publish(user_ids, delta))
+
+
+def reconcile(user_ids=None):
+    """
+    Пересчитывает счетчики по таблице уведомлений и возвращает {user_id: unread}
+    для исправленных пользователей. Без user_ids проверяются все счетчики.
+    """
+    unread = Notification.objects.filter(is_read=False)
+    counters = UnreadCounter.objects.all()
+    if user_ids is not None:
+        unread = unread.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+
+    actual = dict(unread.values('user_id').annotate(total=Count('id')).values_list('user_id', 'total'))
+    if user_ids is not None:
+        for user_id in user_ids:
+            actual.setdefault(user_id, 0)
+    stored = dict(counters.values_list('user_id', 'unread'))
+
+    fixed = {}
+    with transaction.atomic():
+        for user_id, count in actual.items():
+            if user_id not in stored:
+                UnreadCounter.objects.get_or_create(user_id=user_id, defaults={'unread': count})
+                fixed[user_id] = count
+            elif stored[user_id] != count:
+                UnreadCounter.objects.filter(user_id=user_id).update(unread=count)
+                fixed[user_id] = count
+        # Счетчики пользователей, у которых не осталось непрочитанных
+        stale = [user_id for user_id, count in stored.items() if user_id not in actual and count]
+        UnreadCounter.objects.filter(user_id__in=stale).update(unread=0)
+        fixed.update(dict.fromkeys(stale, 0))
+
+    if fixed:
+        transaction.on_commit(lambda: publish(list(fixed)))
+    return fixed
+
+
+def publish(user_ids, delta=None):
+    """
+    Обновляет кэш и отправляет новые значения в WebSocket-группы пользователей.
+    С delta закэшированные значения меняются на delta, остальные читаются из таблицы.
+    """
+    counts = {}
+    if delta is not None:
+        for user_id in user_ids:
+            try:
+                counts[user_id] = cache.incr(_cache_key(user_id), delta)
+            except ValueError:
+                # Значения нет в кэше: возьмем его из таблицы
+                pass
+
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        stored = dict(UnreadCounter.objects.filter(user_id__in=missing).values_list('user_id', 'unread'))
+        cache.delete_many([_cache_key(user_id) for user_id in missing if user_id not in stored])
+        cache.set_many(
+            {_cache_key(user_id): count for user_id, count in stored.items()},
+            settings.NOTIFICATIONS_UNREAD_CACHE_TTL
+        )
+        counts.update(stored)
+
+    channel_layer = get_channel_layer()
+    for user_id, count in counts.items():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f'notifications_{user_id}',
+                {
+                    'type': 'notification.message',
+                    'message': {'type': 'unread_count', 'count': max(count, 0)}
+                }
+            )
+        except Exception as e:
+            logger.error(f"Failed to publish unread count for user {user_id}: {e}")
@@ -0,0 +1,285 @@
+"""
+Рассылка уведомлений всем пользователям в радиусе (например, о потерянном животном).
+
+Конвейер из трех стадий выполняется в фоне (очередь задач или воркер каналов), а не в запросе:
+1. поиск получателей по координатам профилей;
+2. создание Notification пачками через bulk_create;
+3. доставка push и WebSocket пачками.
+"""
+import logging
+import threading
+import time
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.module_loading import import_string
+from firebase_admin import exceptions as firebase_exceptions, messaging
+from announcements import geo
+from . import counters
+from .models import Notification, PushToken
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CHANNEL = 'notifications-fanout'
+
+# Результат отправки на один токен
+PUSH_SENT = 'sent'
+PUSH_INVALID = 'invalid'  # токен больше не действует, его отключают
+PUSH_FAILED = 'failed'  # временный сбой, отправка повторяется
+
+
+class PushDeliveryError(Exception):
+    """Сбой FCM, после которого push пачки отправляется повторно"""
+
+
+class FCMSender:
+    """Отправка push через Firebase Cloud Messaging"""
+    max_batch_size = 500  # ограничение FCM на multicast
+    # Ошибки, после которых токен не заработает (UNREGISTERED, INVALID_ARGUMENT и т.п.)
+    permanent_errors = (
+        messaging.UnregisteredError,
+        messaging.SenderIdMismatchError,
+        firebase_exceptions.InvalidArgumentError,
+    )
+
+    def send_multicast(self, tokens, title, body, data):
+        """Возвращает результат (PUSH_SENT, PUSH_INVALID или PUSH_FAILED) по каждому токену"""
+        message = messaging.MulticastMessage(
+            tokens=tokens,
+            notification=messaging.Notification(title=title, body=body),
+            data=data,
+        )
+        response = messaging.send_each_for_multicast(message)
+        return [
+            PUSH_SENT if result.success
+            else PUSH_INVALID if isinstance(result.exception, self.permanent_errors)
+            else PUSH_FAILED
+            for result in response.responses
+        ]
+
+
+class FanoutMetrics:
+    """Счетчики рассылок в процессе воркера"""
+    STAGES = ('query', 'create', 'deliver')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.runs = 0
+            self.batches = 0
+            self.recipients = 0
+            self.notifications_created = 0
+            self.websocket_sent = 0
+            self.push_sent = 0
+            self.push_failed = 0
+            self.seconds = {stage: 0.0 for stage in self.STAGES}
+
+    def record(self, stage, seconds, **counters):
+        with self._lock:
+            self.seconds[stage] += seconds
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        with self._lock:
+            total = sum(self.seconds.values())
+            return {
+                'runs': self.runs,
+                'batches': self.batches,
+                'recipients': self.recipients,
+                'notifications_created': self.notifications_created,
+                'websocket_sent': self.websocket_sent,
+                'push_sent': self.push_sent,
+                'push_failed': self.push_failed,
+                'seconds': dict(self.seconds),
+                'notifications_per_second': self.notifications_created / total if total else 0.0,
+            }
+
+
+metrics = FanoutMetrics()
+
+
+class RadiusFanout:
+    """Конвейер рассылки уведомлений в радиусе"""
+
+    def __init__(self, channel_layer=None, push_sender=None, chunk_size=None):
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.push_sender = push_sender or import_string(settings.NOTIFICATIONS_PUSH_SENDER)()
+        self.chunk_size = chunk_size or settings.NOTIFICATIONS_FANOUT_CHUNK_SIZE
+
+    def schedule(self, latitude, longitude, radius_km, title, message,
+                 notification_type='lost_pet', content_object=None, exclude_user_id=None, data=None):
+        """Ставит рассылку в очередь воркера после фиксации текущей транзакции"""
+        if latitude is None or longitude is None:
+            return
+
+        payload = {
+            'type': 'fanout.area',
+            'latitude': float(latitude),
+            'longitude': float(longitude),
+            'radius_km': float(radius_km),
+            'title': str(title),
+            'message': str(message),
+            'notification_type': notification_type,
+            'content_type_id': ContentType.objects.get_for_model(content_object).id if content_object else None,
+            'object_id': content_object.pk if content_object else None,
+            'exclude_user_id': exclude_user_id,
+            'data': {key: str(value) for key, value in (data or {}).items()},
+        }
+
+        if settings.NOTIFICATIONS_FANOUT_VIA_TASKQUEUE:
+            from .tasks import run_radius_fanout
+            run_radius_fanout.delay(payload)
+        else:
+            transaction.on_commit(lambda: self._enqueue(payload))
+
+    def run(self, payload):
+        """Стадии 1 и 2: получатели и уведомления; доставка уходит в очередь пачками"""
+        started = time.perf_counter()
+        recipients = self.find_recipients(
+            payload['latitude'], payload['longitude'], payload['radius_km'],
+            payload.get('exclude_user_id')
+        )
+        metrics.record('query', time.perf_counter() - started, runs=1, recipients=len(recipients))
+
+        for notification_ids in self.create_notifications([user_id for user_id, _ in recipients], payload):
+            batch = {
+                'type': 'fanout.deliver',
+                'notification_ids': notification_ids,
+                'notification_type': payload['notification_type'],
+                'title': payload['title'],
+                'message': payload['message'],
+                'data': payload['data'],
+            }
+            if settings.NOTIFICATIONS_FANOUT_VIA_TASKQUEUE:
+                self.deliver(batch)
+            else:
+                self._enqueue(batch)
+
+        return len(recipients)
+
+    def find_recipients(self, latitude, longitude, radius_km, exclude_user_id=None):
+        """Стадия 1: (user_id, расстояние) пользователей, чьи последние координаты в радиусе"""
+        users = get_user_model().objects.filter(is_active=True)
+        if exclude_user_id:
+            users = users.exclude(pk=exclude_user_id)
+        return geo.within_radius(
+            users, latitude, longitude, radius_km,
+            lat_field='userprofile__last_latitude',
+            lon_field='userprofile__last_longitude',
+            geohash_field=None
+        )
+
+    def create_notifications(self, user_ids, payload):
+        """Стадия 2: создает уведомления пачками и отдает id каждой пачки"""
+        for start in range(0, len(user_ids), self.chunk_size):
+            started = time.perf_counter()
+            created = Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    notification_type=payload['notification_type'],
+                    title=payload['title'],
+                    message=payload['message'],
+                    content_type_id=payload['content_type_id'],
+                    object_id=payload['object_id'],
+                )
+                for user_id in user_ids[start:start + self.chunk_size]
+            ])
+            # bulk_create обходит сигналы, счетчики непрочитанных обновляем сами
+            counters.adjust([notification.user_id for notification in created], 1)
+            metrics.record('create', time.perf_counter() - started, notifications_created=len(created))
+            yield [notification.id for notification in created]
+
+    def deliver(self, batch):
+        """Стадия 3: WebSocket и push для пачки уведомлений"""
+        started = time.perf_counter()
+        notifications = list(
+            Notification.objects.filter(id__in=batch['notification_ids']).values_list('id', 'user_id')
+        )
+
+        for notification_id, user_id in notifications:
+            async_to_sync(self.channel_layer.group_send)(
+                f'notifications_{user_id}',
+                {
+                    'type': 'notification.message',
+                    'message': {
+                        **batch['data'],
+                        'type': batch['notification_type'],
+                        'notification_id': notification_id,
+                        'title': batch['title'],
+                        'body': batch['message'],
+                    }
+                }
+            )
+
+        push_sent, push_failed = self._send_push(notifications, batch)
+        metrics.record(
+            'deliver', time.perf_counter() - started,
+            batches=1, websocket_sent=len(notifications), push_sent=push_sent, push_failed=push_failed
+        )
+
+    def _send_push(self, notifications, batch, raise_errors=False):
+        """
+        Один multicast на пачку токенов. Отключаются только токены с постоянной ошибкой;
+        уведомления, не доставленные из-за временного сбоя, уходят в retry_fanout_push
+        (или, при raise_errors, сбой поднимается исключением для повтора задачи).
+        """
+        notification_by_user = {user_id: notification_id for notification_id, user_id in notifications}
+        tokens = list(PushToken.objects.filter(
+            user_id__in=notification_by_user, is_active=True
+        ).values_list('token', 'user_id'))
+
+        sent_users, invalid_tokens, retry_users = set(), [], set()
+        sent = 0
+        step = self.push_sender.max_batch_size
+        for start in range(0, len(tokens), step):
+            chunk = tokens[start:start + step]
+            try:
+                results = self.push_sender.send_multicast(
+                    [token for token, _ in chunk], batch['title'], batch['message'], batch['data']
+                )
+            except Exception as e:
+                logger.warning(f"Failed to send fan-out push batch: {e}")
+                results = [PUSH_FAILED] * len(chunk)
+            for (token, user_id), result in zip(chunk, results):
+                if result == PUSH_SENT:
+                    sent += 1
+                    sent_users.add(user_id)
+                elif result == PUSH_INVALID:
+                    invalid_tokens.append(token)
+                else:
+                    retry_users.add(user_id)
+
+        if invalid_tokens:
+            PushToken.objects.filter(token__in=invalid_tokens).update(is_active=False)
+        if sent_users:
+            Notification.objects.filter(
+                id__in=[notification_by_user[user_id] for user_id in sent_users]
+            ).update(is_push_sent=True)
+
+        # Пользователю с другим рабочим устройством повтор не нужен
+        retry_ids = [notification_by_user[user_id] for user_id in retry_users - sent_users]
+        if retry_ids:
+            if raise_errors:
+                raise PushDeliveryError(f'{len(retry_ids)} fan-out push notifications were not delivered')
+            from .tasks import retry_fanout_push
+            retry_fanout_push.delay({**batch, 'notification_ids': retry_ids})
+
+        return sent, len(tokens) - sent
+
+    def resend_push(self, batch):
+        """Повторная отправка push уведомлениям пачки, которые еще не доставлены"""
+        notifications = list(
+            Notification.objects.filter(id__in=batch['notification_ids'], is_push_sent=False)
+            .values_list('id', 'user_id')
+        )
+        return self._send_push(notifications, batch, raise_errors=True)
+
+    def _enqueue(self, message):
+        async_to_sync(self.channel_layer.send)(FANOUT_CHANNEL, message)
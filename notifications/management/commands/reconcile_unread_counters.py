@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from notifications import counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts unread notification counters and repairs drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='+', dest='user_ids',
+                            help='Only reconcile these user ids')
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile(options['user_ids'])
+        for user_id, count in sorted(fixed.items()):
+            self.stdout.write(f'user {user_id}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(fixed)} counters'))
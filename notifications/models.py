@@ -105,6 +105,7 @@ class Notification(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['notification_type']),
             models.Index(fields=['is_read']),
+            models.Index(fields=['user', 'is_read']),
         ]
     
     def __str__(self):
@@ -117,6 +118,23 @@ class Notification(models.Model):
         self.read_at = timezone.now()
         self.save()
 
+class UnreadCounter(models.Model):
+    """Счетчик непрочитанных уведомлений пользователя (см. notifications.counters)"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_notifications_counter'
+    )
+    unread = models.IntegerField(_('Непрочитанных'), default=0)
+    
+    class Meta:
+        verbose_name = _('Счетчик непрочитанных')
+        verbose_name_plural = _('Счетчики непрочитанных')
+    
+    def __str__(self):
+        return f'{self.user}: {self.unread}'
+
 class NotificationBatch(models.Model):
     """Модель для группировки уведомлений для отложенной отправки"""
     user = models.ForeignKey(
@@ -0,0 +1,6 @@
+from .consumers import FanoutConsumer
+from .fanout import FANOUT_CHANNEL
+
+channel_routes = {
+    FANOUT_CHANNEL: FanoutConsumer.as_asgi(),
+}
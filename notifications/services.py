@@ -3,6 +3,7 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models import Q
 from datetime import timedelta
 import firebase_admin
@@ -13,6 +14,7 @@ from .models import (
     NotificationBatch,
     PushToken
 )
+from . import counters
 
 class NotificationService:
     """Сервис для работы с уведомлениями"""
@@ -29,8 +31,17 @@ class NotificationService:
             object_id=content_object.id if content_object else None
         )
         
-        # Получаем настройки пользователя
-        preferences = NotificationPreference.objects.get_or_create(user=user)[0]
+        # Email и push отправляет воркер, чтобы не задерживать запрос
+        from .tasks import deliver_notification
+        deliver_notification.delay(notification.id)
+        
+        return notification
+    
+    @classmethod
+    def deliver(cls, notification):
+        """Отправка email и push по настройкам пользователя; повторный вызов не дублирует отправленное"""
+        preferences = NotificationPreference.objects.get_or_create(user=notification.user)[0]
+        notification_type = notification.notification_type
         
         # Проверяем время для тихого режима
         current_time = timezone.localtime().time()
@@ -42,17 +53,15 @@ class NotificationService:
         # Отправляем уведомления в зависимости от настроек
         if not is_quiet_time:
             # Email уведомления
-            if cls._should_send_email(preferences, notification_type):
+            if not notification.is_email_sent and cls._should_send_email(preferences, notification_type):
                 if preferences.email_frequency == 'instant':
                     cls._send_email_notification(notification)
                 else:
                     cls._add_to_batch(notification, preferences.email_frequency)
             
             # Push уведомления
-            if cls._should_send_push(preferences, notification_type):
+            if not notification.is_push_sent and cls._should_send_push(preferences, notification_type):
                 cls._send_push_notification(notification)
-        
-        return notification
     
     @staticmethod
     def _should_send_email(preferences, notification_type):
@@ -136,6 +145,8 @@ class NotificationService:
             notification.save()
         except Exception as e:
             print(f"Error sending push notification: {e}")
+            # Воркер повторит задачу с задержкой
+            raise
     
     @staticmethod
     def _add_to_batch(notification, frequency):
@@ -215,12 +226,15 @@ class NotificationService:
         if notification_ids:
             queryset = queryset.filter(id__in=notification_ids)
         
-        queryset.update(is_read=True, read_at=now)
+        # Обновлено ровно столько строк, сколько было непрочитанных
+        with transaction.atomic():
+            updated = queryset.update(is_read=True, read_at=now)
+            counters.adjust([user.id], -updated)
     
     @staticmethod
     def get_unread_count(user):
         """Получить количество непрочитанных уведомлений"""
-        return Notification.objects.filter(user=user, is_read=False).count()
+        return counters.unread_count(user.id)
     
     @staticmethod
     def register_push_token(user, token, device_type):
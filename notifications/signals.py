@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from common import loaded_values, remember_on_init
+from . import counters
+from .models import Notification
+
+
+remember_on_init(Notification, '_was_read', lambda instance: loaded_values(instance, 'is_read')[0])
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_counter(sender, instance, created, **kwargs):
+    """Счетчик непрочитанных при создании уведомления и смене is_read через save()"""
+    if created:
+        delta = 0 if instance.is_read else 1
+    elif instance._was_read is None:
+        delta = 0
+    else:
+        delta = int(instance._was_read) - int(instance.is_read)
+    instance._was_read = instance.is_read
+    counters.adjust([instance.user_id], delta)
+
+
+@receiver(post_delete, sender=Notification)
+def decrement_unread_counter(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.adjust([instance.user_id], -1)
@@ -0,0 +1,25 @@
+from taskqueue import task
+from .models import Notification
+from .services import NotificationService
+
+
+@task(max_retries=5)
+def deliver_notification(notification_id):
+    """Email и push для созданного уведомления"""
+    notification = Notification.objects.select_related('user', 'content_type').filter(pk=notification_id).first()
+    if notification:
+        NotificationService.deliver(notification)
+
+
+@task
+def run_radius_fanout(payload):
+    """Стадии поиска получателей и создания уведомлений рассылки в радиусе"""
+    from .fanout import RadiusFanout
+    RadiusFanout().run(payload)
+
+
+@task(max_retries=5)
+def retry_fanout_push(batch):
+    """Повтор push пачки рассылки после временного сбоя FCM"""
+    from .fanout import RadiusFanout
+    RadiusFanout().resend_push(batch)
@@ -1,12 +1,30 @@
-from django.test import TestCase, Client
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
 
 from catalog.models import Product, Category
 from chat.models import Dialog, Message
-from .models import Notification
+from chat.routing import websocket_urlpatterns
+from taskqueue.base import get_backend
+from taskqueue.worker import Worker
+from . import counters
+from .checks import check_fanout_channel_layer
+from .counters import unread_count
+from .models import Notification, PushToken, UnreadCounter
+from .services import NotificationService
+from .fanout import FANOUT_CHANNEL, PUSH_INVALID, PUSH_SENT, RadiusFanout, metrics as fanout_metrics
 
 class NotificationTests(TestCase):
     def setUp(self):
@@ -178,4 +196,251 @@ class NotificationTests(TestCase):
         
         # Проверяем, что статус обновился
         notification.refresh_from_db()
-        self.assertTrue(notification.is_read) 
\ No newline at end of file
+        self.assertTrue(notification.is_read) 
+
+class FakePushSender:
+    max_batch_size = 2
+
+    def __init__(self, failing=(), unavailable=0):
+        self.failing = set(failing)
+        # Столько первых вызовов падают целиком, как при недоступности FCM
+        self.unavailable = unavailable
+        self.calls = []
+
+    def send_multicast(self, tokens, title, body, data):
+        self.calls.append(tokens)
+        if len(self.calls) <= self.unavailable:
+            raise ConnectionError('FCM is unavailable')
+        return [PUSH_INVALID if token in self.failing else PUSH_SENT for token in tokens]
+
+
+@override_settings(NOTIFICATIONS_FANOUT_VIA_TASKQUEUE=False)
+class RadiusFanoutTests(TestCase):
+    def setUp(self):
+        self.User = get_user_model()
+        self.layer = InMemoryChannelLayer()
+        self.sender = FakePushSender(failing={'token-bad'})
+        self.fanout = RadiusFanout(channel_layer=self.layer, push_sender=self.sender, chunk_size=2)
+
+        self.author = self._user('+79990000010', 55.75, 37.62)
+        self.nearby = [
+            self._user('+79990000011', 55.751, 37.621),
+            self._user('+79990000012', 55.76, 37.63),
+            self._user('+79990000013', 55.74, 37.60),
+        ]
+        self.far = self._user('+79990000014', 59.93, 30.31)
+
+        PushToken.objects.create(user=self.nearby[0], token='token-ok', device_type='android')
+        PushToken.objects.create(user=self.nearby[1], token='token-bad', device_type='ios')
+
+    def _user(self, phone, lat, lon):
+        user = self.User.objects.create_user(phone=phone, password='testpass123')
+        user.userprofile.last_latitude = lat
+        user.userprofile.last_longitude = lon
+        user.userprofile.save()
+        return user
+
+    def _receive(self, channel):
+        return async_to_sync(self.layer.receive)(channel)
+
+    def test_pipeline_runs_through_channel_layer(self):
+        channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f'notifications_{self.nearby[0].id}', channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fanout.schedule(
+                55.75, 37.62, 5, 'Потерялась собака', 'Рядом с вами',
+                exclude_user_id=self.author.id, data={'announcement_id': 7}
+            )
+
+        area = self._receive(FANOUT_CHANNEL)
+        self.assertEqual(area['type'], 'fanout.area')
+        self.assertEqual(self.fanout.run(area), 3)
+
+        # 3 получателя при chunk_size=2 дают две пачки доставки
+        for _ in range(2):
+            batch = self._receive(FANOUT_CHANNEL)
+            self.assertEqual(batch['type'], 'fanout.deliver')
+            self.fanout.deliver(batch)
+
+        notifications = Notification.objects.filter(notification_type='lost_pet')
+        self.assertEqual(set(notifications.values_list('user_id', flat=True)), {u.id for u in self.nearby})
+
+        event = self._receive(channel)
+        self.assertEqual(event['type'], 'notification.message')
+        self.assertEqual(event['message']['type'], 'lost_pet')
+        self.assertEqual(event['message']['announcement_id'], '7')
+
+        self.assertTrue(notifications.get(user=self.nearby[0]).is_push_sent)
+        self.assertFalse(notifications.get(user=self.nearby[1]).is_push_sent)
+        self.assertFalse(PushToken.objects.get(token='token-bad').is_active)
+
+    def test_nothing_scheduled_without_coordinates(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.fanout.schedule(None, None, 5, 'Заголовок', 'Текст')
+        self.assertEqual(callbacks, [])
+
+    @override_settings(
+        NOTIFICATIONS_PUSH_SENDER='notifications.tests.FakePushSender',
+        TASKS_BACKEND='taskqueue.backends.InMemoryBackend',
+    )
+    def test_fcm_outage_is_retried_without_disabling_tokens(self):
+        get_backend().jobs.clear()
+        self.fanout.push_sender = FakePushSender(unavailable=1)
+        payload = {
+            'notification_type': 'lost_pet', 'title': 'Заголовок', 'message': 'Текст',
+            'content_type_id': None, 'object_id': None,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            notification_ids = next(self.fanout.create_notifications([u.id for u in self.nearby[:2]], payload))
+            self.fanout.deliver({
+                'type': 'fanout.deliver', 'notification_ids': notification_ids, 'notification_type': 'lost_pet',
+                'title': 'Заголовок', 'message': 'Текст', 'data': {},
+            })
+
+        self.assertEqual(PushToken.objects.filter(is_active=True).count(), 2)
+        notifications = Notification.objects.filter(id__in=notification_ids)
+        self.assertFalse(notifications.filter(is_push_sent=True).exists())
+
+        self.assertEqual(Worker().drain(), 1)
+        self.assertEqual(notifications.filter(is_push_sent=True).count(), 2)
+
+    @override_settings(
+        NOTIFICATIONS_FANOUT_VIA_TASKQUEUE=True,
+        NOTIFICATIONS_PUSH_SENDER='notifications.tests.FakePushSender',
+        NOTIFICATIONS_FANOUT_CHUNK_SIZE=2,
+        TASKS_BACKEND='taskqueue.backends.InMemoryBackend',
+    )
+    def test_pipeline_runs_in_task_queue(self):
+        fanout_metrics.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fanout.schedule(55.75, 37.62, 5, 'Заголовок', 'Текст', exclude_user_id=self.author.id)
+
+        self.assertEqual(Worker().drain(), 1)
+
+        stats = fanout_metrics.as_dict()
+        self.assertEqual(stats['recipients'], 3)
+        self.assertEqual(stats['notifications_created'], 3)
+        self.assertEqual(stats['batches'], 2)
+        self.assertEqual(stats['websocket_sent'], 3)
+        self.assertEqual((stats['push_sent'], stats['push_failed']), (2, 0))
+        self.assertFalse(Notification.objects.filter(user=self.far).exists())
+
+
+class FanoutChannelLayerCheckTests(SimpleTestCase):
+    in_memory = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    shared = {'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer'}}
+
+    def test_task_queue_needs_no_channel_layer(self):
+        with self.settings(NOTIFICATIONS_FANOUT_VIA_TASKQUEUE=True, CHANNEL_LAYERS=self.in_memory):
+            self.assertEqual(check_fanout_channel_layer(None), [])
+
+    def test_channel_worker_needs_shared_layer(self):
+        with self.settings(NOTIFICATIONS_FANOUT_VIA_TASKQUEUE=False, CHANNEL_LAYERS=self.in_memory):
+            self.assertEqual([error.id for error in check_fanout_channel_layer(None)], ['notifications.E001'])
+        with self.settings(NOTIFICATIONS_FANOUT_VIA_TASKQUEUE=False, CHANNEL_LAYERS=self.shared):
+            self.assertEqual(check_fanout_channel_layer(None), [])
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(phone='+79990000031', password='testpass123')
+        self.layer = InMemoryChannelLayer()
+
+    def _notify(self, **fields):
+        return Notification.objects.create(
+            user=self.user, notification_type='system', title='Заголовок', message='Текст', **fields
+        )
+
+    def test_badge_needs_no_queries(self):
+        self._notify()
+        self._notify()
+        self.assertEqual(unread_count(self.user.id), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.user.id), 2)
+
+    def test_create_read_delete_keep_counter_exact(self):
+        unread_count(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._notify()
+            second = self._notify()
+            self._notify(is_read=True)
+        self.assertEqual(unread_count(self.user.id), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.mark_as_read()
+        self.assertEqual(unread_count(self.user.id), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(unread_count(self.user.id), 0)
+
+    def test_mark_as_read_service(self):
+        unread_count(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self._notify()
+            NotificationService.mark_as_read(self.user)
+        self.assertEqual(unread_count(self.user.id), 0)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 0)
+
+    def test_change_pushed_over_websocket(self):
+        unread_count(self.user.id)
+        channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f'notifications_{self.user.id}', channel)
+
+        with patch('notifications.counters.get_channel_layer', return_value=self.layer):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._notify()
+
+        event = async_to_sync(self.layer.receive)(channel)
+        self.assertEqual(event['message'], {'type': 'unread_count', 'count': 1})
+
+    def test_reconcile_repairs_drift(self):
+        self._notify()
+        unread_count(self.user.id)
+        UnreadCounter.objects.filter(user=self.user).update(unread=7)
+
+        call_command('reconcile_unread_counters', stdout=StringIO())
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 1)
+        self.assertEqual(counters.reconcile(), {})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(phone='+79990000032', password='testpass123')
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/notifications/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    def test_badge_updates_reach_subscribed_socket(self):
+        # Счетчик уже прочитан страницей
+        unread_count(self.user.id)
+
+        async def scenario():
+            communicator, connected = await self._connect(self.user)
+            await database_sync_to_async(Notification.objects.create)(
+                user=self.user, notification_type='system', title='Заголовок', message='Текст'
+            )
+            update = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return connected, update
+
+        connected, update = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual(update, {'type': 'unread_count', 'count': 1})
+
+    def test_anonymous_is_rejected(self):
+        async def scenario():
+            communicator, connected = await self._connect(AnonymousUser())
+            await communicator.disconnect()
+            return connected
+
+        self.assertFalse(async_to_sync(scenario)())
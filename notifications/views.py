@@ -2,13 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
 from django.utils import timezone
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from .models import Notification, NotificationPreference, PushToken
 from .services import NotificationService
 from .forms import NotificationPreferenceForm
+from pagination import paginate
 
 @login_required
 def notification_list(request):
@@ -31,9 +31,7 @@ def notification_list(request):
         notifications = notifications.filter(is_read=is_read == 'true')
     
     # Пагинация
-    paginator = Paginator(notifications, 20)
-    page = request.GET.get('page')
-    notifications = paginator.get_page(page)
+    notifications = paginate(request, notifications, 20)
     
     # Получаем количество непрочитанных
     unread_count = NotificationService.get_unread_count(request.user)
@@ -155,14 +153,13 @@ def mark_notification_read(request, notification_id):
 @login_required
 def mark_all_read(request):
     """Отметить все уведомления как прочитанные"""
-    request.user.notifications.filter(is_read=False).update(is_read=True)
+    NotificationService.mark_as_read(request.user)
     return JsonResponse({'status': 'success'})
 
 @login_required
 def get_unread_count(request):
     """Получить количество непрочитанных уведомлений"""
-    count = request.user.notifications.filter(is_read=False).count()
-    return JsonResponse({'count': count})
+    return JsonResponse({'count': NotificationService.get_unread_count(request.user)})
 
 @login_required
 def delete_notification(request, notification_id):
@@ -0,0 +1,3 @@
+from .cursor import CursorPage, CursorPaginator, approximate_count, paginate
+
+__all__ = ['CursorPage', 'CursorPaginator', 'approximate_count', 'paginate']
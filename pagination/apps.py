@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class PaginationConfig(AppConfig):
+    name = 'pagination'
+    verbose_name = _('Постраничный вывод')
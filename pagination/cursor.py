@@ -0,0 +1,312 @@
+"""
+Постраничный вывод по ключу (keyset) вместо OFFSET.
+
+Следующая страница начинается после последней строки текущей: условие
+WHERE (created_at, id) < (...) по тем же полям, что и ORDER BY. Стоимость запроса
+не растет с глубиной страницы, и COUNT(*) не нужен. Курсор непрозрачный: base64
+от JSON со значениями полей сортировки граничной строки и направлением.
+
+Если queryset отсортирован не по полям модели (например, по релевантности
+поиска) или вместо queryset передан список, курсор хранит смещение.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+CURSOR_PARAM = 'cursor'
+
+
+@dataclass
+class Key:
+    """Поле сортировки: путь, направление и поле модели"""
+    name: str
+    descending: bool
+    field: object
+
+    @property
+    def alias(self):
+        return f'cursor_{self.name}'
+
+
+def encode_cursor(state):
+    data = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Состояние из курсора; None для пустого или испорченного курсора"""
+    if not cursor:
+        return None
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def approximate_count(queryset):
+    """
+    (число строк, точно ли оно). На PostgreSQL — оценка планировщика, в остальных
+    базах — COUNT с ограничением PAGINATION_COUNT_CAP.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), False
+
+    cap = settings.PAGINATION_COUNT_CAP
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count <= cap
+
+
+class CursorPage:
+    """Страница объектов и курсоры соседних страниц"""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None, request=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.request = request
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @cached_property
+    def _count(self):
+        return self.paginator.count()
+
+    @property
+    def count(self):
+        """Число объектов во всем списке, на больших списках приблизительное"""
+        return self._count[0]
+
+    @property
+    def count_text(self):
+        count, exact = self._count
+        if exact:
+            return str(count)
+        if count >= settings.PAGINATION_COUNT_CAP:
+            return f'{count}+'
+        return f'≈{count}'
+
+    def _query(self, cursor):
+        params = self.request.GET.copy() if self.request is not None else QueryDict(mutable=True)
+        params.pop('page', None)
+        params[CURSOR_PARAM] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        """Строка запроса со ссылкой на следующую страницу (остальные параметры сохраняются)"""
+        return self._query(self.next_cursor) if self.next_cursor else ''
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor) if self.previous_cursor else ''
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод queryset по курсорам. Сортировка берется из queryset
+    (или его модели), к ней добавляется pk, чтобы ключ был уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = self._keys(ordering) if isinstance(object_list, QuerySet) else None
+
+    def _keys(self, ordering):
+        queryset = self.object_list
+        model = queryset.model
+        if ordering is None:
+            if queryset.query.order_by:
+                ordering = queryset.query.order_by
+            elif queryset.query.default_ordering:
+                ordering = model._meta.ordering
+            else:
+                ordering = []
+
+        keys = []
+        for item in ordering:
+            if not isinstance(item, str) or item.lstrip('-') in ('', '?'):
+                return None
+            name = item.lstrip('-')
+            field = self._field(model, name)
+            if field is None:
+                return None
+            keys.append(Key('pk' if field.primary_key and '__' not in name else name, item.startswith('-'), field))
+            if keys[-1].name == 'pk':
+                return keys
+        keys.append(Key('pk', keys[-1].descending if keys else False, model._meta.pk))
+        return keys
+
+    @staticmethod
+    def _field(model, name):
+        """Поле модели по пути; None для аннотаций и связей (их сортировка неоднозначна)"""
+        if name == 'pk':
+            return model._meta.pk
+        parts = name.split('__')
+        try:
+            for part in parts[:-1]:
+                model = model._meta.get_field(part).related_model
+                if model is None:
+                    return None
+            field = model._meta.get_field(parts[-1])
+        except FieldDoesNotExist:
+            return None
+        return None if field.is_relation else field
+
+    def _order_by(self, reverse):
+        # NULL всегда после значений при движении вперед
+        order_by = []
+        for key in self.keys:
+            descending = key.descending != reverse
+            nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            expression = F(key.name)
+            if not key.field.null:
+                nulls = {}
+            order_by.append(expression.desc(**nulls) if descending else expression.asc(**nulls))
+        return order_by
+
+    def _beyond(self, values, reverse):
+        """Условие «строка дальше граничной» в порядке обхода"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for key, value in zip(self.keys, values):
+            descending = key.descending != reverse
+            if value is None:
+                # NULL в конце при обходе вперед и в начале при обходе назад
+                beyond = Q(**{f'{key.name}__isnull': False}) if reverse else None
+                same = Q(**{f'{key.name}__isnull': True})
+            else:
+                beyond = Q(**{f'{key.name}__{"lt" if descending else "gt"}': value})
+                if key.field.null and not reverse:
+                    beyond |= Q(**{f'{key.name}__isnull': True})
+                same = Q(**{key.name: value})
+            if beyond is not None:
+                condition |= equal & beyond
+            equal &= same
+
+        # Избыточная граница по первому полю: по ней база ищет начало в индексе,
+        # а не просматривает его с начала (условие с OR индекс не сужает)
+        first, value = self.keys[0], values[0]
+        if value is not None and (reverse or not first.field.null):
+            descending = first.descending != reverse
+            condition &= Q(**{f'{first.name}__{"lte" if descending else "gte"}': value})
+        return condition
+
+    def _values(self, obj):
+        return [_json_value(getattr(obj, key.alias)) for key in self.keys]
+
+    def _parse(self, values):
+        return [None if value is None else key.field.to_python(value) for key, value in zip(self.keys, values)]
+
+    def page(self, cursor=None, request=None):
+        """Страница по курсору; пустой или испорченный курсор дает первую страницу"""
+        state = decode_cursor(cursor)
+        if self.keys is None:
+            return self._offset_page(state, request)
+
+        values = state.get('v') if state else None
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            values = None
+        reverse = bool(values is not None and state.get('r'))
+
+        queryset = self.object_list.annotate(**{key.alias: F(key.name) for key in self.keys})
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._beyond(self._parse(values), reverse))
+            except (ValidationError, TypeError, ValueError):
+                # Значения курсора не приводятся к типам полей
+                return self.page(None, request)
+
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, values is not None
+
+        return CursorPage(
+            rows, self,
+            next_cursor=encode_cursor({'v': self._values(rows[-1])}) if rows and has_next else None,
+            previous_cursor=encode_cursor({'v': self._values(rows[0]), 'r': 1}) if rows and has_previous else None,
+            request=request,
+        )
+
+    def cursor_after(self, obj):
+        """Курсор страницы, которая начинается сразу после obj (только для queryset)"""
+        values = []
+        for key in self.keys:
+            value = obj
+            for part in key.name.split('__'):
+                value = getattr(value, part)
+            values.append(_json_value(value))
+        return encode_cursor({'v': values})
+
+    def _offset_page(self, state, request):
+        offset = state.get('o') if state else 0
+        if not isinstance(offset, int) or offset < 0:
+            offset = 0
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self,
+            next_cursor=encode_cursor({'o': offset + self.per_page}) if has_next else None,
+            previous_cursor=encode_cursor({'o': max(offset - self.per_page, 0)}) if offset else None,
+            request=request,
+        )
+
+    def count(self):
+        """(число объектов, точно ли оно)"""
+        if isinstance(self.object_list, QuerySet):
+            return approximate_count(self.object_list)
+        return len(self.object_list), True
+
+
+def paginate(request, object_list, per_page, ordering=None):
+    """Страница списка по курсору из GET-параметра cursor"""
+    return CursorPaginator(object_list, per_page, ordering).page(request.GET.get(CURSOR_PARAM), request)
@@ -0,0 +1,76 @@
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from catalog.models import Category, Product
+from pagination import CursorPaginator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compares OFFSET pagination with keyset cursors on deep pages of synthetic products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000, help='Number of synthetic products')
+        parser.add_argument('--per-page', type=int, default=24)
+        parser.add_argument('--depths', type=int, nargs='+', default=[1, 100, 1000, 4000],
+                            help='Page numbers to measure')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(options['size'], options['batch_size'])
+            # Статистика для планировщика, иначе он выбирает индекс по status и сортирует все строки
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            queryset = Product.objects.filter(status='active')
+            per_page = options['per_page']
+            for depth in options['depths']:
+                cursor = self._cursor_at(queryset, per_page, depth)
+                if cursor is False:
+                    self.stdout.write(f'page {depth:>6} | beyond the data set')
+                    continue
+
+                offset = self._time(lambda: list(Paginator(queryset, per_page).get_page(depth)), options['repeat'])
+                keyset = self._time(lambda: list(CursorPaginator(queryset, per_page).page(cursor)), options['repeat'])
+                self.stdout.write(
+                    f'page {depth:>6} | offset {offset * 1000:8.2f} ms | cursor {keyset * 1000:8.2f} ms'
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, size, batch_size):
+        seller = User.objects.create_user(phone='+70000000003')
+        category = Category.objects.create(name='Benchmark', slug='benchmark-pagination')
+        now = timezone.now()
+        for start in range(0, size, batch_size):
+            Product.objects.bulk_create(
+                Product(
+                    seller=seller, category=category, slug=f'benchmark-{number}',
+                    title=f'Товар {number}', description='Описание', price=100,
+                    condition='new', status='active', created=now - timedelta(minutes=number),
+                )
+                for number in range(start, min(start + batch_size, size))
+            )
+
+    @staticmethod
+    def _cursor_at(queryset, per_page, depth):
+        """Курсор страницы depth от последней строки предыдущей страницы"""
+        if depth == 1:
+            return None
+        rows = list(queryset.order_by('-created', '-pk')[(depth - 1) * per_page - 1:(depth - 1) * per_page])
+        if not rows:
+            return False
+        return CursorPaginator(queryset, per_page).cursor_after(rows[0])
+
+    @staticmethod
+    def _time(func, repeat):
+        func()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat
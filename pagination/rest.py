@@ -0,0 +1,61 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from .cursor import CURSOR_PARAM, CursorPaginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация DRF поверх CursorPaginator: сортировка берется из
+    queryset после фильтров (в том числе OrderingFilter). Приблизительное
+    число объектов добавляется в ответ по ?count=1.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = CURSOR_PARAM
+    count_query_param = 'count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page = CursorPaginator(queryset, self.get_page_size(request)).page(
+            request.query_params.get(self.cursor_query_param)
+        )
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+        }
+        if self.request.query_params.get(self.count_query_param):
+            body['count'] = self.page.count
+            body['count_text'] = self.page.count_text
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_text': {'type': 'string'},
+                'results': schema,
+            },
+        }
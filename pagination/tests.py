@@ -0,0 +1,124 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db.models import Case, IntegerField, When
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from announcements.models import AnnouncementCategory
+from announcements.views_api import AnnouncementCategoryViewSet
+from catalog.models import Category, Product
+from pagination import CursorPaginator, approximate_count, paginate
+from pagination.cursor import encode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(phone='+79990000121', password='testpass123')
+        category = Category.objects.create(name='Собаки', slug='dogs')
+        cls.products = [
+            Product.objects.create(
+                seller=seller, category=category, title=f'Товар {i}', description='Описание',
+                price=None if i % 4 == 0 else 100 * (i % 3), condition='new'
+            )
+            for i in range(11)
+        ]
+        # Одинаковые даты: порядок внутри них решает pk
+        now = timezone.now()
+        for i, product in enumerate(cls.products):
+            Product.objects.filter(pk=product.pk).update(created=now - timedelta(days=i // 3))
+
+    def _walk(self, queryset, per_page=3):
+        paginator = CursorPaginator(queryset, per_page)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_forward_and_backward_walk(self):
+        queryset = Product.objects.all()
+        expected = list(queryset.order_by('-created', '-pk'))
+        paginator, pages = self._walk(queryset)
+
+        self.assertEqual([product for page in pages for product in page], expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertEqual(len(pages), 4)
+
+        # Назад с последней страницы получаются те же страницы
+        page = pages[-1]
+        for previous in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual(list(page), list(previous))
+        self.assertFalse(page.has_previous())
+
+    def test_nullable_field(self):
+        queryset = Product.objects.order_by('price')
+        _, pages = self._walk(queryset, per_page=4)
+        products = [product for page in pages for product in page]
+
+        self.assertEqual(len(products), len(self.products))
+        prices = [product.price for product in products]
+        self.assertEqual(prices, sorted(p for p in prices if p is not None) + [None] * prices.count(None))
+
+    def test_one_query_per_page(self):
+        paginator = CursorPaginator(Product.objects.all(), 5)
+        with self.assertNumQueries(1):
+            page = paginator.page()
+        with self.assertNumQueries(1):
+            paginator.page(page.next_cursor)
+
+    def test_offset_fallback_and_invalid_cursor(self):
+        pks = [product.pk for product in self.products[::-1]]
+        queryset = Product.objects.order_by(Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(pks)], output_field=IntegerField()
+        ))
+        _, pages = self._walk(queryset, per_page=4)
+        self.assertEqual([product.pk for page in pages for product in page], pks)
+
+        _, pages = self._walk(list(range(7)), per_page=5)
+        self.assertEqual([list(page) for page in pages], [[0, 1, 2, 3, 4], [5, 6]])
+
+        self.assertEqual(list(CursorPaginator(Product.objects.all(), 3).page('bad!cursor')),
+                         list(Product.objects.order_by('-created', '-pk')[:3]))
+
+    def test_cursor_with_wrong_values(self):
+        """Значения, которые не приводятся к типам полей, дают первую страницу"""
+        first = list(Product.objects.order_by('-created', '-pk')[:3])
+        paginator = CursorPaginator(Product.objects.all(), 3)
+        self.assertEqual(list(paginator.page(encode_cursor({'v': ['not a date', 'x']}))), first)
+        self.assertEqual(list(paginator.page(encode_cursor({'v': [None, {'pk': 1}]}))), first)
+
+    def test_query_without_request(self):
+        page = CursorPaginator(Product.objects.all(), 3).page()
+        self.assertEqual(page.next_query, f'cursor={page.next_cursor}')
+
+    @override_settings(PAGINATION_COUNT_CAP=5)
+    def test_approximate_count(self):
+        self.assertEqual(approximate_count(Product.objects.all()), (5, False))
+        self.assertEqual(approximate_count(Product.objects.filter(price=200)), (2, True))
+
+        request = RequestFactory().get('/', {'q': 'товар', 'page': '2'})
+        page = paginate(request, Product.objects.all(), 3)
+        self.assertEqual(page.count_text, '5+')
+        self.assertIn('q=', page.next_query)
+        self.assertNotIn('page=', page.next_query)
+
+
+class KeysetPaginationTest(TestCase):
+    def test_api_list(self):
+        for i in range(5):
+            AnnouncementCategory.objects.create(name='Категория', slug=f'category-{i}')
+        view = AnnouncementCategoryViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        response = view(factory.get('/categories/', {'page_size': 3, 'count': 1}))
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNone(response.data['previous'])
+
+        response = view(factory.get(response.data['next']))
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+        self.assertIn('count=1', response.data['previous'])
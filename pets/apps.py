@@ -4,4 +4,7 @@ from django.utils.translation import gettext_lazy as _
 class PetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pets'
-    verbose_name = _('Питомцы') 
\ No newline at end of file
+    verbose_name = _('Питомцы') 
+
+    def ready(self):
+        import pets.signals  # noqa
@@ -0,0 +1,141 @@
+"""
+Колода карточек для свайпов.
+
+Вместо ORDER BY RANDOM() по всей таблице на каждый запрос колода заранее
+выбирает пачку id (сначала премиум, затем популярные), перемешивает их внутри
+уровней популярности и кладет в кэш по одной карточке на ключ. Выдача карточки —
+это incr указателя и один get, без запросов к базе.
+"""
+import math
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from announcements.models import Announcement
+from .models import SwipeAction
+
+
+class SwipeDeck:
+    """Очередь карточек пользователя для одного типа объявлений"""
+
+    def __init__(self, user, announcement_type=Announcement.TYPE_ANIMAL, batch_size=None, ttl=None):
+        self.user_id = getattr(user, 'pk', user)
+        self.announcement_type = announcement_type
+        self.batch_size = batch_size or settings.SWIPE_DECK_BATCH_SIZE
+        self.ttl = ttl or settings.SWIPE_DECK_TTL
+
+    def next_ids(self, count=1):
+        """id следующих карточек; снятые с публикации объявления пропускаются"""
+        ids = []
+        # Снятые карточки выпадут из колоды при следующей сборке, поэтому хватает нескольких проходов
+        for _ in range(3):
+            popped = self.pop_ids(count - len(ids))
+            if not popped:
+                break
+            active = set(Announcement.objects.filter(
+                pk__in=popped, status=Announcement.STATUS_ACTIVE
+            ).values_list('pk', flat=True))
+            ids.extend(pk for pk in popped if pk in active)
+            if len(ids) >= count:
+                break
+        return ids
+
+    def next_cards(self, count=1):
+        """Следующие карточки в порядке колоды"""
+        ids = self.next_ids(count)
+        cards = Announcement.objects.in_bulk(ids)
+        return [cards[pk] for pk in ids if pk in cards]
+
+    def pop_ids(self, count=1):
+        """Снимает с колоды до count id; пустая колода пересобирается следующей пачкой"""
+        prefix = self._prefix(self.user_id)
+        deck = f'{prefix}:{self.announcement_type}'
+        ids = []
+        builds = 0
+
+        while len(ids) < count:
+            size = cache.get(f'{deck}:size')
+            if size is None:
+                if builds > count // self.batch_size + 1:
+                    break
+                builds += 1
+                size = self._build(deck)
+                if not size:
+                    break
+
+            try:
+                position = cache.incr(f'{deck}:pos')
+            except ValueError:
+                # Указатель вытеснен из кэша раньше колоды
+                cache.delete(f'{deck}:size')
+                continue
+
+            if position > size:
+                cache.delete(f'{deck}:size')
+                continue
+
+            card = cache.get(f'{deck}:{position}')
+            if card is None or cache.get(f'{prefix}:skip:{card}'):
+                continue
+            ids.append(card)
+
+        return ids
+
+    def _build(self, deck):
+        """Кладет в кэш следующую пачку карточек и возвращает ее размер"""
+        swiped = SwipeAction.objects.filter(user_id=self.user_id, announcement=OuterRef('pk'))
+        candidates = Announcement.objects.filter(
+            status=Announcement.STATUS_ACTIVE,
+            type=self.announcement_type
+        ).exclude(
+            author_id=self.user_id
+        ).exclude(
+            Exists(swiped)
+        ).order_by('-is_premium', '-views_count', '-id')
+
+        fields = ('id', 'is_premium', 'views_count')
+        cursor = cache.get(f'{deck}:cursor')
+        rows = []
+        if cursor:
+            last_id, is_premium, views_count = cursor
+            rows = list(candidates.filter(
+                Q(is_premium__lt=is_premium) |
+                Q(is_premium=is_premium, views_count__lt=views_count) |
+                Q(is_premium=is_premium, views_count=views_count, id__lt=last_id)
+            ).values_list(*fields)[:self.batch_size])
+        if not rows:
+            # Колода пройдена целиком: начинаем сначала с тем, что еще не свайпнуто
+            rows = list(candidates.values_list(*fields)[:self.batch_size])
+        if not rows:
+            cache.delete(f'{deck}:cursor')
+            return 0
+
+        cursor = rows[-1]
+        # Премиум остается первым, внутри уровня популярности порядок случайный
+        rows.sort(key=lambda row: (not row[1], -int(math.log2(row[2] + 1)), random.random()))
+
+        values = {f'{deck}:{position}': row[0] for position, row in enumerate(rows, 1)}
+        values[f'{deck}:pos'] = 0
+        values[f'{deck}:cursor'] = cursor
+        cache.set_many(values, self.ttl)
+        # Размер пишем последним: по нему читатели понимают, что колода собрана
+        cache.set(f'{deck}:size', len(rows), self.ttl)
+        return len(rows)
+
+    @staticmethod
+    def _prefix(user_id):
+        generation = cache.get_or_set(f'swipe_deck:{user_id}:gen', 0, None)
+        return f'swipe_deck:{user_id}:{generation}'
+
+    @classmethod
+    def discard(cls, user_id, announcement_id):
+        """Убирает объявление из всех колод пользователя, не пересобирая их"""
+        cache.set(f'{cls._prefix(user_id)}:skip:{announcement_id}', True, settings.SWIPE_DECK_TTL)
+
+    @classmethod
+    def reset(cls, user_id):
+        """Сбрасывает все колоды пользователя"""
+        try:
+            cache.incr(f'swipe_deck:{user_id}:gen')
+        except ValueError:
+            cache.set(f'swipe_deck:{user_id}:gen', 1, None)
@@ -0,0 +1,84 @@
+import random
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from announcements.models import Announcement, AnnouncementCategory
+from pets.deck import SwipeDeck
+from pets.models import SwipeAction
+
+User = get_user_model()
+
+
+def legacy_next_card(user):
+    """Старая выдача: анти-join по свайпам и ORDER BY RANDOM() на каждую карточку"""
+    swiped = SwipeAction.objects.filter(user=user, announcement=OuterRef('pk'))
+    return Announcement.objects.filter(
+        status=Announcement.STATUS_ACTIVE,
+        type=Announcement.TYPE_ANIMAL
+    ).exclude(author=user).exclude(Exists(swiped)).order_by('-is_premium', '?').first()
+
+
+class Command(BaseCommand):
+    help = 'Compares cards per second of the cached swipe deck with the ORDER BY RANDOM() query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of active announcements')
+        parser.add_argument('--cards', type=int, default=200, help='Cards fetched per run')
+        parser.add_argument('--swiped', type=int, default=500, help='Announcements already swiped by the user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        for size in options['sizes']:
+            self._run(size, options)
+
+    def _run(self, size, options):
+        with transaction.atomic():
+            user = User.objects.create_user(phone='+70000000002')
+            author = User.objects.create_user(phone='+70000000003')
+            category = AnnouncementCategory.objects.create(name='Benchmark', slug='benchmark-swipe')
+            self._populate(size, author, category, options['batch_size'])
+
+            swiped = Announcement.objects.filter(author=author).values_list('pk', flat=True)[:options['swiped']]
+            SwipeAction.objects.bulk_create([
+                SwipeAction(user=user, announcement_id=pk, direction=SwipeAction.DISLIKE) for pk in swiped
+            ])
+
+            cards = options['cards']
+            started = time.perf_counter()
+            for _ in range(cards):
+                legacy_next_card(user)
+            legacy = cards / (time.perf_counter() - started)
+
+            cache.clear()
+            deck = SwipeDeck(user)
+            started = time.perf_counter()
+            for _ in range(cards):
+                deck.next_cards(1)
+            cached = cards / (time.perf_counter() - started)
+
+            self.stdout.write(
+                f'{size:>8} rows | query {legacy:10.1f} cards/s | deck {cached:10.1f} cards/s | '
+                f'x{cached / max(legacy, 1e-9):.0f}'
+            )
+            transaction.set_rollback(True)
+
+    def _populate(self, size, author, category, batch_size):
+        for start in range(0, size, batch_size):
+            Announcement.objects.bulk_create([
+                Announcement(
+                    title='Benchmark',
+                    description='',
+                    category=category,
+                    type=Announcement.TYPE_ANIMAL,
+                    status=Announcement.STATUS_ACTIVE,
+                    author=author,
+                    is_premium=random.random() < 0.05,
+                    views_count=int(random.paretovariate(1.2)),
+                )
+                for _ in range(min(batch_size, size - start))
+            ])
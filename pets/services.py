@@ -1,33 +1,16 @@
 from typing import List
-from django.db.models import Q, Exists, OuterRef
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from announcements.models import Announcement
 from .models import SwipeAction, Match
+from .deck import SwipeDeck
 
 User = get_user_model()
 
 class SwipeSystem:
     def get_next_cards(self, user_id: int, count: int = 10) -> List[Announcement]:
         """Получение следующих карточек для показа"""
-        # Получаем текущего пользователя
-        user = User.objects.get(id=user_id)
-        
-        # Получаем все объявления, которые пользователь еще не свайпал
-        viewed_announcements = SwipeAction.objects.filter(
-            user=user,
-            announcement=OuterRef('pk')
-        )
-        
-        available_announcements = Announcement.objects.filter(
-            status='active',
-            type='animal'
-        ).exclude(
-            author=user  # Исключаем собственные объявления
-        ).exclude(
-            Exists(viewed_announcements)  # Исключаем уже просмотренные
-        ).order_by('?')  # Случайный порядок
-        
-        return list(available_announcements[:count])
+        return SwipeDeck(user_id, Announcement.TYPE_ANIMAL).next_cards(count)
 
     def process_swipe(self, user_id: int, announcement_id: int, direction: str) -> bool:
         """Обработка свайпа"""
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .deck import SwipeDeck
+from .models import SwipeAction
+
+
+@receiver(post_save, sender=SwipeAction)
+def discard_swiped_card(sender, instance, created, **kwargs):
+    """Свайпнутая карточка больше не выдается из колоды"""
+    if created:
+        SwipeDeck.discard(instance.user_id, instance.announcement_id)
+
+
+@receiver(post_delete, sender=SwipeAction)
+def reset_deck_on_undo(sender, instance, **kwargs):
+    """После отмены свайпа карточка должна вернуться в колоду"""
+    SwipeDeck.reset(instance.user_id)
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from announcements.models import Announcement, AnnouncementCategory
+from pets.deck import SwipeDeck
+from pets.models import SwipeAction
+
+User = get_user_model()
+
+
+class SwipeDeckTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone='+79001230001', password='pass')
+        self.author = User.objects.create_user(phone='+79001230002', password='pass')
+        self.category = AnnouncementCategory.objects.create(name='Собаки', slug='deck-dogs')
+
+        self.premium = self._create(is_premium=True, views_count=1)
+        self.popular = self._create(views_count=1000)
+        self.regular = [self._create(views_count=3) for _ in range(3)]
+        self.own = self._create(author=self.user, is_premium=True)
+
+    def _create(self, author=None, **fields):
+        return Announcement.objects.create(
+            author=author or self.author,
+            title='Карточка',
+            description='Описание',
+            category=self.category,
+            status=Announcement.STATUS_ACTIVE,
+            type=Announcement.TYPE_ANIMAL,
+            **fields
+        )
+
+    def test_premium_then_popularity(self):
+        ids = SwipeDeck(self.user).next_ids(5)
+        self.assertEqual(ids[:2], [self.premium.pk, self.popular.pk])
+        self.assertEqual(set(ids[2:]), {a.pk for a in self.regular})
+        self.assertNotIn(self.own.pk, ids)
+
+    def test_pop_from_built_deck_hits_no_database(self):
+        deck = SwipeDeck(self.user)
+        deck.pop_ids(1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(deck.pop_ids(3)), 3)
+
+    def test_batches_cover_all_cards_then_wrap(self):
+        deck = SwipeDeck(self.user, batch_size=2)
+        first_pass = [deck.pop_ids(1)[0] for _ in range(5)]
+        self.assertEqual(len(set(first_pass)), 5)
+        self.assertEqual(first_pass[0], self.premium.pk)
+        # Несвайпнутые карточки возвращаются по кругу
+        self.assertEqual(deck.pop_ids(1), [self.premium.pk])
+
+    def test_swipe_discards_queued_card(self):
+        deck = SwipeDeck(self.user)
+        self.assertEqual(deck.pop_ids(1), [self.premium.pk])
+        SwipeAction.objects.create(user=self.user, announcement=self.popular, direction=SwipeAction.DISLIKE)
+        self.assertNotIn(self.popular.pk, deck.pop_ids(10))
+
+    def test_undo_returns_card(self):
+        swipe = SwipeAction.objects.create(user=self.user, announcement=self.premium, direction=SwipeAction.DISLIKE)
+        deck = SwipeDeck(self.user)
+        self.assertEqual(deck.pop_ids(1), [self.popular.pk])
+        swipe.delete()
+        self.assertEqual(deck.pop_ids(1), [self.premium.pk])
+
+    def test_closed_announcements_skipped(self):
+        deck = SwipeDeck(self.user)
+        deck.pop_ids(0)
+        Announcement.objects.filter(pk=self.premium.pk).update(status=Announcement.STATUS_CLOSED)
+        cards = deck.next_cards(2)
+        self.assertEqual([card.pk for card in cards[:1]], [self.popular.pk])
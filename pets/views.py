@@ -2,43 +2,24 @@ from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Exists, OuterRef, F, Count
+from django.db.models import Q, Case, When
 from django.core.paginator import Paginator
 from announcements.models import Announcement
 from .models import SwipeAction, SwipeHistory, Match
+from .deck import SwipeDeck
 import json
 
 class SwipeSystem:
     @staticmethod
     def get_next_cards(user, announcement_type='animals', count=10):
-        """Получение следующих карточек для показа"""
-        already_swiped = SwipeAction.objects.filter(
-            user=user,
-            announcement=OuterRef('pk')
-        )
-        
-        # Базовый запрос
-        announcements = Announcement.objects.filter(
-            status='active',
-            type=announcement_type
-        ).exclude(
-            author=user
-        ).exclude(
-            Exists(already_swiped)
-        )
-        
-        # Приоритизация объявлений
-        if announcement_type == 'animals':
-            announcements = announcements.annotate(
-                premium_score=Count('pets_swipes'),  # Популярность
-                distance_score=F('price')  # Временно используем цену как score
-            ).order_by(
-                '-is_premium',  # Сначала премиум
-                '-premium_score',  # Затем по популярности
-                '?'  # Случайный порядок для остальных
-            )[:count]
+        """Получение следующих карточек для показа из колоды пользователя"""
+        ids = SwipeDeck(user, announcement_type).next_ids(count)
+        if not ids:
+            return Announcement.objects.none()
         
-        return announcements
+        # Сохраняем порядок колоды: сначала премиум, затем по популярности
+        order = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)])
+        return Announcement.objects.filter(pk__in=ids).order_by(order)
 
     @staticmethod
     def process_swipe(user, announcement_id, direction):
@@ -0,0 +1,3 @@
+from .planner import QueryPlanMixin, plan_queryset
+
+__all__ = ['QueryPlanMixin', 'plan_queryset']
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class QueryPlanConfig(AppConfig):
+    name = 'queryplan'
+    verbose_name = _('Планирование запросов')
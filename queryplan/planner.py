@@ -0,0 +1,139 @@
+"""
+select_related/prefetch_related по полям сериализатора.
+
+Планировщик проходит по полям сериализатора (и вложенных сериализаторов) и по
+их source идет по связям модели: FK и прямые/обратные OneToOne попадают в
+select_related, обратные FK и ManyToMany - в prefetch_related. Все, что
+находится под prefetch, тоже подгружается через prefetch.
+
+Поля, которые модель не описывает (SerializerMethodField, методы вроде
+author.get_full_name), планировщик не видит. Для них сериализатор объявляет
+подсказки в Meta:
+
+    class Meta:
+        select_related = ['author__profile']
+        prefetch_related = [Prefetch('announcement_images', to_attr='main_images', ...)]
+
+Подсказки вложенного сериализатора получают префикс его пути.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+
+def _join(prefix, name):
+    return f'{prefix}__{name}' if prefix else name
+
+
+def _prefixed(lookup, prefix):
+    if not prefix:
+        return lookup
+    if isinstance(lookup, Prefetch):
+        return Prefetch(
+            _join(prefix, lookup.prefetch_through), queryset=lookup.queryset, to_attr=lookup.to_attr
+        )
+    return _join(prefix, lookup)
+
+
+class _Plan:
+    def __init__(self):
+        self.select = []
+        self.prefetch = []
+
+    def add_select(self, path):
+        if path not in self.select:
+            self.select.append(path)
+
+    def add_prefetch(self, lookup):
+        key = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+        existing = [p.prefetch_to if isinstance(p, Prefetch) else p for p in self.prefetch]
+        if key not in existing:
+            self.prefetch.append(lookup)
+
+    def add(self, path, many):
+        if many:
+            self.add_prefetch(path)
+        else:
+            self.add_select(path)
+
+    def walk(self, model, serializer, prefix='', many=False):
+        meta = getattr(serializer, 'Meta', None)
+        for path in getattr(meta, 'select_related', ()):
+            self.add(_join(prefix, path), many)
+        for lookup in getattr(meta, 'prefetch_related', ()):
+            self.add_prefetch(_prefixed(lookup, prefix))
+
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if field.source == '*':
+                if isinstance(nested, serializers.BaseSerializer):
+                    self.walk(model, nested, prefix, many)
+                continue
+            self.walk_source(model, field, nested, prefix, many)
+
+    def walk_source(self, model, field, nested, prefix, many):
+        attrs = field.source_attrs
+        path = prefix
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return
+            if not model_field.is_relation:
+                return
+            last = index == len(attrs) - 1
+            # Первичный ключ FK берется из author_id, JOIN не нужен
+            if last and isinstance(field, PrimaryKeyRelatedField) and model_field.many_to_one:
+                return
+            path = _join(path, attr)
+            many = many or model_field.one_to_many or model_field.many_to_many
+            self.add(path, many)
+            model = model_field.related_model
+        if isinstance(nested, serializers.BaseSerializer):
+            self.walk(model, nested, path, many)
+
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset
+
+
+def build_plan(model, serializer):
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    plan = _Plan()
+    plan.walk(model, serializer)
+    return plan
+
+
+def plan_queryset(queryset, serializer):
+    """
+    Добавляет к queryset select_related/prefetch_related, нужные сериализатору.
+    serializer - класс или экземпляр.
+    """
+    return build_plan(queryset.model, serializer).apply(queryset)
+
+
+class QueryPlanMixin:
+    """
+    Примесь для GenericAPIView: get_queryset() подгружает связи, которые
+    читает сериализатор действия. План строится один раз на класс сериализатора.
+    """
+    _query_plans = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        key = (queryset.model, serializer_class)
+        plan = self._query_plans.get(key)
+        if plan is None:
+            plan = self._query_plans[key] = build_plan(queryset.model, serializer_class)
+        return plan.apply(queryset)
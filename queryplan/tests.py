@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory
+from announcements.models import Announcement, AnnouncementCategory, AnnouncementImage
+from announcements.serializers import AnnouncementSerializer
+from announcements.views_api import AnnouncementViewSet
+from user_profile.models import UserProfile
+from user_profile.serializers import UserProfileSerializer
+from queryplan import plan_queryset
+from queryplan.planner import build_plan
+
+User = get_user_model()
+
+
+class PlannerTest(TestCase):
+    def test_announcement_plan(self):
+        """FK из source попадают в select_related, обратные связи и подсказки - в prefetch"""
+        plan = build_plan(Announcement, AnnouncementSerializer)
+        self.assertEqual(plan.select, ['category', 'author'])
+        # Подсказки из Meta идут раньше полей, поэтому связи ищутся по пути, а не по позиции
+        prefetch = {getattr(lookup, 'prefetch_to', lookup): lookup for lookup in plan.prefetch}
+        self.assertEqual(set(prefetch), {'announcement_images', 'main_images'})
+        self.assertEqual(prefetch['announcement_images'], 'announcement_images')
+        self.assertIsInstance(prefetch['main_images'], Prefetch)
+
+    def test_pk_only_relation_is_not_joined(self):
+        """Поле, которое отдает только pk, JOIN не добавляет"""
+        class PkSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = Announcement
+                fields = ['id', 'author', 'category']
+
+        self.assertEqual(build_plan(Announcement, PkSerializer).select, [])
+
+    def test_profile_plan(self):
+        queryset = plan_queryset(UserProfile.objects.all(), UserProfileSerializer)
+        self.assertEqual(queryset.query.select_related, {'user': {}})
+
+
+class AnnouncementQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(phone='+79990000161', password='testpass123')
+        cls.category = AnnouncementCategory.objects.create(name='Собаки', slug='dogs')
+
+    def _add(self, count):
+        for i in range(count):
+            announcement = Announcement.objects.create(
+                title=f'Объявление {i}', description='Описание', category=self.category,
+                type=Announcement.TYPE_ANIMAL, status=Announcement.STATUS_ACTIVE, author=self.author
+            )
+            AnnouncementImage.objects.create(announcement=announcement, image='announcements/main.jpg', is_main=True)
+            AnnouncementImage.objects.create(announcement=announcement, image='announcements/other.jpg')
+
+    def _list_queries(self):
+        view = AnnouncementViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/announcements/', {'page_size': 50})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_list_query_count_does_not_grow(self):
+        """Число запросов на страницу списка не зависит от числа объявлений"""
+        self._add(2)
+        response, small = self._list_queries()
+        self.assertEqual(len(response.data['results']), 2)
+
+        self._add(20)
+        response, large = self._list_queries()
+        self.assertEqual(len(response.data['results']), 22)
+        self.assertEqual(small, large)
+        # Страница, изображения и главные изображения
+        self.assertLessEqual(large, 3)
+
+    def test_main_image_from_prefetch(self):
+        self._add(1)
+        response, _ = self._list_queries()
+        item = response.data['results'][0]
+        self.assertTrue(item['main_image']['is_main'])
+        self.assertEqual(len(item['images']), 2)
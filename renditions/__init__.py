@@ -0,0 +1,4 @@
+from .base import RenditionsMixin
+from .pipeline import build, rendition_name
+
+__all__ = ['RenditionsMixin', 'build', 'rendition_name']
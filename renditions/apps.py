@@ -0,0 +1,15 @@
+from django.apps import AppConfig, apps
+from django.utils.translation import gettext_lazy as _
+
+
+class RenditionsConfig(AppConfig):
+    name = 'renditions'
+    verbose_name = _('Копии изображений')
+
+    def ready(self):
+        from .base import RenditionsMixin
+        from .signals import connect
+
+        for model in apps.get_models():
+            if issubclass(model, RenditionsMixin):
+                connect(model)
@@ -0,0 +1,46 @@
+from django.conf import settings
+from .pipeline import rendition_name
+
+
+class RenditionsMixin:
+    """
+    Доступ к копиям для модели с полями image (ImageField) и renditions (собранные
+    ширины, JSONField). Пока копий нет, везде отдается оригинал.
+    """
+
+    def rendition_url(self, width=None, fmt='jpeg'):
+        """URL самой узкой копии не уже width (без width - IMAGE_RENDITION_DEFAULT_WIDTH)"""
+        if not self.image:
+            return ''
+        if not self.renditions:
+            return self.image.url
+        width = width or settings.IMAGE_RENDITION_DEFAULT_WIDTH
+        widths = sorted(self.renditions)
+        chosen = next((w for w in widths if w >= width), widths[-1])
+        return self.image.storage.url(rendition_name(self.image.name, chosen, fmt))
+
+    def get_srcset(self, fmt='jpeg', build_url=None):
+        """
+        Значение атрибута srcset: '<url> 320w, <url> 640w, ...'.
+        build_url - например request.build_absolute_uri для абсолютных ссылок в API.
+        """
+        if not self.image or not self.renditions:
+            return ''
+        storage = self.image.storage
+        build_url = build_url or (lambda url: url)
+        return ', '.join(
+            f'{build_url(storage.url(rendition_name(self.image.name, width, fmt)))} {width}w'
+            for width in sorted(self.renditions)
+        )
+
+    @property
+    def display_url(self):
+        return self.rendition_url()
+
+    @property
+    def srcset(self):
+        return self.get_srcset('jpeg')
+
+    @property
+    def webp_srcset(self):
+        return self.get_srcset('webp')
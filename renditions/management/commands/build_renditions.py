@@ -0,0 +1,74 @@
+import multiprocessing
+import time
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from renditions import RenditionsMixin, build
+
+
+def _build_chunk(job):
+    label, image_ids = job
+    started = time.perf_counter()
+    # Воркеры пула не могут запускать свои процессы: копии строятся прямо в воркере
+    built = build(apps.get_model(label).objects.filter(pk__in=image_ids), processes=1)
+    return label, len(image_ids), built, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Builds resized WebP/JPEG copies for uploaded images that do not have them, in parallel chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild copies of all images')
+        parser.add_argument('--model', action='append', dest='models', metavar='APP_LABEL.MODEL',
+                            help='Only this model (repeatable), e.g. catalog.ProductImage')
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(),
+                            help='Number of worker processes')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Images per chunk')
+
+    def handle(self, *args, **options):
+        models = [model for model in apps.get_models() if issubclass(model, RenditionsMixin)]
+        if options['models']:
+            try:
+                models = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+
+        chunk_size = options['chunk_size']
+        chunks = []
+        for model in models:
+            images = model.objects.exclude(image='').order_by('pk')
+            if not options['all']:
+                images = images.filter(renditions=[])
+            image_ids = list(images.values_list('pk', flat=True))
+            chunks.extend(
+                (model._meta.label, image_ids[start:start + chunk_size])
+                for start in range(0, len(image_ids), chunk_size)
+            )
+        total = sum(len(image_ids) for _, image_ids in chunks)
+        self.stdout.write(f'{total} images in {len(chunks)} chunks, {options["processes"]} processes')
+
+        started = time.perf_counter()
+        done = built = 0
+        for label, chunk_images, chunk_built, seconds in self._run(chunks, options['processes']):
+            done += chunk_images
+            built += chunk_built
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label}: {chunk_built}/{chunk_images} images in {seconds:.1f}s | '
+                f'total {done}/{total}, {done / max(elapsed, 1e-9):.1f} images/s'
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Built copies of {built} of {total} images in {elapsed:.1f}s'
+        ))
+
+    def _run(self, chunks, processes):
+        if processes <= 1 or len(chunks) <= 1:
+            yield from map(_build_chunk, chunks)
+            return
+
+        # Дочерние процессы не должны делить соединения с базой родителя
+        connections.close_all()
+        with multiprocessing.Pool(processes) as pool:
+            yield from pool.imap_unordered(_build_chunk, chunks)
@@ -0,0 +1,155 @@
+"""
+Производные копии загруженных фотографий (renditions).
+
+Оригиналы с телефонов весят 4–12 МБ, поэтому списки, карточки и API отдают вместо
+них WebP и JPEG фиксированной ширины (IMAGE_RENDITION_WIDTHS). Копии строятся один
+раз: после загрузки задачей в очереди, для уже загруженных - командой
+build_renditions. Декодирование и сжатие идут в пуле процессов. Ориентация из EXIF
+применяется к пикселям, сами метаданные (в том числе координаты съемки) в копии не
+попадают.
+
+Ключи детерминированы:
+    renditions/<путь оригинала без расширения>/<ширина>.<webp|jpeg>
+поэтому повторная сборка перезаписывает те же файлы, а URL строятся без обращений
+к хранилищу. Собранные ширины хранятся в поле renditions модели; копий шире
+оригинала нет, вместо них есть копия в ширину оригинала.
+"""
+import io
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+# формат в ключе -> формат Pillow
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+_executors = {}
+
+
+def rendition_name(name, width, fmt):
+    """Ключ копии в хранилище по имени оригинала"""
+    return f'renditions/{posixpath.splitext(name)[0]}/{width}.{fmt}'
+
+
+def rendition_names(name, widths):
+    return [rendition_name(name, width, fmt) for width in widths for fmt in FORMATS]
+
+
+def render(data, widths, quality):
+    """
+    Копии изображения из байтов оригинала. Возвращает {(ширина, формат): байты}.
+    Функция не трогает Django и выполняется в процессах пула.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # JPEG декодируется сразу с уменьшением в 2-8 раз, если оригинал намного шире
+        original.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        # EXIF, ICC, XMP и комментарии не переносятся в копии
+        image.info = {}
+
+        targets = [width for width in sorted(widths) if width < image.width]
+        if len(targets) < len(widths):
+            targets.append(image.width)
+
+        result = {}
+        for width in targets:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt, pillow_format in FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, pillow_format, quality=quality, optimize=True)
+                result[width, fmt] = buffer.getvalue()
+        return result
+
+
+def _render_job(job):
+    pk, data, widths, quality = job
+    try:
+        return pk, render(data, widths, quality)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning('Cannot render image %s: %s', pk, e)
+        return pk, None
+
+
+def _get_executor(processes):
+    # Пул живет вместе с процессом воркера, чтобы не запускать процессы на каждую задачу
+    if processes not in _executors:
+        _executors[processes] = ProcessPoolExecutor(max_workers=processes)
+    return _executors[processes]
+
+
+def _save(storage, name, data):
+    # Ключ детерминирован: старая копия заменяется, а не получает суффикс
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+def delete_renditions(image):
+    """Удаляет копии изображения из хранилища"""
+    field = image.image
+    for name in rendition_names(field.name, image.renditions):
+        field.storage.delete(name)
+
+
+def build(images, processes=None):
+    """
+    Строит копии для images (модели с RenditionsMixin) и сохраняет собранные ширины.
+    processes - размер пула, по умолчанию IMAGE_RENDITION_PROCESSES; при 1 копии
+    строятся в текущем процессе. Возвращает число обработанных изображений.
+    """
+    images = [image for image in images if image.image]
+    if not images:
+        return 0
+    widths = sorted(settings.IMAGE_RENDITION_WIDTHS)
+    quality = settings.IMAGE_RENDITION_QUALITY
+    by_pk = {image.pk: image for image in images}
+
+    def jobs():
+        for image in images:
+            try:
+                with image.image.open('rb') as f:
+                    data = f.read()
+            except OSError as e:
+                logger.warning('Cannot read image %s: %s', image.pk, e)
+                continue
+            yield image.pk, data, widths, quality
+
+    if processes is None:
+        processes = settings.IMAGE_RENDITION_PROCESSES
+    if processes > 1:
+        results = _get_executor(processes).map(_render_job, jobs())
+    else:
+        results = map(_render_job, jobs())
+
+    built = []
+    for pk, renditions in results:
+        if renditions is None:
+            continue
+        image = by_pk[pk]
+        field = image.image
+        for (width, fmt), data in renditions.items():
+            _save(field.storage, rendition_name(field.name, width, fmt), data)
+        stale = set(image.renditions) - {width for width, _ in renditions}
+        for name in rendition_names(field.name, stale):
+            field.storage.delete(name)
+        image.renditions = sorted({width for width, _ in renditions})
+        built.append(image)
+
+    for model in {type(image) for image in built}:
+        model.objects.bulk_update([image for image in built if type(image) is model], ['renditions'])
+    return len(built)
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from common import loaded_values, remember_on_init
+from .pipeline import delete_renditions, rendition_names
+from .tasks import build_renditions
+
+
+def _image_name(instance):
+    image, = loaded_values(instance, 'image')
+    return getattr(image, 'name', image)
+
+
+def forget_stale_renditions(sender, instance, **kwargs):
+    """Оригинал заменили - копии прежнего удаляются, до сборки новых отдается оригинал"""
+    previous = getattr(instance, '_rendition_source', None)
+    if instance.pk and previous and previous != instance.image.name and instance.renditions:
+        storage = instance.image.storage
+        for name in rendition_names(previous, instance.renditions):
+            storage.delete(name)
+        instance.renditions = []
+
+
+def queue_build(sender, instance, created, **kwargs):
+    """Копии новой фотографии строятся в фоне"""
+    name = instance.image.name
+    if name and (created or name != instance._rendition_source):
+        build_renditions.delay(sender._meta.label, [instance.pk])
+    instance._rendition_source = name
+
+
+def cleanup_renditions(sender, instance, **kwargs):
+    if instance.image and instance.renditions:
+        delete_renditions(instance)
+
+
+def connect(model):
+    remember_on_init(model, '_rendition_source', _image_name)
+    pre_save.connect(forget_stale_renditions, sender=model)
+    post_save.connect(queue_build, sender=model)
+    post_delete.connect(cleanup_renditions, sender=model)
@@ -0,0 +1,10 @@
+from django.apps import apps
+from taskqueue import task
+from .pipeline import build
+
+
+@task
+def build_renditions(model_label, image_ids):
+    """Копии новых фотографий; model_label - 'catalog.ProductImage' и т.п."""
+    model = apps.get_model(model_label)
+    build(model.objects.filter(pk__in=image_ids))
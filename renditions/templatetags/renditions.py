@@ -0,0 +1,22 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.inclusion_tag('renditions/picture.html')
+def picture(image, alt='', sizes=None, css_class='', width=None, **attrs):
+    """
+    <picture> с WebP и JPEG-копиями изображения (модель с RenditionsMixin):
+        {% picture product.images.first alt=product.title sizes="(max-width: 576px) 100vw, 300px" %}
+    Без копий выводится <img> с оригиналом.
+    """
+    attrs.setdefault('loading', 'lazy')
+    return {
+        'image': image,
+        'src': image.rendition_url(width) if image else '',
+        'alt': alt,
+        'sizes': sizes or settings.IMAGE_RENDITION_SIZES,
+        'css_class': css_class,
+        'attrs': attrs,
+    }
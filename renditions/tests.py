@@ -0,0 +1,245 @@
+import io
+import os
+import shutil
+import tempfile
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from taskqueue.base import get_backend
+from taskqueue.worker import Worker
+from announcements.models import Announcement, AnnouncementCategory, AnnouncementImage
+from announcements.serializers import AnnouncementImageSerializer
+from catalog.forms import ProductForm
+from catalog.models import Category, Product, ProductImage
+from renditions import build, rendition_name
+from renditions.pipeline import render
+
+User = get_user_model()
+
+# EXIF Orientation = 6: снимок нужно повернуть на 90° по часовой стрелке
+ORIENTATION = 0x0112
+
+
+def _jpeg(size=(2000, 1000), color=(200, 30, 30), orientation=None):
+    image = Image.new('RGB', size, color)
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes(), comment=b'secret')
+    return buffer.getvalue()
+
+
+def _upload(data, name='photo.jpg'):
+    return SimpleUploadedFile(name, data, content_type='image/jpeg')
+
+
+class RenderTest(SimpleTestCase):
+    def test_fixed_widths_in_both_formats(self):
+        renditions = render(_jpeg(), [320, 640, 1280], 80)
+        self.assertEqual(
+            sorted(renditions),
+            [(320, 'jpeg'), (320, 'webp'), (640, 'jpeg'), (640, 'webp'), (1280, 'jpeg'), (1280, 'webp')]
+        )
+        with Image.open(io.BytesIO(renditions[640, 'webp'])) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (640, 320))
+
+    def test_metadata_is_stripped_and_orientation_applied(self):
+        renditions = render(_jpeg(orientation=6), [320, 640, 1280], 80)
+        for data in renditions.values():
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual(dict(image.getexif()), {})
+                self.assertNotIn('comment', image.info)
+        with Image.open(io.BytesIO(renditions[320, 'jpeg'])) as image:
+            # Портрет: ширина меньше высоты
+            self.assertEqual(image.size, (320, 640))
+
+    def test_no_upscaling(self):
+        """Оригинал уже нужных ширин дает одну копию в свою ширину"""
+        renditions = render(_jpeg(size=(500, 400)), [320, 640, 1280], 80)
+        self.assertEqual(sorted({width for width, _ in renditions}), [320, 500])
+
+    def test_transparent_png(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (100, 100), (0, 0, 0, 0)).save(buffer, 'PNG')
+        renditions = render(buffer.getvalue(), [320], 80)
+        with Image.open(io.BytesIO(renditions[100, 'jpeg'])) as image:
+            self.assertEqual(image.getpixel((50, 50)), (255, 255, 255))
+
+
+@override_settings(
+    TASKS_BACKEND='taskqueue.backends.InMemoryBackend',
+    IMAGE_RENDITION_WIDTHS=[320, 640],
+    IMAGE_RENDITION_PROCESSES=1,
+)
+class PipelineTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.media_root = media_root
+        get_backend().jobs.clear()
+
+        self.user = User.objects.create_user(phone='+79990000211', password='testpass123')
+        category = AnnouncementCategory.objects.create(name='Собаки', slug='dogs')
+        self.announcement = Announcement.objects.create(
+            title='Объявление', description='Описание', category=category,
+            type=Announcement.TYPE_ANIMAL, author=self.user,
+        )
+
+    def _image(self, **kwargs):
+        return AnnouncementImage.objects.create(announcement=self.announcement, image=_upload(_jpeg(**kwargs)))
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_upload_builds_renditions(self):
+        """Копии новой фотографии собираются задачей под детерминированными ключами"""
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self._image()
+        self.assertEqual(image.renditions, [])
+        self.assertEqual(image.display_url, image.image.url)
+        Worker().drain()
+
+        image.refresh_from_db()
+        self.assertEqual(image.renditions, [320, 640])
+        base = os.path.splitext(image.image.name)[0]
+        for name in ('320.webp', '320.jpeg', '640.webp', '640.jpeg'):
+            self.assertTrue(self._exists(f'renditions/{base}/{name}'))
+        self.assertEqual(
+            image.srcset,
+            f'/media/renditions/{base}/320.jpeg 320w, /media/renditions/{base}/640.jpeg 640w'
+        )
+        self.assertEqual(image.rendition_url(400, 'webp'), f'/media/renditions/{base}/640.webp')
+
+    def test_rebuild_overwrites_same_keys(self):
+        image = self._image()
+        build([image])
+        build([image])
+        directory = os.path.join(self.media_root, os.path.dirname(rendition_name(image.image.name, 320, 'jpeg')))
+        self.assertEqual(sorted(os.listdir(directory)), ['320.jpeg', '320.webp', '640.jpeg', '640.webp'])
+
+    def test_replaced_and_deleted_images_drop_renditions(self):
+        image = self._image()
+        build([image])
+        old = rendition_name(image.image.name, 320, 'jpeg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.image = _upload(_jpeg(color=(0, 0, 200)), 'other.jpg')
+            image.save()
+        self.assertFalse(self._exists(old))
+        self.assertEqual(image.renditions, [])
+        Worker().drain()
+
+        image.refresh_from_db()
+        new = rendition_name(image.image.name, 320, 'jpeg')
+        self.assertTrue(self._exists(new))
+        image.delete()
+        self.assertFalse(self._exists(new))
+
+    def test_unreadable_image_is_skipped(self):
+        image = AnnouncementImage.objects.create(
+            announcement=self.announcement, image=_upload(b'not an image', 'broken.jpg')
+        )
+        self.assertEqual(build([image]), 0)
+        image.refresh_from_db()
+        self.assertEqual(image.renditions, [])
+
+    @override_settings(IMAGE_RENDITION_PROCESSES=2)
+    def test_process_pool(self):
+        images = [self._image(color=(i * 40, 0, 0)) for i in range(4)]
+        self.assertEqual(build(images), 4)
+        self.assertEqual(
+            list(AnnouncementImage.objects.values_list('renditions', flat=True)),
+            [[320, 640]] * 4
+        )
+
+    def test_serializer_srcset(self):
+        image = self._image()
+        build([image])
+        request = APIRequestFactory().get('/')
+        data = AnnouncementImageSerializer(image, context={'request': request}).data
+        self.assertTrue(data['srcset']['webp'].startswith('http://testserver/media/renditions/'))
+        self.assertTrue(data['srcset']['jpeg'].endswith('.jpeg 640w'))
+
+    def test_picture_tag(self):
+        image = self._image()
+        template = Template('{% load renditions %}{% picture image alt="Фото" %}')
+        self.assertNotIn('srcset', template.render(Context({'image': image})))
+
+        build([image])
+        html = template.render(Context({'image': image}))
+        self.assertIn('<source type="image/webp" srcset="/media/renditions/', html)
+        self.assertIn('640.jpeg 640w"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_command_builds_missing(self):
+        built = self._image()
+        build([built])
+        self._image()
+        self._image()
+
+        out = io.StringIO()
+        call_command('build_renditions', '--processes', '1', '--model', 'announcements.AnnouncementImage', stdout=out)
+        self.assertIn('Built copies of 2 of 2 images', out.getvalue())
+        self.assertFalse(AnnouncementImage.objects.filter(renditions=[]).exists())
+
+        out = io.StringIO()
+        call_command('build_renditions', '--all', '--processes', '1', '--chunk-size', '2', stdout=out)
+        self.assertIn('Built copies of 3 of 3 images', out.getvalue())
+
+
+@override_settings(TASKS_BACKEND='taskqueue.backends.InMemoryBackend')
+class ProductImageSaveTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        get_backend().jobs.clear()
+
+        self.user = User.objects.create_user(phone='+79990000212', password='testpass123')
+        self.category = Category.objects.create(name='Собаки', slug='dogs')
+        self.product = Product.objects.create(
+            seller=self.user, category=self.category, title='Щенок', price=100, condition='new'
+        )
+
+    def test_save_queries(self):
+        """Новое неглавное фото: EXISTS и INSERT; изменение без смены главного - один UPDATE"""
+        with self.assertNumQueries(2):
+            first = ProductImage.objects.create(product=self.product, image='products/1.jpg')
+        self.assertTrue(first.is_main)
+        with self.assertNumQueries(2):
+            ProductImage.objects.create(product=self.product, image='products/2.jpg')
+        first.order = 3
+        with self.assertNumQueries(2):
+            # Главное фото: снятие отметки (0 строк) и UPDATE самой строки
+            first.save()
+
+    def test_form_inserts_images_at_once(self):
+        form = ProductForm(
+            data={
+                'title': 'Котенок', 'description': 'Описание', 'price': '10',
+                'condition': 'new', 'category': self.category.id, 'location': 'Москва',
+            },
+            files={f'image_{i}': _upload(_jpeg(size=(64, 64)), f'{i}.jpg') for i in range(1, 4)},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        product = form.save(commit=False)
+        product.seller = self.user
+        product.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(2):
+                form.save_m2m()
+
+        self.assertEqual(list(product.images.order_by('pk').values_list('is_main', flat=True)), [True, False, False])
+        self.assertEqual(len(get_backend().jobs), 1)
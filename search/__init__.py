@@ -0,0 +1,3 @@
+from .base import SearchIndex, autocomplete, get_backend, register, search, search_queryset
+
+__all__ = ['SearchIndex', 'autocomplete', 'get_backend', 'register', 'search', 'search_queryset']
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import SearchDocument
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'length', 'updated_at')
+    list_filter = ('content_type',)
+    search_fields = ('=object_id',)
@@ -0,0 +1,41 @@
+"""Разбор текста для поиска: слова без стоп-слов и их основы (стеммер Snowball)"""
+import re
+import threading
+from functools import lru_cache
+import snowballstemmer
+
+TOKEN_RE = re.compile(r'[а-яa-z0-9]+')
+
+STOP_WORDS = frozenset('''
+    а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до его ее ей
+    ему если есть еще же за здесь и из или им их к как ко когда кто ли либо мне может мы на над надо наш не него
+    нее нет ни них но ну о об однако он она они оно от очень по под при с со так также такой там те тем то того
+    тоже той только том ты у уже хотя чего чей чем что чтобы чье чья эта эти это я
+    and for of the with
+'''.split())
+
+# Стеммеры Snowball хранят состояние разбора, поэтому вызываются под блокировкой
+_stemmers = {
+    'russian': snowballstemmer.stemmer('russian'),
+    'english': snowballstemmer.stemmer('english'),
+}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа слова: русский или английский стеммер по первой букве"""
+    stemmer = _stemmers['russian' if 'а' <= word[0] <= 'я' else 'english']
+    with _lock:
+        return stemmer.stemWord(word)
+
+
+def words(text):
+    """Слова текста в нижнем регистре, ё заменена на е, без стоп-слов"""
+    text = (text or '').lower().replace('ё', 'е')
+    return [word for word in TOKEN_RE.findall(text) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def tokenize(text):
+    """Основы слов текста"""
+    return [stem(word) for word in words(text)]
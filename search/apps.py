@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+from django.utils.translation import gettext_lazy as _
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'search'
+    verbose_name = _('Поиск')
+
+    def ready(self):
+        # Индексы описываются в <app>/search_indexes.py; сигналы подключаются при регистрации
+        autodiscover_modules('search_indexes')
@@ -0,0 +1,323 @@
+"""
+Бэкенды поиска.
+
+DatabaseBackend — собственный обратный индекс в таблицах search_*, ранжирование BM25.
+PostgresBackend — полнотекстовый поиск PostgreSQL с конфигурацией POSTGRES_SEARCH_CONFIG.
+HaystackBackend — любое подключение django-haystack (например, Whoosh) из HAYSTACK_CONNECTIONS.
+"""
+from collections import Counter
+from functools import reduce
+from operator import add
+import numpy as np
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q
+from .analysis import stem, tokenize, words
+from .models import SearchDocument, SearchPosting
+
+# Параметры BM25
+K1 = 1.2
+B = 0.75
+
+MAX_TERM_LENGTH = 64
+
+# Сколько результатов haystack проверять по базе за раз
+HAYSTACK_PAGE_SIZE = 500
+
+
+def _prefix_word(text, prefix):
+    """Последнее слово запроса, если его нужно дополнять"""
+    if not prefix or not text or text[-1].isspace():
+        return None
+    query_words = words(text)
+    return query_words[-1] if query_words else None
+
+
+class BaseBackend:
+    def update(self, index, instances):
+        """Добавляет или обновляет документы объектов"""
+
+    def remove(self, index, pks):
+        """Удаляет документы объектов"""
+
+    def clear(self, index):
+        """Удаляет все документы индекса"""
+
+    def rebuild(self, index, batch_size=500):
+        """Переиндексирует все объекты; возвращает их число"""
+        self.clear(index)
+        total = 0
+        queryset = index.get_queryset().order_by('pk')
+        last_pk = None
+        while True:
+            batch = queryset.filter(pk__gt=last_pk) if last_pk is not None else queryset
+            batch = list(batch[:batch_size])
+            if not batch:
+                return total
+            self.update(index, batch)
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+    def search(self, index, text, limit, prefix=False, candidates=None):
+        """
+        Список (pk, релевантность) лучших limit объектов.
+        candidates — queryset модели индекса, которым ограничивается поиск.
+        """
+        raise NotImplementedError
+
+    def autocomplete(self, index, prefix, limit):
+        raise NotImplementedError
+
+
+class DatabaseBackend(BaseBackend):
+    """Обратный индекс в базе: основа слова -> документы с частотой"""
+
+    def update(self, index, instances):
+        content_type = ContentType.objects.get_for_model(index.model)
+        documents = {}
+        for instance in instances:
+            frequencies, forms = Counter(), {}
+            for text, weight in index.field_values(instance):
+                for word in words(text):
+                    term = stem(word)[:MAX_TERM_LENGTH]
+                    frequencies[term] += weight
+                    forms.setdefault(term, word[:MAX_TERM_LENGTH])
+            documents[instance.pk] = (frequencies, forms)
+        if not documents:
+            return
+
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create(
+                [
+                    SearchDocument(
+                        content_type=content_type, object_id=pk, length=sum(frequencies.values())
+                    )
+                    for pk, (frequencies, _) in documents.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['content_type', 'object_id'],
+                update_fields=['length', 'updated_at'],
+            )
+            document_ids = dict(SearchDocument.objects.filter(
+                content_type=content_type, object_id__in=documents
+            ).values_list('object_id', 'pk'))
+            SearchPosting.objects.filter(document_id__in=document_ids.values()).delete()
+            SearchPosting.objects.bulk_create([
+                SearchPosting(
+                    document_id=document_ids[pk], content_type=content_type,
+                    term=term, word=forms[term], frequency=frequency
+                )
+                for pk, (frequencies, forms) in documents.items()
+                for term, frequency in frequencies.items()
+            ], batch_size=1000)
+
+    def remove(self, index, pks):
+        documents = SearchDocument.objects.filter(
+            content_type=ContentType.objects.get_for_model(index.model), object_id__in=pks
+        )
+        SearchPosting.objects.filter(document__in=documents).delete()
+        documents.delete()
+
+    def clear(self, index):
+        content_type = ContentType.objects.get_for_model(index.model)
+        SearchPosting.objects.filter(content_type=content_type).delete()
+        SearchDocument.objects.filter(content_type=content_type).delete()
+
+    def search(self, index, text, limit, prefix=False, candidates=None):
+        terms = set(tokenize(text))
+        if not terms:
+            return []
+        content_type = ContentType.objects.get_for_model(index.model)
+
+        condition = Q(term__in=terms)
+        prefix_word = _prefix_word(text, prefix)
+        if prefix_word:
+            condition |= Q(word__startswith=prefix_word)
+        postings = SearchPosting.objects.filter(condition, content_type=content_type)
+        matched = postings
+        if candidates is not None:
+            matched = postings.filter(document__object_id__in=candidates.values('pk'))
+        rows = list(matched.values_list('document__object_id', 'term', 'frequency', 'document__length'))
+        if not rows:
+            return []
+        stats = SearchDocument.objects.filter(content_type=content_type).aggregate(
+            total=Count('pk'), average_length=Avg('length')
+        )
+
+        object_ids, row_terms, frequencies, lengths = zip(*rows)
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.float64)
+        row_terms, term_index = np.unique(np.asarray(row_terms), return_inverse=True)
+        if candidates is None:
+            document_frequency = np.bincount(term_index)
+        else:
+            # IDF считается по всему индексу, чтобы отбор не менял релевантность
+            counts = dict(postings.filter(term__in=row_terms.tolist()).values('term').annotate(
+                documents=Count('pk')
+            ).values_list('term', 'documents'))
+            document_frequency = np.array([counts[term] for term in row_terms.tolist()])
+
+        # Все вхождения всех слов запроса оцениваются одним проходом
+        idf = np.log(1 + (stats['total'] - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = stats['average_length'] or 1
+        tf = frequencies * (K1 + 1) / (frequencies + K1 * (1 - B + B * lengths / average_length))
+        pks, document_index = np.unique(np.asarray(object_ids, dtype=np.int64), return_inverse=True)
+        scores = np.bincount(document_index, weights=idf[term_index] * tf)
+
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        # При равной релевантности выше более новый объект
+        top = top[np.lexsort((-pks[top], -scores[top]))]
+        return list(zip(pks[top].tolist(), scores[top].tolist()))
+
+    def autocomplete(self, index, prefix, limit):
+        prefix_word = _prefix_word(prefix, True)
+        if not prefix_word:
+            return []
+        return list(SearchPosting.objects.filter(
+            content_type=ContentType.objects.get_for_model(index.model),
+            word__startswith=prefix_word
+        ).values('word').annotate(documents=Count('pk')).order_by('-documents', 'word').values_list(
+            'word', flat=True
+        )[:limit])
+
+
+class PostgresBackend(BaseBackend):
+    """
+    Поиск PostgreSQL: tsvector строится из полей индекса с весами A-D.
+    Отдельного хранения нет; для больших таблиц нужен GIN-индекс по тому же выражению.
+    """
+
+    def __init__(self):
+        from django.db import connection
+        if connection.vendor != 'postgresql':
+            raise ImproperlyConfigured('PostgresBackend requires a PostgreSQL database')
+
+    def _vector(self, index):
+        from django.contrib.postgres.search import SearchVector
+        # Самым тяжелым полям достается вес A, дальше по убыванию
+        ranks = {weight: letter for weight, letter in zip(sorted(set(index.fields.values()), reverse=True), 'ABCD')}
+        return reduce(add, [
+            SearchVector(path, weight=ranks.get(weight, 'D'), config=settings.POSTGRES_SEARCH_CONFIG)
+            for path, weight in index.fields.items()
+        ])
+
+    def _query(self, text, prefix):
+        from django.contrib.postgres.search import SearchQuery
+        query_words = words(text)
+        if not query_words:
+            return None
+        # Слова состоят только из букв и цифр, поэтому их можно подставить в raw tsquery
+        terms = list(query_words)
+        if _prefix_word(text, prefix):
+            terms[-1] += ':*'
+        return SearchQuery(' | '.join(terms), search_type='raw', config=settings.POSTGRES_SEARCH_CONFIG)
+
+    def _matches(self, index, text, prefix):
+        from django.contrib.postgres.search import SearchRank
+        query = self._query(text, prefix)
+        if query is None:
+            return None
+        return index.model._default_manager.annotate(
+            search_vector=self._vector(index)
+        ).filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pk')
+
+    def search(self, index, text, limit, prefix=False, candidates=None):
+        matches = self._matches(index, text, prefix)
+        if matches is None:
+            return []
+        if candidates is not None:
+            matches = matches.filter(pk__in=candidates.values('pk'))
+        return [(pk, float(rank)) for pk, rank in matches.values_list('pk', 'rank')[:limit]]
+
+    def autocomplete(self, index, prefix, limit):
+        prefix_word = _prefix_word(prefix, True)
+        matches = self._matches(index, prefix_word or '', True)
+        if matches is None:
+            return []
+        counts = Counter()
+        for instance in index.get_queryset().filter(pk__in=matches.values('pk')[:100]):
+            counts.update({word for word in words(index.document(instance)) if word.startswith(prefix_word)})
+        return [word for word, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]]
+
+
+class HaystackBackend(BaseBackend):
+    """
+    Подключение django-haystack (SEARCH_HAYSTACK_CONNECTION). Текст индексируется
+    основами слов, поэтому русская морфология учитывается и в Whoosh.
+    """
+
+    def __init__(self):
+        try:
+            from haystack import connections
+            from haystack import indexes
+        except ImportError as e:
+            raise ImproperlyConfigured('HaystackBackend requires django-haystack') from e
+
+        from .base import registered_indexes
+        self.connection = connections[settings.SEARCH_HAYSTACK_CONNECTION]
+        self.indexes = {index.model: self._haystack_index(indexes, index) for index in registered_indexes()}
+        self.connection.get_unified_index().build(indexes=list(self.indexes.values()))
+
+    @staticmethod
+    def _haystack_index(indexes, index):
+        attrs = {
+            'text': indexes.CharField(document=True),
+            'content_auto': indexes.EdgeNgramField(),
+            'get_model': lambda self: index.model,
+            'index_queryset': lambda self, using=None: index.get_queryset(),
+            'prepare_text': lambda self, instance: ' '.join(tokenize(index.document(instance))),
+            'prepare_content_auto': lambda self, instance: ' '.join(words(index.document(instance))),
+        }
+        return type(f'{index.model.__name__}HaystackIndex', (indexes.SearchIndex, indexes.Indexable), attrs)()
+
+    def update(self, index, instances):
+        self.connection.get_backend().update(self.indexes[index.model], list(instances))
+
+    def remove(self, index, pks):
+        backend = self.connection.get_backend()
+        for pk in pks:
+            backend.remove(f'{index.model._meta.label_lower}.{pk}')
+
+    def clear(self, index):
+        self.connection.get_backend().clear(models=[index.model])
+
+    def _queryset(self, index):
+        from haystack.query import SearchQuerySet
+        return SearchQuerySet(using=self.connection.connection_alias).models(index.model)
+
+    def search(self, index, text, limit, prefix=False, candidates=None):
+        terms = tokenize(text)
+        if not terms:
+            return []
+        results = self._queryset(index).filter_or(text__in=terms)
+        prefix_word = _prefix_word(text, prefix)
+        if prefix_word:
+            results = results.filter_or(content_auto=prefix_word)
+        if candidates is None:
+            return [(int(result.pk), result.score or 0.0) for result in results[:limit]]
+
+        # Отбор по базе выполняется страницами результатов, пока не наберется limit
+        found = []
+        for start in range(0, results.count(), HAYSTACK_PAGE_SIZE):
+            page = [(int(result.pk), result.score or 0.0) for result in results[start:start + HAYSTACK_PAGE_SIZE]]
+            allowed = set(candidates.filter(pk__in=[pk for pk, _ in page]).values_list('pk', flat=True))
+            found.extend(item for item in page if item[0] in allowed)
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def autocomplete(self, index, prefix, limit):
+        prefix_word = _prefix_word(prefix, True)
+        if not prefix_word:
+            return []
+        counts = Counter()
+        for result in self._queryset(index).autocomplete(content_auto=prefix_word)[:100]:
+            counts.update({word for word in (result.content_auto or '').split() if word.startswith(prefix_word)})
+        return [word for word, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]]
@@ -0,0 +1,113 @@
+"""
+Полнотекстовый поиск по моделям.
+
+Модель подключается классом-наследником SearchIndex в <app>/search_indexes.py:
+поля и их веса, а также модели, от которых зависит документ. Документы
+обновляются сигналами при сохранении и удалении в той же транзакции. Хранение
+и ранжирование выполняет бэкенд из настройки SEARCH_BACKEND.
+"""
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.signals import setting_changed
+from django.db.models import Case, IntegerField, When
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+_registry = {}
+_backends = {}
+
+
+class SearchIndex:
+    """Описание поискового индекса модели"""
+    model = None
+    # Путь к полю (можно через связи: 'category__name') -> вес поля
+    fields = {}
+    # Метка зависимой модели -> ее поле с id индексируемого объекта ('announcement_id')
+    # или путь к ней от индексируемой модели ('category'), если на зависимую ссылается много объектов
+    depends_on = {}
+
+    def get_queryset(self):
+        related = {path.rsplit('__', 1)[0] for path in self.fields if '__' in path}
+        return self.model._default_manager.select_related(*sorted(related))
+
+    def field_values(self, instance):
+        """Пары (текст, вес) непустых полей объекта"""
+        values = []
+        for path, weight in self.fields.items():
+            value = instance
+            for attr in path.split('__'):
+                try:
+                    value = getattr(value, attr)
+                except ObjectDoesNotExist:
+                    value = None
+                if value is None:
+                    break
+            if value:
+                values.append((str(value), weight))
+        return values
+
+    def document(self, instance):
+        """Весь текст объекта одной строкой"""
+        return ' '.join(text for text, _ in self.field_values(instance))
+
+    @property
+    def label(self):
+        return self.model._meta.label
+
+
+def register(index_class):
+    """Декоратор класса индекса"""
+    from .signals import connect
+    index = _registry[index_class.model] = index_class()
+    connect(index)
+    return index_class
+
+
+def get_index(model):
+    return _registry[model]
+
+
+def registered_indexes():
+    return list(_registry.values())
+
+
+def get_backend():
+    path = settings.SEARCH_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+@receiver(setting_changed)
+def _reset_backends(setting, **kwargs):
+    if setting == 'SEARCH_BACKEND':
+        _backends.clear()
+
+
+def search(model, text, limit=None, prefix=False, candidates=None):
+    """
+    Список (pk, релевантность) по убыванию релевантности.
+    prefix=True дополняет последнее слово запроса (поиск по мере ввода).
+    candidates — queryset модели: оцениваются только его объекты, лимит применяется после отбора.
+    """
+    return get_backend().search(
+        get_index(model), text, limit or settings.SEARCH_MAX_RESULTS, prefix, candidates=candidates
+    )
+
+
+def search_queryset(queryset, text, prefix=False, order=True):
+    """Сужает queryset до найденных объектов; order=True сортирует по релевантности"""
+    # Фильтры queryset применяются до ограничения SEARCH_MAX_RESULTS
+    pks = [pk for pk, _ in search(queryset.model, text, prefix=prefix, candidates=queryset)]
+    queryset = queryset.filter(pk__in=pks)
+    if order and pks:
+        queryset = queryset.order_by(Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(pks)],
+            output_field=IntegerField()
+        ))
+    return queryset
+
+
+def autocomplete(model, prefix, limit=10):
+    """Слова из индекса, начинающиеся с последнего слова prefix, самые частые первыми"""
+    return get_backend().autocomplete(get_index(model), prefix, limit)
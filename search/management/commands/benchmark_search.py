@@ -0,0 +1,103 @@
+import random
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from catalog.models import Category, Product
+from search.base import get_backend, get_index, search
+
+User = get_user_model()
+
+# Тема -> словоформы в текстах объявлений и форма в запросе
+TOPICS = {
+    'лабрадор': (['лабрадор', 'лабрадора', 'лабрадору', 'лабрадором'], 'лабрадоры'),
+    'попугай': (['попугай', 'попугая', 'попугаю', 'попугаем'], 'попугаи'),
+    'переноска': (['переноска', 'переноски', 'переноску', 'переноской'], 'переноски'),
+    'ошейник': (['ошейник', 'ошейника', 'ошейники', 'ошейником'], 'ошейники'),
+    'аквариум': (['аквариум', 'аквариума', 'аквариумы', 'аквариуме'], 'аквариумов'),
+    'когтеточка': (['когтеточка', 'когтеточку', 'когтеточки', 'когтеточкой'], 'когтеточку'),
+}
+FILLER = ['продаю', 'отдам', 'срочно', 'недорого', 'новый', 'хороший', 'доставка', 'город', 'самовывоз', 'торг']
+
+
+def legacy_search(text):
+    """Прежний поиск каталога: подстрока в заголовке, описании или категории"""
+    return list(Product.objects.filter(
+        Q(title__icontains=text) | Q(description__icontains=text) | Q(category__name__icontains=text)
+    ).distinct().order_by('-created').values_list('pk', flat=True)[:10])
+
+
+class Command(BaseCommand):
+    help = 'Compares indexed full-text search with icontains lookups on synthetic products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                            help='Numbers of synthetic products to benchmark')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        for size in options['sizes']:
+            self._run(size, options['batch_size'])
+
+    def _run(self, size, batch_size):
+        with transaction.atomic():
+            seller = User.objects.create_user(phone='+70000000002')
+            category = Category.objects.create(name='Benchmark', slug='benchmark-search')
+            relevant = self._populate(size, seller, category, batch_size)
+            # bulk_create обходит сигналы, индекс строим явно
+            get_backend().rebuild(get_index(Product), batch_size=batch_size)
+
+            results = {
+                'icontains': (legacy_search, self._time(legacy_search)),
+                'index': (self._indexed, self._time(self._indexed)),
+            }
+            for name, (find, elapsed) in results.items():
+                precision, recall = self._quality(find, relevant)
+                self.stdout.write(
+                    f'{size:>8} rows | {name:<9} | {elapsed * 1000:7.2f} ms/query | '
+                    f'precision@10 {precision:.2f} | recall@10 {recall:.2f}'
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, size, seller, category, batch_size):
+        relevant = {topic: set() for topic in TOPICS}
+        for start in range(0, size, batch_size):
+            batch, topics = [], []
+            for number in range(start, min(start + batch_size, size)):
+                topic = random.choice(list(TOPICS))
+                forms = TOPICS[topic][0]
+                words = random.sample(FILLER, 4) + [random.choice(forms)]
+                random.shuffle(words)
+                batch.append(Product(
+                    seller=seller, category=category, slug=f'benchmark-{number}',
+                    title=' '.join(words[:3]).capitalize(), description=' '.join(words[3:]),
+                    price=100, condition='new', status='active',
+                ))
+                topics.append(topic)
+            for product, topic in zip(Product.objects.bulk_create(batch), topics):
+                relevant[topic].add(product.pk)
+        return relevant
+
+    @staticmethod
+    def _indexed(text):
+        return [pk for pk, _ in search(Product, text, limit=10)]
+
+    @staticmethod
+    def _time(find):
+        queries = [query for _, query in TOPICS.values()]
+        started = time.perf_counter()
+        for query in queries:
+            find(query)
+        return (time.perf_counter() - started) / len(queries)
+
+    @staticmethod
+    def _quality(find, relevant):
+        precision = recall = 0
+        for topic, (_, query) in TOPICS.items():
+            found = find(query)
+            hits = len(set(found) & relevant[topic])
+            precision += hits / 10
+            recall += hits / min(10, len(relevant[topic]))
+        return precision / len(TOPICS), recall / len(TOPICS)
@@ -0,0 +1,22 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from search.base import get_backend, get_index, registered_indexes
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds full-text search documents for all or selected models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Model label, e.g. catalog.Product; repeatable')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['model']:
+            indexes = [get_index(apps.get_model(label)) for label in options['model']]
+        else:
+            indexes = registered_indexes()
+
+        backend = get_backend()
+        for index in indexes:
+            total = backend.rebuild(index, batch_size=options['batch_size'])
+            self.stdout.write(f'{index.label}: {total} documents indexed')
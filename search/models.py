@@ -0,0 +1,39 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SearchDocument(models.Model):
+    """Проиндексированный объект (бэкенд search.backends.DatabaseBackend)"""
+    content_type = models.ForeignKey(ContentType, verbose_name=_('Тип объекта'), on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField(_('ID объекта'))
+    length = models.FloatField(_('Длина'), default=0)  # взвешенное число слов, для BM25
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Документ поиска')
+        verbose_name_plural = _('Документы поиска')
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='search_document_unique_object'),
+        ]
+
+
+class SearchPosting(models.Model):
+    """Вхождение основы слова в документ: строка обратного индекса"""
+    document = models.ForeignKey(SearchDocument, verbose_name=_('Документ'),
+                                 on_delete=models.CASCADE, related_name='postings')
+    content_type = models.ForeignKey(ContentType, verbose_name=_('Тип объекта'), on_delete=models.CASCADE)
+    term = models.CharField(_('Основа'), max_length=64)
+    word = models.CharField(_('Словоформа'), max_length=64)  # первая встреченная форма, для подсказок
+    frequency = models.FloatField(_('Частота'))  # с учетом весов полей
+
+    class Meta:
+        verbose_name = _('Вхождение слова')
+        verbose_name_plural = _('Вхождения слов')
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'term'], name='search_posting_unique_term'),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'term']),
+            models.Index(fields=['content_type', 'word']),
+        ]
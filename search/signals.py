@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save
+from .base import get_backend, registered_indexes
+
+# Сколько зависимых объектов переиндексировать за раз
+BATCH_SIZE = 500
+
+
+def connect(index):
+    """Подключает обработчики к модели индекса и к моделям, от которых зависит документ"""
+    # Зависимые модели заданы метками: сигналы моделей принимают их как отложенные ссылки
+    for sender in [index.model, *index.depends_on]:
+        label = sender if isinstance(sender, str) else sender._meta.label
+        post_save.connect(update_document, sender=sender, dispatch_uid=f'search_update:{label}')
+        post_delete.connect(remove_document, sender=sender, dispatch_uid=f'search_remove:{label}')
+
+
+def _update_dependent(index, sender, instance):
+    """Документы объектов, от которых зависит сохраненная или удаленная связанная модель"""
+    path = index.depends_on[sender._meta.label]
+    if path in {field.attname for field in sender._meta.concrete_fields}:
+        targets = index.get_queryset().filter(pk=getattr(instance, path))
+    else:
+        targets = index.get_queryset().filter(**{path: instance.pk})
+    # Пачками по pk: на категорию могут ссылаться тысячи объектов
+    backend = get_backend()
+    targets = targets.order_by('pk')
+    last_pk = None
+    while True:
+        batch = list((targets if last_pk is None else targets.filter(pk__gt=last_pk))[:BATCH_SIZE])
+        if not batch:
+            return
+        backend.update(index, batch)
+        last_pk = batch[-1].pk
+
+
+def update_document(sender, instance, raw=False, **kwargs):
+    """Документ обновляется в той же транзакции, что и объект"""
+    if raw:
+        return
+    for index in registered_indexes():
+        if sender is index.model:
+            get_backend().update(index, [instance])
+        elif sender._meta.label in index.depends_on:
+            _update_dependent(index, sender, instance)
+
+
+def remove_document(sender, instance, **kwargs):
+    for index in registered_indexes():
+        if sender is index.model:
+            get_backend().remove(index, [instance.pk])
+        elif sender._meta.label in index.depends_on:
+            _update_dependent(index, sender, instance)
@@ -0,0 +1,138 @@
+import io
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from announcements.models import AnimalAnnouncement, Announcement, AnnouncementCategory
+from catalog.models import Category, Product
+from search import autocomplete, search, search_queryset
+from search.analysis import tokenize
+from search.models import SearchDocument, SearchPosting
+
+User = get_user_model()
+
+
+class AnalysisTest(SimpleTestCase):
+    def test_russian_stemming(self):
+        self.assertEqual(tokenize('Рыжая собака'), tokenize('рыжую собаку'))
+        self.assertEqual(tokenize('лабрадоры и щенки'), tokenize('лабрадора щенков'))
+        self.assertEqual(tokenize('Ёжик на даче'), ['ежик', 'дач'])
+        self.assertEqual(tokenize('Dogs for sale'), ['dog', 'sale'])
+
+
+class DatabaseBackendTest(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(phone='+79990000111', password='testpass123')
+        self.category = Category.objects.create(name='Собаки', slug='dogs')
+
+    def _product(self, title, description='Описание', **kwargs):
+        return Product.objects.create(
+            seller=self.seller, category=self.category, title=title, description=description,
+            price=100, condition='new', status='active', **kwargs
+        )
+
+    def test_bm25_ranking(self):
+        """Совпадение в заголовке весит больше, чем в описании; учитываются словоформы"""
+        in_description = self._product('Щенок', 'Продаю щенков лабрадора')
+        in_title = self._product('Щенки лабрадора', 'Привиты')
+        self._product('Корм для кошек')
+
+        with self.assertNumQueries(2):
+            results = search(Product, 'лабрадоры')
+        self.assertEqual([pk for pk, _ in results], [in_title.pk, in_description.pk])
+        self.assertGreater(results[0][1], results[1][1])
+
+        # Редкое слово важнее частого
+        rare = self._product('Щенок хаски')
+        self.assertEqual(search(Product, 'щенок хаски')[0][0], rare.pk)
+
+    def test_index_follows_save_and_delete(self):
+        product = self._product('Кошка британская')
+        self.assertTrue(search(Product, 'британская'))
+
+        product.title = 'Котенок сиамский'
+        product.save()
+        self.assertFalse(search(Product, 'британская'))
+        self.assertEqual(search(Product, 'сиамские')[0][0], product.pk)
+        # Категория попадает в документ через связь
+        self.assertEqual(search(Product, 'собаки')[0][0], product.pk)
+
+        product.delete()
+        self.assertFalse(search(Product, 'сиамский'))
+        self.assertFalse(SearchDocument.objects.exists())
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_prefix_and_autocomplete(self):
+        labrador = self._product('Лабрадор палевый')
+        self._product('Лабрадор черный')
+        self._product('Лаванда для кошек')
+
+        self.assertEqual(search(Product, 'палевого лабр', prefix=True)[0][0], labrador.pk)
+        self.assertEqual(search(Product, 'лабр'), [])
+        self.assertEqual(autocomplete(Product, 'ла'), ['лабрадор', 'лаванда'])
+        self.assertEqual(autocomplete(Product, 'черный лаб'), ['лабрадор'])
+        self.assertEqual(autocomplete(Product, 'лаб '), [])
+
+    def test_search_queryset_orders_by_relevance(self):
+        weak = self._product('Переноска', 'Подойдет для таксы')
+        strong = self._product('Такса', 'Щенок таксы')
+        other = self._product('Ошейник')
+
+        queryset = search_queryset(Product.objects.all(), 'такса')
+        self.assertEqual(list(queryset), [strong, weak])
+        self.assertNotIn(other, search_queryset(Product.objects.all(), 'такса', order=False))
+
+    @override_settings(SEARCH_MAX_RESULTS=2)
+    def test_filters_apply_before_limit(self):
+        """Лимит применяется к уже отфильтрованному queryset, релевантность не меняется"""
+        for _ in range(3):
+            self._product('Такса', 'Щенок таксы')
+        cheap = self._product('Переноска', 'Подойдет для таксы')
+
+        filtered = Product.objects.filter(title='Переноска')
+        self.assertEqual(list(search_queryset(filtered, 'такса')), [cheap])
+        with override_settings(SEARCH_MAX_RESULTS=10):
+            scores = dict(search(Product, 'такса'))
+        self.assertEqual(search(Product, 'такса', candidates=filtered), [(cheap.pk, scores[cheap.pk])])
+
+    def test_signals_only_for_indexed_models(self):
+        with mock.patch('search.signals.registered_indexes', return_value=[]) as indexes:
+            AnnouncementCategory.objects.create(name='Кошки', slug='cats')
+            indexes.assert_not_called()
+            self._product('Попугай')
+        indexes.assert_called()
+
+    def test_category_rename_updates_products(self):
+        products = [self._product('Ошейник'), self._product('Поводок')]
+        other = Product.objects.create(
+            seller=self.seller, category=Category.objects.create(name='Кошки', slug='cats'), title='Корм',
+            description='Описание', price=100, condition='new', status='active'
+        )
+        self.category.name = 'Щенки'
+        self.category.save()
+
+        self.assertEqual({pk for pk, _ in search(Product, 'щенки')}, {product.pk for product in products})
+        self.assertEqual(search(Product, 'собаки'), [])
+        self.assertEqual([pk for pk, _ in search(Product, 'кошки')], [other.pk])
+
+    def test_dependent_model_updates_document(self):
+        author = User.objects.create_user(phone='+79990000112', password='testpass123')
+        announcement = Announcement.objects.create(
+            title='Продаю щенка', description='Описание',
+            category=AnnouncementCategory.objects.create(name='Собаки', slug='dogs'),
+            type=Announcement.TYPE_ANIMAL, author=author,
+        )
+        AnimalAnnouncement.objects.create(
+            announcement=announcement, species='Собака', breed='Корги', gender='male', size='small', color='рыжий'
+        )
+        self.assertEqual([pk for pk, _ in search(Announcement, 'корги')], [announcement.pk])
+
+    def test_rebuild_command(self):
+        product = self._product('Попугай волнистый')
+        SearchDocument.objects.all().delete()
+        self.assertFalse(search(Product, 'попугай'))
+
+        out = io.StringIO()
+        call_command('rebuild_search_index', '--model', 'catalog.Product', stdout=out)
+        self.assertIn('catalog.Product: 1 documents indexed', out.getvalue())
+        self.assertEqual(search(Product, 'попугаи')[0][0], product.pk)
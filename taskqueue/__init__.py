@@ -0,0 +1,3 @@
+from .base import task
+
+__all__ = ['task']
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+from django.utils.translation import gettext_lazy as _
+
+
+class TaskQueueConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'taskqueue'
+    verbose_name = _('Отложенные задачи')
+
+    def ready(self):
+        # Регистрируем задачи из <app>/tasks.py, чтобы воркер знал их по имени
+        autodiscover_modules('tasks')
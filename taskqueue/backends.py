@@ -0,0 +1,118 @@
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+
+class DatabaseBackend:
+    """Очередь в таблице Job; несколько воркеров разбирают ее без пересечений"""
+
+    def enqueue(self, name, args, kwargs, max_retries, run_at=None):
+        return Job.objects.create(
+            name=name, args=args, kwargs=kwargs, max_retries=max_retries, run_at=run_at or timezone.now()
+        )
+
+    def _stale(self, now):
+        # Задачи упавшего воркера возвращаются в работу по таймауту; живой воркер
+        # продлевает блокировку через heartbeat, пока выполняет задачу
+        return Q(status=Job.STATUS_RUNNING, locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT))
+
+    def _claimable(self, now):
+        return Q(status=Job.STATUS_PENDING, run_at__lte=now) | self._stale(now)
+
+    def _candidate_ids(self, now, limit):
+        queryset = Job.objects.filter(self._claimable(now)).order_by('run_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        return list(queryset.values_list('id', flat=True)[:limit])
+
+    def claim(self, worker_id, limit):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = self._candidate_ids(now, limit)
+            # Без skip_locked (SQLite) те же id мог выбрать другой воркер: UPDATE
+            # повторяет условие и забирает только строки, которые еще свободны
+            Job.objects.filter(status=Job.STATUS_PENDING, run_at__lte=now, id__in=ids).update(
+                status=Job.STATUS_RUNNING, locked_by=worker_id, locked_at=now
+            )
+            # Повторный захват после таймаута считается неудачной попыткой: задача,
+            # которая роняет воркер, не должна перезапускаться бесконечно
+            Job.objects.filter(self._stale(now), id__in=ids).update(
+                locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+                last_error=f'Lock expired after {settings.TASKS_LOCK_TIMEOUT}s'
+            )
+            Job.objects.filter(
+                id__in=ids, locked_by=worker_id, locked_at=now, attempts__gt=F('max_retries')
+            ).update(status=Job.STATUS_FAILED, locked_by='', locked_at=None)
+        return list(Job.objects.filter(
+            id__in=ids, status=Job.STATUS_RUNNING, locked_by=worker_id, locked_at=now
+        ).order_by('run_at'))
+
+    def heartbeat(self, worker_id, jobs):
+        """Продлевает блокировку задач, которые воркер еще выполняет"""
+        Job.objects.filter(
+            pk__in=[job.pk for job in jobs], status=Job.STATUS_RUNNING, locked_by=worker_id
+        ).update(locked_at=timezone.now())
+
+    def complete(self, job):
+        # Успешные задачи не храним, чтобы таблица не росла
+        Job.objects.filter(pk=job.pk).delete()
+
+    def retry(self, job, error, run_at):
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_PENDING, attempts=job.attempts, run_at=run_at,
+            last_error=error, locked_by='', locked_at=None
+        )
+
+    def fail(self, job, error):
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_FAILED, attempts=job.attempts, last_error=error,
+            locked_by='', locked_at=None
+        )
+
+
+class InMemoryBackend:
+    """Очередь в памяти процесса для тестов и локальной разработки"""
+
+    def __init__(self):
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, name, args, kwargs, max_retries, run_at=None):
+        job = Job(name=name, args=args, kwargs=kwargs, max_retries=max_retries, run_at=run_at or timezone.now())
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def claim(self, worker_id, limit):
+        now = timezone.now()
+        with self._lock:
+            claimed = [
+                job for job in self.jobs
+                if job.status == Job.STATUS_PENDING and job.run_at <= now
+            ][:limit]
+            for job in claimed:
+                job.status = Job.STATUS_RUNNING
+                job.locked_by = worker_id
+        return claimed
+
+    def heartbeat(self, worker_id, jobs):
+        pass
+
+    def complete(self, job):
+        job.status = Job.STATUS_DONE
+
+    def retry(self, job, error, run_at):
+        job.status = Job.STATUS_PENDING
+        job.run_at = run_at
+        job.last_error = error
+
+    def fail(self, job, error):
+        job.status = Job.STATUS_FAILED
+        job.last_error = error
+
+    def pending(self):
+        return [job for job in self.jobs if job.status == Job.STATUS_PENDING]
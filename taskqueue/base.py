@@ -0,0 +1,105 @@
+"""
+Отложенные задачи: функция с декоратором @task ставится в очередь вызовом .delay()
+после фиксации транзакции и выполняется воркером (manage.py run_tasks).
+"""
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_backends = {}
+
+
+class Task:
+    """Обертка над функцией-задачей"""
+
+    def __init__(self, func, name, max_retries):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        Ставит задачу в очередь после коммита текущей транзакции.
+        Аргументы должны сериализоваться в JSON: передавайте id, а не модели.
+        """
+        self.delay_in(0, *args, **kwargs)
+
+    def delay_in(self, seconds, *args, **kwargs):
+        """Как delay, но задача выполнится не раньше чем через seconds секунд"""
+        max_retries = settings.TASKS_MAX_RETRIES if self.max_retries is None else self.max_retries
+        transaction.on_commit(
+            lambda: get_backend().enqueue(
+                self.name, list(args), kwargs, max_retries,
+                run_at=timezone.now() + timedelta(seconds=seconds)
+            )
+        )
+
+
+def task(func=None, *, name=None, max_retries=None):
+    """Декоратор, регистрирующий функцию как отложенную задачу"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        wrapper = Task(func, task_name, max_retries)
+        _registry[task_name] = wrapper
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+def get_task(name):
+    if name not in _registry:
+        # Модуль задачи мог быть еще не импортирован в этом процессе
+        import_string(name)
+    return _registry[name]
+
+
+def get_backend():
+    path = settings.TASKS_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+@receiver(setting_changed)
+def _reset_backends(setting, **kwargs):
+    if setting == 'TASKS_BACKEND':
+        _backends.clear()
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором: backoff, 2*backoff, 4*backoff..."""
+    return timedelta(seconds=min(
+        settings.TASKS_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.TASKS_RETRY_BACKOFF_MAX
+    ))
+
+
+def execute(job, backend):
+    """Выполняет взятую воркером задачу и отмечает результат в бэкенде"""
+    try:
+        get_task(job.name).func(*job.args, **job.kwargs)
+    except Exception:
+        job.attempts += 1
+        error = traceback.format_exc()
+        if job.attempts > job.max_retries:
+            logger.error(f"Task {job.name} failed after {job.attempts} attempts: {error}")
+            backend.fail(job, error)
+        else:
+            logger.warning(f"Task {job.name} failed, retry #{job.attempts}: {error}")
+            backend.retry(job, error, timezone.now() + retry_delay(job.attempts))
+        return False
+
+    backend.complete(job)
+    return True
@@ -0,0 +1,43 @@
+import multiprocessing
+from django.core.management.base import BaseCommand
+from django.db import connections
+from taskqueue.worker import Worker
+
+
+def _work(batch_size, sleep):
+    Worker(batch_size=batch_size).run(sleep=sleep)
+
+
+class Command(BaseCommand):
+    help = 'Runs deferred task workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=None, help='Tasks claimed per poll')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the ready tasks and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = Worker(batch_size=options['batch_size']).drain()
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} tasks'))
+            return
+
+        if options['processes'] == 1:
+            _work(options['batch_size'], options['sleep'])
+            return
+
+        # Дочерние процессы не должны делить соединения с базой родителя
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_work, args=(options['batch_size'], options['sleep']))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('В очереди')),
+        (STATUS_RUNNING, _('Выполняется')),
+        (STATUS_DONE, _('Выполнена')),
+        (STATUS_FAILED, _('Ошибка')),
+    ]
+
+    name = models.CharField(_('Задача'), max_length=255)
+    args = models.JSONField(_('Аргументы'), default=list, blank=True)
+    kwargs = models.JSONField(_('Именованные аргументы'), default=dict, blank=True)
+    status = models.CharField(_('Статус'), max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(_('Неудачных попыток'), default=0)
+    max_retries = models.PositiveIntegerField(_('Максимум повторов'), default=3)
+    run_at = models.DateTimeField(_('Запустить не раньше'), default=timezone.now)
+    locked_by = models.CharField(_('Воркер'), max_length=100, blank=True)
+    locked_at = models.DateTimeField(_('Взята в работу'), null=True, blank=True)
+    last_error = models.TextField(_('Последняя ошибка'), blank=True)
+    created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Дата обновления'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Задача')
+        verbose_name_plural = _('Задачи')
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
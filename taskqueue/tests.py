@@ -0,0 +1,147 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from taskqueue import task
+from taskqueue.backends import DatabaseBackend
+from taskqueue.base import get_backend, retry_delay
+from taskqueue.models import Job
+from taskqueue.worker import Worker
+from user_profile.models import Review, SellerProfile
+
+calls = []
+
+
+@task(max_retries=2)
+def record_call(value):
+    calls.append(value)
+
+
+@task(max_retries=1)
+def always_fails():
+    raise ValueError('boom')
+
+
+@override_settings(TASKS_BACKEND='taskqueue.backends.DatabaseBackend', TASKS_RETRY_BACKOFF=10)
+class DatabaseBackendTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_only_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record_call.delay(1)
+            self.assertFalse(Job.objects.exists())
+
+        callbacks[0]()
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.args), ('taskqueue.tests.record_call', [1]))
+
+    def test_worker_runs_and_removes_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_call.delay(2)
+            record_call.delay(3)
+
+        self.assertEqual(Worker().drain(), 2)
+        self.assertEqual(calls, [2, 3])
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_is_claimed_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_call.delay(4)
+        job = Job.objects.get()
+        backend = DatabaseBackend()
+
+        self.assertEqual([claimed.pk for claimed in backend.claim('worker-a', 10)], [job.pk])
+        # Второй воркер выбрал тот же id до UPDATE первого (SQLite без skip_locked)
+        with patch.object(backend, '_candidate_ids', return_value=[job.pk]):
+            self.assertEqual(backend.claim('worker-b', 10), [])
+        self.assertEqual(Job.objects.get().locked_by, 'worker-a')
+
+    def test_retry_with_backoff_then_fail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            always_fails.delay()
+
+        before = timezone.now()
+        Worker().run_once()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, 1))
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        self.assertIn('ValueError', job.last_error)
+
+        # Задача еще не готова к повтору
+        self.assertEqual(Worker().run_once(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        Worker().run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+
+    def _stale_job(self, max_retries):
+        job = DatabaseBackend().enqueue('taskqueue.tests.record_call', [4], {}, max_retries)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_RUNNING, locked_by='dead', locked_at=timezone.now() - timedelta(hours=1)
+        )
+        return job
+
+    def test_stale_running_job_is_reclaimed(self):
+        job = self._stale_job(max_retries=1)
+        claimed = DatabaseBackend().claim('worker-a', 10)
+        self.assertEqual([(j.pk, j.attempts) for j in claimed], [(job.pk, 1)])
+
+    def test_stale_job_without_retries_is_failed(self):
+        job = self._stale_job(max_retries=0)
+        self.assertEqual(Worker().drain(), 0)
+        self.assertEqual(calls, [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 1))
+        self.assertIn('Lock expired', job.last_error)
+
+    def test_heartbeat_keeps_running_job_locked(self):
+        job = self._stale_job(max_retries=1)
+        backend = DatabaseBackend()
+        backend.heartbeat('dead', [job])
+        self.assertEqual(backend.claim('worker-a', 10), [])
+        self.assertEqual(Job.objects.get().locked_by, 'dead')
+
+    def test_backoff_is_capped(self):
+        with self.settings(TASKS_RETRY_BACKOFF=10, TASKS_RETRY_BACKOFF_MAX=60):
+            self.assertEqual(retry_delay(1), timedelta(seconds=10))
+            self.assertEqual(retry_delay(3), timedelta(seconds=40))
+            self.assertEqual(retry_delay(10), timedelta(seconds=60))
+
+
+@override_settings(TASKS_BACKEND='taskqueue.backends.InMemoryBackend')
+class DeferredSideEffectsTests(TestCase):
+    def setUp(self):
+        self.User = get_user_model()
+        get_backend().jobs.clear()
+
+    def test_review_rating_needs_no_worker(self):
+        """Агрегаты рейтинга обновляются при сохранении отзыва, задачи в очередь не ставятся"""
+        seller = self.User.objects.create_user(phone='+79990000021', password='testpass123', is_seller=True)
+        author = self.User.objects.create_user(phone='+79990000022', password='testpass123')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(author=author, seller=seller, rating=4, comment='Хорошо')
+            Review.objects.create(author=author, seller=seller, rating=5, comment='Отлично')
+
+        self.assertEqual(get_backend().jobs, [])
+        self.assertEqual(float(SellerProfile.objects.get(user=seller).rating), 4.5)
+
+    @override_settings(DEBUG=False, SMS_ENABLED=True)
+    @patch('login_auth.services.SMSService.send_sms', side_effect=[False, True])
+    def test_sms_retried_on_provider_error(self, send_sms):
+        from login_auth.tasks import send_sms as send_sms_task
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_sms_task.delay('+79990000023', 'Код: 1234')
+
+        Worker().drain()
+        job = get_backend().jobs[0]
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_PENDING, 1))
+
+        job.run_at = timezone.now()
+        Worker().drain()
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        self.assertEqual(send_sms.call_count, 2)
@@ -0,0 +1,69 @@
+import os
+import socket
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from .base import execute, get_backend
+
+
+class Heartbeat(threading.Thread):
+    """Фоновый поток, продлевающий блокировку взятых задач, пока идет пачка"""
+
+    def __init__(self, backend, worker_id, jobs, interval):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.worker_id = worker_id
+        self.jobs = jobs
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                self.backend.heartbeat(self.worker_id, self.jobs)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Worker:
+    """Забирает задачи из бэкенда пачками и выполняет их"""
+
+    def __init__(self, backend=None, batch_size=None, worker_id=None):
+        self.backend = backend or get_backend()
+        self.batch_size = batch_size or settings.TASKS_BATCH_SIZE
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+
+    def run_once(self):
+        """Выполняет одну пачку готовых задач; возвращает их количество"""
+        jobs = self.backend.claim(self.worker_id, self.batch_size)
+        if not jobs:
+            return 0
+        heartbeat = Heartbeat(self.backend, self.worker_id, jobs, settings.TASKS_HEARTBEAT_INTERVAL)
+        heartbeat.start()
+        try:
+            for job in jobs:
+                execute(job, self.backend)
+        finally:
+            heartbeat.stop()
+        return len(jobs)
+
+    def run(self, sleep=1.0, stop=None):
+        """Цикл воркера; спит, пока очередь пуста"""
+        while not (stop and stop.is_set()):
+            if not self.run_once():
+                time.sleep(sleep)
+
+    def drain(self, limit=None):
+        """Выполняет задачи, пока очередь не опустеет (для тестов и --once)"""
+        processed = 0
+        while limit is None or processed < limit:
+            count = self.run_once()
+            if not count:
+                break
+            processed += count
+        return processed
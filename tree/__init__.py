@@ -0,0 +1,4 @@
+from .base import MaterializedPathMixin
+from .cache import Tree, get_tree, invalidate
+
+__all__ = ['MaterializedPathMixin', 'Tree', 'get_tree', 'invalidate']
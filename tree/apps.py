@@ -0,0 +1,15 @@
+from django.apps import AppConfig, apps
+from django.utils.translation import gettext_lazy as _
+
+
+class TreeConfig(AppConfig):
+    name = 'tree'
+    verbose_name = _('Деревья категорий')
+
+    def ready(self):
+        from .base import MaterializedPathMixin
+        from .signals import connect
+
+        for model in apps.get_models():
+            if issubclass(model, MaterializedPathMixin):
+                connect(model)
@@ -0,0 +1,74 @@
+"""
+Материализованный путь для моделей-деревьев со ссылкой parent на себя.
+
+В поле path хранятся id всех предков и самого узла: '3/17/42/'. Все потомки узла
+- строки, у которых path начинается с его path, то есть один диапазон индекса по
+path без рекурсивных запросов. Путь пишется после сохранения (нужен pk); при
+переносе узла пути всего поддерева меняются одним UPDATE.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from django.utils.translation import gettext_lazy as _
+
+SEPARATOR = '/'
+
+
+def path_ids(path):
+    """id узлов пути от корня: '3/17/42/' -> [3, 17, 42]"""
+    return [int(part) for part in path.split(SEPARATOR) if part]
+
+
+class MaterializedPathMixin:
+    """
+    Модель с полями parent (ForeignKey('self')) и path (CharField с индексом).
+    Дает descendants() и поддерживает path при сохранении.
+    """
+
+    def _parent_path(self):
+        if self.parent_id is None:
+            return ''
+        return type(self)._default_manager.filter(pk=self.parent_id).values_list('path', flat=True).get()
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id:
+            if self.parent_id == self.pk or self._parent_path().startswith(self.path):
+                raise ValidationError({'parent': _('Категория не может быть вложена в саму себя')})
+
+    def save(self, *args, **kwargs):
+        parent_path = self._parent_path()
+        old_path = self.path
+        if old_path and parent_path.startswith(old_path):
+            raise ValidationError(_('Категория не может быть вложена в саму себя'))
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            path = f'{parent_path}{self.pk}{SEPARATOR}'
+            if path != old_path:
+                manager = type(self)._default_manager
+                manager.filter(pk=self.pk).update(path=path)
+                if old_path:
+                    # Перенос: потомки получают новый префикс
+                    manager.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(path), Substr('path', len(old_path) + 1))
+                    )
+                self.path = path
+
+    def descendants(self, include_self=False):
+        """Все потомки узла одним запросом по префиксу path"""
+        if not self.path:
+            return type(self)._default_manager.none()
+        queryset = type(self)._default_manager.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def ancestor_ids(self):
+        return path_ids(self.path)[:-1]
+
+    @property
+    def depth(self):
+        """0 у корня"""
+        return self.path.count(SEPARATOR) - 1
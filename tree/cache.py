@@ -0,0 +1,91 @@
+"""
+Дерево целиком в памяти процесса.
+
+Категорий немного, а нужны они почти на каждой странице каталога, поэтому дерево
+читается одним запросом и держится в процессе. Для каждого узла заранее собраны
+дети и множество id поддерева, так что «все потомки» - один поиск в словаре.
+
+Процессы узнают об изменениях по поколению в общем кэше: сохранение или удаление
+узла меняет поколение, и каждый процесс перечитает дерево при следующем обращении.
+Поэтому нужен кэш, общий для процессов (Redis, проверяется при запуске: announcements.checks).
+
+Ключи в кэше:
+    tree:gen:<app_label>.<model>    поколение дерева модели
+"""
+import threading
+import uuid
+from django.core.cache import cache
+from .base import path_ids
+
+_trees = {}
+_lock = threading.Lock()
+
+
+def _generation_key(model):
+    return f'tree:gen:{model._meta.label_lower}'
+
+
+class Tree:
+    """
+    Снимок дерева. Узлы - экземпляры модели в порядке Meta.ordering; у каждого есть
+    список subcategories (дети). Узлы общие для всех запросов процесса, их нельзя менять.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = {node.pk: node for node in nodes}
+        self._by_slug = {getattr(node, 'slug', None): node for node in nodes}
+        self.roots = []
+        for node in nodes:
+            node.subcategories = []
+        for node in nodes:
+            parent = self.nodes.get(node.parent_id)
+            (parent.subcategories if parent else self.roots).append(node)
+
+        subtree = {pk: {pk} for pk in self.nodes}
+        for node in nodes:
+            for ancestor_id in path_ids(node.path)[:-1]:
+                if ancestor_id in subtree:
+                    subtree[ancestor_id].add(node.pk)
+        self._subtree = {pk: frozenset(ids) for pk, ids in subtree.items()}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, pk):
+        return self.nodes.get(pk)
+
+    def by_slug(self, slug):
+        return self._by_slug.get(slug)
+
+    def subtree_ids(self, pk):
+        """frozenset id узла и всех его потомков; пустой, если узла нет"""
+        return self._subtree.get(pk, frozenset())
+
+    def ancestors(self, pk):
+        """Предки узла от корня"""
+        node = self.nodes.get(pk)
+        if node is None:
+            return []
+        return [self.nodes[ancestor_id] for ancestor_id in path_ids(node.path)[:-1] if ancestor_id in self.nodes]
+
+    def walk(self, nodes=None):
+        """Узлы в порядке обхода в глубину"""
+        for node in self.roots if nodes is None else nodes:
+            yield node
+            yield from self.walk(node.subcategories)
+
+
+def get_tree(model):
+    """Дерево модели из памяти процесса; перечитывается, когда узлы изменились"""
+    # Если поколение вытеснено из кэша, новое случайное заставит перечитать дерево
+    generation = cache.get_or_set(_generation_key(model), lambda: uuid.uuid4().hex, None)
+    with _lock:
+        entry = _trees.get(model)
+        if entry is None or entry[0] != generation:
+            entry = (generation, Tree(list(model._default_manager.all())))
+            _trees[model] = entry
+        return entry[1]
+
+
+def invalidate(model):
+    cache.set(_generation_key(model), uuid.uuid4().hex, None)
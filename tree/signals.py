@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from common import reset_now_and_on_commit
+from .cache import invalidate
+
+
+def invalidate_tree(sender, **kwargs):
+    """Процессы перечитают дерево при следующем обращении"""
+    reset_now_and_on_commit(lambda: invalidate(sender))
+
+
+def connect(model):
+    post_save.connect(invalidate_tree, sender=model)
+    post_delete.connect(invalidate_tree, sender=model)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+from announcements.filters import AnnouncementFilter
+from announcements.models import Announcement, AnnouncementCategory
+from catalog.models import Category, Product
+from tree import get_tree
+
+User = get_user_model()
+
+
+class TreeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.animals = Category.objects.create(name='Животные', slug='animals')
+        self.dogs = Category.objects.create(name='Собаки', slug='dogs', parent=self.animals)
+        self.puppies = Category.objects.create(name='Щенки', slug='puppies', parent=self.dogs)
+        self.goods = Category.objects.create(name='Товары', slug='goods')
+
+
+class MaterializedPathTest(TreeTestCase):
+    def test_paths(self):
+        self.assertEqual(self.animals.path, f'{self.animals.pk}/')
+        self.assertEqual(self.puppies.path, f'{self.animals.pk}/{self.dogs.pk}/{self.puppies.pk}/')
+        self.assertEqual(self.puppies.depth, 2)
+        self.assertEqual(self.puppies.ancestor_ids(), [self.animals.pk, self.dogs.pk])
+
+    def test_descendants(self):
+        with self.assertNumQueries(1):
+            self.assertCountEqual(self.animals.descendants(), [self.dogs, self.puppies])
+        self.assertCountEqual(self.dogs.descendants(include_self=True), [self.dogs, self.puppies])
+
+    def test_move_rewrites_subtree(self):
+        self.dogs.parent = self.goods
+        self.dogs.save()
+        self.puppies.refresh_from_db()
+        self.assertEqual(self.puppies.path, f'{self.goods.pk}/{self.dogs.pk}/{self.puppies.pk}/')
+        self.assertCountEqual(self.animals.descendants(), [])
+
+    def test_cycle_is_rejected(self):
+        self.animals.parent = self.puppies
+        with self.assertRaises(ValidationError):
+            self.animals.full_clean()
+        with self.assertRaises(ValidationError):
+            self.animals.save()
+
+
+class TreeCacheTest(TreeTestCase):
+    def test_tree_is_cached_per_process(self):
+        tree = get_tree(Category)
+        self.assertEqual(tree.subtree_ids(self.animals.pk), {self.animals.pk, self.dogs.pk, self.puppies.pk})
+        self.assertEqual([node.pk for node in tree.roots], [self.animals.pk, self.goods.pk])
+        self.assertEqual(tree.get(self.dogs.pk).subcategories, [self.puppies])
+        with self.assertNumQueries(0):
+            self.assertIs(get_tree(Category), tree)
+
+    def test_save_and_delete_invalidate(self):
+        get_tree(Category)
+        kittens = Category.objects.create(name='Котята', slug='kittens', parent=self.animals)
+        self.assertIn(kittens.pk, get_tree(Category).subtree_ids(self.animals.pk))
+
+        self.dogs.delete()
+        self.assertEqual(get_tree(Category).subtree_ids(self.animals.pk), {self.animals.pk, kittens.pk})
+
+
+class CategoryFiltersTest(TreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(phone='+79990000231', password='testpass123')
+
+    def test_catalog_search_includes_grandchildren(self):
+        product = Product.objects.create(
+            seller=self.user, category=self.puppies, title='Щенок', description='Описание',
+            condition='new', status='active',
+        )
+        response = self.client.get(reverse('catalog:search'), {'category': self.animals.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(product, response.context['products'])
+
+        response = self.client.get(reverse('catalog:search'), {'category': 0})
+        self.assertEqual(response.status_code, 404)
+
+    def test_category_page_includes_grandchildren(self):
+        product = Product.objects.create(
+            seller=self.user, category=self.puppies, title='Щенок', description='Описание',
+            condition='new', status='active',
+        )
+        response = self.client.get(reverse('catalog:category_detail', kwargs={'slug': 'animals'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(product, response.context['products'])
+
+    def test_announcement_filter_includes_grandchildren(self):
+        pets = AnnouncementCategory.objects.create(name='Питомцы', slug='pets')
+        cats = AnnouncementCategory.objects.create(name='Кошки', slug='cats', parent=pets)
+        kittens = AnnouncementCategory.objects.create(name='Котята', slug='kittens', parent=cats)
+        announcement = Announcement.objects.create(
+            title='Котенок', description='Описание', category=kittens, author=self.user, type='animal',
+        )
+
+        queryset = AnnouncementFilter({'category': pets.pk}, queryset=Announcement.objects.all()).qs
+        self.assertEqual(list(queryset), [announcement])
@@ -1,3 +1,4 @@
+from decimal import Decimal, InvalidOperation
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -5,6 +6,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model, authenticate
 from django.db.models import Q
+from queryplan import plan_queryset
 from ..models import UserProfile, SellerProfile, SpecialistProfile, VerificationDocument
 from ..serializers import (
     UserProfileSerializer, SellerProfileSerializer, 
@@ -18,7 +20,7 @@ User = get_user_model()
 def profile_list(request):
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-    profiles = UserProfile.objects.all()
+    profiles = plan_queryset(UserProfile.objects.all(), UserProfileSerializer)
     serializer = UserProfileSerializer(profiles, many=True)
     return Response(serializer.data)
 
@@ -103,7 +105,7 @@ def specialist_profile_detail(request, pk):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def specialist_search(request):
-    queryset = SpecialistProfile.objects.all()
+    queryset = plan_queryset(SpecialistProfile.objects.all(), SpecialistProfileSerializer)
     
     specialization = request.query_params.get('specialization')
     if specialization:
@@ -113,9 +115,14 @@ def specialist_search(request):
     if min_experience:
         queryset = queryset.filter(experience_years__gte=min_experience)
     
+    # Средняя оценка хранится в профиле с индексом, отзывы не агрегируются
     min_rating = request.query_params.get('min_rating')
     if min_rating:
-        queryset = queryset.filter(rating__gte=min_rating)
+        try:
+            min_rating = Decimal(min_rating)
+        except InvalidOperation:
+            return Response({'min_rating': 'Некорректное значение'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = queryset.filter(rating__gte=min_rating).order_by('-rating', 'pk')
     
     serializer = SpecialistProfileSerializer(queryset, many=True)
     return Response(serializer.data)
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from user_profile import ratings
+
+
+class Command(BaseCommand):
+    help = ('Recomputes seller/specialist rating aggregates (sum, count, histogram, average) from reviews; '
+            'needed after bulk_create/update of reviews, which bypass the incremental updates')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report profiles whose counters differ from their reviews')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', metavar='USER_ID',
+                            help='Only this user (repeatable)')
+
+    def handle(self, *args, **options):
+        for model in ratings.TARGETS:
+            name = model._meta.verbose_name_plural
+            started = time.perf_counter()
+            stale = ratings.inconsistent(model)
+            if options['user_ids']:
+                stale = stale.filter(user_id__in=options['user_ids'])
+            stale_ids = list(stale.values_list('user_id', flat=True))
+
+            if options['check']:
+                self.stdout.write(f'{name}: {len(stale_ids)} inconsistent' + (
+                    f', users {", ".join(map(str, stale_ids[:20]))}' if stale_ids else ''
+                ))
+                continue
+
+            updated = ratings.rebuild(model, options['user_ids'])
+            self.stdout.write(
+                f'{name}: {updated} rebuilt, {len(stale_ids)} were inconsistent, '
+                f'{time.perf_counter() - started:.2f}s'
+            )
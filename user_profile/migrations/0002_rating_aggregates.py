@@ -0,0 +1,122 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:10
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def fill_aggregates(apps, schema_editor):
+    """Заполняет новые счетчики по существующим отзывам"""
+    Review = apps.get_model('user_profile', 'Review')
+    for model_name, field in (('SellerProfile', 'seller'), ('SpecialistProfile', 'specialist')):
+        model = apps.get_model('user_profile', model_name)
+        reviews = Review.objects.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+
+        def aggregate(expression):
+            return Coalesce(Subquery(reviews.annotate(value=expression).values('value')), 0,
+                            output_field=IntegerField())
+
+        values = {
+            'rating_sum': aggregate(Sum('rating')),
+            'rating_count': aggregate(Count('pk')),
+        }
+        for star in range(1, 6):
+            values[f'rating_{star}'] = aggregate(Count('pk', filter=Q(rating=star)))
+        model.objects.update(
+            rating=Coalesce(
+                Round(Cast(values['rating_sum'], FloatField()) / NullIf(values['rating_count'], Value(0)), 2),
+                Value(0.0)
+            ),
+            **values
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sellerprofile',
+            name='rating',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=3, verbose_name='Рейтинг'),
+        ),
+        migrations.AlterField(
+            model_name='specialistprofile',
+            name='rating',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=3, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число оценок'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_1',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 1'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_2',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 2'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_3',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 3'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_4',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 4'),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='rating_5',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 5'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число оценок'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_1',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 1'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_2',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 2'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_3',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 3'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_4',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 4'),
+        ),
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='rating_5',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Оценок 5'),
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
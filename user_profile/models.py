@@ -45,7 +45,38 @@ class UserProfile(models.Model):
     def __str__(self):
         return f'Профиль пользователя {self.user.phone}'
 
-class SellerProfile(models.Model):
+class RatingAggregate(models.Model):
+    """
+    Агрегаты отзывов о продавце или специалисте. Отзывы меняют их атомарными
+    приращениями (см. user_profile.ratings), средняя оценка хранится с индексом
+    для фильтра по рейтингу.
+    """
+    rating = models.DecimalField(
+        _('Рейтинг'),
+        max_digits=3,
+        decimal_places=2,
+        default=0,
+        db_index=True
+    )
+    # Не Positive: устаревший после массовых операций счетчик не должен ронять удаление отзыва
+    rating_sum = models.IntegerField(_('Сумма оценок'), default=0, editable=False)
+    rating_count = models.IntegerField(_('Число оценок'), default=0, editable=False)
+    # Гистограмма: число оценок каждого балла
+    rating_1 = models.IntegerField(_('Оценок 1'), default=0, editable=False)
+    rating_2 = models.IntegerField(_('Оценок 2'), default=0, editable=False)
+    rating_3 = models.IntegerField(_('Оценок 3'), default=0, editable=False)
+    rating_4 = models.IntegerField(_('Оценок 4'), default=0, editable=False)
+    rating_5 = models.IntegerField(_('Оценок 5'), default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rating_histogram(self):
+        """{балл: число оценок} от 5 до 1"""
+        return {star: getattr(self, f'rating_{star}') for star in range(5, 0, -1)}
+
+class SellerProfile(RatingAggregate):
     SELLER_TYPE_CHOICES = [
         ('individual', _('Частное лицо')),
         ('entrepreneur', _('ИП')),
@@ -69,12 +100,6 @@ class SellerProfile(models.Model):
     description = models.TextField(_('Описание'), blank=True)
     website = models.URLField(_('Веб-сайт'), blank=True)
     is_verified = models.BooleanField(_('Верифицирован'), default=False)
-    rating = models.DecimalField(
-        _('Рейтинг'),
-        max_digits=3,
-        decimal_places=2,
-        default=0
-    )
     created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Дата обновления'), auto_now=True)
 
@@ -85,7 +110,7 @@ class SellerProfile(models.Model):
     def __str__(self):
         return f'Профиль продавца {self.user.phone}'
 
-class SpecialistProfile(models.Model):
+class SpecialistProfile(RatingAggregate):
     SPECIALIZATION_CHOICES = [
         ('veterinarian', _('Ветеринар')),
         ('groomer', _('Грумер')),
@@ -114,12 +139,6 @@ class SpecialistProfile(models.Model):
         blank=True
     )
     is_verified = models.BooleanField(_('Верифицирован'), default=False)
-    rating = models.DecimalField(
-        _('Рейтинг'),
-        max_digits=3,
-        decimal_places=2,
-        default=0
-    )
     created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Дата обновления'), auto_now=True)
 
@@ -267,17 +286,5 @@ class Review(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
-        # Обновляем рейтинг продавца или специалиста
-        target = self.seller or self.specialist
-        if target:
-            reviews = Review.objects.filter(
-                models.Q(seller=target) | models.Q(specialist=target)
-            )
-            avg_rating = reviews.aggregate(models.Avg('rating'))['rating__avg']
-            if target.is_seller:
-                target.seller_profile.rating = avg_rating
-                target.seller_profile.save()
-            if target.is_specialist:
-                target.specialist_profile.rating = avg_rating
-                target.specialist_profile.save() 
\ No newline at end of file
+        # Рейтинг продавца или специалиста обновляют сигналы, см. user_profile.ratings
+        super().save(*args, **kwargs) 
\ No newline at end of file
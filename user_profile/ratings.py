@@ -0,0 +1,112 @@
+"""
+Агрегаты рейтинга продавцов и специалистов.
+
+В профиле хранятся сумма и число оценок, гистограмма по баллам и средняя оценка
+(rating, с индексом). Создание, изменение и удаление отзыва меняют их одним
+UPDATE с приращениями F() сразу после записи отзыва (post_save), без пересчета AVG
+по всем отзывам цели: параллельные отзывы не теряют изменений. Сигнал приходит уже
+после транзакции save(), поэтому отзыв и агрегаты откатываются вместе, только если
+транзакцию открыл вызывающий код (ATOMIC_REQUESTS выключен); расхождения после
+сбоя между ними находит inconsistent. Массовые операции (bulk_create, QuerySet.update) сигналов не шлют -
+после них агрегаты пересчитывает rebuild (команда rebuild_ratings).
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from .models import Review, SellerProfile, SpecialistProfile
+
+STARS = range(1, 6)
+
+# Модель профиля -> поле отзыва со ссылкой на пользователя-цель
+TARGETS = {
+    SellerProfile: 'seller',
+    SpecialistProfile: 'specialist',
+}
+
+COUNTER_FIELDS = ['rating_sum', 'rating_count'] + [f'rating_{star}' for star in STARS]
+
+
+def _average(rating_sum, rating_count):
+    """Средняя оценка с двумя знаками; 0 без оценок"""
+    return Coalesce(
+        Round(Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0)), 2),
+        Value(0.0)
+    )
+
+
+def review_target(seller_id, specialist_id):
+    """(модель профиля, id пользователя) цели отзыва"""
+    if seller_id:
+        return SellerProfile, seller_id
+    if specialist_id:
+        return SpecialistProfile, specialist_id
+    return None, None
+
+
+def apply(changes):
+    """
+    Применяет изменения оценок: changes - (модель профиля, id пользователя, балл, +1 или -1).
+    Изменения одной цели складываются в один UPDATE.
+    """
+    deltas = {}
+    for model, user_id, rating, sign in changes:
+        if model is None or rating not in STARS:
+            continue
+        delta = deltas.setdefault((model, user_id), dict.fromkeys(COUNTER_FIELDS, 0))
+        delta['rating_sum'] += sign * rating
+        delta['rating_count'] += sign
+        delta[f'rating_{rating}'] += sign
+
+    # Перенос отзыва на другую цель меняет два профиля: оба или ни одного
+    with transaction.atomic():
+        for (model, user_id), delta in deltas.items():
+            delta = {name: value for name, value in delta.items() if value}
+            if not delta:
+                continue
+            # Правые части UPDATE видят значения строки до изменения
+            rating_sum = F('rating_sum') + delta.get('rating_sum', 0)
+            rating_count = F('rating_count') + delta.get('rating_count', 0)
+            model.objects.filter(user_id=user_id).update(
+                rating=_average(rating_sum, rating_count),
+                **{name: F(name) + value for name, value in delta.items()}
+            )
+
+
+def expected(model):
+    """Агрегаты профилей model, посчитанные по отзывам, - выражения для annotate/update"""
+    field = TARGETS[model]
+    reviews = Review.objects.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+
+    def aggregate(expression):
+        return Coalesce(Subquery(reviews.annotate(value=expression).values('value')), 0,
+                        output_field=IntegerField())
+
+    values = {
+        'rating_sum': aggregate(Sum('rating')),
+        'rating_count': aggregate(Count('pk')),
+    }
+    for star in STARS:
+        values[f'rating_{star}'] = aggregate(Count('pk', filter=Q(rating=star)))
+    return values
+
+
+def rebuild(model, user_ids=None):
+    """Пересчитывает агрегаты профилей с нуля одним UPDATE; возвращает число профилей"""
+    values = expected(model)
+    profiles = model.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return profiles.update(
+        rating=_average(values['rating_sum'], values['rating_count']),
+        **values
+    )
+
+
+def inconsistent(model):
+    """Профили, чьи счетчики расходятся с отзывами"""
+    values = expected(model)
+    aliases = {f'expected_{name}': expression for name, expression in values.items()}
+    mismatch = Q()
+    for name in values:
+        mismatch |= ~Q(**{name: F(f'expected_{name}')})
+    return model.objects.alias(**aliases).filter(mismatch)
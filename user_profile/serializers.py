@@ -9,16 +9,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'phone', 'bio', 'location', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class SellerProfileSerializer(serializers.ModelSerializer):
+class RatingFieldsMixin(serializers.Serializer):
+    """Средняя оценка, число отзывов и гистограмма для профилей с RatingAggregate"""
+    rating = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True)
+    rating_count = serializers.IntegerField(read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+class SellerProfileSerializer(RatingFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SellerProfile
-        fields = ['seller_type', 'company_name', 'inn', 'description', 'website']
+        fields = ['seller_type', 'company_name', 'inn', 'description', 'website',
+                  'rating', 'rating_count', 'rating_histogram']
         read_only_fields = ['is_verified', 'rating']
 
-class SpecialistProfileSerializer(serializers.ModelSerializer):
+class SpecialistProfileSerializer(RatingFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SpecialistProfile
-        fields = ['specialization', 'experience_years', 'services', 'price_range', 'certificates']
+        fields = ['specialization', 'experience_years', 'services', 'price_range', 'certificates',
+                  'rating', 'rating_count', 'rating_histogram']
         read_only_fields = ['is_verified', 'rating']
 
 class VerificationDocumentSerializer(serializers.ModelSerializer):
@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
-from .models import UserProfile, SellerProfile, SpecialistProfile
+from common import loaded_values, remember_on_init
+from .models import Review, UserProfile, SellerProfile, SpecialistProfile
+from . import ratings
 
 User = get_user_model()
 
@@ -28,4 +30,34 @@ def create_seller_profile(sender, instance, created, **kwargs):
 def create_specialist_profile(sender, instance, created, **kwargs):
     """Создает профиль специалиста при активации статуса специалиста"""
     if instance.is_specialist and not hasattr(instance, 'specialist_profile'):
-        SpecialistProfile.objects.create(user=instance) 
\ No newline at end of file
+        SpecialistProfile.objects.create(user=instance) 
+
+
+def _review_state(instance):
+    seller_id, specialist_id, rating = loaded_values(instance, 'seller_id', 'specialist_id', 'rating')
+    return (*ratings.review_target(seller_id, specialist_id), rating)
+
+
+# Сохраненные цель и оценка: из них вычитается прежний вклад отзыва
+remember_on_init(Review, '_saved_rating', lambda instance: _review_state(instance) if instance.pk else None)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, raw=False, **kwargs):
+    """Агрегаты цели меняются на разницу между прежней и новой оценкой"""
+    if raw:
+        return
+    state = _review_state(instance)
+    if state != instance._saved_rating:
+        changes = [(*state, 1)]
+        if instance._saved_rating:
+            changes.append((*instance._saved_rating, -1))
+        ratings.apply(changes)
+    instance._saved_rating = state
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    if instance._saved_rating:
+        ratings.apply([(*instance._saved_rating, -1)])
+        instance._saved_rating = None
@@ -0,0 +1,12 @@
+from taskqueue import task
+from . import ratings
+
+
+@task
+def update_rating(user_id):
+    """
+    Пересчет агрегатов рейтинга пользователя с нуля. Новые отзывы обновляют их
+    сами (user_profile.ratings); задача нужна после массовых операций с отзывами.
+    """
+    for model in ratings.TARGETS:
+        ratings.rebuild(model, user_ids=[user_id])
@@ -0,0 +1,113 @@
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from user_profile import ratings
+from user_profile.api.views import specialist_search
+from user_profile.models import Review, SellerProfile, SpecialistProfile
+
+User = get_user_model()
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(phone='+79990000251', password='testpass123', is_seller=True)
+        self.specialist = self._specialist('+79990000252')
+        self.author = User.objects.create_user(phone='+79990000253', password='testpass123')
+
+    def _specialist(self, phone, experience_years=5):
+        """Профиль создается с обязательными полями до того, как пользователь станет специалистом"""
+        user = User.objects.create_user(phone=phone, password='testpass123')
+        SpecialistProfile.objects.create(
+            user=user, specialization='veterinarian', experience_years=experience_years,
+            services='Консультации', price_range='1000-3000',
+        )
+        user.is_specialist = True
+        user.save()
+        return user
+
+    def _review(self, rating, **target):
+        return Review.objects.create(author=self.author, rating=rating, comment='Отзыв',
+                                     **(target or {'seller': self.seller}))
+
+    def _assertConsistent(self):
+        for model in ratings.TARGETS:
+            self.assertFalse(ratings.inconsistent(model).exists())
+
+    def test_create_updates_aggregates(self):
+        self._review(4)
+        self._review(5)
+        self._review(5)
+        profile = SellerProfile.objects.get(user=self.seller)
+        self.assertEqual(profile.rating, Decimal('4.67'))
+        self.assertEqual((profile.rating_sum, profile.rating_count), (14, 3))
+        self.assertEqual(profile.rating_histogram, {5: 2, 4: 1, 3: 0, 2: 0, 1: 0})
+        self._assertConsistent()
+
+    def test_update_and_delete(self):
+        review = self._review(2)
+        self._review(4)
+        review.rating = 5
+        review.save()
+        profile = SellerProfile.objects.get(user=self.seller)
+        self.assertEqual(profile.rating, Decimal('4.50'))
+        self.assertEqual((profile.rating_2, profile.rating_5), (0, 1))
+
+        # Отзыв перенесен на специалиста
+        review.seller = None
+        review.specialist = self.specialist
+        review.save()
+        self.assertEqual(SellerProfile.objects.get(user=self.seller).rating, Decimal('4.00'))
+        self.assertEqual(SpecialistProfile.objects.get(user=self.specialist).rating_count, 1)
+        self._assertConsistent()
+
+        review.delete()
+        specialist = SpecialistProfile.objects.get(user=self.specialist)
+        self.assertEqual((specialist.rating, specialist.rating_count), (0, 0))
+        self._assertConsistent()
+
+    def test_one_update_per_review(self):
+        review = self._review(3)
+        review.comment = 'Исправлено'
+        # Без смены оценки и цели агрегаты не трогаются
+        with self.assertNumQueries(1):
+            review.save()
+
+    def test_rebuild_after_bulk_create(self):
+        Review.objects.bulk_create([
+            Review(author=self.author, seller=self.seller, rating=rating, comment='Отзыв') for rating in (1, 3, 5)
+        ])
+        self.assertTrue(ratings.inconsistent(SellerProfile).filter(user=self.seller).exists())
+
+        out = StringIO()
+        call_command('rebuild_ratings', '--check', stdout=out)
+        self.assertIn(f'users {self.seller.pk}', out.getvalue())
+
+        call_command('rebuild_ratings', '--user', str(self.seller.pk), stdout=StringIO())
+        profile = SellerProfile.objects.get(user=self.seller)
+        self.assertEqual((profile.rating, profile.rating_count), (Decimal('3.00'), 3))
+        self._assertConsistent()
+
+    def test_min_rating_filter_uses_aggregate(self):
+        self._review(5, specialist=self.specialist)
+        other = self._specialist('+79990000254', experience_years=2)
+        Review.objects.create(author=self.author, specialist=other, rating=2, comment='Отзыв')
+
+        def search(min_rating):
+            request = APIRequestFactory().get('/api/specialists/search/', {'min_rating': min_rating})
+            force_authenticate(request, user=self.author)
+            return specialist_search(request)
+
+        response = search('4')
+        self.assertEqual(response.status_code, 200)
+        # В ответе нет id пользователя: специалисты различаются стажем
+        self.assertEqual([item['experience_years'] for item in response.data], [5])
+        self.assertEqual((response.data[0]['rating'], response.data[0]['rating_count']), ('5.00', 1))
+        self.assertEqual(len(search('1').data), 2)
+
+        response = search('abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_rating', response.data)